@@ -20,11 +20,15 @@ import re
 import os
 import time
 from urlparse import parse_qs
-from tempfile import NamedTemporaryFile
 
 SYNC_CALL = saga.adaptors.cpi.decorators.SYNC_CALL
 ASYNC_CALL = saga.adaptors.cpi.decorators.ASYNC_CALL
 
+_FINAL_STATES = [saga.job.DONE, saga.job.FAILED, saga.job.CANCELED]
+
+# delimiter for submit descriptions which are passed as here documents
+_SCRIPT_EOF = 'SAGA_CONDOR_SCRIPT_EOF'
+
 
 # --------------------------------------------------------------------
 #
@@ -211,7 +215,20 @@ _PTY_TIMEOUT = 2.0
 #
 _ADAPTOR_NAME          = "saga.adaptor.condorjob"
 _ADAPTOR_SCHEMAS       = ["condor", "condor+ssh", "condor+gsissh"]
-_ADAPTOR_OPTIONS       = []
+_ADAPTOR_OPTIONS       = [
+    {
+    'category'         : 'saga.adaptor.condorjob',
+    'name'             : 'polling',
+    'type'             : str,
+    'default'          : 'pending=2,pending_max=30,running=1,final=0.5',
+    'documentation'    : '''Polling intervals for job state queries (condor_q,
+                          condor_history), in seconds, as comma separated
+                          key=value pairs: pending, pending_max, running,
+                          final, backoff, latency (see
+                          saga.utils.poll_policy).''',
+    'env_variable'     : None
+    }
+]
 
 # --------------------------------------------------------------------
 # the adaptor capabilities & supported attributes
@@ -298,6 +315,8 @@ class Adaptor (saga.adaptors.base.Base):
         self.id_re = re.compile('^\[(.*)\]-\[(.*?)\]$')
         self.opts  = self.get_config (_ADAPTOR_NAME)
 
+        self.polling = self.opts['polling'].get_value()
+
     # ----------------------------------------------------------------
     #
     def sanity_check(self):
@@ -381,6 +400,10 @@ class CondorJobService (saga.adaptors.cpi.job.Service):
 
         self.shell = saga.utils.pty_shell.PTYShell(pty_url, self.session)
 
+        # paces the state queries of all job services for this host
+        self._policy = self.shell.get_poll_policy(_ADAPTOR_NAME,
+                                                  self._adaptor.polling)
+
       # self.shell.set_initialize_hook(self.initialize)
       # self.shell.set_finalize_hook(self.finalize)
 
@@ -399,6 +422,33 @@ class CondorJobService (saga.adaptors.cpi.job.Service):
     # ----------------------------------------------------------------
     #
     def initialize(self):
+        # use the discovery results of an earlier job service for the same
+        # host and user, if they are cached
+        self._discovery        = self.shell.get_discovery_cache(_ADAPTOR_NAME)
+        self._discovery_cached = False
+
+        info = None
+        if self._discovery:
+            info = self._discovery.get()
+
+        if info is not None:
+            self._logger.info("Using cached Condor discovery results: %s" % info)
+            self._discovery_cached = True
+
+        else:
+            info = self._discover()
+            if self._discovery:
+                self._discovery.put(info)
+
+        self._commands = info['commands']
+
+    # ----------------------------------------------------------------
+    #
+    def _discover(self):
+        """ find the Condor tools on the remote host, and return them as dict
+        """
+        commands = dict()
+
         # check if all required condor tools are available
         for cmd in self._commands.keys():
             ret, out, _ = self.shell.run_sync("which %s " % cmd)
@@ -422,10 +472,28 @@ class CondorJobService (saga.adaptors.cpi.job.Service):
                         version = version.strip(" $")
 
                         # add path and version to the command dictionary
-                self._commands[cmd] = {"path":    path,
-                                       "version": version}
+                commands[cmd] = {"path":    path,
+                                 "version": version}
+
+        self._logger.info("Found Condor tools: %s" % commands)
 
-        self._logger.info("Found Condor tools: %s" % self._commands)
+        return {'commands': commands}
+
+    # ----------------------------------------------------------------
+    #
+    def _rediscover(self):
+        """ drop cached discovery results after a failed submission, and
+            rediscover the remote environment.  Returns False if the results
+            were not cached (so that rediscovery would not change anything).
+        """
+        if not self._discovery_cached:
+            return False
+
+        self._logger.info("Condor submission failed -- discovering again")
+        self._discovery.invalidate()
+        self.initialize()
+
+        return True
 
     # ----------------------------------------------------------------
     #
@@ -435,7 +503,25 @@ class CondorJobService (saga.adaptors.cpi.job.Service):
     # ----------------------------------------------------------------
     #
     def _job_run(self, jd):
-        """ runs a job via qsub
+        """ runs a job via condor_submit
+        """
+
+        script = self._job_script(jd)
+        ret, out, _ = self.shell.run_sync(self._job_submit_cmd(script))
+
+        if ret != 0 and self._rediscover():
+            # the submission may have failed because of stale cached discovery
+            # results -- try once more
+            script = self._job_script(jd)
+            ret, out, _ = self.shell.run_sync(self._job_submit_cmd(script))
+
+        return self._job_submit_parse(ret, out, script)
+
+    # ----------------------------------------------------------------
+    #
+    def _job_script(self, jd):
+        """ creates the Condor submit description for a job (and stages its
+            input files)
         """
 
         # Because we do funky shit with env and sh, we need to explicitly add
@@ -471,26 +557,27 @@ class CondorJobService (saga.adaptors.cpi.job.Service):
                 jd=jd, option_dict=self.query_options)
         self._logger.info("Generated Condor script: %s" % script)
 
-        submit_file = NamedTemporaryFile(mode='w', suffix='.condor',
-                    prefix='tmp-saga-', delete=False)
-        submit_file.write(script)
-        submit_file.close()
-        self._logger.info("Written Condor script locally: %s" % submit_file.name)
-
-        if self.shell.url.scheme == "ssh":
-            self._logger.info("Transferring Condor script to: %s" % self.shell.url)
-            submit_file_name = os.path.basename(submit_file.name)
-            self.shell.stage_to_remote(submit_file.name, submit_file_name, cp_flags="-P")
-
-        elif self.shell.url.scheme == "gsissh":
-            raise NotImplemented("GSISSH support for Condor not implemented.")
-        else:
-            submit_file_name = submit_file.name
+        return script
 
+    # ----------------------------------------------------------------
+    #
+    def _job_submit_cmd(self, script):
+        """ creates the command line which submits a Condor submit description
+        """
 
-        ret, out, _ = self.shell.run_sync('%s -verbose %s' \
-            % (self._commands['condor_submit']['path'], submit_file_name))
+        # condor_submit reads the submit description from stdin, so we can
+        # pass it as (literal) here document, instead of staging a file --
+        # that also allows to submit many jobs in a single shell exchange
+        return "%s -verbose <<'%s'\n%s\n%s" \
+            % (self._commands['condor_submit']['path'], _SCRIPT_EOF,
+               script.rstrip('\n'), _SCRIPT_EOF)
 
+    # ----------------------------------------------------------------
+    #
+    def _job_submit_parse(self, ret, out, script):
+        """ parses the output of condor_submit, and adds the job to the
+            internal list of known jobs
+        """
 
         if ret != 0:
             # something went wrong
@@ -527,14 +614,6 @@ class CondorJobService (saga.adaptors.cpi.job.Service):
                 'stderr':       None
             }
 
-            # remove submit file(s)
-            # XXX: maybe leave them in case of debugging?
-            if self.shell.url.scheme == 'ssh':
-                ret, out, _ = self.shell.run_sync ('rm %s' % submit_file_name)
-            elif self.shell.url.scheme == 'gsissh':
-                raise NotImplemented("GSISSH support for Condor not implemented.")
-            os.remove(submit_file.name)
-
             return job_id
 
     # ----------------------------------------------------------------
@@ -674,54 +753,22 @@ class CondorJobService (saga.adaptors.cpi.job.Service):
         rm, pid = self._adaptor.parse_id(job_id)
 
         # run the Condor 'condor_q' command to get some infos about our job
-        ret, out, _ = self.shell.run_sync("unset GREP_OPTIONS; %s -long %s | \
-            grep -E '(JobStatus)|(ExitStatus)|(CompletionDate)'" \
-            % (self._commands['condor_q']['path'], pid))
+        with self._policy.query():
+            ret, out, _ = self.shell.run_sync("unset GREP_OPTIONS; %s -long %s | \
+                grep -E '(JobStatus)|(ExitStatus)|(CompletionDate)'" \
+                % (self._commands['condor_q']['path'], pid))
 
         if ret != 0:
             if prev_info['state'] in [saga.job.RUNNING, saga.job.PENDING]:
 
                 # run the Condor 'condor_history' command to get info about 
                 # finished jobs
-                ret, out, _ = self.shell.run_sync("unset GREP_OPTIONS; %s -long -match 1 %s | \
-                    grep -E '(ExitCode)|(TransferOutput)|(CompletionDate)|(JobCurrentStartDate)|(QDate)|(Err)|(Out)'" \
-                    % (self._commands['condor_history']['path'], pid))
+                with self._policy.query():
+                    ret, out, _ = self.shell.run_sync("unset GREP_OPTIONS; %s -long -match 1 %s | \
+                        grep -E '(ExitCode)|(TransferOutput)|(CompletionDate)|(JobCurrentStartDate)|(QDate)|(Err)|(Out)'" \
+                        % (self._commands['condor_history']['path'], pid))
                 
-                if ret != 0:
-                    message = "Error getting job history via 'condor_history': %s" % out
-                    log_error_and_raise(message, saga.NoSuccess, self._logger)
-
-                # parse the egrep result. this should look something like this:
-                # ExitCode = 0
-                # TransferOutput = "radical.txt"
-                results = out.split('\n')
-                for result in results:
-                    if len(result.split('=')) == 2:
-                        key, val = result.split('=')
-                        key = key.strip()  # strip() removes whitespaces at the
-                        val = val.strip()  # beginning and the end of the string
-
-                        if key == 'ExitCode':
-                            curr_info['returncode'] = int(val)
-                        elif key == 'TransferOutput':
-                            curr_info['transfers'] = val
-                        elif key == 'QDate':
-                            curr_info['create_time'] = val
-                        elif key == 'JobCurrentStartDate':
-                            curr_info['start_time'] = val
-                        elif key == 'CompletionDate':
-                            curr_info['end_time'] = val
-                        elif key == 'Out':
-                            curr_info['stdout'] = val
-                        elif key == 'Err':
-                            curr_info['stderr'] = val
-
-                if curr_info['returncode'] == 0:
-                    curr_info['state'] = saga.job.DONE
-                else:
-                    curr_info['state'] = saga.job.FAILED
-
-                curr_info['gone'] = True
+                self._parse_history(ret, out, curr_info)
 
             else:
                 curr_info['gone'] = True
@@ -730,68 +777,204 @@ class CondorJobService (saga.adaptors.cpi.job.Service):
             #    message = "Error retrieving job info via 'condor_q': %s" % out
             #    log_error_and_raise(message, saga.NoSuccess, self._logger)
         else:
-            # parse the egrep result. this should look something like this:
-            # JobStatus = 5
-            # ExitStatus = 0
-            # CompletionDate = 0
-            results = out.split('\n')
-            for result in results:
-                if len(result.split('=')) == 2:
-                    key, val = result.split('=')
-                    key = key.strip()  # strip() removes whitespaces at the
-                    val = val.strip()  # beginning and the end of the string
-
-                    if key == 'JobStatus':
-                        curr_info['state'] = _condor_to_saga_jobstate(val)
-                    elif key == 'ExitStatus':
-                        curr_info['returncode'] = val
-                    elif key == 'CompletionDate':
-                        curr_info['end_time'] = val
+            self._parse_queue(out, curr_info)
 
         if curr_info['gone'] is True:
-            # If we are running over SSH, copy the output to our local system
-            if self.shell.url.scheme == "ssh":
-                files = []
+            self._stage_out(curr_info)
+
+        # return the new job info dict
+        return curr_info
+
+    # ----------------------------------------------------------------
+    #
+    def _job_get_infos(self, job_ids):
+        """ get the attributes of many jobs with one condor_q call, and one
+            bulk exchange of condor_history calls for the jobs which left the
+            queue.  Returns a dict of new job info dicts, keyed by job id.
+        """
 
-                if curr_info['transfers']:
-                    t = curr_info['transfers']
-                    self._logger.debug("TransferOutput: %s" % t)
+        pids = dict()
+        for job_id in job_ids:
+            rm, pid = self._adaptor.parse_id(job_id)
+            pids[pid] = job_id
 
-                    # Remove leading and ending double quotes
-                    if t.startswith('"') and t.endswith('"'):
-                        t = t[1:-1]
+        # the job ids are passed on stdin, to avoid overly long command lines.
+        # The ads of the jobs are separated by empty lines.
+        with self._policy.query():
+            ret, out, _ = self.shell.run_sync("unset GREP_OPTIONS; { xargs %s -long <<EOT\n%s\nEOT\n} | \
+                grep -E '^$|^(ClusterId|ProcId|JobStatus|ExitStatus|CompletionDate) '" \
+                % (self._commands['condor_q']['path'], "\n".join(pids.keys())))
 
-                    # Parse comma separated list
-                    files += t.split(',')
+        queued = dict()
+        ad     = list()
 
-                if curr_info['stdout']:
-                    t = curr_info['stdout']
-                    self._logger.debug("StdOut: %s" % t)
+        for line in out.split('\n') + ['']:
 
-                    # Remove leading and ending double quotes
-                    if t.startswith('"') and t.endswith('"'):
-                        t = t[1:-1]
+            if line.strip():
+                ad.append(line)
+                continue
 
-                    files.append(t)
+            if ad:
+                attrs = dict([[elem.strip() for elem in l.split('=', 1)] \
+                              for l in ad if '=' in l])
+                pid   = "%s.%s" % (attrs.get('ClusterId'), attrs.get('ProcId'))
+                if pid in pids:
+                    queued[pid] = '\n'.join(ad)
+            ad = list()
 
-                if curr_info['stderr']:
-                    t = curr_info['stderr']
-                    self._logger.debug("StdErr: %s" % t)
+        job_infos = dict()
+        history   = list()
 
-                    # Remove leading and ending double quotes
-                    if t.startswith('"') and t.endswith('"'):
-                        t = t[1:-1]
+        for pid, job_id in pids.iteritems():
 
-                    files.append(t)
+            curr_info = dict(self.jobs[job_id])
 
-                # Transfer list of files
-                for f in files:
-                    f = f.strip()
-                    self._logger.info("Transferring file %s" % f)
-                    self.shell.stage_from_remote(f, f)
+            if pid in queued:
+                self._parse_queue(queued[pid], curr_info)
 
-        # return the new job info dict
-        return curr_info
+            elif curr_info['state'] in [saga.job.RUNNING, saga.job.PENDING]:
+                history.append(pid)
+
+            else:
+                curr_info['gone'] = True
+
+            job_infos[job_id] = curr_info
+
+        # run the Condor 'condor_history' command to get info about finished
+        # jobs
+        cmds = ["unset GREP_OPTIONS; %s -long -match 1 %s | \
+            grep -E '(ExitCode)|(TransferOutput)|(CompletionDate)|(JobCurrentStartDate)|(QDate)|(Err)|(Out)'" \
+            % (self._commands['condor_history']['path'], pid) for pid in history]
+
+        if history:
+            with self._policy.query():
+                results = self.shell.run_bulk(cmds)
+
+            for pid, (ret, out) in zip(history, results):
+                self._parse_history(ret, out, job_infos[pids[pid]])
+
+        for job_id in job_infos:
+            if job_infos[job_id]['gone'] is True:
+                self._stage_out(job_infos[job_id])
+
+        return job_infos
+
+    # ----------------------------------------------------------------
+    #
+    def _parse_queue(self, out, curr_info):
+        """ parse the (egrep'ed) output of 'condor_q -long' into a job info
+            dict
+        """
+
+        # parse the egrep result. this should look something like this:
+        # JobStatus = 5
+        # ExitStatus = 0
+        # CompletionDate = 0
+        results = out.split('\n')
+        for result in results:
+            if len(result.split('=')) == 2:
+                key, val = result.split('=')
+                key = key.strip()  # strip() removes whitespaces at the
+                val = val.strip()  # beginning and the end of the string
+
+                if key == 'JobStatus':
+                    curr_info['state'] = _condor_to_saga_jobstate(val)
+                elif key == 'ExitStatus':
+                    curr_info['returncode'] = val
+                elif key == 'CompletionDate':
+                    curr_info['end_time'] = val
+
+    # ----------------------------------------------------------------
+    #
+    def _parse_history(self, ret, out, curr_info):
+        """ parse the (egrep'ed) output of 'condor_history -long' into a job
+            info dict -- the job is gone afterwards
+        """
+
+        if ret != 0:
+            message = "Error getting job history via 'condor_history': %s" % out
+            log_error_and_raise(message, saga.NoSuccess, self._logger)
+
+        # parse the egrep result. this should look something like this:
+        # ExitCode = 0
+        # TransferOutput = "radical.txt"
+        results = out.split('\n')
+        for result in results:
+            if len(result.split('=')) == 2:
+                key, val = result.split('=')
+                key = key.strip()  # strip() removes whitespaces at the
+                val = val.strip()  # beginning and the end of the string
+
+                if key == 'ExitCode':
+                    curr_info['returncode'] = int(val)
+                elif key == 'TransferOutput':
+                    curr_info['transfers'] = val
+                elif key == 'QDate':
+                    curr_info['create_time'] = val
+                elif key == 'JobCurrentStartDate':
+                    curr_info['start_time'] = val
+                elif key == 'CompletionDate':
+                    curr_info['end_time'] = val
+                elif key == 'Out':
+                    curr_info['stdout'] = val
+                elif key == 'Err':
+                    curr_info['stderr'] = val
+
+        if curr_info['returncode'] == 0:
+            curr_info['state'] = saga.job.DONE
+        else:
+            curr_info['state'] = saga.job.FAILED
+
+        curr_info['gone'] = True
+
+    # ----------------------------------------------------------------
+    #
+    def _stage_out(self, curr_info):
+        """ copy the output files of a finished job to our local system, if
+            we are running over SSH
+        """
+
+        if self.shell.url.scheme != "ssh":
+            return
+
+        files = []
+
+        if curr_info.get('transfers'):
+            t = curr_info['transfers']
+            self._logger.debug("TransferOutput: %s" % t)
+
+            # Remove leading and ending double quotes
+            if t.startswith('"') and t.endswith('"'):
+                t = t[1:-1]
+
+            # Parse comma separated list
+            files += t.split(',')
+
+        if curr_info.get('stdout'):
+            t = curr_info['stdout']
+            self._logger.debug("StdOut: %s" % t)
+
+            # Remove leading and ending double quotes
+            if t.startswith('"') and t.endswith('"'):
+                t = t[1:-1]
+
+            files.append(t)
+
+        if curr_info.get('stderr'):
+            t = curr_info['stderr']
+            self._logger.debug("StdErr: %s" % t)
+
+            # Remove leading and ending double quotes
+            if t.startswith('"') and t.endswith('"'):
+                t = t[1:-1]
+
+            files.append(t)
+
+        # Transfer list of files
+        for f in files:
+            f = f.strip()
+            self._logger.info("Transferring file %s" % f)
+            self.shell.stage_from_remote(f, f)
 
     # ----------------------------------------------------------------
     #
@@ -900,6 +1083,7 @@ class CondorJobService (saga.adaptors.cpi.job.Service):
         time_start = time.time()
         time_now   = time_start
         rm, pid    = self._adaptor.parse_id(job_id)
+        poller     = self._policy.poller()
 
         while True:
             state = self._job_get_state(job_id=job_id)
@@ -909,7 +1093,7 @@ class CondorJobService (saga.adaptors.cpi.job.Service):
                state == saga.job.CANCELED:
                     return True
             # avoid busy poll
-            time.sleep(0.5)
+            poller.sleep([state], time_start, timeout)
 
             # check if we hit timeout
             if timeout >= 0:
@@ -998,29 +1182,147 @@ class CondorJobService (saga.adaptors.cpi.job.Service):
         return ids
 
 
-  # # ----------------------------------------------------------------
-  # #
-  # def container_run (self, jobs) :
-  #     self._logger.debug ("container run: %s"  %  str(jobs))
-  #     # TODO: this is not optimized yet
-  #     for job in jobs:
-  #         job.run ()
-  #
-  #
-  # # ----------------------------------------------------------------
-  # #
-  # def container_wait (self, jobs, mode, timeout) :
-  #     self._logger.debug ("container wait: %s"  %  str(jobs))
-  #     # TODO: this is not optimized yet
-  #     for job in jobs:
-  #         job.wait ()
-  #
-  #
-  # # ----------------------------------------------------------------
-  # #
-  # def container_cancel (self, jobs) :
-  #     self._logger.debug ("container cancel: %s"  %  str(jobs))
-  #     raise saga.NoSuccess ("Not Implemented");
+    # ----------------------------------------------------------------
+    #
+    def container_run(self, jobs):
+        """ submits all jobs in a single shell exchange
+        """
+        self._logger.debug("container run: %s" % str(jobs))
+
+        error    = None
+        rejected = False
+        submits  = list()
+        scripts  = list()
+
+        for job in jobs:
+            try:
+                scripts.append(self._job_script(job._adaptor.jd))
+                submits.append(job)
+            except saga.SagaException as e:
+                # submit the other jobs anyway
+                error = e
+                self._container_fail([job], e)
+
+        results = self.shell.run_bulk([self._job_submit_cmd(script) \
+                                       for script in scripts])
+
+        for job, script, (ret, out) in zip(submits, scripts, results):
+            try:
+                job._adaptor._id      = self._job_submit_parse(ret, out, script)
+                job._adaptor._started = True
+            except saga.SagaException as e:
+                error    = e
+                rejected = True
+                self._container_fail([job], e)
+
+        if rejected:
+            # make sure that later submissions don't use stale cached
+            # discovery results
+            self._rediscover()
+
+        if error:
+            raise error
+
+    # ----------------------------------------------------------------
+    #
+    def _container_fail(self, jobs, e):
+        """ marks jobs which could not be submitted as failed
+        """
+        for job in jobs:
+            job._adaptor._state     = saga.job.FAILED
+            job._adaptor._exception = e
+
+    # ----------------------------------------------------------------
+    #
+    def _container_jobs(self, jobs):
+        """ returns the ids of those jobs which have been submitted, and
+            which are known to this service (jobs which failed to submit, and
+            jobs reconnected via other services, are skipped)
+        """
+        return [job._adaptor._id for job in jobs \
+                if job._adaptor._id and job._adaptor._id in self.jobs]
+
+    # ----------------------------------------------------------------
+    #
+    def container_wait(self, jobs, mode, timeout):
+        """ waits for any or all jobs to finish, with one bulk query per poll
+        """
+        self._logger.debug("container wait: %s" % str(jobs))
+
+        for job in jobs:
+            if job._adaptor._started is False and \
+               job._adaptor._state != saga.job.FAILED:
+                log_error_and_raise("Can't wait for job that hasn't been started",
+                    saga.IncorrectState, self._logger)
+
+        time_start = time.time()
+        poller     = self._policy.poller()
+
+        while True:
+
+            states = self.container_get_states(jobs)
+            final  = [state for state in states if state in _FINAL_STATES]
+
+            if len(final) == len(jobs) or (final and mode == saga.ANY):
+                return
+
+            # avoid busy poll
+            poller.sleep(states, time_start, timeout)
+
+            # check if we hit timeout
+            if timeout >= 0:
+                if time.time() - time_start > timeout:
+                    return
+
+    # ----------------------------------------------------------------
+    #
+    def container_cancel(self, jobs, timeout):
+        """ cancels all jobs which are not yet final with a single condor_rm
+        """
+        self._logger.debug("container cancel: %s" % str(jobs))
+
+        job_ids = [job_id for job_id in self._container_jobs(jobs) \
+                   if self.jobs[job_id]['state'] not in _FINAL_STATES]
+
+        if not job_ids:
+            return
+
+        pids = [self._adaptor.parse_id(job_id)[1] for job_id in job_ids]
+
+        ret, out, _ = self.shell.run_sync("{ xargs %s <<EOT\n%s\nEOT\n}" \
+            % (self._commands['condor_rm']['path'], "\n".join(pids)))
+
+        if ret != 0:
+            message = "Error canceling jobs via 'condor_rm': %s" % out
+            log_error_and_raise(message, saga.NoSuccess, self._logger)
+
+        # assume the jobs were successfully canceled
+        for job_id in job_ids:
+            self.jobs[job_id]['state'] = saga.job.CANCELED
+
+    # ----------------------------------------------------------------
+    #
+    def container_get_states(self, jobs):
+        """ updates the states of all jobs with a single bulk query
+        """
+        self._logger.debug("container get_states: %s" % str(jobs))
+
+        job_ids = [job_id for job_id in self._container_jobs(jobs) \
+                   if self.jobs[job_id]['state'] not in _FINAL_STATES and \
+                      self.jobs[job_id]['gone'] is not True]
+
+        if job_ids:
+            self.jobs.update(self._job_get_infos(job_ids))
+
+        # jobs this service does not know are asked individually
+        states = list()
+        for job in jobs:
+            if job._adaptor._id in self.jobs:
+                states.append(self.jobs[job._adaptor._id]['state'])
+            else:
+                states.append(job._adaptor.get_state())
+
+        return states
 
 
 ###############################################################################
@@ -1044,6 +1346,9 @@ class CondorJob (saga.adaptors.cpi.job.Job):
         self.jd = job_info["job_description"]
         self.js = job_info["job_service"]
 
+        # the js is responsible for job bulk operations (container_*)
+        self._container = self.js
+
         if job_info['reconnect'] is True:
             self._id = job_info['reconnect_jobid']
             self._started = True
@@ -1051,6 +1356,11 @@ class CondorJob (saga.adaptors.cpi.job.Job):
             self._id = None
             self._started = False
 
+        # state and error of jobs which never got submitted (see
+        # container_run)
+        self._state     = saga.job.NEW
+        self._exception = None
+
         return self.get_api()
 
     # ----------------------------------------------------------------
@@ -1060,8 +1370,9 @@ class CondorJob (saga.adaptors.cpi.job.Job):
         """ implements saga.adaptors.cpi.job.Job.get_state()
         """
         if self._started is False:
-            # jobs that are not started are always in 'NEW' state
-            return saga.job.NEW
+            # jobs that are not started are in 'NEW' state -- unless their
+            # submission failed
+            return self._state
         else:
             return self.js._job_get_state(self._id)
 
@@ -53,6 +53,11 @@ class Directory (cpi_ns.directory.Directory) :
     @ASYNC                                        
     def is_file_self_async    (self,              ttype)  : pass
 
+    @SYNC
+    def list_stats            (self, npat, flags, ttype)  : pass
+    @ASYNC
+    def list_stats_async      (self, npat, flags, ttype)  : pass
+
 
 
 
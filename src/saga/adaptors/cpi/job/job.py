@@ -51,19 +51,19 @@ class Job (cpi_base.CPIBase, cpi_async.Async) :
     def get_stdin_async           (self, ttype)          : pass
 
     @SYNC
-    def get_stdout                (self, ttype)          : pass
+    def get_stdout                (self, ttype, offset, size) : pass
     @ASYNC
-    def get_stdout_async          (self, ttype)          : pass
+    def get_stdout_async          (self, ttype, offset, size) : pass
 
     @SYNC
-    def get_stderr                (self, ttype)          : pass
+    def get_stderr                (self, ttype, offset, size) : pass
     @ASYNC
-    def get_stderr_async          (self, ttype)          : pass
+    def get_stderr_async          (self, ttype, offset, size) : pass
 
     @SYNC
-    def get_log                   (self, ttype)          : pass
+    def get_log                   (self, ttype, offset, size) : pass
     @ASYNC
-    def get_log_async             (self, ttype)          : pass
+    def get_log_async             (self, ttype, offset, size) : pass
 
     @SYNC
     def suspend                   (self, ttype)          : pass
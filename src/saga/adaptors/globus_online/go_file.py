@@ -7,6 +7,7 @@ __license__   = "MIT"
 """ (GSI)SSH based Globus Online Adaptor """
 
 import os
+import fnmatch
 import saga.utils.pty_shell as sups
 import saga.utils.misc as sumisc
 
@@ -811,6 +812,51 @@ class GODirectory(saga.adaptors.cpi.filesystem.Directory):
             self.entries.append(saga.Url(line.strip()))
 
         return self.entries
+
+    # ----------------------------------------------------------------
+    #
+    @SYNC_CALL
+    def find(self, npat, flags):
+
+        self._is_valid()
+
+        if not flags:
+            flags = 0
+
+        if not npat:
+            npat = '*'
+
+        # GO has no server side find, but a recursive ls gives us the complete
+        # tree in one go -- we then match the pattern locally.  Patterns with
+        # a path element are matched against the relative path, all others
+        # against the entry name.
+        cmd_flags = ""
+        if flags & saga.filesystem.RECURSIVE:
+            cmd_flags += "-r"
+
+        dir_ps   = self.get_path_spec()
+        out, err = self._adaptor.run_go_cmd(self.shell, "ls %s '%s'" % (cmd_flags, dir_ps),
+                                            mode='raise')
+        lines = filter(None, out.split("\n"))
+        self._logger.debug(lines)
+
+        if npat.startswith('./'):
+            npat = npat[2:]
+
+        entries = []
+        for line in lines:
+
+            path = line.strip().rstrip('/')
+
+            if '/' in npat:
+                match = fnmatch.fnmatch(path, npat)
+            else:
+                match = fnmatch.fnmatch(os.path.basename(path), npat)
+
+            if match:
+                entries.append(saga.Url(path))
+
+        return entries
    
     # ----------------------------------------------------------------
     #
@@ -26,6 +26,14 @@ from datetime import datetime
 
 SYNC_CALL = saga.adaptors.cpi.decorators.SYNC_CALL
 
+_FINAL_STATES = [saga.job.DONE, saga.job.FAILED, saga.job.CANCELED]
+
+# separates the remote job info files in the output of bulk queries
+_JOB_INFO_MARKER = "SAGA-JOB-INFO:"
+
+# delimiter for job scripts which are passed as here documents
+_SCRIPT_EOF = 'SAGA_LOADL_SCRIPT_EOF'
+
 
 # --------------------------------------------------------------------
 #
@@ -110,6 +118,17 @@ _ADAPTOR_OPTIONS       = [
                             of days to consider a temporary file older enough to be deleted.''',
     'env_variable'     : None
     },
+    {
+    'category'         : 'saga.adaptor.loadljob',
+    'name'             : 'polling',
+    'type'             : str,
+    'default'          : 'pending=2,pending_max=30,running=1,final=0.5',
+    'documentation'    : '''Polling intervals for job state queries (llq), in
+                          seconds, as comma separated key=value pairs: pending,
+                          pending_max, running, final, backoff, latency (see
+                          saga.utils.poll_policy).''',
+    'env_variable'     : None
+    },
 ]
 
 
@@ -199,6 +218,7 @@ class Adaptor (saga.adaptors.base.Base):
 
         self.purge_on_start = self.opts['purge_on_start'].get_value()
         self.purge_older_than = self.opts['purge_older_than'].get_value()
+        self.polling = self.opts['polling'].get_value()
 
     # ----------------------------------------------------------------
     #
@@ -336,6 +356,10 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
 
         self.shell = saga.utils.pty_shell.PTYShell(pty_url, self.session)
 
+        # paces the state queries of all job services for this host
+        self._policy = self.shell.get_poll_policy(_ADAPTOR_NAME,
+                                                  self._adaptor.polling)
+
         #self.shell.set_initialize_hook(self.initialize)
         #self.shell.set_finalize_hook(self.finalize)
 
@@ -353,6 +377,41 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
     # ----------------------------------------------------------------
     #
     def initialize(self):
+        # use the discovery results of an earlier job service for the same
+        # host and user, if they are cached
+        self._discovery        = self.shell.get_discovery_cache(_ADAPTOR_NAME)
+        self._discovery_cached = False
+
+        info = None
+        if self._discovery:
+            info = self._discovery.get()
+
+        if info is not None:
+            self._logger.info("Using cached LoadLeveler discovery results: %s" % info)
+            self._discovery_cached = True
+
+        else:
+            info = self._discover()
+            if self._discovery:
+                self._discovery.put(info)
+
+        self._commands = info['commands']
+
+        # purge temporary files (not more often than we discover, though)
+        if self._adaptor.purge_on_start and not self._discovery_cached:
+            cmd = "find $HOME/.saga/adaptors/loadl_job" \
+                  " -type f -mtime +%d -print -delete | wc -l" % self._adaptor.purge_older_than
+            ret, out, _ = self.shell.run_sync(cmd)
+            if ret == 0 and out != "0":
+                self._logger.info("Purged %s temporary files" % out)
+
+    # ----------------------------------------------------------------
+    #
+    def _discover(self):
+        """ find the LoadLeveler tools on the remote host, and return them as dict
+        """
+        commands = dict()
+
         # check if all required loadleveler tools are available
         for cmd in self._commands.keys():
             ret, out, _ = self.shell.run_sync("which %s " % cmd)
@@ -373,10 +432,10 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
                     version = out.strip().split()[1]
 
                     # add path and version to the command dictionary
-                    self._commands[cmd] = {"path":    path,
-                                           "version": version}
+                    commands[cmd] = {"path":    path,
+                                     "version": version}
 
-        self._logger.info("Found LoadLeveler tools: %s" % self._commands)
+        self._logger.info("Found LoadLeveler tools: %s" % commands)
 
         # see if we can get some information about the cluster, e.g.,
         # different queues, number of processes per node, etc.
@@ -384,13 +443,23 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
         #       well in practice.
         # modi by hgkim
 
-        # purge temporary files
-        if self._adaptor.purge_on_start:
-            cmd = "find $HOME/.saga/adaptors/loadl_job" \
-                  " -type f -mtime +%d -print -delete | wc -l" % self._adaptor.purge_older_than
-            ret, out, _ = self.shell.run_sync(cmd)
-            if ret == 0 and out != "0":
-                self._logger.info("Purged %s temporary files" % out)
+        return {'commands': commands}
+
+    # ----------------------------------------------------------------
+    #
+    def _rediscover(self):
+        """ drop cached discovery results after a failed submission, and
+            rediscover the remote environment.  Returns False if the results
+            were not cached (so that rediscovery would not change anything).
+        """
+        if not self._discovery_cached:
+            return False
+
+        self._logger.info("LoadLeveler submission failed -- discovering again")
+        self._discovery.invalidate()
+        self.initialize()
+
+        return True
 
     # ----------------------------------------------------------------
     #
@@ -399,23 +468,6 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
             if  self.shell :
                 self.shell.finalize (True)
 
-    def __remote_mkdir(self, path):
-        """
-        Creates a directory on the remote host.
-        :param path: the remote directory to be created.
-        """
-        # check if the path exists
-        ret, out, _ = self.shell.run_sync(
-                        "(test -d %s && echo -n 0) || (mkdir -p %s && echo -n 1)" % (path, path))
-
-        if ret == 0 and out == "1":
-            self._logger.info("Remote directory created: %s" % path)
-        elif ret != 0:
-            # something went wrong
-            message = "Couldn't create remote directory - %s\n%s" % (out, path)
-            log_error_and_raise(message, saga.NoSuccess, self._logger)
-
-
     def __remote_job_info_path(self, loadl_job_id="$LOADL_JOB_NAME"):
         """
         Returns the path of the remote job info file.
@@ -446,6 +498,15 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
         if ret != 0:
             return None
 
+        return self.__parse_remote_job_info(out)
+
+    def __parse_remote_job_info(self, out):
+        """
+        Parses the content of a remote job info file.
+        :param out: the content of the remote job info file
+        :return: a dictionary with the job info
+        """
+
         qres = SgeKeyValueParser(out, key_suffix=":").as_dict()
 
         if "signal" in qres:
@@ -607,11 +668,9 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
             'echo "end_time: $(LC_ALL=en_US.utf8 date \'+%%a %%b %%d %%H:%%M:%%S %%Y\')" >>%s' % job_info_path
         ]
 
-        # convert exec and args into an string and
-        # escape all double quotes and dollar signs, otherwise 'echo |'
-        # further down won't work.
-        # only escape '$' in args and exe. not in the params
-        script_body = "\n".join(script_body).replace('$', '\\$')
+        # convert exec and args into an string.  The script is passed to the
+        # remote shell as literal here document, so no escaping is needed.
+        script_body = "\n".join(script_body)
 
         # Dirty Trick for Joule: it expects an "executable" parameter,
         # but doesn't really need it, therefore we pass it after the queue
@@ -621,7 +680,7 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
 
         loadlscript = "\n%s%s" % (loadl_params, script_body)
 
-        return loadlscript.replace('"', '\\"')
+        return loadlscript
 
     # ----------------------------------------------------------------
     #
@@ -629,6 +688,23 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
         """ runs a job via llsubmit
         """
 
+        script = self._job_script(jd)
+        ret, out, _ = self.shell.run_sync(self._job_submit_cmd(jd, script))
+
+        if ret != 0 and self._rediscover():
+            # the submission may have failed because of stale cached discovery
+            # results -- try once more
+            script = self._job_script(jd)
+            ret, out, _ = self.shell.run_sync(self._job_submit_cmd(jd, script))
+
+        return self._job_submit_parse(ret, out, script)
+
+    # ----------------------------------------------------------------
+    #
+    def _job_script(self, jd):
+        """ creates the LoadLeveler script for a job
+        """
+
         try:
             # create a LoadLeveler job script from SAGA job description
             script = self.__generate_llsubmit_script(jd)
@@ -637,26 +713,51 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
         except Exception, ex:
             log_error_and_raise(str(ex), saga.BadParameter, self._logger)
 
-        # try to create the working/output/error directories (if defined)
+        return script
+
+    # ----------------------------------------------------------------
+    #
+    def _job_submit_cmd(self, jd, script):
+        """ creates the command line which submits a LoadLeveler script
+        """
+
+        # submit the LoadLeveler script
+        # Now we want to execute the script. This process consists of two steps,
+        # which are run in a single shell exchange:
+        # (1) we create a temporary file with 'mktemp' and write the generated
+        #     Load Leveler script (passed as literal here document) into it
+        # (2) we call 'llsubmit <tmpfile>' to submit the script to the queueing system
+        cmdline = "SCRIPTFILE=`mktemp -t SAGA-Python-LOADLJobScript.XXXXXX` && cat > $SCRIPTFILE <<'%s' && %s%s $SCRIPTFILE && rm -f $SCRIPTFILE\n%s\n%s" \
+                % (_SCRIPT_EOF, self._commands['llsubmit']['path'],
+                   self.cluster_option, script.rstrip('\n'), _SCRIPT_EOF)
+
+        # create the working/output/error directories (if defined) first
         # WARNING: this assumes a shared filesystem between login node and
         #           compute nodes.
+        dirs = list()
+
         if jd.working_directory is not None and len(jd.working_directory) > 0:
-            self.__remote_mkdir(jd.working_directory)
+            dirs.append(jd.working_directory)
 
-        if jd.output is not None and len(jd.output) > 0:
-            self.__remote_mkdir(os.path.dirname(jd.output))
+        if jd.output is not None and len(os.path.dirname(jd.output)) > 0:
+            dirs.append(os.path.dirname(jd.output))
 
-        if jd.error is not None and len(jd.error) > 0:
-            self.__remote_mkdir(os.path.dirname(jd.error))
+        if jd.error is not None and len(os.path.dirname(jd.error)) > 0:
+            dirs.append(os.path.dirname(jd.error))
+
+        if dirs:
+            cmdline = "mkdir -p %s && %s" % (" ".join(dirs), cmdline)
 
-        # submit the LoadLeveler script
-        # Now we want to execute the script. This process consists of two steps:
-        # (1) we create a temporary file with 'mktemp' and write the contents of
-        #     the generated Load Leveler script into it
-        # (2) we call 'llsubmit <tmpfile>' to submit the script to the queueing system
-        cmdline = """SCRIPTFILE=`mktemp -t SAGA-Python-LOADLJobScript.XXXXXX` &&  echo "%s" > $SCRIPTFILE && %s%s $SCRIPTFILE && rm -f $SCRIPTFILE""" %  (script, self._commands['llsubmit']['path'], self.cluster_option)
         self._logger.info("cmdline: %r", cmdline)
-        ret, out, _ = self.shell.run_sync(cmdline)
+
+        return cmdline
+
+    # ----------------------------------------------------------------
+    #
+    def _job_submit_parse(self, ret, out, script):
+        """ parses the output of llsubmit, and adds the job to the internal
+            list of known jobs
+        """
 
         if ret != 0:
             # something went wrong
@@ -692,8 +793,9 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
         rm, pid = self._adaptor.parse_id(job_id)
 
         # run the LoadLeveler 'llq' command to get some info about our job
-        ret, out, _ = self.shell.run_sync("%s -j %s -r %%st %%dd %%cc %%jt %%c %%Xs" % \
-                                          (self._commands['llq']['path'], pid))
+        with self._policy.query():
+            ret, out, _ = self.shell.run_sync("%s -j %s -r %%st %%dd %%cc %%jt %%c %%Xs" % \
+                                              (self._commands['llq']['path'], pid))
         # output is something like
         # R!03/25/2014 13:47!!Serial!normal!kisti.kim
         # OR
@@ -887,6 +989,7 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
         time_start = time.time()
         time_now   = time_start
         rm, pid    = self._adaptor.parse_id(job_id)
+        poller     = self._policy.poller()
 
         while True:
             state = self._job_get_state(job_id=job_id)
@@ -900,7 +1003,7 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
                     #self.__clean_remote_job_info(pid)
                     return True
             # avoid busy poll
-            time.sleep(0.5)
+            poller.sleep([state], time_start, timeout)
 
             # check if we hit timeout
             if timeout >= 0:
@@ -1000,29 +1103,220 @@ class LOADLJobService (saga.adaptors.cpi.job.Service):
         return ids
 
 
-  # # ----------------------------------------------------------------
-  # #
-  # def container_run (self, jobs) :
-  #     self._logger.debug ("container run: %s"  %  str(jobs))
-  #     # TODO: this is not optimized yet
-  #     for job in jobs:
-  #         job.run ()
-  #
-  #
-  # # ----------------------------------------------------------------
-  # #
-  # def container_wait (self, jobs, mode, timeout) :
-  #     self._logger.debug ("container wait: %s"  %  str(jobs))
-  #     # TODO: this is not optimized yet
-  #     for job in jobs:
-  #         job.wait ()
-  #
-  #
-  # # ----------------------------------------------------------------
-  # #
-  # def container_cancel (self, jobs) :
-  #     self._logger.debug ("container cancel: %s"  %  str(jobs))
-  #     raise saga.NoSuccess ("Not Implemented");
+    # ----------------------------------------------------------------
+    #
+    def _job_get_infos(self, job_ids):
+        """ get the attributes of many jobs with a single query: one llq call
+            for all jobs still in the queue, plus the remote job info files of
+            all jobs.  Returns a dict of updated job infos, keyed by job id.
+        """
+
+        pids = dict()
+        for job_id in job_ids:
+            rm, pid = self._adaptor.parse_id(job_id)
+            pids[pid] = job_id
+
+        ids = "\n".join(pids.keys())
+
+        with self._policy.query():
+            ret, out, _ = self.shell.run_sync(
+                "{ xargs %s -r %%id %%st %%dd %%cc %%jt %%c %%Xs -j <<EOT\n%s\nEOT\n"
+                "while read id; do echo \"%s $id\"; cat %s/$id 2>/dev/null; done <<EOT\n%s\nEOT\n}" \
+                % (self._commands['llq']['path'], ids,
+                   _JOB_INFO_MARKER, self.temp_path, ids))
+
+        # the output is one llq line per job still in the queue, like
+        # v4c064.8637.0!R!03/25/2014 13:47!!Serial!normal!kisti.kim
+        # followed by one marker line and the info file content per job
+        sections = out.split("%s " % _JOB_INFO_MARKER)
+        queued   = dict()
+        remote   = dict()
+
+        for line in sections[0].split("\n"):
+            results = line.strip().split('!')
+            pid     = ".".join(results[0].split('.')[:2])
+            if len(results) > 2 and pid in pids:
+                queued[pid] = results
+
+        for section in sections[1:]:
+            pid, _, info = section.partition("\n")
+            if pid.strip() in pids and len(info.strip()) > 0:
+                remote[pid.strip()] = info
+
+        job_infos = dict()
+
+        for pid, job_id in pids.iteritems():
+
+            job_info = dict(self.jobs[job_id])
+
+            if pid in queued:
+                job_info['state'     ] = _ll_to_saga_jobstate(queued[pid][1])
+                job_info['returncode'] = -1 # still running
+                job_info['start_time'] = queued[pid][2]
+
+            elif pid in remote:
+                job_info.update(self.__parse_remote_job_info(remote[pid]))
+
+            else:
+                # the job info file may not be written yet -- try again on
+                # the next update
+                self._logger.debug("no job info for %s yet" % job_id)
+                continue
+
+            job_infos[job_id] = job_info
+
+        return job_infos
+
+    # ----------------------------------------------------------------
+    #
+    def container_run(self, jobs):
+        """ submits all jobs in a single shell exchange
+        """
+        self._logger.debug("container run: %s" % str(jobs))
+
+        error    = None
+        rejected = False
+        submits  = list()
+        scripts  = list()
+        cmds     = list()
+
+        for job in jobs:
+            jd = job._adaptor.jd
+            try:
+                script = self._job_script(jd)
+                cmds.append(self._job_submit_cmd(jd, script))
+                scripts.append(script)
+                submits.append(job)
+            except saga.SagaException as e:
+                # submit the other jobs anyway
+                error = e
+                self._container_fail([job], e)
+
+        results = self.shell.run_bulk(cmds)
+
+        for job, script, (ret, out) in zip(submits, scripts, results):
+            try:
+                job._adaptor._id      = self._job_submit_parse(ret, out, script)
+                job._adaptor._started = True
+            except saga.SagaException as e:
+                error    = e
+                rejected = True
+                self._container_fail([job], e)
+
+        if rejected:
+            # make sure that later submissions don't use stale cached
+            # discovery results
+            self._rediscover()
+
+        if error:
+            raise error
+
+    # ----------------------------------------------------------------
+    #
+    def _container_fail(self, jobs, e):
+        """ marks jobs which could not be submitted as failed
+        """
+        for job in jobs:
+            job._adaptor._state     = saga.job.FAILED
+            job._adaptor._exception = e
+
+    # ----------------------------------------------------------------
+    #
+    def _container_jobs(self, jobs):
+        """ returns the ids of those jobs which have been submitted, and
+            which are known to this service (jobs which failed to submit, and
+            jobs reconnected via other services, are skipped)
+        """
+        return [job._adaptor._id for job in jobs \
+                if job._adaptor._id and job._adaptor._id in self.jobs]
+
+    # ----------------------------------------------------------------
+    #
+    def container_wait(self, jobs, mode, timeout):
+        """ waits for any or all jobs to finish, with one bulk query per poll
+        """
+        self._logger.debug("container wait: %s" % str(jobs))
+
+        for job in jobs:
+            if job._adaptor._started is False and \
+               job._adaptor._state != saga.job.FAILED:
+                log_error_and_raise("Can't wait for job that hasn't been started",
+                    saga.IncorrectState, self._logger)
+
+        time_start = time.time()
+        poller     = self._policy.poller()
+
+        while True:
+
+            states = self.container_get_states(jobs)
+
+            if saga.job.UNKNOWN in states:
+                log_error_and_raise("cannot get job state", saga.IncorrectState, self._logger)
+
+            final = [state for state in states if state in _FINAL_STATES]
+
+            if len(final) == len(jobs) or (final and mode == saga.ANY):
+                return
+
+            # avoid busy poll
+            poller.sleep(states, time_start, timeout)
+
+            # check if we hit timeout
+            if timeout >= 0:
+                if time.time() - time_start > timeout:
+                    return
+
+    # ----------------------------------------------------------------
+    #
+    def container_cancel(self, jobs, timeout):
+        """ cancels all jobs which are not yet final with a single llcancel
+        """
+        self._logger.debug("container cancel: %s" % str(jobs))
+
+        job_ids = [job_id for job_id in self._container_jobs(jobs) \
+                   if self.jobs[job_id]['state'] not in _FINAL_STATES]
+
+        if not job_ids:
+            return
+
+        pids = [self._adaptor.parse_id(job_id)[1] for job_id in job_ids]
+
+        ret, out, _ = self.shell.run_sync("{ xargs %s%s <<EOT\n%s\nEOT\n}" \
+            % (self._commands['llcancel']['path'], self.cluster_option,
+               "\n".join(pids)))
+
+        if ret != 0:
+            message = "Error canceling jobs via 'llcancel': %s" % out
+            log_error_and_raise(message, saga.NoSuccess, self._logger)
+
+        # assume the jobs were succesfully canceld
+        for job_id in job_ids:
+            self.jobs[job_id]['state'] = saga.job.CANCELED
+
+    # ----------------------------------------------------------------
+    #
+    def container_get_states(self, jobs):
+        """ updates the states of all jobs with a single bulk query
+        """
+        self._logger.debug("container get_states: %s" % str(jobs))
+
+        job_ids = [job_id for job_id in self._container_jobs(jobs) \
+                   if self.jobs[job_id]['state'] not in _FINAL_STATES and \
+                      self.jobs[job_id]['gone'] is not True]
+
+        if job_ids:
+            self.jobs.update(self._job_get_infos(job_ids))
+
+        # jobs this service does not know are asked individually
+        states = list()
+        for job in jobs:
+            if job._adaptor._id in self.jobs:
+                states.append(self.jobs[job._adaptor._id]['state'])
+            else:
+                states.append(job._adaptor.get_state())
+
+        return states
+
 
 
 ###############################################################################
@@ -1046,6 +1340,9 @@ class LOADLJob (saga.adaptors.cpi.job.Job):
         self.jd = job_info["job_description"]
         self.js = job_info["job_service"]
 
+        # the js is responsible for job bulk operations (container_*)
+        self._container = self.js
+
         if job_info['reconnect'] is True:
             self._id = job_info['reconnect_jobid']
             self._started = True
@@ -1053,6 +1350,11 @@ class LOADLJob (saga.adaptors.cpi.job.Job):
             self._id = None
             self._started = False
 
+        # state and error of jobs which never got submitted (see
+        # container_run)
+        self._state     = saga.job.NEW
+        self._exception = None
+
         return self.get_api()
 
     # ----------------------------------------------------------------
@@ -1062,8 +1364,9 @@ class LOADLJob (saga.adaptors.cpi.job.Job):
         """ implements saga.adaptors.cpi.job.Job.get_state()
         """
         if self._started is False:
-            # jobs that are not started are always in 'NEW' state
-            return saga.job.NEW
+            # jobs that are not started are in 'NEW' state -- unless their
+            # submission failed
+            return self._state
         else:
             return self.js._job_get_state(self._id)
 
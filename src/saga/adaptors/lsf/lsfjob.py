@@ -8,10 +8,10 @@ __license__   = "MIT"
 """
 
 import radical.utils.which
-import radical.utils.threads as sut
 
 import saga.url as surl
 import saga.utils.pty_shell
+import saga.utils.job.state_monitor as sujsm
 
 import saga.adaptors.base
 import saga.adaptors.cpi.job
@@ -21,7 +21,6 @@ from saga.job.constants import *
 import re
 import os 
 import time
-import threading
 
 from cgi  import parse_qs
 
@@ -29,62 +28,11 @@ SYNC_CALL = saga.adaptors.cpi.decorators.SYNC_CALL
 ASYNC_CALL = saga.adaptors.cpi.decorators.ASYNC_CALL
 
 SYNC_WAIT_UPDATE_INTERVAL = 1  # seconds
-MONITOR_UPDATE_INTERVAL = 3  # seconds
 
+_FINAL_STATES = [saga.job.DONE, saga.job.FAILED, saga.job.CANCELED]
 
-# --------------------------------------------------------------------
-#
-class _job_state_monitor(threading.Thread):
-    """ thread that periodically monitors job states
-    """
-    def __init__(self, job_service):
-
-        self.logger = job_service._logger
-        self.js = job_service
-        self._stop = sut.Event()
-
-        super(_job_state_monitor, self).__init__()
-        self.setDaemon(True)
-
-    def stop(self):
-        self._stop.set()
-
-
-    def stopped(self):
-        return self._stop.isSet()
-
-    def run(self):
-        while self.stopped() is False:
-            try:
-                # do bulk updates here! we don't want to pull information
-                # job by job. that would be too inefficient!
-                jobs = self.js.jobs
-                job_keys = jobs.keys()
-
-                for job in job_keys:
-                    # if the job hasn't been started, we can't update its
-                    # state. we can tell if a job has been started if it
-                    # has a job id
-                    if  jobs[job].get ('job_id', None) is not None:
-                        # we only need to monitor jobs that are not in a
-                        # terminal state, so we can skip the ones that are 
-                        # either done, failed or canceled
-                        state = jobs[job]['state']
-                        if (state != saga.job.DONE) and (state != saga.job.FAILED) and (state != saga.job.CANCELED):
-
-                            job_info = self.js._job_get_info(job)
-                            self.logger.info("Job monitoring thread updating Job %s (state: %s)" % (job, job_info['state']))
-
-                            if job_info['state'] != jobs[job]['state']:
-                                # fire job state callback if 'state' has changed
-                                job._api()._attributes_i_set('state', job_info['state'], job._api()._UP, True)
-
-                            # update job info
-                            self.js.jobs[job] = job_info
-
-                time.sleep(MONITOR_UPDATE_INTERVAL)
-            except Exception as e:
-                self.logger.warning("Exception caught in job monitoring thread: %s" % e)
+# delimiter for job scripts which are passed as here documents
+_SCRIPT_EOF = 'SAGA_LSF_SCRIPT_EOF'
 
 
 # --------------------------------------------------------------------
@@ -207,15 +155,12 @@ def _lsfcript_generator(url, logger, jd, ppn, lsf_version, queue=None, ):
     #    lsf_params += "#PBS -l nodes=%s:ppn=%s \n" \
     #        % (str(int(tbd)), ppn)
 
-    # escape all double quotes and dollarsigns, otherwise 'echo |'
-    # further down won't work
-    # only escape '$' in args and exe. not in the params
+    # the script is passed to the remote shell as literal here document, so
+    # no quoting or escaping is needed
     #exec_n_args = workdir_directives exec_n_args
-    exec_n_args = exec_n_args.replace('$', '\\$')
 
     lsfscript = "\n#!/bin/bash \n%s\n%s\n%s" % (lsf_params, env_variable_list, exec_n_args)
 
-    lsfscript = lsfscript.replace('"', '\\"')
     return lsfscript
 
 
@@ -229,7 +174,20 @@ _PTY_TIMEOUT = 2.0
 #
 _ADAPTOR_NAME          = "saga.adaptor.lsfjob"
 _ADAPTOR_SCHEMAS       = ["lsf", "lsf+ssh", "lsf+gsissh"]
-_ADAPTOR_OPTIONS       = []
+_ADAPTOR_OPTIONS       = [
+    {
+    'category'         : 'saga.adaptor.lsfjob',
+    'name'             : 'polling',
+    'type'             : str,
+    'default'          : 'pending=3,pending_max=60,running=3,final=1',
+    'documentation'    : '''Polling intervals for job state queries (bjobs), in
+                          seconds, as comma separated key=value pairs: pending,
+                          pending_max, running, final, backoff, latency (see
+                          saga.utils.poll_policy).  The intervals apply to
+                          all job services for the same LSF host.''',
+    'env_variable'     : None
+    }
+]
 
 # --------------------------------------------------------------------
 # the adaptor capabilities & supported attributes
@@ -315,6 +273,8 @@ class Adaptor (saga.adaptors.base.Base):
         self.id_re = re.compile('^\[(.*)\]-\[(.*?)\]$')
         self.opts  = self.get_config (_ADAPTOR_NAME)
 
+        self.polling = self.opts['polling'].get_value()
+
     # ----------------------------------------------------------------
     #
     def sanity_check(self):
@@ -362,10 +322,10 @@ class LSFJobService (saga.adaptors.cpi.job.Service):
     def close(self):
 
         if  self.mt :
-            self.mt.stop()
-            self.mt.join(10)  # don't block forever on join()
+            sujsm.unregister(self._monitor_key, self)
+            self.mt = None
 
-        self._logger.info("Job monitoring thread stopped.")
+        self._logger.info("Unregistered from job monitoring thread.")
 
         self.finalize(True)
 
@@ -392,9 +352,8 @@ class LSFJobService (saga.adaptors.cpi.job.Service):
         self.shell   = None
         self.jobs    = dict()
 
-        # the monitoring thread - one per service instance
-        self.mt = _job_state_monitor(job_service=self)
-        self.mt.start()
+        # the monitoring thread is shared with other services (see below)
+        self.mt = None
 
         rm_scheme = rm_url.scheme
         pty_url   = surl.Url (rm_url)
@@ -431,12 +390,49 @@ class LSFJobService (saga.adaptors.cpi.job.Service):
       # self.shell.set_finalize_hook(self.finalize)
 
         self.initialize()
+
+        # all job services for the same LSF server and user share one
+        # monitoring thread, which updates the states of all their jobs at once
+        self._monitor_key = "%s://%s@%s:%s" % (rm_scheme, self.shell.pty_info['user'],
+                                                rm_url.host, rm_url.port)
+        self._policy = self.shell.get_poll_policy(_ADAPTOR_NAME,
+                                                  self._adaptor.polling)
+        # LSF's monitor never gave up on errors, so let it retry forever
+        self.mt = sujsm.register(self._monitor_key, self, self._policy,
+                                 max_errors=None)
         return self.get_api()
 
 
     # ----------------------------------------------------------------
     #
     def initialize(self):
+        # use the discovery results of an earlier job service for the same
+        # host and user, if they are cached
+        self._discovery        = self.shell.get_discovery_cache(_ADAPTOR_NAME)
+        self._discovery_cached = False
+
+        info = None
+        if self._discovery:
+            info = self._discovery.get()
+
+        if info is not None:
+            self._logger.info("Using cached LSF discovery results: %s" % info)
+            self._discovery_cached = True
+
+        else:
+            info = self._discover()
+            if self._discovery:
+                self._discovery.put(info)
+
+        self._commands = info['commands']
+
+    # ----------------------------------------------------------------
+    #
+    def _discover(self):
+        """ find the LSF tools on the remote host, and return them as dict
+        """
+        commands = dict()
+
         # check if all required lsf tools are available
         for cmd in self._commands.keys():
             ret, out, _ = self.shell.run_sync("which %s " % cmd)
@@ -454,10 +450,10 @@ class LSFJobService (saga.adaptors.cpi.job.Service):
                     version = out.split("\n")[0]
 
                     # add path and version to the command dictionary
-                    self._commands[cmd] = {"path":    path,
-                                           "version": version}
+                    commands[cmd] = {"path":    path,
+                                     "version": version}
 
-        self._logger.info("Found LSF tools: %s" % self._commands)
+        self._logger.info("Found LSF tools: %s" % commands)
 
         # see if we can get some information about the cluster, e.g.,
         # different queues, number of processes per node, etc.
@@ -487,14 +483,49 @@ class LSFJobService (saga.adaptors.cpi.job.Service):
     #Using %s as default ppn." 
      #           % (ppn_list, self.ppn))
 
+        return {'commands': commands}
+
+    # ----------------------------------------------------------------
+    #
+    def _rediscover(self):
+        """ drop cached discovery results after a failed submission, and
+            rediscover the remote environment.  Returns False if the results
+            were not cached (so that rediscovery would not change anything).
+        """
+        if not self._discovery_cached:
+            return False
+
+        self._logger.info("LSF submission failed -- discovering again")
+        self._discovery.invalidate()
+        self.initialize()
+
+        return True
+
     # ----------------------------------------------------------------
     #
     def _job_run(self, job_obj):
-        """ runs a job via qsub
+        """ runs a job via bsub
         """
         # get the job description
         jd = job_obj.jd
 
+        cmdline = self._job_submit_cmd(jd, self._job_script(jd))
+        ret, out, _ = self.shell.run_sync(cmdline)
+
+        if ret != 0 and self._rediscover():
+            # the submission may have failed because of stale cached discovery
+            # results -- try once more
+            cmdline = self._job_submit_cmd(jd, self._job_script(jd))
+            ret, out, _ = self.shell.run_sync(cmdline)
+
+        return self._job_submit_parse(ret, out, cmdline, job_obj)
+
+    # ----------------------------------------------------------------
+    #
+    def _job_script(self, jd):
+        """ creates the LSF script for a job
+        """
+
         # normalize working directory path
         if  jd.working_directory :
             jd.working_directory = os.path.normpath (jd.working_directory)
@@ -516,23 +547,35 @@ class LSFJobService (saga.adaptors.cpi.job.Service):
         except Exception, ex:
             log_error_and_raise(str(ex), saga.BadParameter, self._logger)
 
-        # try to create the working directory (if defined)
+        return script
+
+    # ----------------------------------------------------------------
+    #
+    def _job_submit_cmd(self, jd, script):
+        """ creates the command line which submits an LSF script via bsub
+        """
+
+        # The command line creates the working directory (if defined),
+        # creates a temporary file with 'mktemp', writes the generated LSF
+        # script into it (passed as literal here document), and calls
+        # 'bsub < <tmpfile>' to submit the script to the queueing system --
+        # all in a single shell exchange.
         # WARNING: this assumes a shared filesystem between login node and
         #          compute nodes.
+        cmdline = "SCRIPTFILE=`mktemp -t SAGA-Python-LSFJobScript.XXXXXX` && cat > $SCRIPTFILE <<'%s' && %s < $SCRIPTFILE && rm -f $SCRIPTFILE\n%s\n%s" \
+                % (_SCRIPT_EOF, self._commands['bsub']['path'],
+                   script.rstrip('\n'), _SCRIPT_EOF)
+
         if jd.working_directory is not None:
-            self._logger.info("Creating working directory %s" % jd.working_directory)
-            ret, out, _ = self.shell.run_sync("mkdir -p %s" % (jd.working_directory))
-            if ret != 0:
-                # something went wrong
-                message = "Couldn't create working directory - %s" % (out)
-                log_error_and_raise(message, saga.NoSuccess, self._logger)
+            cmdline = "mkdir -p %s && %s" % (jd.working_directory, cmdline)
 
-        # Now we want to execute the script. This process consists of two steps:
-        # (1) we create a temporary file with 'mktemp' and write the contents of 
-        #     the generated PBS script into it
-        # (2) we call 'qsub <tmpfile>' to submit the script to the queueing system
-        cmdline = """SCRIPTFILE=`mktemp -t SAGA-Python-LSFJobScript.XXXXXX` && echo "%s" > $SCRIPTFILE && %s < $SCRIPTFILE && rm -f $SCRIPTFILE""" % (script, self._commands['bsub']['path'])
-        ret, out, _ = self.shell.run_sync(cmdline)
+        return cmdline
+
+    # ----------------------------------------------------------------
+    #
+    def _job_submit_parse(self, ret, out, cmdline, job_obj):
+        """ parses the output of a bsub command line, and returns the job id
+        """
 
         if ret != 0:
             # something went wrong
@@ -651,7 +694,8 @@ class LSFJobService (saga.adaptors.cpi.job.Service):
         # 
         # If we add the -nodeader flag, the first row is ommited 
 
-        ret, out, _ = self.shell.run_sync("%s -noheader %s" % (self._commands['bjobs']['path'], pid))
+        with self._policy.query():
+            ret, out, _ = self.shell.run_sync("%s -noheader %s" % (self._commands['bjobs']['path'], pid))
 
         if ret != 0:
             if ("Illegal job ID" in out):
@@ -679,6 +723,108 @@ class LSFJobService (saga.adaptors.cpi.job.Service):
         # return the new job info dict
         return curr_info
 
+    # ----------------------------------------------------------------
+    #
+    def _job_get_infos(self, job_objs, jobs=None):
+        """ get the attributes of many jobs with a single bjobs call.  Returns
+            a dict of new job info dicts, keyed by job object.  The current job
+            infos are taken from the given table (by default our own).
+        """
+
+        if jobs is None:
+            jobs = self.jobs
+
+        pids = dict()
+        for job_obj in job_objs:
+            rm, pid = self._adaptor.parse_id(jobs[job_obj]['job_id'])
+            pids[pid] = job_obj
+
+        # the job ids are passed on stdin, to avoid overly long command lines
+        with self._policy.query():
+            ret, out, _ = self.shell.run_sync("{ xargs %s -noheader <<EOT\n%s\nEOT\n}" \
+                % (self._commands['bjobs']['path'], "\n".join(pids.keys())))
+
+        # the result of bjobs <id> <id> ... looks like this (see
+        # _job_get_info), with one line per known job, and one error message
+        # per unknown job:
+        #
+        # 901545  oweidne DONE  regular    yslogin5-ib ys3833-ib   *FILENAME  Nov 11 12:06
+        # Job <901546> is not found
+        listed = dict()
+        gone   = list()
+
+        for line in out.split("\n"):
+
+            results = line.split()
+
+            if len(results) > 2 and results[0] in pids:
+                listed[results[0]] = results
+
+            elif "Illegal job ID" in line or "not found" in line:
+                gone += [gone_pid for gone_pid in pids \
+                         if gone_pid in re.findall(r'\d+', line)]
+
+        if ret != 0 and not listed and not gone:
+            # something went wrong
+            message = "Error retrieving job infos via 'bjobs': %s" % out
+            log_error_and_raise(message, saga.NoSuccess, self._logger)
+
+        job_infos = dict()
+
+        for pid, job_obj in pids.iteritems():
+
+            prev_info = jobs[job_obj]
+            curr_info = dict(prev_info)
+
+            if pid in listed:
+                curr_info['state'] = _lsf_to_saga_jobstate(listed[pid][2])
+                if len(listed[pid]) > 5:
+                    curr_info['exec_hosts'] = listed[pid][5]
+
+            elif pid in gone:
+                # see _job_get_info
+                curr_info['gone'] = True
+                if prev_info['state'] in [saga.job.RUNNING, saga.job.PENDING]:
+                    curr_info['state'] = saga.job.DONE
+                else:
+                    curr_info['state'] = saga.job.FAILED
+
+            else:
+                continue
+
+            job_infos[job_obj] = curr_info
+
+        return job_infos
+
+    # ----------------------------------------------------------------
+    #
+    def _monitor_jobs(self):
+        """ returns the jobs the monitoring thread needs to update: all jobs
+            which have been started (and thus have a job id), and which are
+            not in a final state
+        """
+        return dict([(job_obj, job_info) for job_obj, job_info in self.jobs.items() \
+                     if  job_info.get('job_id', None) is not None \
+                     and job_info['state'] not in _FINAL_STATES])
+
+    # ----------------------------------------------------------------
+    #
+    def _job_update_infos(self, job_infos):
+        """ update the job table with the result of _job_get_infos, and fire
+            the state callbacks of all jobs whose state changed
+        """
+
+        for job_obj, job_info in job_infos.iteritems():
+
+            self._logger.info("Updating Job %s (state: %s)" % (job_obj, job_info['state']))
+
+            if job_info['state'] != self.jobs[job_obj]['state']:
+                # fire job state callback if 'state' has changed
+                job_obj._api()._attributes_i_set('state', job_info['state'], job_obj._api()._UP, True)
+
+            # update job info
+            self.jobs[job_obj] = job_info
+
     # ----------------------------------------------------------------
     #
     def _job_get_state(self, job_obj):
@@ -728,15 +874,15 @@ class LSFJobService (saga.adaptors.cpi.job.Service):
     # ----------------------------------------------------------------
     #
     def _job_cancel(self, job_obj):
-        """ cancel the job via 'qdel'
+        """ cancel the job via 'bkill'
         """
         rm, pid = self._adaptor.parse_id(job_obj._id)
 
         ret, out, _ = self.shell.run_sync("%s %s\n" \
-            % (self._commands['qdel']['path'], pid))
+            % (self._commands['bkill']['path'], pid))
 
         if ret != 0:
-            message = "Error canceling job via 'qdel': %s" % out
+            message = "Error canceling job via 'bkill': %s" % out
             log_error_and_raise(message, saga.NoSuccess, self._logger)
 
         # assume the job was succesfully canceled
@@ -865,29 +1011,146 @@ class LSFJobService (saga.adaptors.cpi.job.Service):
         return ids
 
 
-  # # ----------------------------------------------------------------
-  # #
-  # def container_run (self, jobs) :
-  #     self._logger.debug ("container run: %s"  %  str(jobs))
-  #     # TODO: this is not optimized yet
-  #     for job in jobs:
-  #         job.run ()
-  #
-  #
-  # # ----------------------------------------------------------------
-  # #
-  # def container_wait (self, jobs, mode, timeout) :
-  #     self._logger.debug ("container wait: %s"  %  str(jobs))
-  #     # TODO: this is not optimized yet
-  #     for job in jobs:
-  #         job.wait ()
-  #
-  #
-  # # ----------------------------------------------------------------
-  # #
-  # def container_cancel (self, jobs) :
-  #     self._logger.debug ("container cancel: %s"  %  str(jobs))
-  #     raise saga.NoSuccess ("Not Implemented");
+    # ----------------------------------------------------------------
+    #
+    def container_run(self, jobs):
+        """ submits all jobs in a single shell exchange
+        """
+        self._logger.debug("container run: %s" % str(jobs))
+
+        error    = None
+        rejected = False
+        submits  = list()
+        cmdlines = list()
+
+        for job in jobs:
+            jd = job._adaptor.jd
+            try:
+                cmdlines.append(self._job_submit_cmd(jd, self._job_script(jd)))
+                submits.append(job)
+            except saga.SagaException as e:
+                # submit the other jobs anyway
+                error = e
+                self._container_fail([job], e)
+
+        results = self.shell.run_bulk(cmdlines)
+
+        for job, cmdline, (ret, out) in zip(submits, cmdlines, results):
+            try:
+                job._adaptor._id      = self._job_submit_parse(ret, out, cmdline, job._adaptor)
+                job._adaptor._started = True
+            except saga.SagaException as e:
+                error    = e
+                rejected = True
+                self._container_fail([job], e)
+
+        if rejected:
+            # make sure that later submissions don't use stale cached
+            # discovery results
+            self._rediscover()
+
+        if error:
+            raise error
+
+    # ----------------------------------------------------------------
+    #
+    def _container_fail(self, jobs, e):
+        """ marks jobs which could not be submitted as failed
+        """
+        for job in jobs:
+            job._adaptor._state     = saga.job.FAILED
+            job._adaptor._exception = e
+
+            if job._adaptor in self.jobs:
+                self.jobs[job._adaptor]['state'] = saga.job.FAILED
+
+    # ----------------------------------------------------------------
+    #
+    def _container_jobs(self, jobs):
+        """ returns the job objects of those jobs which have been submitted,
+            and which are known to this service (jobs which failed to submit,
+            and jobs created via other services, are skipped)
+        """
+        return [job._adaptor for job in jobs \
+                if job._adaptor._started and job._adaptor in self.jobs]
+
+    # ----------------------------------------------------------------
+    #
+    def container_wait(self, jobs, mode, timeout):
+        """ the job states are kept up to date by the monitoring thread, so we
+            only need to watch the job table
+        """
+        self._logger.debug("container wait: %s" % str(jobs))
+
+        for job in jobs:
+            if job._adaptor._started is False and \
+               job._adaptor._state != saga.job.FAILED:
+                log_error_and_raise("Can't wait for job that hasn't been started",
+                    saga.IncorrectState, self._logger)
+
+        # jobs which failed to submit are final already
+        failed   = len([job for job in jobs if job._adaptor._state == saga.job.FAILED])
+        job_objs = self._container_jobs(jobs)
+
+        time_start = time.time()
+
+        while True:
+
+            final = [job_obj for job_obj in job_objs \
+                     if self.jobs[job_obj]['state'] in _FINAL_STATES]
+
+            if len(final) == len(job_objs) or ((final or failed) and mode == saga.ANY):
+                return
+
+            # check if we hit timeout
+            if timeout >= 0:
+                if time.time() - time_start > timeout:
+                    return
+
+            # avoid busy poll
+            time.sleep(SYNC_WAIT_UPDATE_INTERVAL)
+
+    # ----------------------------------------------------------------
+    #
+    def container_cancel(self, jobs, timeout):
+        """ cancels all jobs which are not yet final with a single bkill call
+        """
+        self._logger.debug("container cancel: %s" % str(jobs))
+
+        job_objs = [job_obj for job_obj in self._container_jobs(jobs) \
+                    if self.jobs[job_obj]['state'] not in _FINAL_STATES]
+
+        if not job_objs:
+            return
+
+        pids = [self._adaptor.parse_id(self.jobs[job_obj]['job_id'])[1] \
+                for job_obj in job_objs]
+
+        ret, out, _ = self.shell.run_sync("{ xargs %s <<EOT\n%s\nEOT\n}" \
+            % (self._commands['bkill']['path'], "\n".join(pids)))
+
+        if ret != 0:
+            message = "Error canceling jobs via 'bkill': %s" % out
+            log_error_and_raise(message, saga.NoSuccess, self._logger)
+
+        # assume the jobs were succesfully canceled
+        for job_obj in job_objs:
+            self.jobs[job_obj]['state'] = saga.job.CANCELED
+
+    # ----------------------------------------------------------------
+    #
+    def container_get_states(self, jobs):
+        """ updates the states of all jobs with a single bjobs call
+        """
+        self._logger.debug("container get_states: %s" % str(jobs))
+
+        job_objs = [job_obj for job_obj in self._container_jobs(jobs) \
+                    if self.jobs[job_obj]['state'] not in _FINAL_STATES]
+
+        if job_objs:
+            self._job_update_infos(self._job_get_infos(job_objs))
+
+        return [job._adaptor.get_state() for job in jobs]
 
 
 ###############################################################################
@@ -914,6 +1177,9 @@ class LSFJob (saga.adaptors.cpi.job.Job):
         self.jd = job_info["job_description"]
         self.js = job_info["job_service"]
 
+        # the js is responsible for job bulk operations (container_*)
+        self._container = self.js
+
         if job_info['reconnect'] is True:
             self._id = job_info['reconnect_jobid']
             self._started = True
@@ -921,6 +1187,11 @@ class LSFJob (saga.adaptors.cpi.job.Job):
             self._id = None
             self._started = False
 
+        # state and error of jobs which never got submitted (see
+        # container_run)
+        self._state     = saga.job.NEW
+        self._exception = None
+
         return self.get_api()
 
     # ----------------------------------------------------------------
@@ -7,10 +7,10 @@ __license__   = "MIT"
 """ PBS job adaptor implementation
 """
 
-import threading
 
 import saga.url             as surl
 import saga.utils.pty_shell as sups
+import saga.utils.job.state_monitor as sujsm
 import saga.adaptors.base
 import saga.adaptors.cpi.job
 
@@ -19,7 +19,6 @@ from saga.job.constants import *
 import re
 import os 
 import time
-import threading
 
 from cgi  import parse_qs
 
@@ -27,79 +26,14 @@ SYNC_CALL  = saga.adaptors.cpi.decorators.SYNC_CALL
 ASYNC_CALL = saga.adaptors.cpi.decorators.ASYNC_CALL
 
 SYNC_WAIT_UPDATE_INTERVAL =  1  # seconds
-MONITOR_UPDATE_INTERVAL   = 60  # seconds
 
+_FINAL_STATES = [saga.job.DONE, saga.job.FAILED, saga.job.CANCELED]
 
-# --------------------------------------------------------------------
-#
-class _job_state_monitor(threading.Thread):
-    """ thread that periodically monitors job states
-    """
-    def __init__(self, job_service):
-
-        self.logger = job_service._logger
-        self.js = job_service
-        self._stop = threading.Event()
-
-        super(_job_state_monitor, self).__init__()
-        self.setDaemon(True)
-
-    def stop(self):
-        self._stop.set()
-
-
-    def run(self):
-
-        # we stop the monitoring thread when we see the same error 3 times in
-        # a row...
-        error_type_count = dict()
-
-        while not self._stop.is_set ():
-
-            try:
-                # FIXME: do bulk updates here! we don't want to pull information
-                # job by job. that would be too inefficient!
-                jobs = self.js.jobs
-
-                for job_id in jobs.keys() :
-
-                    job_info = jobs[job_id]
-
-                    # we only need to monitor jobs that are not in a
-                    # terminal state, so we can skip the ones that are 
-                    # either done, failed or canceled
-                    if  job_info['state'] not in [saga.job.DONE, saga.job.FAILED, saga.job.CANCELED] :
+# the qstat fields we are interested in
+_QSTAT_KEYS = "(job_state)|(exec_host)|(exit_status)|(ctime)|(start_time)|(stime)|(mtime)"
 
-                        new_job_info = self.js._job_get_info(job_id, reconnect=False)
-                        self.logger.info ("Job monitoring thread updating Job %s (state: %s)" \
-                                       % (job_id, new_job_info['state']))
-
-                        # fire job state callback if 'state' has changed
-                        if  new_job_info['state'] != job_info['state']:
-                            job_obj = job_info['obj']
-                            job_obj._attributes_i_set('state', new_job_info['state'], job_obj._UP, True)
-
-                        # update job info
-                        jobs[job_id] = new_job_info
-
-            except Exception as e:
-                import traceback
-                traceback.print_exc ()
-                self.logger.warning("Exception caught in job monitoring thread: %s" % e)
-
-                # check if we see the same error again and again
-                error_type = str(e)
-                if  error_type not in error_type_count :
-                    error_type_count = dict()
-                    error_type_count[error_type]  = 1
-                else :
-                    error_type_count[error_type] += 1
-                    if  error_type_count[error_type] >= 3 :
-                        self.logger.error("too many monitoring errors -- stopping job monitoring thread")
-                        return
-
-            finally :
-                time.sleep (MONITOR_UPDATE_INTERVAL)
+# delimiter for job scripts which are passed as here documents
+_SCRIPT_EOF = 'SAGA_PBS_SCRIPT_EOF'
 
 
 # --------------------------------------------------------------------
@@ -143,16 +77,41 @@ def _pbs_to_saga_jobstate(pbsjs):
 
 # --------------------------------------------------------------------
 #
-def _pbscript_generator(url, logger, jd, ppn, gres, pbs_version, is_cray=False, queue=None, ):
-    """ generates a PBS script from a SAGA job description
+def _pbscript_generator(url, logger, jd, ppn, gres, pbs_version, is_cray=False, queue=None, tasks=None):
+    """ generates a PBS script from a SAGA job description.  If a list of
+        job descriptions is passed as `tasks`, a job array script is
+        generated, where each array element uses the arguments and
+        environment of the respective task description.
     """
     pbs_params  = str()
     exec_n_args = str()
 
     exec_n_args += 'export SAGA_PPN=%d\n' % ppn
+
+    if tasks:
+        # the array index is exposed as PBS_ARRAY_INDEX on PBS Pro, and as
+        # PBS_ARRAYID on TORQUE
+        if 'PBSPro_1' in pbs_version:
+            exec_n_args += 'case "$PBS_ARRAY_INDEX" in\n'
+        else:
+            exec_n_args += 'case "$PBS_ARRAYID" in\n'
+        for i, task in enumerate(tasks):
+            exec_n_args += "%d)\n" % i
+            if task.environment:
+                for k,v in task.environment.iteritems():
+                    exec_n_args += "    export %s=%s\n" % (k, v)
+            if task.arguments:
+                exec_n_args += "    set -- %s\n" % ' '.join(task.arguments)
+            else:
+                exec_n_args += "    set --\n"
+            exec_n_args += "    ;;\n"
+        exec_n_args += "esac\n"
+
     if jd.executable:
         exec_n_args += "%s " % (jd.executable)
-    if jd.arguments:
+    if tasks:
+        exec_n_args += '"$@" '
+    elif jd.arguments:
         for arg in jd.arguments:
             exec_n_args += "%s " % (arg)
 
@@ -168,7 +127,13 @@ def _pbscript_generator(url, logger, jd, ppn, gres, pbs_version, is_cray=False,
         # batch environment in some cases.
         pbs_params += "#PBS -V \n"
 
-    if jd.environment:
+    if tasks:
+        if 'PBSPro_1' in pbs_version:
+            pbs_params += "#PBS -J 0-%d \n" % (len(tasks) - 1)
+        else:
+            pbs_params += "#PBS -t 0-%d \n" % (len(tasks) - 1)
+
+    elif jd.environment:
         pbs_params += "#PBS -v %s\n" % \
                 ','.join (["%s=%s" % (k,v) 
                            for k,v in jd.environment.iteritems()])
@@ -314,15 +279,12 @@ def _pbscript_generator(url, logger, jd, ppn, gres, pbs_version, is_cray=False,
     if gres:
         pbs_params += "#PBS -l gres=%s\n" % gres
 
-    # escape all double quotes and dollarsigns, otherwise 'echo |'
-    # further down won't work
-    # only escape '$' in args and exe. not in the params
+    # the script is passed to the remote shell as literal here document, so
+    # no quoting or escaping is needed
     exec_n_args = workdir_directives + exec_n_args
-    exec_n_args = exec_n_args.replace('$', '\\$')
 
     pbscript = "\n#!/bin/bash \n%s%s" % (pbs_params, exec_n_args)
 
-    pbscript = pbscript.replace('"', '\\"')
     return pbscript
 
 
@@ -336,7 +298,44 @@ _PTY_TIMEOUT = 2.0
 #
 _ADAPTOR_NAME          = "saga.adaptor.pbsjob"
 _ADAPTOR_SCHEMAS       = ["pbs", "pbs+ssh", "pbs+gsissh"]
-_ADAPTOR_OPTIONS       = []
+_ADAPTOR_OPTIONS       = [
+    {
+    'category'         : 'saga.adaptor.pbsjob',
+    'name'             : 'job_arrays',
+    'type'             : bool,
+    'default'          : True,
+    'valid_options'    : [True, False],
+    'documentation'    : '''Submit homogeneous jobs of a task container (jobs
+                          which only differ in arguments and environment) as
+                          one job array (TORQUE: qsub -t, PBS Pro: qsub -J).
+                          Each array element is still represented by its own
+                          job instance.''',
+    'env_variable'     : None
+    },
+    {
+    'category'         : 'saga.adaptor.pbsjob',
+    'name'             : 'job_array_max',
+    'type'             : int,
+    'default'          : 1000,
+    'documentation'    : '''Maximal number of elements per job array.  Larger
+                          sets of homogeneous jobs are split into several
+                          arrays.  This needs to be lower than the server's
+                          'max_job_array_size' / 'max_array_size' setting.''',
+    'env_variable'     : None
+    },
+    {
+    'category'         : 'saga.adaptor.pbsjob',
+    'name'             : 'polling',
+    'type'             : str,
+    'default'          : 'pending=15,pending_max=120,running=15,final=5',
+    'documentation'    : '''Polling intervals for job state queries (qstat), in
+                          seconds, as comma separated key=value pairs: pending,
+                          pending_max, running, final, backoff, latency (see
+                          saga.utils.poll_policy).  The intervals apply to
+                          all job services for the same PBS server.''',
+    'env_variable'     : None
+    }
+]
 
 # --------------------------------------------------------------------
 # the adaptor capabilities & supported attributes
@@ -380,6 +379,11 @@ _ADAPTOR_DOC = {
 The PBS adaptor allows to run and manage jobs on `PBS <http://www.pbsworks.com/>`_
 and `TORQUE <http://www.adaptivecomputing.com/products/open-source/torque>`_
 controlled HPC clusters.
+
+Homogeneous jobs run via a task container are submitted as job arrays (see the
+'job_arrays' option).  The array elements get their own job ids
+(`[url]-[<array id>[<index>]]`), and can be watched and canceled individually.
+Note that all elements share the same output and error files.
 """,
     "example": "examples/jobs/pbsjob.py",
     "schemas": {"pbs":        "connect to a local cluster",
@@ -425,6 +429,10 @@ class Adaptor (saga.adaptors.base.Base):
         self.id_re = re.compile('^\[(.*)\]-\[(.*?)\]$')
         self.opts  = self.get_config (_ADAPTOR_NAME)
 
+        self.job_arrays    = self.opts['job_arrays'   ].get_value()
+        self.job_array_max = self.opts['job_array_max'].get_value()
+        self.polling       = self.opts['polling'      ].get_value()
+
     # ----------------------------------------------------------------
     #
     def sanity_check(self):
@@ -472,10 +480,10 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
     def close(self):
 
         if  self.mt :
-            self.mt.stop()
-            self.mt.join(10)  # don't block forever on join()
+            sujsm.unregister(self._monitor_key, self)
+            self.mt = None
 
-        self._logger.info("Job monitoring thread stopped.")
+        self._logger.info("Unregistered from job monitoring thread.")
 
         self.finalize(True)
 
@@ -504,9 +512,8 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
         self.jobs    = dict()
         self.gres    = None
 
-        # the monitoring thread - one per service instance
-        self.mt = _job_state_monitor(job_service=self)
-        self.mt.start()
+        # the monitoring thread is shared with other services (see below)
+        self.mt = None
 
         rm_scheme = rm_url.scheme
         pty_url   = surl.Url(rm_url)
@@ -524,6 +531,10 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
                 elif key == 'gres':
                     self.gres = val[0]
 
+        # values given in the URL take precedence over discovered ones
+        self._url_is_cray = self.is_cray
+        self._url_ppn     = self.ppn
+
 
         # we need to extract the scheme for PTYShell. That's basically the
         # job.Service Url without the pbs+ part. We use the PTYShell to execute
@@ -549,12 +560,55 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
       # self.shell.set_finalize_hook(self.finalize)
 
         self.initialize()
+
+        # all job services for the same PBS server and user share one
+        # monitoring thread, which updates the states of all their jobs at once
+        self._monitor_key = "%s://%s@%s:%s" % (rm_scheme, self.shell.pty_info['user'],
+                                                rm_url.host, rm_url.port)
+        self._policy = self.shell.get_poll_policy(_ADAPTOR_NAME,
+                                                  self._adaptor.polling)
+        self.mt = sujsm.register(self._monitor_key, self, self._policy)
         return self.get_api()
 
 
     # ----------------------------------------------------------------
     #
     def initialize(self):
+        # use the discovery results of an earlier job service for the same
+        # host and user, if they are cached and cover what we need
+        self._discovery        = self.shell.get_discovery_cache(_ADAPTOR_NAME)
+        self._discovery_cached = False
+
+        info = None
+        if self._discovery:
+            info = self._discovery.get()
+
+        if info is not None \
+            and (self._url_is_cray or 'is_cray' in info) \
+            and (self._url_ppn     or 'ppn'     in info):
+            self._logger.info("Using cached PBS discovery results: %s" % info)
+            self._discovery_cached = True
+
+        else:
+            info = self._discover()
+            if self._discovery:
+                self._discovery.put(info)
+
+        self._commands = info['commands']
+
+        # values given in the job service URL take precedence
+        self.is_cray = self._url_is_cray or info['is_cray']
+        self.ppn     = self._url_ppn     or info['ppn']
+
+    # ----------------------------------------------------------------
+    #
+    def _discover(self):
+        """ find the PBS tools and some machine properties on the remote host,
+            and return them as dict
+        """
+        info     = dict()
+        commands = dict()
+
         # check if all required pbs tools are available
         for cmd in self._commands.keys():
             ret, out, _ = self.shell.run_sync("which %s " % cmd)
@@ -564,8 +618,8 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
             else:
                 path = out.strip()  # strip removes newline
                 if cmd == 'qdel':  # qdel doesn't support --version!
-                    self._commands[cmd] = {"path":    path,
-                                           "version": "?"}
+                    commands[cmd] = {"path":    path,
+                                     "version": "?"}
                 else:
                     ret, out, _ = self.shell.run_sync("%s --version" % cmd)
                     if ret != 0:
@@ -577,10 +631,11 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
                         version = out#.strip().split()[1]
 
                         # add path and version to the command dictionary
-                        self._commands[cmd] = {"path":    path,
-                                               "version": version}
+                        commands[cmd] = {"path":    path,
+                                         "version": version}
 
-        self._logger.info("Found PBS tools: %s" % self._commands)
+        self._logger.info("Found PBS tools: %s" % commands)
+        info['commands'] = commands
 
         #
         # TODO: Get rid of this, as I dont think there is any justification that Cray's are special
@@ -588,32 +643,32 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
         # let's try to figure out if we're working on a Cray machine.
         # naively, we assume that if we can find the 'aprun' command in the
         # path that we're logged in to a Cray machine.
-        if self.is_cray == "":
+        if self._url_is_cray == "":
             ret, out, _ = self.shell.run_sync('which aprun')
             if ret != 0:
-                self.is_cray = ""
+                info['is_cray'] = ""
             else:
                 self._logger.info("Host '%s' seems to be a Cray machine." \
                     % self.rm.host)
-                self.is_cray = "unknowncray"
+                info['is_cray'] = "unknowncray"
         else: 
-            self._logger.info("Assuming host is a Cray since 'craytype' is set to: %s" % self.is_cray)
+            self._logger.info("Assuming host is a Cray since 'craytype' is set to: %s" % self._url_is_cray)
 
         #
         # Get number of processes per node
         #
-        if self.ppn:
-            self._logger.debug("Using user specified 'ppn': %d" % self.ppn)
-            return
+        if self._url_ppn:
+            self._logger.debug("Using user specified 'ppn': %d" % self._url_ppn)
+            return info
 
         # TODO: this is quite a hack. however, it *seems* to work quite
         #       well in practice.
-        if 'PBSPro_12' in self._commands['qstat']['version']:
+        if 'PBSPro_12' in commands['qstat']['version']:
             ret, out, _ = self.shell.run_sync('unset GREP_OPTIONS; %s -a | grep -E "resources_available.ncpus"' % \
-                                               self._commands['pbsnodes']['path'])
+                                               commands['pbsnodes']['path'])
         else:
             ret, out, _ = self.shell.run_sync('unset GREP_OPTIONS; %s -a | grep -E "(np|pcpu)[[:blank:]]*=" ' % \
-                                               self._commands['pbsnodes']['path'])
+                                               commands['pbsnodes']['path'])
         if ret != 0:
             message = "Error running pbsnodes: %s" % out
             log_error_and_raise(message, saga.NoSuccess, self._logger)
@@ -634,9 +689,27 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
                         ppn_list[np] += 1
                     else:
                         ppn_list[np] = 1
-            self.ppn = max(ppn_list, key=ppn_list.get)
+            info['ppn'] = max(ppn_list, key=ppn_list.get)
             self._logger.debug("Found the following 'ppn' configurations: %s. "
-                "Using %s as default ppn."  % (ppn_list, self.ppn))
+                "Using %s as default ppn."  % (ppn_list, info['ppn']))
+
+        return info
+
+    # ----------------------------------------------------------------
+    #
+    def _rediscover(self):
+        """ drop cached discovery results after a failed submission, and
+            rediscover the remote environment.  Returns False if the results
+            were not cached (so that rediscovery would not change anything).
+        """
+        if not self._discovery_cached:
+            return False
+
+        self._logger.info("PBS submission failed -- discovering again")
+        self._discovery.invalidate()
+        self.initialize()
+
+        return True
 
     # ----------------------------------------------------------------
     #
@@ -647,6 +720,65 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
         # get the job description
         jd = job_obj.get_description()
 
+        try:
+            pid = self._job_submit(jd, self._job_script(jd))
+
+        except saga.NoSuccess:
+            # the submission may have failed because of stale cached discovery
+            # results -- if so, rediscover and try once more
+            if not self._rediscover():
+                raise
+            pid = self._job_submit(jd, self._job_script(jd))
+
+        job_id = "[%s]-[%s]" % (self.rm, pid)
+        self._logger.info("Submitted PBS job with id: %s" % job_id)
+
+        self._job_register(job_id, job_obj)
+
+        # return the job id
+        return job_id
+
+    # ----------------------------------------------------------------
+    #
+    def _job_array_register(self, pid, job_objs):
+        """ add the elements of a submitted job array to the watch list, and
+            return their job ids
+        """
+
+        # qsub reports array ids as '<pid>[]'
+        base    = pid.split('[')[0]
+        job_ids = list()
+
+        self._logger.info("Submitted PBS job array %s (%d elements)" % (pid, len(job_objs)))
+
+        for i, job_obj in enumerate(job_objs):
+            job_id = "[%s]-[%s[%d]]" % (self.rm, base, i)
+            self._job_register(job_id, job_obj)
+            job_ids.append(job_id)
+
+        return job_ids
+
+    # ----------------------------------------------------------------
+    #
+    def _job_array_key(self, jd):
+        """ jobs with the same key can be submitted as one job array: they
+            may only differ in arguments and environment
+        """
+
+        attribs = jd.as_dict()
+
+        for key in [saga.job.ARGUMENTS, saga.job.ENVIRONMENT]:
+            attribs.pop(key, None)
+
+        return repr(sorted(attribs.items()))
+
+    # ----------------------------------------------------------------
+    #
+    def _job_script(self, jd, tasks=None):
+        """ create the PBS script for a job (or, if tasks are given, for a job
+            array)
+        """
+
         # normalize working directory path
         if  jd.working_directory :
             jd.working_directory = os.path.normpath (jd.working_directory)
@@ -663,74 +795,96 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
                                          jd=jd, ppn=self.ppn, gres=self.gres,
                                          pbs_version=self._commands['qstat']['version'],
                                          is_cray=self.is_cray, queue=self.queue,
-                                         )
+                                         tasks=tasks)
 
             self._logger.info("Generated PBS script: %s" % script)
         except Exception, ex:
             log_error_and_raise(str(ex), saga.BadParameter, self._logger)
 
-        # try to create the working directory (if defined)
+        return script
+
+    # ----------------------------------------------------------------
+    #
+    def _job_submit(self, jd, script):
+        """ submit a PBS script via qsub, and return the PBS job id
+        """
+
+        cmdline = self._job_submit_cmd(jd, script)
+        ret, out, _ = self.shell.run_sync(cmdline)
+
+        return self._job_submit_parse(ret, out, cmdline)
+
+    # ----------------------------------------------------------------
+    #
+    def _job_submit_cmd(self, jd, script):
+        """ create the command line which submits a PBS script via qsub
+        """
+
+        # The command line creates the working directory (if defined),
+        # creates a temporary file with 'mktemp', writes the generated PBS
+        # script into it (passed as literal here document), and calls
+        # 'qsub <tmpfile>' to submit the script to the queueing system -- all
+        # in a single shell exchange.
         # WARNING: this assumes a shared filesystem between login node and
         #          compute nodes.
+        cmdline = "SCRIPTFILE=`mktemp -t SAGA-Python-PBSJobScript.XXXXXX` && cat > $SCRIPTFILE <<'%s' && %s $SCRIPTFILE && rm -f $SCRIPTFILE\n%s\n%s" \
+                % (_SCRIPT_EOF, self._commands['qsub']['path'],
+                   script.rstrip('\n'), _SCRIPT_EOF)
+
         if jd.working_directory:
-            self._logger.info("Creating working directory %s" % jd.working_directory)
-            ret, out, _ = self.shell.run_sync("mkdir -p %s" % (jd.working_directory))
-            if ret != 0:
-                # something went wrong
-                message = "Couldn't create working directory - %s" % (out)
-                log_error_and_raise(message, saga.NoSuccess, self._logger)
+            cmdline = "mkdir -p %s && %s" % (jd.working_directory, cmdline)
 
-        # Now we want to execute the script. This process consists of two steps:
-        # (1) we create a temporary file with 'mktemp' and write the contents of 
-        #     the generated PBS script into it
-        # (2) we call 'qsub <tmpfile>' to submit the script to the queueing system
-        cmdline = """SCRIPTFILE=`mktemp -t SAGA-Python-PBSJobScript.XXXXXX` &&  echo "%s" > $SCRIPTFILE && %s $SCRIPTFILE && rm -f $SCRIPTFILE""" %  (script, self._commands['qsub']['path'])
-        ret, out, _ = self.shell.run_sync(cmdline)
+        return cmdline
+
+    # ----------------------------------------------------------------
+    #
+    def _job_submit_parse(self, ret, out, cmdline):
+        """ parse the output of a qsub command line, and return the PBS job id
+        """
 
         if ret != 0:
             # something went wrong
             message = "Error running job via 'qsub': %s. Commandline was: %s" \
                 % (out, cmdline)
             log_error_and_raise(message, saga.NoSuccess, self._logger)
-        else:
-            # parse the job id. qsub usually returns just the job id, but
-            # sometimes there are a couple of lines of warnings before.
-            # if that's the case, we log those as 'warnings'
-            lines = out.split('\n')
-            lines = filter(lambda lines: lines != '', lines)  # remove empty
-
-            if len(lines) > 1:
-                self._logger.warning('qsub: %s' % ''.join(lines[:-2]))
-
-            # we asssume job id is in the last line
-            #print cmdline
-            #print out
-
-            job_id = "[%s]-[%s]" % (self.rm, lines[-1].strip().split('.')[0])
-            self._logger.info("Submitted PBS job with id: %s" % job_id)
-
-            state = saga.job.PENDING
-
-            # populate job info dict
-            self.jobs[job_id] = {'obj'         : job_obj,
-                                 'job_id'      : job_id,
-                                 'state'       : state,
-                                 'exec_hosts'  : None,
-                                 'returncode'  : None,
-                                 'create_time' : None,
-                                 'start_time'  : None,
-                                 'end_time'    : None,
-                                 'gone'        : False
-                                 }
-
-            self._logger.info ("assign job id  %s / %s / %s to watch list (%s)" \
-                            % (None, job_id, job_obj, self.jobs.keys()))
-
-            # set status to 'pending' and manually trigger callback
-            job_obj._attributes_i_set('state', state, job_obj._UP, True)
 
-            # return the job id
-            return job_id
+        # parse the job id. qsub usually returns just the job id, but
+        # sometimes there are a couple of lines of warnings before.
+        # if that's the case, we log those as 'warnings'
+        lines = out.split('\n')
+        lines = filter(lambda lines: lines != '', lines)  # remove empty
+
+        if len(lines) > 1:
+            self._logger.warning('qsub: %s' % ''.join(lines[:-2]))
+
+        # we asssume job id is in the last line
+        return lines[-1].strip().split('.')[0]
+
+    # ----------------------------------------------------------------
+    #
+    def _job_register(self, job_id, job_obj):
+        """ add a submitted job to the watch list
+        """
+
+        state = saga.job.PENDING
+
+        # populate job info dict
+        self.jobs[job_id] = {'obj'         : job_obj,
+                             'job_id'      : job_id,
+                             'state'       : state,
+                             'exec_hosts'  : None,
+                             'returncode'  : None,
+                             'create_time' : None,
+                             'start_time'  : None,
+                             'end_time'    : None,
+                             'gone'        : False
+                             }
+
+        self._logger.info ("assign job id  %s / %s / %s to watch list (%s)" \
+                        % (None, job_id, job_obj, self.jobs.keys()))
+
+        # set status to 'pending' and manually trigger callback
+        job_obj._attributes_i_set('state', state, job_obj._UP, True)
 
 
     # ----------------------------------------------------------------
@@ -810,16 +964,11 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
         rm, pid = self._adaptor.parse_id(job_id)
 
         # run the PBS 'qstat' command to get some infos about our job
-        # TODO: create a PBSPRO/TORQUE flag once
-        if 'PBSPro_1' in self._commands['qstat']['version']:
-            qstat_flag = '-fx'
-        else:
-            qstat_flag ='-f1'
-            
-        ret, out, _ = self.shell.run_sync("unset GREP_OPTIONS; %s %s %s | "
-                "grep -E -i '(job_state)|(exec_host)|(exit_status)|"
-                 "(ctime)|(start_time)|(stime)|(mtime)'"
-                % (self._commands['qstat']['path'], qstat_flag, pid))
+        with self._policy.query():
+            ret, out, _ = self.shell.run_sync("unset GREP_OPTIONS; %s %s %s | "
+                    "grep -E -i '%s'"
+                    % (self._commands['qstat']['path'], self._qstat_flag(), pid,
+                       _QSTAT_KEYS))
 
         if ret != 0:
 
@@ -828,20 +977,7 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
                 log_error_and_raise(message, saga.NoSuccess, self._logger)
 
             if ("Unknown Job Id" in out):
-                # Let's see if the last known job state was running or pending. in
-                # that case, the job is gone now, which can either mean DONE,
-                # or FAILED. the only thing we can do is set it to 'DONE'
-                job_info['gone'] = True
-                # TODO: we can also set the end time?
-                self._logger.warning("Previously running job has disappeared. "
-                        "This probably means that the backend doesn't store "
-                        "information about finished jobs. Setting state to 'DONE'.")
-
-                if job_info['state'] in [saga.job.RUNNING, saga.job.PENDING]:
-                    job_info['state'] = saga.job.DONE
-                else:
-                    # TODO: This is an uneducated guess?
-                    job_info['state'] = saga.job.FAILED
+                self._job_gone(job_info)
             else:
                 # something went wrong
                 message = "Error retrieving job info via 'qstat': %s" % out
@@ -849,69 +985,240 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
         else:
 
             # The job seems to exist on the backend. let's process some data.
-
-            # TODO: make the parsing "contextual", in the sense that it takes
-            #       the state into account.
-
-            # parse the egrep result. this should look something like this:
-            #     job_state = C
-            #     exec_host = i72/0
-            #     exit_status = 0
-            results = out.split('\n')
-            for line in results:
-                if len(line.split('=')) == 2:
-                    key, val = line.split('=')
-                    key = key.strip()
-                    val = val.strip()
-
-                    # The ubiquitous job state
-                    if key in ['job_state']: # PBS Pro and TORQUE
-                        job_info['state'] = _pbs_to_saga_jobstate(val)
-
-                    # Hosts where the job ran
-                    elif key in ['exec_host']: # PBS Pro and TORQUE
-                        job_info['exec_hosts'] = val.split('+')  # format i73/7+i73/6+...
-
-                    # Exit code of the job
-                    elif key in ['exit_status', # TORQUE
-                                 'Exit_status' # PBS Pro
-                                ]:
-                        job_info['returncode'] = int(val)
-
-                    # Time job got created in the queue
-                    elif key in ['ctime']: # PBS Pro and TORQUE
-                        job_info['create_time'] = val
-
-                    # Time job started to run
-                    elif key in ['start_time', # TORQUE
-                                 'stime'       # PBS Pro
-                                ]:
-                        job_info['start_time'] = val
-
-                    # Time job ended.
-                    #
-                    # PBS Pro doesn't have an "end time" field.
-                    # It has an "resources_used.walltime" though,
-                    # which could be added up to the start time.
-                    # We will not do that arithmetic now though.
-                    #
-                    # Alternatively, we can use mtime, as the latest
-                    # modification time will generally also be the end time.
-                    #
-                    # TORQUE has an "comp_time" (completion? time) field,
-                    # that is generally the same as mtime at the finish.
-                    #
-                    # For the time being we will use mtime as end time for
-                    # both TORQUE and PBS Pro.
-                    #
-                    if key in ['mtime']: # PBS Pro and TORQUE
-                        job_info['end_time'] = val
+            job_info = self._parse_qstat(out.split('\n'), job_info)
 
         # return the updated job info
         return job_info
 
-    def _parse_qstat(self, haystack, job_info):
+    # ----------------------------------------------------------------
+    #
+    def _job_get_infos(self, job_ids, jobs=None):
+        """ Get job information attributes for many jobs via a single qstat
+            call.  Returns a dict of new job info dicts, for all jobs which
+            qstat reported on, or which are unknown to qstat (and thus gone).
+            The current job infos are taken from the given table (by default
+            our own).
+        """
+
+        if jobs is None:
+            jobs = self.jobs
+
+        pids    = dict()
+        queries = set()
+        for job_id in job_ids:
+            rm, pid = self._adaptor.parse_id(job_id)
+            pids[pid] = job_id
+
+            # array elements ('<pid>[<index>]') are listed via their array
+            if '[' in pid:
+                queries.add(pid.split('[')[0] + '[]')
+            else:
+                queries.add(pid)
+
+        # '-t' expands job arrays into their elements
+        if [query for query in queries if query.endswith('[]')]:
+            flags = self._qstat_flag() + ' -t'
+        else:
+            flags = self._qstat_flag()
+
+        # the ids are passed via a here document, and xargs splits them over as
+        # many qstat calls as needed -- so we don't hit command line limits.
+        # The output of all jobs is filtered in one go, and the 'Job Id' lines
+        # separate the records.  The braces keep the here document intact if
+        # run_sync appends any redirection.
+        with self._policy.query():
+            ret, out, _ = self.shell.run_sync("unset GREP_OPTIONS; { "
+                    "xargs %s %s 2>&1 <<EOT | grep -E -i '(Job Id)|%s'\n%s\nEOT\n}"
+                    % (self._commands['qstat']['path'], flags,
+                       _QSTAT_KEYS, '\n'.join(queries)))
+
+        unknown_re = re.compile('Unknown Job Id (Error )?(\S+)', re.IGNORECASE)
+        record_re  = re.compile('^\s*Job Id:\s*(\S+)',          re.IGNORECASE)
+
+        records = dict()   # pid : qstat output lines
+        gone    = list()   # pids unknown to qstat
+        current = None
+
+        for line in out.split('\n'):
+
+            match = unknown_re.search(line)
+            if match:
+                gone.append(match.group(2).split('.')[0])
+                current = None
+                continue
+
+            match = record_re.search(line)
+            if match:
+                current = match.group(1).split('.')[0]
+                records[current] = list()
+                continue
+
+            if current in records:
+                records[current].append(line)
+
+        if not records and not gone and out.strip():
+            message = "Error retrieving job info via 'qstat': %s" % out
+            log_error_and_raise(message, saga.NoSuccess, self._logger)
+
+        job_infos = dict()
+
+        # if a whole array is unknown, all its elements are gone
+        gone_arrays = [gone_pid.split('[')[0] for gone_pid in gone \
+                       if gone_pid.endswith('[]')]
+
+        for pid in pids:
+
+            job_id = pids[pid]
+
+            if pid in records:
+                job_info = dict(jobs[job_id])
+                job_infos[job_id] = self._parse_qstat(records[pid], job_info)
+
+            elif pid in gone or \
+                 ('[' in pid and pid.split('[')[0] in gone_arrays):
+                job_info = dict(jobs[job_id])
+                job_infos[job_id] = self._job_gone(job_info)
+
+        return job_infos
+
+    # ----------------------------------------------------------------
+    #
+    def _monitor_jobs(self):
+        """ returns the jobs the monitoring thread needs to update: all jobs
+            which are not in a final state
+        """
+        return dict([(job_id, job_info) for job_id, job_info in self.jobs.items() \
+                     if job_info['state'] not in _FINAL_STATES])
+
+    # ----------------------------------------------------------------
+    #
+    def _job_update_infos(self, new_job_infos):
+        """ update the job table with the result of _job_get_infos, and fire
+            the state callbacks of all jobs whose state changed
+        """
+
+        for job_id in new_job_infos:
+
+            new_job_info = new_job_infos[job_id]
+
+            self._logger.info("Updating Job %s (state: %s)" \
+                           % (job_id, new_job_info['state']))
+
+            # fire job state callback if 'state' has changed
+            self._job_set_state(job_id, new_job_info['state'])
+
+            # update job info
+            self.jobs[job_id] = new_job_info
+
+    # ----------------------------------------------------------------
+    #
+    def _job_set_state(self, job_id, state):
+        """ set the job's state in the job table, and fire the job state
+            callback if the state has changed
+        """
+        job_info = self.jobs[job_id]
+
+        if state != job_info['state']:
+            job_info['state'] = state
+            job_obj = job_info['obj']
+            job_obj._attributes_i_set('state', state, job_obj._UP, True)
+
+    # ----------------------------------------------------------------
+    #
+    def _qstat_flag(self):
+        """ PBS Pro needs '-x' to report finished jobs, TORQUE needs '-1' to
+            not wrap lines
+        """
+        # TODO: create a PBSPRO/TORQUE flag once
+        if 'PBSPro_1' in self._commands['qstat']['version']:
+            return '-fx'
+        else:
+            return '-f1'
+
+    # ----------------------------------------------------------------
+    #
+    def _job_gone(self, job_info):
+        """ qstat does not know the job (anymore)
+        """
+        # Let's see if the last known job state was running or pending. in
+        # that case, the job is gone now, which can either mean DONE,
+        # or FAILED. the only thing we can do is set it to 'DONE'
+        job_info['gone'] = True
+        # TODO: we can also set the end time?
+        self._logger.warning("Previously running job has disappeared. "
+                "This probably means that the backend doesn't store "
+                "information about finished jobs. Setting state to 'DONE'.")
+
+        if job_info['state'] in [saga.job.RUNNING, saga.job.PENDING]:
+            job_info['state'] = saga.job.DONE
+        else:
+            # TODO: This is an uneducated guess?
+            job_info['state'] = saga.job.FAILED
+
+        return job_info
+
+    # ----------------------------------------------------------------
+    #
+    def _parse_qstat(self, lines, job_info):
+        """ parse the (filtered) qstat output lines of one job into the given
+            job info dict
+        """
 
+        # TODO: make the parsing "contextual", in the sense that it takes
+        #       the state into account.
+
+        # parse the egrep result. this should look something like this:
+        #     job_state = C
+        #     exec_host = i72/0
+        #     exit_status = 0
+        for line in lines:
+            if len(line.split('=')) == 2:
+                key, val = line.split('=')
+                key = key.strip()
+                val = val.strip()
+
+                # The ubiquitous job state
+                if key in ['job_state']: # PBS Pro and TORQUE
+                    job_info['state'] = _pbs_to_saga_jobstate(val)
+
+                # Hosts where the job ran
+                elif key in ['exec_host']: # PBS Pro and TORQUE
+                    job_info['exec_hosts'] = val.split('+')  # format i73/7+i73/6+...
+
+                # Exit code of the job
+                elif key in ['exit_status', # TORQUE
+                             'Exit_status' # PBS Pro
+                            ]:
+                    job_info['returncode'] = int(val)
+
+                # Time job got created in the queue
+                elif key in ['ctime']: # PBS Pro and TORQUE
+                    job_info['create_time'] = val
+
+                # Time job started to run
+                elif key in ['start_time', # TORQUE
+                             'stime'       # PBS Pro
+                            ]:
+                    job_info['start_time'] = val
+
+                # Time job ended.
+                #
+                # PBS Pro doesn't have an "end time" field.
+                # It has an "resources_used.walltime" though,
+                # which could be added up to the start time.
+                # We will not do that arithmetic now though.
+                #
+                # Alternatively, we can use mtime, as the latest
+                # modification time will generally also be the end time.
+                #
+                # TORQUE has an "comp_time" (completion? time) field,
+                # that is generally the same as mtime at the finish.
+                #
+                # For the time being we will use mtime as end time for
+                # both TORQUE and PBS Pro.
+                #
+                if key in ['mtime']: # PBS Pro and TORQUE
+                    job_info['end_time'] = val
 
         # return the new job info dict
         return job_info
@@ -977,7 +1284,7 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
             log_error_and_raise(message, saga.NoSuccess, self._logger)
 
         # assume the job was succesfully canceled
-        self.jobs[job_id]['state'] = saga.job.CANCELED
+        self._job_set_state(job_id, saga.job.CANCELED)
 
 
     # ----------------------------------------------------------------
@@ -1096,29 +1403,192 @@ class PBSJobService (saga.adaptors.cpi.job.Service):
         return ids
 
 
-  # # ----------------------------------------------------------------
-  # #
-  # def container_run (self, jobs) :
-  #     self._logger.debug ("container run: %s"  %  str(jobs))
-  #     # TODO: this is not optimized yet
-  #     for job in jobs:
-  #         job.run ()
-  #
-  #
-  # # ----------------------------------------------------------------
-  # #
-  # def container_wait (self, jobs, mode, timeout) :
-  #     self._logger.debug ("container wait: %s"  %  str(jobs))
-  #     # TODO: this is not optimized yet
-  #     for job in jobs:
-  #         job.wait ()
-  #
-  #
-  # # ----------------------------------------------------------------
-  # #
-  # def container_cancel (self, jobs) :
-  #     self._logger.debug ("container cancel: %s"  %  str(jobs))
-  #     raise saga.NoSuccess ("Not Implemented");
+    # ----------------------------------------------------------------
+    #
+    def container_run(self, jobs):
+        """ Sort the jobs into sets of homogeneous jobs, and submit each set
+            as one job array (of at most 'job_array_max' elements).  Jobs which
+            have no sibling are submitted individually.
+        """
+        self._logger.debug("container run: %s" % str(jobs))
+
+        groups = list()
+        keys   = dict()
+
+        for job in jobs:
+
+            if not self._adaptor.job_arrays:
+                groups.append([job])
+                continue
+
+            key = self._job_array_key(job.get_description())
+
+            if key not in keys or \
+               len(groups[keys[key]]) >= self._adaptor.job_array_max:
+                keys[key] = len(groups)
+                groups.append(list())
+
+            groups[keys[key]].append(job)
+
+        # create all job scripts, and submit them in a single shell exchange
+        error    = None
+        rejected = False
+        submits  = list()
+        cmdlines = list()
+
+        for group in groups:
+
+            jds = [job.get_description() for job in group]
+
+            try:
+                if len(group) > 1:
+                    script = self._job_script(jds[0], jds)
+                else:
+                    script = self._job_script(jds[0])
+
+            except saga.SagaException as e:
+                # submit the other groups anyway
+                error = e
+                self._container_fail(group, e)
+                continue
+
+            submits.append(group)
+            cmdlines.append(self._job_submit_cmd(jds[0], script))
+
+        results = self.shell.run_bulk(cmdlines)
+
+        for group, cmdline, (ret, out) in zip(submits, cmdlines, results):
+
+            try:
+                pid = self._job_submit_parse(ret, out, cmdline)
+
+            except saga.SagaException as e:
+                error    = e
+                rejected = True
+                self._container_fail(group, e)
+                continue
+
+            if len(group) > 1:
+                job_ids = self._job_array_register(pid, group)
+            else:
+                job_ids = ["[%s]-[%s]" % (self.rm, pid)]
+                self._logger.info("Submitted PBS job with id: %s" % job_ids[0])
+                self._job_register(job_ids[0], group[0])
+
+            for job, job_id in zip(group, job_ids):
+                job._adaptor._id      = job_id
+                job._adaptor._started = True
+
+        if rejected:
+            # make sure that later submissions don't use stale cached
+            # discovery results
+            self._rediscover()
+
+        if error:
+            raise error
+
+    # ----------------------------------------------------------------
+    #
+    def _container_fail(self, jobs, e):
+        """ marks jobs which could not be submitted as failed
+        """
+        for job in jobs:
+            job._adaptor._state     = saga.job.FAILED
+            job._adaptor._exception = e
+
+    # ----------------------------------------------------------------
+    #
+    def _container_jobs(self, jobs):
+        """ returns the ids of those jobs which have been submitted, and
+            which are known to this service (jobs which failed to submit, and
+            jobs reconnected via other services, are skipped)
+        """
+        return [job._adaptor._id for job in jobs \
+                if job._adaptor._id and job._adaptor._id in self.jobs]
+
+    # ----------------------------------------------------------------
+    #
+    def container_wait(self, jobs, mode, timeout):
+        """ the job states are kept up to date by the monitoring thread, so we
+            only need to watch the job table
+        """
+        self._logger.debug("container wait: %s" % str(jobs))
+
+        for job in jobs:
+            if job._adaptor._started is False and \
+               job._adaptor._state != saga.job.FAILED:
+                log_error_and_raise("Can't wait for job that hasn't been started",
+                    saga.IncorrectState, self._logger)
+
+        # jobs which failed to submit are final already
+        failed  = len([job for job in jobs if job._adaptor._state == saga.job.FAILED])
+        job_ids = self._container_jobs(jobs)
+
+        time_start = time.time()
+
+        while True:
+
+            final = [job_id for job_id in job_ids \
+                     if self.jobs[job_id]['state'] in _FINAL_STATES]
+
+            if len(final) == len(job_ids):
+                return
+
+            if failed and mode == saga.ANY:
+                return
+
+            if final and mode == saga.ANY:
+                return
+
+            # check if we hit timeout
+            if timeout >= 0:
+                if time.time() - time_start > timeout:
+                    return
+
+            # avoid busy poll
+            time.sleep(SYNC_WAIT_UPDATE_INTERVAL)
+
+    # ----------------------------------------------------------------
+    #
+    def container_cancel(self, jobs, timeout):
+        """ cancel all jobs which are not yet final with a single qdel call
+        """
+        self._logger.debug("container cancel: %s" % str(jobs))
+
+        job_ids = [job_id for job_id in self._container_jobs(jobs) \
+                   if self.jobs[job_id]['state'] not in _FINAL_STATES]
+
+        if not job_ids:
+            return
+
+        # the job ids are passed on stdin, to avoid overly long command lines
+        pids = [self._adaptor.parse_id(job_id)[1] for job_id in job_ids]
+
+        ret, out, _ = self.shell.run_sync("{ xargs %s <<EOT\n%s\nEOT\n}" \
+            % (self._commands['qdel']['path'], '\n'.join(pids)))
+
+        if ret != 0:
+            message = "Error canceling jobs via 'qdel': %s" % out
+            log_error_and_raise(message, saga.NoSuccess, self._logger)
+
+        # assume the jobs were succesfully canceled
+        for job_id in job_ids:
+            self._job_set_state(job_id, saga.job.CANCELED)
+
+    # ----------------------------------------------------------------
+    #
+    def container_get_states(self, jobs):
+        """ update the states of all jobs with a single qstat call
+        """
+        self._logger.debug("container get_states: %s" % str(jobs))
+
+        job_ids = [job_id for job_id in self._container_jobs(jobs) \
+                   if self.jobs[job_id]['state'] not in _FINAL_STATES]
+
+        if job_ids:
+            self._job_update_infos(self._job_get_infos(job_ids))
+
+        return [job._adaptor.get_state() for job in jobs]
 
 
 ###############################################################################
@@ -1145,6 +1615,9 @@ class PBSJob (saga.adaptors.cpi.job.Job):
         self.jd = job_info["job_description"]
         self.js = job_info["job_service"]
 
+        # the js is responsible for job bulk operations
+        self._container = self.js
+
         if job_info['reconnect'] is True:
             self._id      = job_info['reconnect_jobid']
             self._started = True
@@ -1152,6 +1625,11 @@ class PBSJob (saga.adaptors.cpi.job.Job):
             self._id      = None
             self._started = False
 
+        # state and error of jobs which never got submitted (see
+        # container_run)
+        self._state     = saga.job.NEW
+        self._exception = None
+
         return self.get_api()
 
     # ----------------------------------------------------------------
@@ -1161,7 +1639,7 @@ class PBSJob (saga.adaptors.cpi.job.Job):
         """ implements saga.adaptors.cpi.job.Job.get_state()
         """
         if  self._started is False:
-            return saga.job.NEW
+            return self._state
 
         return self.js._job_get_state(job_id=self._id)
             
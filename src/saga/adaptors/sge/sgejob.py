@@ -28,6 +28,14 @@ ASYNC_CALL = saga.adaptors.cpi.decorators.ASYNC_CALL
 
 _QSTAT_JOB_STATE_RE = re.compile(r"^([^ ]+) ([0-9]{2}/[0-9]{2}/[0-9]{4} [0-9]{2}:[0-9]{2}:[0-9]{2}) (.+)$")
 
+_FINAL_STATES = [saga.job.DONE, saga.job.FAILED, saga.job.CANCELED]
+
+# separates the remote job info files in the output of bulk queries
+_JOB_INFO_MARKER = "SAGA-JOB-INFO:"
+
+# delimiter for job scripts which are passed as here documents
+_SCRIPT_EOF = 'SAGA_SGE_SCRIPT_EOF'
+
 class SgeKeyValueParser(object):
     """
     Parser for SGE commands returning lines with key-value pairs.
@@ -135,6 +143,17 @@ _ADAPTOR_OPTIONS       = [
                             of days to consider a temporary file older enough to be deleted.''',
     'env_variable'     : None
     },
+    {
+    'category'         : 'saga.adaptor.sgejob',
+    'name'             : 'polling',
+    'type'             : str,
+    'default'          : 'pending=2,pending_max=30,running=1,final=0.5',
+    'documentation'    : '''Polling intervals for job state queries (qstat,
+                          qacct), in seconds, as comma separated key=value
+                          pairs: pending, pending_max, running, final, backoff,
+                          latency (see saga.utils.poll_policy).''',
+    'env_variable'     : None
+    },
 ]
 # --------------------------------------------------------------------
 # the adaptor capabilities & supported attributes
@@ -222,6 +241,7 @@ class Adaptor (saga.adaptors.base.Base):
 
         self.purge_on_start = self.opts['purge_on_start'].get_value()
         self.purge_older_than = self.opts['purge_older_than'].get_value()
+        self.polling = self.opts['polling'].get_value()
 
     # ----------------------------------------------------------------
     #
@@ -315,6 +335,10 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
 
         self.shell = saga.utils.pty_shell.PTYShell(pty_url, self.session)
 
+        # paces the state queries of all job services for this host
+        self._policy = self.shell.get_poll_policy(_ADAPTOR_NAME,
+                                                  self._adaptor.polling)
+
       # self.shell.set_initialize_hook(self.initialize)
       # self.shell.set_finalize_hook(self.finalize)
 
@@ -332,6 +356,74 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
     # ----------------------------------------------------------------
     #
     def initialize(self):
+        # use the discovery results of an earlier job service for the same
+        # host and user, if they are cached
+        self._discovery        = self.shell.get_discovery_cache(_ADAPTOR_NAME)
+        self._discovery_cached = False
+
+        info = None
+        if self._discovery:
+            info = self._discovery.get()
+
+        if info is not None:
+            self._logger.info("Using cached SGE discovery results: %s" % info)
+            self._discovery_cached = True
+
+        else:
+            info = self._discover()
+            if self._discovery:
+                self._discovery.put(info)
+
+        self._commands  = info['commands']
+        self.pe_list    = info['pe_list']
+        self.accounting = info['accounting']
+
+        mandatory_attrs = info['mandatory_attrs']
+        optional_attrs  = info['optional_attrs']
+
+        # find out user specified memory attributes in job.Service URL
+        if self.memreqs is None:
+            flags = []
+        else:
+            flags, _ = self.__parse_memreqs(self.memreqs)
+        # if there are mandatory memory attributes store them and check that they were specified in the job.Service URL
+        if not (mandatory_attrs == []):
+            self.mandatory_memreqs = mandatory_attrs
+            missing_flags = []
+            for attr in mandatory_attrs:
+                if not attr in flags:
+                    missing_flags.append(attr)
+            if not (missing_flags == []):
+                message = "The following memory attribute(s) are mandatory in your SGE environment and thus " \
+                          "must be specified in the job service URL: %s" % ' '.join(missing_flags)
+                log_error_and_raise(message, saga.BadParameter, self._logger) 
+        # if memory attributes were specified in the job.Service URL, check that they correspond to existing optional or mandatory memory attributes
+        invalid_attrs = []
+        for f in flags:
+            if not (f in optional_attrs or f in mandatory_attrs):
+                invalid_attrs.append(f)
+        if not (invalid_attrs == []):
+            message = "The following memory attribute(s) were specified in the job.Service URL but are not valid " \
+                      "memory attributes in your SGE environment: %s" % ' '.join(invalid_attrs)
+            log_error_and_raise(message, saga.BadParameter, self._logger)
+
+        # purge temporary files (not more often than we discover, though)
+        if self._adaptor.purge_on_start and not self._discovery_cached:
+            cmd = "find $HOME/.saga/adaptors/sge_job" \
+                  " -type f -mtime +%d -print -delete | wc -l" % self._adaptor.purge_older_than
+            ret, out, _ = self.shell.run_sync(cmd)
+            if ret == 0 and out != "0":
+                self._logger.info("Purged %s temporary files" % out)
+
+    # ----------------------------------------------------------------
+    #
+    def _discover(self):
+        """ find the SGE tools, processing elements, memory attributes and
+            accounting settings on the remote host, and return them as dict
+        """
+        info     = dict()
+        commands = dict()
+
         # check if all required sge tools are available
         for cmd in self._commands.keys():
             ret, out, _ = self.shell.run_sync("which %s " % cmd)
@@ -357,27 +449,29 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
                     # help screen, e.g., GE 6.2u5_1
                     version = out.strip().split('\n')[0]
 
-                    # add path and version to the command dictionary
-                    self._commands[cmd] = {"path":    "unset GREP_OPTIONS; %s" % path,
-                                           "version": version}
+                # add path and version to the command dictionary
+                commands[cmd] = {"path":    "unset GREP_OPTIONS; %s" % path,
+                                 "version": version}
 
-        self._logger.info("Found SGE tools: %s" % self._commands)
+        self._logger.info("Found SGE tools: %s" % commands)
+        info['commands'] = commands
 
         # determine the available processing elements
+        info['pe_list'] = list()
         ret, out, _ = self.shell.run_sync('%s -spl' %
-                      (self._commands['qconf']['path']))
+                      (commands['qconf']['path']))
         if ret != 0:
             message = "Error running 'qconf': %s" % out
             log_error_and_raise(message, saga.NoSuccess, self._logger)
         else:
             for pe in out.split('\n'):
                 if pe != '':
-                    self.pe_list.append(pe)
+                    info['pe_list'].append(pe)
             self._logger.debug("Available processing elements: %s" %
-                (self.pe_list))
+                (info['pe_list']))
 
         # find out mandatory and optional memory attributes 
-        ret, out, _ = self.shell.run_sync('%s -sc' % (self._commands['qconf']['path']))
+        ret, out, _ = self.shell.run_sync('%s -sc' % (commands['qconf']['path']))
         if ret != 0:
             message = "Error running 'qconf': %s" % out
             log_error_and_raise(message, saga.NoSuccess, self._logger)
@@ -393,44 +487,34 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
                         mandatory_attrs.append(name)
             self._logger.debug("Optional memory attributes: %s" % (mandatory_attrs))
             self._logger.debug("Mandatory memory attributes: %s" % (optional_attrs))       
-        # find out user specified memory attributes in job.Service URL
-        if self.memreqs is None:
-            flags = []
-        else:
-            flags, _ = self.__parse_memreqs(self.memreqs)
-        # if there are mandatory memory attributes store them and check that they were specified in the job.Service URL
-        if not (mandatory_attrs == []):
-            self.mandatory_memreqs = mandatory_attrs
-            missing_flags = []
-            for attr in mandatory_attrs:
-                if not attr in flags:
-                    missing_flags.append(attr)
-            if not (missing_flags == []):
-                message = "The following memory attribute(s) are mandatory in your SGE environment and thus " \
-                          "must be specified in the job service URL: %s" % ' '.join(missing_flags)
-                log_error_and_raise(message, saga.BadParameter, self._logger) 
-        # if memory attributes were specified in the job.Service URL, check that they correspond to existing optional or mandatory memory attributes
-        invalid_attrs = []
-        for f in flags:
-            if not (f in optional_attrs or f in mandatory_attrs):
-                invalid_attrs.append(f)
-        if not (invalid_attrs == []):
-            message = "The following memory attribute(s) were specified in the job.Service URL but are not valid " \
-                      "memory attributes in your SGE environment: %s" % ' '.join(invalid_attrs)
-            log_error_and_raise(message, saga.BadParameter, self._logger)
+            info['mandatory_attrs'] = mandatory_attrs
+            info['optional_attrs']  = optional_attrs
 
         # check if accounting is activated
-        qres = self.__kvcmd_results('qconf', '-sconf', filter_keys=["reporting_params"])
-        self.accounting = "reporting_params" in qres and "accounting=true" in qres["reporting_params"]
-        self._logger.info("Accounting is %sabled" % ("en" if self.accounting else "dis"))
+        ret, out, _ = self.shell.run_sync('%s -sconf' % commands['qconf']['path'])
+        qres = dict()
+        if ret == 0:
+            qres = SgeKeyValueParser(out, filter_keys=["reporting_params"]).as_dict()
+        info['accounting'] = "reporting_params" in qres and "accounting=true" in qres["reporting_params"]
+        self._logger.info("Accounting is %sabled" % ("en" if info['accounting'] else "dis"))
 
-        # purge temporary files
-        if self._adaptor.purge_on_start:
-            cmd = "find $HOME/.saga/adaptors/sge_job" \
-                  " -type f -mtime +%d -print -delete | wc -l" % self._adaptor.purge_older_than
-            ret, out, _ = self.shell.run_sync(cmd)
-            if ret == 0 and out != "0":
-                self._logger.info("Purged %s temporary files" % out)
+        return info
+
+    # ----------------------------------------------------------------
+    #
+    def _rediscover(self):
+        """ drop cached discovery results after a failed submission, and
+            rediscover the remote environment.  Returns False if the results
+            were not cached (so that rediscovery would not change anything).
+        """
+        if not self._discovery_cached:
+            return False
+
+        self._logger.info("SGE submission failed -- discovering again")
+        self._discovery.invalidate()
+        self.initialize()
+
+        return True
 
     # ----------------------------------------------------------------
     #
@@ -507,27 +591,12 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
             return SgeKeyValueParser(out, *args, **kwargs).as_dict()
         return None
 
-    def __remote_mkdir(self, path):
-        """
-        Creates a directory on the remote host.
-        :param path: the remote directory to be created.
-        """
-        # check if the path exists
-        ret, out, _ = self.shell.run_sync(
-                        "(test -d %s && echo -n 0) || (mkdir -p %s && echo -n 1)" % (path, path))
-
-        if ret == 0 and out == "1":
-            self._logger.info("Remote directory created: %s" % path)
-        elif ret != 0:
-            # something went wrong
-            message = "Couldn't create remote directory - %s" % (out)
-            log_error_and_raise(message, saga.NoSuccess, self._logger)
-
     def __job_info_from_accounting(self, sge_job_id, max_retries=10):
         """ Returns job information from the SGE accounting using qacct.
         It may happen that when the job exits from the queue system the results in
         the accounting database take some time to appear. To avoid premature failing
-        several tries can be done (up to a maximum) with delays of 1 second in between.
+        several tries can be done (up to a maximum), with delays of the polling
+        policy's 'final' interval in between.
         :param sge_job_id: SGE job id
         :param max_retries: The maximum number of retries in case qacct fails
         :return: job information dictionary
@@ -539,8 +608,9 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
         while job_info is None and retries > 0:
             retries -= 1
 
-            qres = self.__kvcmd_results('qacct', "-j %s | grep -E '%s'" % (
-                                            sge_job_id, "hostname|qsub_time|start_time|end_time|exit_status|failed"))
+            with self._policy.query():
+                qres = self.__kvcmd_results('qacct', "-j %s | grep -E '%s'" % (
+                                                sge_job_id, "hostname|qsub_time|start_time|end_time|exit_status|failed"))
 
             if qres is not None: # ok, extract job info from qres
                 # hostname     sge
@@ -561,10 +631,42 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
                 # sometimes there is a lapse between the job exits from the queue and
                 # its information enters in the accounting database
                 # let's run qacct again after a delay
-                time.sleep(1)
+                time.sleep(self._policy.interval([]))
 
         return job_info
 
+    def __parse_qstat_state(self, out):
+        """
+        Parses the state columns of a job in the qstat job listing.
+        :param out: state, submit/start time and queue of the job, something like
+                    'r 06/24/2013 17:24:50 all.q@node1'
+        :return: a tuple of SGE state, start time and execution host
+        """
+
+        m = _QSTAT_JOB_STATE_RE.match(out)
+        if m is None: # something wrong with the result of qstat
+            message = "Unexpected qstat results retrieving job info:\n%s" % out.rstrip()
+            log_error_and_raise(message, saga.NoSuccess, self._logger)
+
+        state, start_time, queue = m.groups()
+
+        # Convert start time into POSIX format
+        try:
+            dt = datetime.strptime(start_time, "%m/%d/%Y %H:%M:%S")
+            start_time = dt.strftime("%a %b %d %H:%M:%S %Y")
+        except:
+            start_time = None
+
+        if state not in ["r", "t", "s", "S", "T", "d", "E", "Eqw"]:
+            start_time = None
+
+        exec_host = None
+        if "@" in queue:
+            queue, exec_host = queue.split("@")
+            exec_host = exec_host.rstrip()
+
+        return state, start_time, exec_host
+
     def __remote_job_info_path(self, sge_job_id="$JOB_ID"):
         """
         Returns the path of the remote job info file.
@@ -596,6 +698,15 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
         if ret != 0:
             return None
 
+        return self.__parse_remote_job_info(out)
+
+    def __parse_remote_job_info(self, out):
+        """
+        Parses the content of a remote job info file.
+        :param out: the content of the remote job info file
+        :return: a dictionary with the job info
+        """
+
         qres = SgeKeyValueParser(out, key_suffix=":").as_dict()
 
         if "signal" in qres:
@@ -746,15 +857,13 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
             'echo "end_time: $(LC_ALL=en_US.utf8 date \'+%%a %%b %%d %%H:%%M:%%S %%Y\')" >>%s' % job_info_path
         ]
 
-        # convert exec and args into an string and
-        # escape all double quotes and dollar signs, otherwise 'echo |'
-        # further down won't work.
-        # only escape '$' in args and exe. not in the params
-        script_body = "\n".join(script_body).replace('$', '\\$')
+        # convert exec and args into an string.  The script is passed to the
+        # remote shell as literal here document, so no escaping is needed.
+        script_body = "\n".join(script_body)
 
         sgescript = "\n#!/bin/bash \n%s \n%s" % (sge_params, script_body)
 
-        return sgescript.replace('"', '\\"')
+        return sgescript
 
     # ----------------------------------------------------------------
     #
@@ -766,6 +875,22 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
         Runs a job via qsub
         """
 
+        cmdline = self._job_submit_cmd(jd, self._job_script(jd))
+        ret, out, _ = self.shell.run_sync(cmdline)
+
+        if ret != 0 and self._rediscover():
+            # the submission may have failed because of stale cached discovery
+            # results -- try once more
+            cmdline = self._job_submit_cmd(jd, self._job_script(jd))
+            ret, out, _ = self.shell.run_sync(cmdline)
+
+        return self._job_submit_parse(ret, out, cmdline)
+
+    def _job_script(self, jd):
+        """
+        Creates the qsub script for a job
+        """
+
         if self.queue is not None and jd.queue is not None and self.queue != jd.queue:
             self._logger.warning("Job service was instantiated explicitly with 'queue=%s', "
                                 "but job description tries to a different queue: '%s'. Using '%s'." % (
@@ -784,26 +909,47 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
         except Exception, ex:
             log_error_and_raise(str(ex), saga.BadParameter, self._logger)
 
-        # try to create the working/output/error directories (if defined)
+        return script
+
+    def _job_submit_cmd(self, jd, script):
+        """
+        Creates the command line which submits a qsub script
+        """
+
+        # submit the SGE script
+        # Now we want to execute the script. This process consists of two steps,
+        # which are run in a single shell exchange:
+        # (1) we create a temporary file with 'mktemp' and write the generated
+        #     SGE script (passed as literal here document) into it
+        # (2) we call 'qsub <tmpfile>' to submit the script to the queueing system
+        cmdline = "SCRIPTFILE=`mktemp -t SAGA-Python-SGEJobScript.XXXXXX` && cat > $SCRIPTFILE <<'%s' && %s -notify $SCRIPTFILE && rm -f $SCRIPTFILE\n%s\n%s" \
+                % (_SCRIPT_EOF, self._commands['qsub']['path'],
+                   script.rstrip('\n'), _SCRIPT_EOF)
+
+        # create the working/output/error directories (if defined) first
         # WARNING: this assumes a shared filesystem between login node and
         #           compute nodes.
+        dirs = list()
+
         if jd.working_directory is not None and len(jd.working_directory) > 0:
-            self.__remote_mkdir(jd.working_directory)
+            dirs.append(jd.working_directory)
 
-        if jd.output is not None and len(jd.output) > 0:
-            self.__remote_mkdir(os.path.dirname(jd.output))
+        if jd.output is not None and len(os.path.dirname(jd.output)) > 0:
+            dirs.append(os.path.dirname(jd.output))
 
-        if jd.error is not None and len(jd.error) > 0:
-            self.__remote_mkdir(os.path.dirname(jd.output))
+        if jd.error is not None and len(os.path.dirname(jd.error)) > 0:
+            dirs.append(os.path.dirname(jd.error))
 
-        # submit the SGE script
-        # Now we want to execute the script. This process consists of two steps:
-        # (1) we create a temporary file with 'mktemp' and write the contents of 
-        #     the generated PBS script into it
-        # (2) we call 'qsub <tmpfile>' to submit the script to the queueing system
-        cmdline = """SCRIPTFILE=`mktemp -t SAGA-Python-SGEJobScript.XXXXXX` &&  echo "%s" > $SCRIPTFILE && %s -notify $SCRIPTFILE && rm -f $SCRIPTFILE""" %  (script, self._commands['qsub']['path'])
-        #cmdline = 'echo "%s" | %s -notify' % (script, self._commands['qsub']['path'])
-        ret, out, _ = self.shell.run_sync(cmdline)
+        if dirs:
+            cmdline = "mkdir -p %s && %s" % (" ".join(dirs), cmdline)
+
+        return cmdline
+
+    def _job_submit_parse(self, ret, out, cmdline):
+        """
+        Parses the output of a qsub command line, and adds the job to the
+        internal list of known jobs
+        """
 
         if ret != 0:
             # something went wrong
@@ -847,38 +993,17 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
         rm, pid = self._adaptor.parse_id(job_id)
 
         # check the state of the job
-        ret, out, _ = self.shell.run_sync(
-                        "%s | tail -n+3 | awk '($1==%s) {{print $5,$6,$7,$8}}'" % (
-                            self._commands['qstat']['path'], pid))
+        with self._policy.query():
+            ret, out, _ = self.shell.run_sync(
+                            "%s | tail -n+3 | awk '($1==%s) {{print $5,$6,$7,$8}}'" % (
+                                self._commands['qstat']['path'], pid))
 
         out = out.strip()
 
         job_info = None
 
         if ret == 0 and len(out) > 0: # job is still in the queue
-            # output is something like
-            # r 06/24/2013 17:24:50
-            m = _QSTAT_JOB_STATE_RE.match(out)
-            if m is None: # something wrong with the result of qstat
-                message = "Unexpected qstat results retrieving job info:\n%s" % out.rstrip()
-                log_error_and_raise(message, saga.NoSuccess, self._logger)
-
-            state, start_time, queue = m.groups()
-
-            # Convert start time into POSIX format
-            try:
-                dt = datetime.strptime(start_time, "%m/%d/%Y %H:%M:%S")
-                start_time = dt.strftime("%a %b %d %H:%M:%S %Y")
-            except:
-                start_time = None
-
-            if state not in ["r", "t", "s", "S", "T", "d", "E", "Eqw"]:
-                start_time = None
-
-            exec_host = None
-            if "@" in queue:
-                queue, exec_host = queue.split("@")
-                exec_host = exec_host.rstrip()
+            state, start_time, exec_host = self.__parse_qstat_state(out)
 
             if self.accounting and state == "Eqw": # if it is an Eqw job it is better to retrieve the information from qacct
                 job_info = self.__job_info_from_accounting(pid)
@@ -1065,6 +1190,7 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
         time_start = time.time()
         time_now   = time_start
         rm, pid    = self._adaptor.parse_id(job_id)
+        poller     = self._policy.poller()
 
         while True:
             state = self._job_get_state(job_id=job_id)
@@ -1078,7 +1204,7 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
                     self.__clean_remote_job_info(pid)
                     return True
             # avoid busy poll
-            time.sleep(0.5)
+            poller.sleep([state], time_start, timeout)
 
             # check if we hit timeout
             if timeout >= 0:
@@ -1161,29 +1287,237 @@ class SGEJobService (saga.adaptors.cpi.job.Service):
 
         return ids
 
-  # # ----------------------------------------------------------------
-  # #
-  # def container_run (self, jobs) :
-  #     self._logger.debug ("container run: %s"  %  str(jobs))
-  #     # TODO: this is not optimized yet
-  #     for job in jobs:
-  #         job.run ()
-  #
-  #
-  # # ----------------------------------------------------------------
-  # #
-  # def container_wait (self, jobs, mode, timeout) :
-  #     self._logger.debug ("container wait: %s"  %  str(jobs))
-  #     # TODO: this is not optimized yet
-  #     for job in jobs:
-  #         job.wait ()
-  #
-  #
-  # # ----------------------------------------------------------------
-  # #
-  # def container_cancel (self, jobs) :
-  #     self._logger.debug ("container cancel: %s"  %  str(jobs))
-  #     raise saga.NoSuccess ("Not Implemented");
+    # ----------------------------------------------------------------
+    #
+    def _job_get_infos(self, job_ids):
+        """ get the attributes of many jobs with a single query: one qstat
+            listing for all jobs still in the queue, plus the remote job info
+            files of all jobs.  Returns a dict of updated job infos, keyed by
+            job id.
+        """
+
+        pids = dict()
+        for job_id in job_ids:
+            rm, pid = self._adaptor.parse_id(job_id)
+            pids[pid] = job_id
+
+        with self._policy.query():
+            ret, out, _ = self.shell.run_sync(
+                "{ %s | tail -n+3; while read id; do echo \"%s $id\"; cat %s/$id 2>/dev/null; done <<EOT\n%s\nEOT\n}" \
+                % (self._commands['qstat']['path'], _JOB_INFO_MARKER,
+                   self.temp_path, "\n".join(pids.keys())))
+
+        # the output is the job listing, followed by one marker line and the
+        # info file content per job
+        sections = out.split("%s " % _JOB_INFO_MARKER)
+        queued   = dict()
+        remote   = dict()
+
+        for line in sections[0].split("\n"):
+            elems = line.split()
+            if len(elems) >= 8 and elems[0] in pids:
+                queued[elems[0]] = " ".join(elems[4:8])
+
+        for section in sections[1:]:
+            pid, _, info = section.partition("\n")
+            if pid.strip() in pids and len(info.strip()) > 0:
+                remote[pid.strip()] = info
+
+        job_infos = dict()
+
+        for pid, job_id in pids.iteritems():
+
+            job_info = dict(self.jobs[job_id])
+
+            if pid in queued:
+                state, start_time, exec_host = self.__parse_qstat_state(queued[pid])
+                job_info['state'     ] = self.__sge_to_saga_jobstate(state)
+                job_info['start_time'] = start_time or job_info['start_time']
+                job_info['exec_hosts'] = exec_host  or job_info['exec_hosts']
+
+            elif pid in remote:
+                job_info.update(self.__parse_remote_job_info(remote[pid]))
+
+            elif self.accounting:
+                # the job left the queue before writing its info file -- this
+                # is rare enough to afford a qacct call
+                info = self.__job_info_from_accounting(pid)
+                if info is None:
+                    job_info['gone'] = True
+                else:
+                    job_info.update(info)
+
+            else:
+                job_info['gone'] = True
+
+            job_infos[job_id] = job_info
+
+        return job_infos
+
+    # ----------------------------------------------------------------
+    #
+    def _job_clean_infos(self, job_ids):
+        """ removes the remote job info files of the given jobs
+        """
+
+        if not job_ids:
+            return
+
+        pids = [self._adaptor.parse_id(job_id)[1] for job_id in job_ids]
+
+        ret, out, _ = self.shell.run_sync("(cd %s && xargs rm -f <<EOT\n%s\nEOT\n)" \
+            % (self.temp_path, "\n".join(pids)))
+        if ret != 0:
+            self._logger.debug("Remote job infos couldn't be removed: %s" % out)
+
+    # ----------------------------------------------------------------
+    #
+    def container_run(self, jobs):
+        """ submits all jobs in a single shell exchange
+        """
+        self._logger.debug("container run: %s" % str(jobs))
+
+        error    = None
+        rejected = False
+        submits  = list()
+        cmdlines = list()
+
+        for job in jobs:
+            jd = job.get_description()
+            try:
+                cmdlines.append(self._job_submit_cmd(jd, self._job_script(jd)))
+                submits.append(job)
+            except saga.SagaException as e:
+                # submit the other jobs anyway
+                error = e
+                self._container_fail([job], e)
+
+        results = self.shell.run_bulk(cmdlines)
+
+        for job, cmdline, (ret, out) in zip(submits, cmdlines, results):
+            try:
+                job._adaptor._id      = self._job_submit_parse(ret, out, cmdline)
+                job._adaptor._started = True
+            except saga.SagaException as e:
+                error    = e
+                rejected = True
+                self._container_fail([job], e)
+
+        if rejected:
+            # make sure that later submissions don't use stale cached
+            # discovery results
+            self._rediscover()
+
+        if error:
+            raise error
+
+    # ----------------------------------------------------------------
+    #
+    def _container_fail(self, jobs, e):
+        """ marks jobs which could not be submitted as failed
+        """
+        for job in jobs:
+            job._adaptor._state     = saga.job.FAILED
+            job._adaptor._exception = e
+
+    # ----------------------------------------------------------------
+    #
+    def _container_jobs(self, jobs):
+        """ returns the ids of those jobs which have been submitted, and
+            which are known to this service (jobs which failed to submit, and
+            jobs reconnected via other services, are skipped)
+        """
+        return [job._adaptor._id for job in jobs \
+                if job._adaptor._id and job._adaptor._id in self.jobs]
+
+    # ----------------------------------------------------------------
+    #
+    def container_wait(self, jobs, mode, timeout):
+        """ waits for any or all jobs to finish, with one bulk query per poll
+        """
+        self._logger.debug("container wait: %s" % str(jobs))
+
+        for job in jobs:
+            if job._adaptor._started is False and \
+               job._adaptor._state != saga.job.FAILED:
+                log_error_and_raise("Can't wait for job that hasn't been started",
+                    saga.IncorrectState, self._logger)
+
+        time_start = time.time()
+        poller     = self._policy.poller()
+
+        while True:
+            states = self.container_get_states(jobs)
+
+            if saga.job.UNKNOWN in states:
+                log_error_and_raise("cannot get job state", saga.IncorrectState, self._logger)
+
+            final = [job for job, state in zip(jobs, states) \
+                     if state in _FINAL_STATES]
+
+            if len(final) == len(jobs) or (final and mode == saga.ANY):
+                self._job_clean_infos(self._container_jobs(final))
+                return
+
+            # avoid busy poll
+            poller.sleep(states, time_start, timeout)
+
+            # check if we hit timeout
+            if timeout >= 0:
+                if time.time() - time_start > timeout:
+                    return
+
+    # ----------------------------------------------------------------
+    #
+    def container_cancel(self, jobs, timeout):
+        """ cancels all jobs which are not yet final with a single qdel call
+        """
+        self._logger.debug("container cancel: %s" % str(jobs))
+
+        job_ids = [job_id for job_id in self._container_jobs(jobs) \
+                   if self.jobs[job_id]['state'] not in _FINAL_STATES]
+
+        if not job_ids:
+            return
+
+        pids = [self._adaptor.parse_id(job_id)[1] for job_id in job_ids]
+
+        ret, out, _ = self.shell.run_sync("{ xargs %s <<EOT\n%s\nEOT\n}" \
+            % (self._commands['qdel']['path'], "\n".join(pids)))
+
+        if ret != 0:
+            message = "Error canceling jobs via 'qdel': %s" % out
+            log_error_and_raise(message, saga.NoSuccess, self._logger)
+
+        self._job_clean_infos(job_ids)
+
+        # assume the jobs were succesfully canceled
+        for job_id in job_ids:
+            self.jobs[job_id]['state'] = saga.job.CANCELED
+
+    # ----------------------------------------------------------------
+    #
+    def container_get_states(self, jobs):
+        """ updates the states of all jobs with a single bulk query
+        """
+        self._logger.debug("container get_states: %s" % str(jobs))
+
+        job_ids = [job_id for job_id in self._container_jobs(jobs) \
+                   if self.jobs[job_id]['state'] not in _FINAL_STATES and \
+                      self.jobs[job_id]['gone'] is not True]
+
+        if job_ids:
+            self.jobs.update(self._job_get_infos(job_ids))
+
+        # jobs this service does not know are asked individually
+        states = list()
+        for job in jobs:
+            if job._adaptor._id in self.jobs:
+                states.append(self.jobs[job._adaptor._id]['state'])
+            else:
+                states.append(job._adaptor.get_state())
+
+        return states
 
 
 ###############################################################################
@@ -1207,6 +1541,9 @@ class SGEJob (saga.adaptors.cpi.job.Job):
         self.jd = job_info["job_description"]
         self.js = job_info["job_service"]
 
+        # the js is responsible for job bulk operations (container_*)
+        self._container = self.js
+
         if job_info['reconnect'] is True:
             self._id = job_info['reconnect_jobid']
             self._started = True
@@ -1214,6 +1551,11 @@ class SGEJob (saga.adaptors.cpi.job.Job):
             self._id = None
             self._started = False
 
+        # state and error of jobs which never got submitted (see
+        # container_run)
+        self._state     = saga.job.NEW
+        self._exception = None
+
         return self.get_api()
 
     # ----------------------------------------------------------------
@@ -1229,8 +1571,9 @@ class SGEJob (saga.adaptors.cpi.job.Job):
         """ mplements saga.adaptors.cpi.job.Job.get_state()
         """
         if self._started is False:
-            # jobs that are not started are always in 'NEW' state
-            return saga.job.NEW
+            # jobs that are not started are in 'NEW' state -- unless their
+            # submission failed
+            return self._state
         else:
             return self.js._job_get_state(self._id)
 
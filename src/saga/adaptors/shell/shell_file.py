@@ -18,12 +18,351 @@ import radical.utils as ru
 
 import re
 import os
+import time
+import errno
+import shutil
+import weakref
+import itertools
+import threading
+import multiprocessing.pool
 
 import shell_wrapper
 
 SYNC_CALL  = saga.adaptors.cpi.decorators.SYNC_CALL
 ASYNC_CALL = saga.adaptors.cpi.decorators.ASYNC_CALL
 
+# numbers the remote staging files of ShellFile.read() and write()
+_staging_count = itertools.count ()
+
+
+# --------------------------------------------------------------------
+#
+# One combined stat call per path.  It reports the entry type ('d', 'f', 'l',
+# 'o' for other, or '-' if the entry does not exist), the size in bytes, the
+# mtime (seconds since epoch) and the link target (for links).  GNU and BSD
+# stat differ in their format options, so we try both.
+#
+_STAT_CMD = " P='%s' ; "                                                     \
+            "if   test -h \"$P\" ; then T=l ; "                              \
+            "elif test -d \"$P\" ; then T=d ; "                              \
+            "elif test -f \"$P\" ; then T=f ; "                              \
+            "elif test -e \"$P\" ; then T=o ; "                              \
+            "else                       T=- ; fi ; "                         \
+            "S=`stat -c '%%s %%Y' \"$P\" 2>/dev/null "                       \
+            "|| stat -f '%%z %%m' \"$P\" 2>/dev/null || echo '- -'` ; "      \
+            "L=`test $T = l && readlink \"$P\"` ; "                          \
+            "echo \"STAT: $T $S $L\""
+
+# One stat call for all entries matching a pattern (in the cwd).  Each line
+# reports the ls-like mode string (type and permissions), the size in bytes,
+# the mtime (seconds since epoch), and the entry name.
+_LIST_STATS_CMD = " if stat -c '%%s' . >/dev/null 2>&1 ; "                     \
+                  "then stat -c '%%A %%s %%Y %%n'  -- %s ; "                  \
+                  "else stat -f '%%Sp %%z %%m %%N' -- %s ; fi 2>/dev/null ; " \
+                  "true"
+
+_STAT_TYPES = {'d' : 'dir',
+               'f' : 'file',
+               'l' : 'link',
+               'o' : 'other',
+               '-' : None}
+
+
+# --------------------------------------------------------------------
+#
+def _stat_key (cwdurl, tgt) :
+    """
+    Create a cache key for the given target URL.  Path-only URLs are
+    interpreted relative to cwdurl.  The key consists of the URL sans path
+    (i.e. it identifies the host and access protocol), and the normalized path.
+    """
+
+    tgt = saga.Url (tgt)
+
+    if  tgt.path == str (tgt) :
+        tgt = sumisc.url_make_absolute (cwdurl, tgt)
+
+    base      = saga.Url (tgt)
+    base.path = ''
+
+    return (str (base), os.path.normpath (tgt.path))
+
+
+# --------------------------------------------------------------------
+#
+def _parse_stat (out) :
+    """
+    Parse the output of _STAT_CMD into an info dict, or return None if no
+    valid stat record is found.
+    """
+
+    for line in reversed (out.split ('\n')) :
+
+        if  not line.startswith ('STAT: ') :
+            continue
+
+        elems = line.strip ().split (' ', 4)
+
+        if  len (elems) < 4 or not elems[1] in _STAT_TYPES :
+            return None
+
+        info = {'type'  : _STAT_TYPES[elems[1]],
+                'size'  : None,
+                'mtime' : None,
+                'link'  : None}
+
+        if  elems[2].isdigit () : info['size']  = int   (elems[2])
+        if  elems[3].isdigit () : info['mtime'] = float (elems[3])
+        if  len (elems) > 4     : info['link']  = elems[4]
+
+        return info
+
+    return None
+
+
+# --------------------------------------------------------------------
+#
+class _StatCache (object) :
+    """
+    Caches entry metadata (as returned by _parse_stat) for a limited time.  One
+    instance is kept per session -- see Adaptor.get_stat_cache().  Entries are
+    invalidated when they expire, or when they get changed by operations
+    through the same session.  Entries which do not exist are not cached, as
+    they may get created by someone else any time.  The cache hands out and
+    stores copies of the info dicts, so callers can't alter cached entries.
+    """
+
+    _MAX_ENTRIES = 10000
+
+    # ----------------------------------------------------------------
+    #
+    def __init__ (self, ttl) :
+
+        self._ttl     = ttl
+        self._entries = dict()
+        self._lock    = threading.RLock ()
+
+
+    # ----------------------------------------------------------------
+    #
+    def get (self, key) :
+
+        if  not self._ttl :
+            return None
+
+        with self._lock :
+
+            if  not key in self._entries :
+                return None
+
+            info, stamp = self._entries[key]
+
+            if  time.time () - stamp > self._ttl :
+                del (self._entries[key])
+                return None
+
+            return dict (info)
+
+
+    # ----------------------------------------------------------------
+    #
+    def put (self, key, info) :
+
+        if  not self._ttl or not info or info['type'] == None :
+            return
+
+        with self._lock :
+
+            if  len (self._entries) >= self._MAX_ENTRIES :
+                now = time.time ()
+                for k in self._entries.keys () :
+                    if  now - self._entries[k][1] > self._ttl :
+                        del (self._entries[k])
+
+                if  len (self._entries) >= self._MAX_ENTRIES :
+                    self._entries.clear ()
+
+            self._entries[key] = (dict (info), time.time ())
+
+
+    # ----------------------------------------------------------------
+    #
+    def update (self, key, **attrs) :
+        """
+        Add the given attributes to a cached entry (if it is still cached),
+        without extending its lifetime.
+        """
+
+        with self._lock :
+
+            if  key in self._entries :
+                self._entries[key][0].update (attrs)
+
+
+    # ----------------------------------------------------------------
+    #
+    def invalidate (self, key) :
+        """
+        Invalidate the entry for key, all entries below it (for directories),
+        and the entry of its parent directory (whose size and mtime change).
+        """
+
+        base, path = key
+        parent     = (base, os.path.dirname (path))
+        prefix     = path.rstrip ('/') + '/'
+
+        with self._lock :
+
+            for k in self._entries.keys () :
+                if  k == key or k == parent :
+                    del (self._entries[k])
+                elif k[0] == base and k[1].startswith (prefix) :
+                    del (self._entries[k])
+
+
+# --------------------------------------------------------------------
+#
+# Operations where all URLs point to the local file system are performed
+# in-process, without a round trip through the local pty shell.
+#
+_LOCAL_SCHEMAS = ['file', 'local']
+
+
+def _is_local_fs (url, cwdurl) :
+    """
+    Returns True if the given URL can be handled by the local fast path, i.e.
+    if it points to the local file system and does not ask for any specific
+    access protocol or user id.  URLs which only contain a path are
+    interpreted in the context of the given cwd URL.
+    """
+
+    u = saga.Url (url)
+
+    if  not u.scheme and not u.host :
+        u = saga.Url (cwdurl)
+
+    if  u.scheme and not u.scheme.lower () in _LOCAL_SCHEMAS :
+        return False
+
+    if  u.username :
+        return False
+
+    return sumisc.url_is_local (u)
+
+
+# --------------------------------------------------------------------
+#
+def _local_copy_one (job) :
+
+    src, tgt, in_tree = job
+
+    if  in_tree and os.path.islink (src) :
+        # links found while walking a tree are copied as links (as 'cp -r'
+        # does) -- all others are dereferenced
+        if  os.path.lexists (tgt) :
+            os.remove (tgt)
+        os.symlink (os.readlink (src), tgt)
+
+    else :
+        shutil.copy (src, tgt)
+
+
+# --------------------------------------------------------------------
+#
+def _local_copy (src, tgt, recursive, threads) :
+    """
+    Copy src to tgt in-process, following the semantics of 'cp [-r] src tgt'.
+    Files of recursive copies are distributed over a bounded thread pool.
+    Returns the list of copied source files.
+    """
+
+    if  os.path.isdir (tgt) :
+        tgt = os.path.join (tgt, os.path.basename (src.rstrip ('/')))
+
+    if  not os.path.isdir (src) :
+        jobs = [(src, tgt, False)]
+
+    elif not recursive :
+        raise saga.NoSuccess ("cannot copy directory %s without RECURSIVE flag" % src)
+
+    else :
+        jobs = list()
+        for root, dirs, files in os.walk (src) :
+
+            tgt_root = os.path.normpath (os.path.join (tgt, os.path.relpath (root, src)))
+
+            if  not os.path.isdir (tgt_root) :
+                os.makedirs (tgt_root)
+
+            # os.walk does not descend into linked dirs, so we copy them as
+            # links, like files
+            for name in files + [d for d in dirs if os.path.islink (os.path.join (root, d))] :
+                jobs.append ((os.path.join (root, name), os.path.join (tgt_root, name), True))
+
+    if  len (jobs) > 1 and threads > 1 :
+        pool = multiprocessing.pool.ThreadPool (min (threads, len (jobs)))
+        try :
+            pool.map (_local_copy_one, jobs)
+        finally :
+            pool.close ()
+            pool.join  ()
+
+    else :
+        for job in jobs :
+            _local_copy_one (job)
+
+    return [job[0] for job in jobs]
+
+
+# --------------------------------------------------------------------
+#
+def _local_mkparent (path) :
+
+    dirname = os.path.dirname (path)
+
+    if  dirname and not os.path.isdir (dirname) :
+        os.makedirs (dirname)
+
+
+# --------------------------------------------------------------------
+#
+def _local_remove (tgt, recursive) :
+    """
+    Remove tgt in-process, following the semantics of 'rm -f [-r] tgt'.
+    """
+
+    if  os.path.isdir (tgt) and not os.path.islink (tgt) :
+        if  not recursive :
+            raise saga.NoSuccess ("cannot remove directory %s without RECURSIVE flag" % tgt)
+        shutil.rmtree (tgt)
+
+    elif os.path.lexists (tgt) :
+        os.remove (tgt)
+
+
+# --------------------------------------------------------------------
+#
+def _local_move (src, tgt, recursive, threads) :
+    """
+    Move src to tgt in-process.  A rename is used where possible -- only moves
+    across file systems fall back to copy and remove.
+    """
+
+    if  os.path.isdir (tgt) :
+        tgt = os.path.join (tgt, os.path.basename (src.rstrip ('/')))
+
+    if  os.path.isdir (src) and not recursive :
+        raise saga.NoSuccess ("cannot move directory %s without RECURSIVE flag" % src)
+
+    try :
+        os.rename (src, tgt)
+
+    except OSError as e :
+        if  e.errno != errno.EXDEV :
+            raise
+        _local_copy   (src, tgt, recursive, threads)
+        _local_remove (src, recursive)
+
 
 # --------------------------------------------------------------------
 # the adaptor name
@@ -42,6 +381,29 @@ _ADAPTOR_OPTIONS       = [
   #                       shell process.''',
   # 'env_variable'     : None
   # }
+    { 
+    'category'         : 'saga.adaptor.shell_file',
+    'name'             : 'stat_cache_ttl', 
+    'type'             : int, 
+    'default'          : 10,
+    'documentation'    : '''Number of seconds for which entry metadata (type, size,
+                          mtime, link target) are cached per session.  Mutating
+                          operations performed through the same session
+                          invalidate the affected entries.  A value of '0'
+                          disables the cache.  Individual calls can bypass the
+                          cache with the NO_CACHE flag.''',
+    'env_variable'     : None
+    },
+    { 
+    'category'         : 'saga.adaptor.shell_file',
+    'name'             : 'local_copy_threads', 
+    'type'             : int, 
+    'default'          : 4,
+    'documentation'    : '''Number of threads used for recursive copies where both
+                          source and target are on the local file system (those
+                          are performed in-process, without a shell).''',
+    'env_variable'     : None
+    }
 ]
 
 # --------------------------------------------------------------------
@@ -165,6 +527,13 @@ class Adaptor (saga.adaptors.base.Base):
 
         self.opts  = self.get_config (_ADAPTOR_NAME)
 
+        self.stat_cache_ttl     = self.opts['stat_cache_ttl'    ].get_value ()
+        self.local_copy_threads = self.opts['local_copy_threads'].get_value ()
+
+        # stat caches are kept per lease manager, which identifies the session
+        # (all default sessions share one lease manager)
+        self._stat_caches   = weakref.WeakKeyDictionary ()
+
 
     # ----------------------------------------------------------------
     #
@@ -190,6 +559,23 @@ class Adaptor (saga.adaptors.base.Base):
         return lease_tgt
 
 
+    # ----------------------------------------------------------------
+    #
+    def get_stat_cache (self, session) :
+        """
+        return the stat cache for the given session
+        """
+
+        with self._lock :
+
+            lm = session._lease_manager
+
+            if  not lm in self._stat_caches :
+                self._stat_caches[lm] = _StatCache (self.stat_cache_ttl)
+
+            return self._stat_caches[lm]
+
+
 
 
 ###############################################################################
@@ -227,7 +613,16 @@ class ShellDirectory (saga.adaptors.cpi.filesystem.Directory) :
         ret     = None
         out     = None
 
-        if  sumisc.url_is_compatible (cwdurl, tgt) :
+        self._invalidate (dirname)
+
+        if  _is_local_fs (tgt, cwdurl) and os.path.isabs (tgt.path) :
+
+            try :
+                _local_mkparent (tgt.path)
+            except OSError as e :
+                raise saga.NoSuccess ("failed at mkdir '%s': %s" % (dirname, e))
+
+        elif sumisc.url_is_compatible (cwdurl, tgt) :
 
             ret, out, _ = self._command (" mkdir -p '%s'\n" % (dirname), make_location=True)
             if  ret != 0 :
@@ -265,6 +660,7 @@ class ShellDirectory (saga.adaptors.cpi.filesystem.Directory) :
         self.session     = session
         self.valid       = False # will be set by initialize
         self.lm          = session._lease_manager
+        self.stat_cache  = self._adaptor.get_stat_cache (session)
 
         def _shell_creator (url) :
             return sups.PTYShell (url, self.session, self._logger)
@@ -311,6 +707,43 @@ class ShellDirectory (saga.adaptors.cpi.filesystem.Directory) :
             return cmd_shell.run_sync ("%s cd %s && %s" % (pre_cmd, location.path, command))
 
 
+    # ----------------------------------------------------------------
+    #
+    def _stat (self, tgt, flags=None) :
+        """
+        return the stat info for the given target, from the stat cache if
+        possible (and not disabled by NO_CACHE)
+        """
+
+        key = _stat_key (self.url, tgt)
+
+        if  not flags or not flags & NO_CACHE :
+            info = self.stat_cache.get (key)
+            if  info :
+                return info
+
+        ret, out, _ = self._command (_STAT_CMD % key[1])
+        info        = _parse_stat (out)
+
+        if  ret != 0 or not info :
+            raise saga.NoSuccess ("stat for (%s) failed (%s): (%s)" \
+                               % (tgt, ret, out))
+
+        self.stat_cache.put (key, info)
+
+        return info
+
+
+    # ----------------------------------------------------------------
+    #
+    def _invalidate (self, tgt) :
+        """
+        remove the given target (and anything below it) from the stat cache
+        """
+
+        self.stat_cache.invalidate (_stat_key (self.url, tgt))
+
+
     # ----------------------------------------------------------------
     #
     def initialize (self) :
@@ -331,6 +764,9 @@ class ShellDirectory (saga.adaptors.cpi.filesystem.Directory) :
             cmd = " test -d  '%s' && cd '%s'" % (self.url.path, self.url.path)
             mkl = False
 
+        if  self.flags & (saga.filesystem.CREATE | saga.filesystem.CREATE_PARENTS) :
+            self._invalidate (self.url)
+
         ret, out, _ = self._command (cmd, make_location=mkl)
 
         if  ret != 0 :
@@ -472,6 +908,135 @@ class ShellDirectory (saga.adaptors.cpi.filesystem.Directory) :
         return self.entries
    
    
+    # ----------------------------------------------------------------
+    #
+    @SYNC_CALL
+    def find (self, npat, flags):
+
+        self._is_valid ()
+
+        if  not flags :
+            flags = 0
+
+        if  None == npat :
+            npat = "*"
+
+        # the complete search is performed by a single remote 'find'.  Name
+        # patterns are matched against the entry name, unless they contain
+        # a path element -- then they are matched against the relative path.
+        opts = ""
+        if  flags & saga.filesystem.DEREFERENCE :
+            opts += " -L"
+
+        cmd = " find%s . -mindepth 1" % opts
+
+        if  not flags & saga.filesystem.RECURSIVE :
+            cmd += " -maxdepth 1"
+
+        if  '/' in npat :
+            if  npat.startswith ('./') :
+                npat = npat[2:]
+            cmd += " -path './%s'" % npat
+        else :
+            cmd += " -name '%s'"   % npat
+
+        ret, out, _ = self._command ("%s 2>/dev/null\n" % cmd)
+
+        # find reports errors for unreadable subdirs, but will still report all
+        # other matches
+        entries = list()
+
+        for line in out.split ("\n") :
+
+            if  line.startswith ('./') :
+                entries.append (saga.Url (line[2:].rstrip ()))
+
+        if  ret != 0 :
+            if  not entries :
+                raise saga.NoSuccess ("failed to find(): (%s)(%s)" \
+                                   % (ret, out))
+            self._logger.warning ("find() incomplete: (%s)" % ret)
+
+        return entries
+   
+   
+    # ----------------------------------------------------------------
+    #
+    @SYNC_CALL
+    def list_stats (self, npat, flags):
+
+        self._is_valid ()
+
+        if  None == npat :
+            npat = "*"
+
+        ret, out, _ = self._command (_LIST_STATS_CMD % (npat, npat))
+
+        if  ret != 0 :
+            raise saga.NoSuccess ("failed to list_stats(): (%s)(%s)" \
+                               % (ret, out))
+
+        stats = dict()
+
+        for line in filter (None, out.split ("\n")) :
+
+            elems = line.strip ().split (' ', 3)
+
+            if  len (elems) != 4 or len (elems[0]) < 10 or \
+                not elems[1].isdigit () or not elems[2].isdigit () :
+                self._logger.debug ("ignore stat noise: %s" % line)
+                continue
+
+            mode, size, mtime, name = elems
+
+            info = {'type'  : {'d' : 'dir',
+                               '-' : 'file',
+                               'l' : 'link'}.get (mode[0], 'other'),
+                    'size'  : int   (size),
+                    'mtime' : float (mtime),
+                    'perms' : mode[1:10],
+                    'link'  : None}
+
+            stats[name] = info
+
+            # prime the stat cache (sans link targets)
+            self.stat_cache.put (_stat_key (self.url, name), info)
+
+        return stats
+   
+   
+    # ----------------------------------------------------------------
+    #
+    def _copy_remote (self, src, tgt, rec_flag) :
+        """
+        copy between two remote hosts.  If both are the same host, the copy is
+        performed there -- otherwise the data are streamed from one host to the
+        other through a local pipe, without staging them on the local disk.
+        """
+
+        for url in [src, tgt] :
+            if  url.scheme and not url.scheme.lower () in _ADAPTOR_SCHEMAS :
+                raise saga.BadParameter ("schema of copy url is not supported (%s)" \
+                                      % (url))
+
+        src_lease = self._adaptor.get_lease_target (src)
+        tgt_lease = self._adaptor.get_lease_target (tgt)
+
+        if  sumisc.url_is_compatible (src, tgt) :
+
+            with self.lm.lease (src_lease, self.shell_creator, src) as copy_shell :
+
+                ret, out, _ = copy_shell.run_sync (" cp %s '%s' '%s'\n" % (rec_flag, src.path, tgt.path))
+                if  ret != 0 :
+                    raise saga.NoSuccess ("copy (%s -> %s) failed (%s): (%s)" \
+                                       % (src, tgt, ret, out))
+                return [src.path]
+
+        with self.lm.lease (src_lease, self.shell_creator, src) as src_shell :
+            with self.lm.lease (tgt_lease, self.shell_creator, tgt) as tgt_shell :
+                return src_shell.stage_to_shell (src.path, tgt_shell, tgt.path, rec_flag)
+
+
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
@@ -506,10 +1071,24 @@ class ShellDirectory (saga.adaptors.cpi.filesystem.Directory) :
 
         files_copied = list()
 
+        # if src and tgt are both local, we copy in-process
+        if  _is_local_fs (src, cwdurl) and \
+            _is_local_fs (tgt, cwdurl) :
+
+            if  flags & saga.filesystem.CREATE_PARENTS : 
+                self._create_parent (cwdurl, tgt)
+
+            try :
+                files_copied = _local_copy (src.path, tgt.path,
+                                            flags & saga.filesystem.RECURSIVE,
+                                            self._adaptor.local_copy_threads)
+            except (IOError, OSError) as e :
+                raise saga.NoSuccess ("copy (%s -> %s) failed: %s" % (src, tgt, e))
+
         # if cwd, src and tgt point to the same host, we just run a shell cp
         # command on that host
-        if  sumisc.url_is_compatible (cwdurl, src) and \
-            sumisc.url_is_compatible (cwdurl, tgt) :
+        elif sumisc.url_is_compatible (cwdurl, src) and \
+             sumisc.url_is_compatible (cwdurl, tgt) :
 
             if  flags & saga.filesystem.CREATE_PARENTS : 
                 self._create_parent (cwdurl, tgt)
@@ -555,10 +1134,8 @@ class ShellDirectory (saga.adaptors.cpi.filesystem.Directory) :
                         files_copied = copy_shell.stage_from_remote (src.path, tgt.path, rec_flag)
 
                 else :
-                    # print "from remote to other remote -- fail"
-                    # we cannot support the combination of URLs
-                    raise saga.BadParameter ("copy from %s to %s is not supported" \
-                                          % (src, tgt))
+                    # from remote to other remote: stream through the local host
+                    files_copied = self._copy_remote (src, tgt, rec_flag)
    
 
             # if cwd is local, and src or tgt are remote, we need to actually
@@ -595,13 +1172,12 @@ class ShellDirectory (saga.adaptors.cpi.filesystem.Directory) :
                         files_copied = copy_shell.stage_from_remote (src.path, tgt.path, rec_flag)
 
                 else :
-
-                    # print "from remote to other remote -- fail"
-                    # we cannot support the combination of URLs
-                    raise saga.BadParameter ("copy from %s to %s is not supported" \
-                                          % (src, tgt))
+                    # from remote to other remote: stream through the local host
+                    files_copied = self._copy_remote (src, tgt, rec_flag)
 
    
+        self._invalidate (tgt)
+
         if  _from_task :
             _from_task._set_metric ('files_copied', files_copied)
 
@@ -643,6 +1219,8 @@ class ShellDirectory (saga.adaptors.cpi.filesystem.Directory) :
         if  sumisc.url_is_compatible (cwdurl, src) and \
             sumisc.url_is_compatible (cwdurl, tgt) :
 
+            self._invalidate (tgt)
+
             # print "shell ln"
             ret, out, err = self._command (" ln -s '%s' '%s'\n" % (src.path, tgt.path))
             if  ret != 0 :
@@ -678,7 +1256,36 @@ class ShellDirectory (saga.adaptors.cpi.filesystem.Directory) :
     @SYNC_CALL
     def move (self, src_in, tgt_in, flags):
 
-        # we handle move non-atomically, i.e. as copy/remove
+        self._is_valid ()
+
+        cwdurl = saga.Url (self.url) # deep copy
+        src    = saga.Url (src_in)   # deep copy
+        tgt    = saga.Url (tgt_in)   # deep copy
+
+        if  sumisc.url_is_relative (src) : src = sumisc.url_make_absolute (cwdurl, src)
+        if  sumisc.url_is_relative (tgt) : tgt = sumisc.url_make_absolute (cwdurl, tgt)
+
+        # if src and tgt are both local, we move in-process (by rename, if
+        # possible)
+        if  _is_local_fs (src, cwdurl) and \
+            _is_local_fs (tgt, cwdurl) :
+
+            if  flags & saga.filesystem.CREATE_PARENTS : 
+                self._create_parent (cwdurl, tgt)
+
+            self._invalidate (src)
+            self._invalidate (tgt)
+
+            try :
+                _local_move (src.path, tgt.path,
+                             flags & saga.filesystem.RECURSIVE,
+                             self._adaptor.local_copy_threads)
+            except (IOError, OSError) as e :
+                raise saga.NoSuccess ("move (%s -> %s) failed: %s" % (src, tgt, e))
+
+            return
+
+        # otherwise we handle move non-atomically, i.e. as copy/remove
         self.copy   (src_in, tgt_in, flags);
         self.remove (src_in, flags);
    
@@ -713,7 +1320,23 @@ class ShellDirectory (saga.adaptors.cpi.filesystem.Directory) :
         if  flags & saga.filesystem.RECURSIVE : 
             rec_flag  += "-r "
 
-        if  sumisc.url_is_compatible (cwdurl, tgt) :
+        # local entries are removed in-process
+        if  _is_local_fs (tgt, cwdurl) :
+
+            path = tgt.path
+            if  not os.path.isabs (path) :
+                path = os.path.join (cwdurl.path, path)
+
+            self._invalidate (tgt)
+
+            try :
+                _local_remove (path, flags & saga.filesystem.RECURSIVE)
+            except (IOError, OSError) as e :
+                raise saga.NoSuccess ("remove (%s) failed: %s" % (tgt, e))
+
+        elif sumisc.url_is_compatible (cwdurl, tgt) :
+
+            self._invalidate (tgt)
 
             ret, out, err = self._command (" rm -f %s '%s'\n" % (rec_flag, tgt.path))
             if  ret != 0 :
@@ -748,6 +1371,8 @@ class ShellDirectory (saga.adaptors.cpi.filesystem.Directory) :
 
         options = ""
 
+        self._invalidate (tgt)
+
         if  flags & saga.filesystem.CREATE_PARENTS : 
             ret, out, _ = self._command (" mkdir -p '%s'" % tgt.path, make_location=True)
         else :
@@ -760,125 +1385,129 @@ class ShellDirectory (saga.adaptors.cpi.filesystem.Directory) :
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def get_size_self (self) :
+    def get_size_self (self, flags=None) :
 
         self._is_valid ()
 
-        return self.get_size (self.url)
+        return self.get_size (self.url, flags)
 
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def get_size (self, tgt_in) :
+    def get_size (self, tgt_in, flags=None) :
 
         self._is_valid ()
 
-        cwdurl = saga.Url (self.url) # deep copy
-        tgt    = saga.Url (tgt_in)   # deep copy
+        tgt  = saga.Url (tgt_in)   # deep copy
+        info = self._stat (tgt, flags)
+
+        if  info['type'] == 'file' and info['size'] != None :
+            return info['size']
+
+        if  info['type'] == None :
+            raise saga.NoSuccess ("get size for (%s) failed: no such entry" % tgt)
+
+        # directory sizes are evaluated via du, and are cached alongside the
+        # stat info.  Links and other entries are dereferenced by wc.
+        if  info.get ('du') != None :
+            return info['du']
+
+        if  info['type'] == 'dir' :
+            size_mult   = 1024   # see '-k' option to 'du'
+            ret, out, _ = self._command (" du -ks '%s'  | xargs | cut -f 1 -d ' '\n" % tgt.path)
+        else :
+            size_mult   = 1
+            ret, out, _ = self._command (" wc -c '%s' | xargs | cut -f 1 -d ' '\n" % tgt.path)
 
-        ret, out, _ = self._command (" du -ks '%s'  | xargs | cut -f 1 -d ' '\n" % tgt.path)
         if  ret != 0 :
             raise saga.NoSuccess ("get size for (%s) failed (%s): (%s)" \
                                % (tgt, ret, out))
 
         size = None
         try :
-            size = int (out) * 1024 # see '-k' option to 'du'
+            size = int (out) * size_mult
         except Exception as e :
             raise saga.NoSuccess ("could not get file size: %s" % out)
 
+        self.stat_cache.update (_stat_key (self.url, tgt), du=size)
+
         return size
    
 
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def is_dir_self (self):
+    def is_dir_self (self, flags=None):
 
         self._is_valid ()
 
-        return self.is_dir (self.url)
+        return self.is_dir (self.url, flags)
    
    
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def is_dir (self, tgt_in):
+    def is_dir (self, tgt_in, flags=None):
 
         self._is_valid ()
 
-        cwdurl = saga.Url (self.url) # deep copy
-        tgt    = saga.Url (tgt_in)   # deep copy
-
-        ret, out, _ = self._command (" test -d '%s' && test ! -h '%s'" % (tgt.path, tgt.path))
-
-        return True if ret == 0 else False
+        return self._stat (tgt_in, flags)['type'] == 'dir'
    
    
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def is_entry_self (self):
+    def is_entry_self (self, flags=None):
 
         self._is_valid ()
 
-        return self.is_entry (self.url)
+        return self.is_entry (self.url, flags)
    
    
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def is_entry (self, tgt_in):
+    def is_entry (self, tgt_in, flags=None):
 
         self._is_valid ()
 
-        cwdurl = saga.Url (self.url) # deep copy
-        tgt    = saga.Url (tgt_in)   # deep copy
-
-        ret, out, _ = self._command (" test -f '%s' && test ! -h '%s'" % (tgt.path, tgt.path))
-
-        return True if ret == 0 else False
+        return self._stat (tgt_in, flags)['type'] == 'file'
    
    
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def is_link_self (self):
+    def is_link_self (self, flags=None):
 
         self._is_valid ()
 
-        return self.is_link (self.url)
+        return self.is_link (self.url, flags)
    
    
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def is_link (self, tgt_in):
+    def is_link (self, tgt_in, flags=None):
 
         self._is_valid ()
 
-        cwdurl = saga.Url (self.url) # deep copy
-        tgt    = saga.Url (tgt_in)   # deep copy
-
-        ret, out, _ = self._command (" test -h '%s'" % tgt.path)
-
-        return True if ret == 0 else False
+        return self._stat (tgt_in, flags)['type'] == 'link'
    
    
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def is_file_self (self):
+    def is_file_self (self, flags=None):
 
-        return self.is_entry_self ()
+        return self.is_entry_self (flags)
    
    
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def is_file (self, tgt_in):
+    def is_file (self, tgt_in, flags=None):
 
-        return self.is_entry (tgt_in)
+        return self.is_entry (tgt_in, flags)
    
    
 ###############################################################################
@@ -914,7 +1543,16 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
 
         dirname = sumisc.url_get_dirname (tgt)
 
-        if  sumisc.url_is_compatible (cwdurl, tgt) :
+        self._invalidate (dirname)
+
+        if  _is_local_fs (tgt, cwdurl) and os.path.isabs (tgt.path) :
+
+            try :
+                _local_mkparent (tgt.path)
+            except OSError as e :
+                raise saga.NoSuccess ("failed at mkdir '%s': %s" % (dirname, e))
+
+        elif sumisc.url_is_compatible (cwdurl, tgt) :
 
             ret, out, _ = self.shell.obj.run_sync (" mkdir -p '%s'\n" % (dirname))
             if  ret != 0 :
@@ -984,6 +1622,10 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
                 self.flags = 0
 
 
+        self.stat_cache = self._adaptor.get_stat_cache (self.session)
+        self._pos       = 0     # file cursor for read / write / seek
+        self._tmpdir    = None  # remote scratch dir, see _remote_tmp()
+
         def _shell_creator (url) :
             return sups.PTYShell (url, self.session, self._logger)
         self.shell_creator = _shell_creator
@@ -1011,6 +1653,43 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
         return self.get_api ()
 
 
+    # ----------------------------------------------------------------
+    #
+    def _stat (self, flags=None) :
+        """
+        return the stat info for this file, from the stat cache if possible
+        (and not disabled by NO_CACHE)
+        """
+
+        key = _stat_key (self.cwdurl, self.url)
+
+        if  not flags or not flags & NO_CACHE :
+            info = self.stat_cache.get (key)
+            if  info :
+                return info
+
+        ret, out, _ = self.shell.obj.run_sync (_STAT_CMD % key[1])
+        info        = _parse_stat (out)
+
+        if  ret != 0 or not info :
+            raise saga.NoSuccess ("stat for (%s) failed (%s): (%s)" \
+                               % (self.url, ret, out))
+
+        self.stat_cache.put (key, info)
+
+        return info
+
+
+    # ----------------------------------------------------------------
+    #
+    def _invalidate (self, tgt) :
+        """
+        remove the given target (and anything below it) from the stat cache
+        """
+
+        self.stat_cache.invalidate (_stat_key (self.cwdurl, tgt))
+
+
     # ----------------------------------------------------------------
     #
     def initialize (self) :
@@ -1021,6 +1700,9 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
         cmd = ""
         dirname = sumisc.url_get_dirname  (self.url)
 
+        if  self.flags & (saga.filesystem.CREATE | saga.filesystem.CREATE_PARENTS) :
+            self._invalidate (self.url)
+
         if  self.flags & saga.filesystem.CREATE_PARENTS :
             cmd = " mkdir -p '%s'; touch '%s'" % (dirname, self.url.path)
             self._logger.info ("mkdir '%s'; touch '%s'" % (dirname, self.url.path))
@@ -1039,6 +1721,10 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
         if  self.flags & saga.filesystem.WRITE :
             cmd += "; test -w '%s'" % (self.url.path)
 
+        if  self.flags & saga.filesystem.TRUNCATE :
+            self._invalidate (self.url)
+            cmd += " && : > '%s'" % (self.url.path)
+
         ret, out, _ = self.shell.obj.run_sync (cmd)
 
         if  ret != 0 :
@@ -1089,6 +1775,38 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
         return saga.Url (self.url) # deep copy
 
 
+    # ----------------------------------------------------------------
+    #
+    def _copy_remote (self, src, tgt, rec_flag) :
+        """
+        copy between two remote hosts.  If both are the same host, the copy is
+        performed there -- otherwise the data are streamed from one host to the
+        other through a local pipe, without staging them on the local disk.
+        """
+
+        for url in [src, tgt] :
+            if  url.scheme and not url.scheme.lower () in _ADAPTOR_SCHEMAS :
+                raise saga.BadParameter ("schema of copy url is not supported (%s)" \
+                                      % (url))
+
+        src_lease = self._adaptor.get_lease_target (src)
+        tgt_lease = self._adaptor.get_lease_target (tgt)
+
+        if  sumisc.url_is_compatible (src, tgt) :
+
+            with self.lm.lease (src_lease, self.shell_creator, src) as copy_shell :
+
+                ret, out, _ = copy_shell.run_sync (" cp %s '%s' '%s'\n" % (rec_flag, src.path, tgt.path))
+                if  ret != 0 :
+                    raise saga.NoSuccess ("copy (%s -> %s) failed (%s): (%s)" \
+                                       % (src, tgt, ret, out))
+                return [src.path]
+
+        with self.lm.lease (src_lease, self.shell_creator, src) as src_shell :
+            with self.lm.lease (tgt_lease, self.shell_creator, tgt) as tgt_shell :
+                return src_shell.stage_to_shell (src.path, tgt_shell, tgt.path, rec_flag)
+
+
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
@@ -1114,10 +1832,23 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
         if  flags & saga.filesystem.CREATE_PARENTS : 
             self._create_parent (cwdurl, tgt)
 
+        self._invalidate (tgt)
+
+        # if src and tgt are both local, we copy in-process
+        if  _is_local_fs (src, cwdurl) and \
+            _is_local_fs (tgt, cwdurl) :
+
+            try :
+                _local_copy (src.path, tgt.path,
+                             flags & saga.filesystem.RECURSIVE,
+                             self._adaptor.local_copy_threads)
+            except (IOError, OSError) as e :
+                raise saga.NoSuccess ("copy (%s -> %s) failed: %s" % (src, tgt, e))
+
         # if cwd, src and tgt point to the same host, we just run a shell cp
         # command on that host
-        if  sumisc.url_is_compatible (cwdurl, src) and \
-            sumisc.url_is_compatible (cwdurl, tgt) :
+        elif sumisc.url_is_compatible (cwdurl, src) and \
+             sumisc.url_is_compatible (cwdurl, tgt) :
 
             # print "shell cp"
             ret, out, _ = self.shell.obj.run_sync (" cp %s '%s' '%s'\n" % (rec_flag, src.path, tgt.path))
@@ -1149,10 +1880,8 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
                     files_copied = self.shell.obj.stage_from_remote (src.path, tgt.path, rec_flag)
 
                 else :
-                    # print "from remote to other remote -- fail"
-                    # we cannot support the combination of URLs
-                    raise saga.BadParameter ("copy from %s to %s is not supported" \
-                                          % (src, tgt))
+                    # from remote to other remote: stream through the local host
+                    files_copied = self._copy_remote (src, tgt, rec_flag)
    
 
             # if cwd is local, and src or tgt are remote, we need to actually
@@ -1189,10 +1918,8 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
                         files_copied = copy_shell.stage_from_remote (src.path, tgt.path, rec_flag)
 
                 else :
-
-                    # we cannot support two remote URLs
-                    raise saga.BadParameter ("copy from %s to %s is not supported" \
-                                          % (src, tgt))
+                    # from remote to other remote: stream through the local host
+                    files_copied = self._copy_remote (src, tgt, rec_flag)
 
    
     # ----------------------------------------------------------------
@@ -1220,6 +1947,8 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
         if  sumisc.url_is_compatible (cwdurl, src) and \
             sumisc.url_is_compatible (cwdurl, tgt) :
 
+            self._invalidate (tgt)
+
             # print "shell ln"
             ret, out, err = self.shell.obj.run_sync (" ln -s '%s' '%s'\n" % (src.path, tgt.path))
             if  ret != 0 :
@@ -1238,9 +1967,35 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
     @SYNC_CALL
     def move_self (self, tgt_in, flags):
 
-        # we handle move non-atomically, i.e. as copy/remove
-        self.copy_self   (tgt_in, flags)
-        self.remove_self (flags)
+        self._is_valid ()
+
+        cwdurl = saga.Url (self.cwdurl) # deep copy
+        tgt    = saga.Url (tgt_in)      # deep copy
+
+        if  sumisc.url_is_relative (tgt) : tgt = sumisc.url_make_absolute (cwdurl, tgt)
+
+        # if src and tgt are both local, we move in-process (by rename, if
+        # possible) -- otherwise we handle move non-atomically, i.e. as
+        # copy/remove
+        if  _is_local_fs (self.url, cwdurl) and \
+            _is_local_fs (tgt,      cwdurl) :
+
+            if  flags & saga.filesystem.CREATE_PARENTS : 
+                self._create_parent (cwdurl, tgt)
+
+            self._invalidate (self.url)
+            self._invalidate (tgt)
+
+            try :
+                _local_move (self.url.path, tgt.path,
+                             flags & saga.filesystem.RECURSIVE,
+                             self._adaptor.local_copy_threads)
+            except (IOError, OSError) as e :
+                raise saga.NoSuccess ("move (%s -> %s) failed: %s" % (self.url, tgt, e))
+
+        else :
+            self.copy_self   (tgt_in, flags)
+            self.remove_self (flags)
 
         # however, we are not closed at this point, but need to re-initialize
         self.url   = tgt_in
@@ -1251,54 +2006,166 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
     #
     @SYNC_CALL
     def write (self, string, flags=None):
-	"""
-	This call is intended to write a string to a local or remote file.
-	Since write() uses file staging calls, it cannot be used to randomly
-	write certain parts of a file (i.e. seek()). Together with read(),
-	it was designed to manipulate template files and write them back to
-	the remote directory. Be aware, that writing large files will
-	be very slow compared to native read(2) and write(2) calls.
-	"""
+        """
+        Write the given string to the file, at the current position of the
+        file cursor, overwriting the data at that position (but not beyond).
+        With the APPEND flag, the data are appended to the end of the file;
+        with the TRUNCATE flag, the file is truncated before writing.  Only the
+        written data are transferred, not the complete file.
+        """
+
         self._is_valid ()
         if  flags==None:
             flags = self.flags
         else:
             self.flags=flags
 
+            if  flags & saga.filesystem.TRUNCATE :
+                self._truncate ()
+
         tgt = saga.Url (self.url)  # deep copy, is absolute
-            
-        if  flags==saga.filesystem.APPEND:
-            string = self.read()+string            
-        # FIXME: eval flags
 
-        self.shell.obj.write_to_remote(string,tgt.path)
-                                                    
+        self._invalidate (tgt)
+
+        # stage the data into a scratch file, and merge it into the target
+        tmp = self._remote_tmp ()
+
+        try :
+            self.shell.obj.write_to_remote (string, tmp)
+
+            if  flags & saga.filesystem.APPEND :
+                cmd = " cat '%s' >> '%s'" % (tmp, tgt.path)
+
+            else :
+                # open the target read-write (so it is not truncated), let dd
+                # move the file offset (it copies nothing), and let cat write
+                # the data from there on
+                cmd = " { dd bs=1 seek=%d count=0 2>/dev/null && cat '%s' ; } 1<> '%s'" \
+                    % (self._pos, tmp, tgt.path)
+
+            ret, out, _ = self.shell.obj.run_sync (cmd)
+            if  ret != 0 :
+                raise saga.NoSuccess ("write to (%s) failed (%s): (%s)" \
+                                       % (tgt, ret, out))
+        finally :
+            self.shell.obj.run_sync (" rm -f '%s'" % tmp)
+
+        if  flags & saga.filesystem.APPEND :
+            self._pos  = self._stat (NO_CACHE)['size']
+        else :
+            self._pos += len (string)
+
+        return len (string)
+
+
+    # ----------------------------------------------------------------
+    #
+    def _truncate (self) :
+
+        self._invalidate (self.url)
+
+        ret, out, _ = self.shell.obj.run_sync (" : > '%s'" % self.url.path)
+        if  ret != 0 :
+            raise saga.NoSuccess ("truncate (%s) failed (%s): (%s)" \
+                                   % (self.url, ret, out))
+        self._pos = 0
+
+
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def read (self,size=None):
-	"""
-	This call is intended to read a string wit length size from a local
-	or remote file.	Since read() uses file staging calls, it cannot be
-	used to randomly read certain parts of a file (i.e. seek()).
-	Together with write(), it was designed to manipulate template files
-	and write them back to the remote directory. Be aware, that reading
-	large files will be very slow compared to native read(2) and write(2)
-	calls.
-	"""
+    def read (self, size=None):
+        """
+        Read up to `size` bytes from the current position of the file cursor
+        (or everything up to the end of the file if no size is given).  Only
+        the requested slice of the file is transferred: the slice is cut out
+        remotely via 'tail -c' and 'head -c', and then staged like a complete
+        file.
+        """
 
         self._is_valid ()
 
+        if  size != None and size < 0 :
+            raise saga.BadParameter ("cannot read negative number of bytes (%s)" % size)
+
+        if  size == 0 :
+            return ""
+
         tgt = saga.Url (self.url)  # deep copy, is absolute
-        out = self.shell.obj.read_from_remote(tgt.path)
 
-        if  size!=None:
-            return out[0:size-1]
-        else:
-            return out
+        if  self._pos == 0 and size == None :
+            # nothing to cut -- stage the complete file
+            out = self.shell.obj.read_from_remote (tgt.path)
+
+        else :
+            tmp = self._remote_tmp ()
+            cmd = " tail -c +%d '%s'" % (self._pos + 1, tgt.path)
+            if  size != None :
+                cmd += " | head -c %d" % size
+
+            try :
+                ret, out, _ = self.shell.obj.run_sync ("%s > '%s'" % (cmd, tmp))
+                if  ret != 0 :
+                    raise saga.NoSuccess ("read from (%s) failed (%s): (%s)" \
+                                           % (tgt, ret, out))
+
+                out = self.shell.obj.read_from_remote (tmp)
+
+            finally :
+                self.shell.obj.run_sync (" rm -f '%s'" % tmp)
+
+        self._pos += len (out)
+
+        return out
+
+
+    # ----------------------------------------------------------------
+    #
+    @SYNC_CALL
+    def seek (self, off, whence=START):
+        """
+        Move the file cursor, and return its new position.  Seeking relative
+        to END requires a (non-cached) stat of the file.
+        """
+
+        self._is_valid ()
+
+        if  whence == START :
+            pos = off
+        elif whence == CURRENT :
+            pos = self._pos + off
+        elif whence == END :
+            pos = self._stat (NO_CACHE)['size'] + off
+        else :
+            raise saga.BadParameter ("invalid seek mode (%s)" % whence)
+
+        if  pos < 0 :
+            raise saga.BadParameter ("cannot seek to negative offset (%s)" % pos)
+
+        self._pos = pos
+
+        return self._pos
+
+
+    # ----------------------------------------------------------------
+    #
+    def _remote_tmp (self) :
+        """
+        name of a remote scratch file for staging file slices -- unique per
+        call, so that concurrent reads and writes don't clash
+        """
+
+        if  not self._tmpdir :
+            ret, out, _ = self.shell.obj.run_sync (' echo "${TMPDIR:-/tmp}"')
+            if  ret != 0 :
+                raise saga.NoSuccess ("cannot determine remote tmp dir (%s): (%s)" \
+                                       % (ret, out))
+            self._tmpdir = out.strip ().rstrip ('/') or '/tmp'
+
+        return "%s/saga-python.%s.%s.%s.staging" \
+             % (self._tmpdir, os.getpid (), id(self), next (_staging_count))
 
 
-   
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
@@ -1315,6 +2182,18 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
         if  flags & saga.filesystem.RECURSIVE : 
             rec_flag  += "-r "
 
+        self._invalidate (tgt)
+
+        # local entries are removed in-process
+        if  _is_local_fs (tgt, self.cwdurl) :
+
+            try :
+                _local_remove (tgt.path, flags & saga.filesystem.RECURSIVE)
+            except (IOError, OSError) as e :
+                raise saga.NoSuccess ("remove (%s) failed: %s" % (tgt, e))
+
+            return
+
         ret, out, _ = self.shell.obj.run_sync (" rm -f %s '%s'\n" % (rec_flag, tgt.path))
         if  ret != 0 :
             raise saga.NoSuccess ("remove (%s) failed (%s): (%s)" \
@@ -1324,15 +2203,29 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def get_size_self (self) :
+    def get_size_self (self, flags=None) :
 
         self._is_valid ()
+
+        info = self._stat (flags)
+
+        if  info['type'] == 'file' and info['size'] != None :
+            return info['size']
+
+        if  info['type'] == None :
+            raise saga.NoSuccess ("get size for (%s) failed: no such entry" % self.url)
+
+        # directory sizes are evaluated via du, and are cached alongside the
+        # stat info.  Links and other entries are dereferenced by wc.
+        if  info.get ('du') != None :
+            return info['du']
+
         size      = None
         size_mult = 1
         ret       = None
         out       = None
 
-        if  self.is_dir_self () :
+        if  info['type'] == 'dir' :
             size_mult   = 1024   # see '-k' option to 'du'
             ret, out, _ = self.shell.obj.run_sync (" du -ks '%s'  | xargs | cut -f 1 -d ' '\n" \
                                             % self.url.path)
@@ -1349,6 +2242,7 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
         except Exception as e :
             raise saga.NoSuccess ("could not get file size: %s" % out)
 
+        self.stat_cache.update (_stat_key (self.cwdurl, self.url), du=size)
 
         return size
    
@@ -1356,57 +2250,41 @@ class ShellFile (saga.adaptors.cpi.filesystem.File) :
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def is_dir_self (self):
+    def is_dir_self (self, flags=None):
 
         self._is_valid ()
 
-        cwdurl = saga.Url (self.url) # deep copy
-
-        ret, out, _ = self.shell.obj.run_sync (" test -d '%s' && test ! -h '%s'" % (cwdurl.path, cwdurl.path))
-
-        return True if ret == 0 else False
+        return self._stat (flags)['type'] == 'dir'
 
 
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def is_entry_self (self):
+    def is_entry_self (self, flags=None):
 
         self._is_valid ()
 
-        cwdurl = saga.Url (self.url) # deep copy
-
-        ret, out, _ = self.shell.obj.run_sync (" test -f '%s' && test ! -h '%s'" % (cwdurl.path, cwdurl.path))
-
-        return True if ret == 0 else False
+        return self._stat (flags)['type'] == 'file'
    
    
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def is_link_self (self):
+    def is_link_self (self, flags=None):
 
         self._is_valid ()
 
-        cwdurl = saga.Url (self.url) # deep copy
-
-        ret, out, _ = self.shell.obj.run_sync (" test -h '%s'" % cwdurl.path)
-
-        return True if ret == 0 else False
+        return self._stat (flags)['type'] == 'link'
    
    
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def is_file_self (self):
+    def is_file_self (self, flags=None):
 
         self._is_valid ()
 
-        cwdurl = saga.Url (self.url) # deep copy
-
-        ret, out, _ = self.shell.obj.run_sync (" test -f '%s' && test ! -h '%s'" % (cwdurl.path, cwdurl.path))
-
-        return True if ret == 0 else False
+        return self._stat (flags)['type'] == 'file'
 
 
 # ------------------------------------------------------------------------------
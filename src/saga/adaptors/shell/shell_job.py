@@ -15,6 +15,8 @@ from   saga.job.constants import *
 
 import re
 import time
+import base64
+import hashlib
 import threading
 
 import shell_wrapper
@@ -22,11 +24,25 @@ import shell_wrapper
 SYNC_CALL  = saga.adaptors.cpi.decorators.SYNC_CALL
 ASYNC_CALL = saga.adaptors.cpi.decorators.ASYNC_CALL
 
+MONITOR_READY_TIMEOUT = 30.0  # max time to wait for notifications to start
+MONITOR_RECONNECTS    =  3    # attempts to re-establish a lost monitor channel
+MONITOR_EVENT_TTL     = 60.0  # max time to keep events for unregistered jobs
+
+_FINAL_STATES = [saga.job.DONE, saga.job.FAILED, saga.job.CANCELED]
+
 
 # ------------------------------------------------------------------------------
 #
 class _job_state_monitor (threading.Thread) :
-    """ thread that periodically monitors job states """
+    """ 
+    thread that listens on the wrapper's notification channel, and pushes
+    state updates to the known job instances.  As long as the thread is
+    'active', jobs can rely on those notifications (and need not poll).
+
+    Notifications carry sequence numbers -- if the channel gets lost, the
+    thread reconnects and resumes at the next expected notification, so that
+    no state change is missed in between.
+    """
 
     # --------------------------------------------------------------------------
     #
@@ -37,7 +53,13 @@ class _job_state_monitor (threading.Thread) :
         self.rm      = rm 
         self.logger  = logger
         self.stop    = False
-        self.events  = dict()
+        self.active  = False              # notifications are flowing
+        self.ready   = threading.Event () # set once that state is known
+        self.lock    = threading.RLock () # protects self.events and js.jobs
+        self.events  = dict()             # {job_id : [stamp, [states]]}
+        self.pruned  = time.time ()
+        self.seq     = None               # next expected notification
+        self.retries = 0
 
         super (_job_state_monitor, self).__init__ ()
 
@@ -51,93 +73,270 @@ class _job_state_monitor (threading.Thread) :
         self.stop = True
 
 
+    # --------------------------------------------------------------------------
+    #
+    def register (self, job_id, job) :
+        """ 
+        Make the job known to the monitor, and replay any events which arrived
+        for that job before it got registered (fast jobs can finish before
+        their job id is even returned from RUN).
+        """
+
+        with self.lock :
+
+            self.js.jobs[job_id] = job
+
+            if  job_id in self.events :
+                for event in self.events[job_id][1] :
+                    job._adaptor._set_state (event)
+                del (self.events[job_id])
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _add_event (self, job_id, state) :
+        """
+        Keep an event for a job which is not (yet) registered.  The wrapper
+        also notifies about jobs of other services, which never get registered
+        here -- so events are only kept for MONITOR_EVENT_TTL seconds, which is
+        plenty for RUN to return the job id.
+        """
+
+        now = time.time ()
+
+        if  now - self.pruned > MONITOR_EVENT_TTL :
+            for old_id in self.events.keys () :
+                if  now - self.events[old_id][0] > MONITOR_EVENT_TTL :
+                    del (self.events[old_id])
+            self.pruned = now
+
+        if  not job_id in self.events :
+            self.events[job_id] = [now, list()]
+        self.events[job_id][1].append (state)
+
+
     # --------------------------------------------------------------------------
     #
     def run (self) :
 
+        try:
+
+            while not self._listen () :
+
+                # the channel got lost -- try to get it back, and resume where
+                # we left off.  The attempts are reset once MONITOR is up again.
+                while True :
+
+                    if  self.retries >= MONITOR_RECONNECTS :
+                        self.logger.error ("monitoring channel failed -- disable notifications")
+                        return
+
+                    self.retries += 1
+                    self.logger.warn ("monitoring channel lost -- reconnect (%s)" \
+                                   % self.retries)
+
+                    try :
+                        self.channel = self.js._reconnect_channel ()
+                        break
+
+                    except Exception as e :
+                        self.logger.warn ("monitoring channel reconnect failed: %s" % e)
+                        time.sleep (self.retries)
+
+        except Exception as e:
+
+            self.logger.error ("Exception in job monitoring thread: %s" % e)
+            self.logger.error ("Cancel job monitoring for %s" % self.rm)
+
+        finally :
+
+            # whatever the reason, we won't see any further notifications --
+            # wake up all waiting jobs, so that they can fall back to polling.
+            self.active = False
+            self.ready.set ()
+
+            with self.lock :
+                for job_id in self.js.jobs :
+                    self.js.jobs[job_id]._adaptor._notify ()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _listen (self) :
+        """
+        Run MONITOR on the channel, and process notifications until the channel
+        dies (returns False), or until the thread is stopped (returns True).
+        """
+
         MONITOR_READ_TIMEOUT = 1.0   # check for stop signal now and then
 
-        try:
+        if  self.seq == None : self.channel.run_async ("MONITOR")
+        else                 : self.channel.run_async ("MONITOR %d" % self.seq)
 
-            self.channel.run_async ("MONITOR")
+        while self.channel.alive () :
 
-            while self.channel.alive () :
+            idx, out = self.channel.find (['\n'], timeout=MONITOR_READ_TIMEOUT)
 
-                idx, out = self.channel.find (['\n'], timeout=MONITOR_READ_TIMEOUT)
+            line = out.strip ()
 
-                line = out.strip ()
+            if  not line :
 
-                if  not line :
+                # just a read timeout, i.e. an opportiunity to check for
+                if  self.stop :
+                    self.logger.debug ("stop monitoring")
+                    return True
+                pass
 
-                    # just a read timeout, i.e. an opportiunity to check for
-                    if  self.stop :
-                        self.logger.debug ("stop monitoring")
-                        return
-                    pass
 
+            elif line.startswith ('READY') :
+                self.logger.debug ("monitoring channel is up")
+                self.seq     = int (line.split ()[1])
+                self.retries = 0
+                self.active  = True
+                self.ready.set ()
 
-                elif line == 'EXIT' or line == "Killed" :
-                    self.logger.error ("monitoring channel failed -- disable notifications")
-                    return
 
+            elif line.startswith ('GAP') :
+                # notifications got rotated away while we were not listening --
+                # we need to pull the states of all jobs once.
+                self.logger.warn ("monitoring channel lost notifications -- resync")
+                self.seq = int (line.split ()[1])
+                self.js._resync_states ()
 
-                elif not ':' in line :
-                    self.logger.warn ("monitoring channel noise: %s" % line)
 
+            elif line == 'EXIT' or line == "Killed" :
+                return False
 
-                else :
-                    job_pid, state, data = line.split (':', 2)
-                    job_id = "[%s]-[%s]" % (self.rm, job_pid)
 
-                    state = self.js._adaptor.string_to_state (state)
+            elif line.count (':') < 3 or not line.split (':', 1)[0].isdigit () :
+                self.logger.warn ("monitoring channel noise: %s" % line)
 
-                    try :
-                        job = self.js.get_job (job_id, no_reconnect=True)
 
-                        if  not job :
-                            # job not yet known -- keep event for later
-                            if  not job_id in self.events :
-                                self.events[job_id] = list()
-                            self.events[job_id].append (state)
+            else :
+                seq, job_pid, state, data = line.split (':', 3)
+                job_id = "[%s]-[%s]" % (self.rm, job_pid)
 
-                        else :
+                self.seq = int (seq) + 1
+                state    = self.js._adaptor.string_to_state (state)
 
-                            # check for previous events :
-                            if  job_id in self.events :
-                                for event in self.events[job_id] :
-                                    job._adaptor._set_state (event)
-                                del (self.events[job_id])
-                            job._adaptor._set_state (state)
+                with self.lock :
 
+                    job = self.js.jobs.get (job_id)
 
-                    except saga.DoesNotExist as e :
-                        self.logger.error ("event for unknown job '%s'" % job_id)
+                    if  not job :
+                        # job not yet known -- keep event for later
+                        self._add_event (job_id, state)
 
+                    else :
+                        job._adaptor._set_state (state)
 
-        except Exception as e:
+        return False
 
-            self.logger.error ("Exception in job monitoring thread: %s" % e)
-            self.logger.error ("Cancel job monitoring for %s" % self.rm)
+
+# ------------------------------------------------------------------------------
+#
+class _job_run_coalescer (object) :
+    """
+    Collects job submissions from concurrent run() calls, and sends them to the
+    wrapper in a single BULK.  The first submission of a batch waits for the
+    batch window to close (or for the batch to fill up), and then flushes the
+    batch -- all other submitters just wait for their job id.
+    """
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__ (self, js, window, size, logger) :
+
+        self.js      = js
+        self.window  = window             # seconds
+        self.size    = size               # max jobs per batch
+        self.logger  = logger
+        self.cond    = threading.Condition ()
+        self.flush   = threading.Lock ()  # serializes BULKs on the shell
+        self.batch   = list()             # pending submissions
+
+
+    # --------------------------------------------------------------------------
+    #
+    def submit (self, jd) :
+        """ 
+        Add a job to the current batch, and return its job id once the batch
+        was submitted.  Errors are raised in the submitting thread.
+        """
+
+        # translate the job description here, so that invalid descriptions
+        # fail for the caller, not for the whole batch
+        entry = {'cmd'    : self.js._jd2cmd (jd),
+                 'done'   : threading.Event (),
+                 'result' : None}
+
+        with self.cond :
+
+            batch  = self.batch
+            leader = (len (batch) == 0)
+
+            batch.append (entry)
+
+            if  len (batch) >= self.size :
+                # batch is full -- close it, and wake up its leader
+                self.batch = list()
+                self.cond.notify_all ()
+
+            if  leader :
+
+                deadline = time.time () + self.window
+
+                while self.batch is batch :
+                    remaining = deadline - time.time ()
+                    if  remaining <= 0 :
+                        self.batch = list()
+                        break
+                    self.cond.wait (remaining)
+
+        if  leader :
+
+            self.logger.debug ("flush coalesced run of %d jobs" % len (batch))
+
+            with self.flush :
+                try :
+                    results = self.js._bulk_run ([e['cmd'] for e in batch])
+                except Exception as e :
+                    results = [e] * len (batch)
+
+            for e, result in zip (batch, results) :
+                e['result'] = result
+                e['done'].set ()
+
+        entry['done'].wait ()
+
+        if  isinstance (entry['result'], Exception) :
+            raise entry['result']
+
+        return entry['result']
 
 
 # --------------------------------------------------------------------
 #
-# strip white space from a string, and hex-decode the remaining characters.
-# This must be applied to stdout/stderr data returned from the shell wrapper.
+# strip white space from a string, and decode the remaining characters (hex or
+# base64).  This must be applied to stdout/stderr data returned from the shell
+# wrapper.  Both the whitespace removal and the decoding operate on the string
+# as a whole.
 #
-def _decode (data) :
+def _decode (data, encoding='hex') :
 
-    elem = ""
-    code = ""
-    
-    for c in data :
-    
-        if  c in ['0','1','2','3','4','5','6','7','8','9','a','b','c','d','e','f'] :
-            code += c
-        elif c not in [' ', '\n'] :
-            raise saga.BadParameter("Cannot decode '%s' in data (%s)" % (c, data))
+    code = ''.join (data.split ())
+
+    try :
+        if  encoding == 'base64' :
+            return base64.b64decode (code)
+
+        elif encoding == 'hex' :
+            return code.decode ('hex')
 
-    return code.decode ('hex')
+    except (TypeError, ValueError) as e :
+        raise saga.BadParameter ("Cannot decode data (%s): %s" % (e, data[:100]))
+
+    raise saga.BadParameter ("Cannot decode data: unknown encoding '%s'" % encoding)
 
 
 # --------------------------------------------------------------------
@@ -173,6 +372,67 @@ _ADAPTOR_OPTIONS       = [
                           suitable jobs, including the ones managed by another,
                           live job service instance.''',
     'env_variable'     : None
+    },
+    {
+    'category'         : 'saga.adaptor.shell_job',
+    'name'             : 'use_supervisor',
+    'type'             : bool,
+    'default'          : False,
+    'valid_options'    : [True, False],
+    'documentation'    : '''Start jobs via a single supervisor process per job
+                          service, instead of via one monitoring shell per job.
+                          This saves two processes per running job on the
+                          target host.  Job control (and thus canceling of all
+                          processes spawned by a job) requires the remote shell
+                          to support 'set -m'.''',
+    'env_variable'     : None
+    },
+    {
+    'category'         : 'saga.adaptor.shell_job',
+    'name'             : 'max_state_age',
+    'type'             : int,
+    'default'          : 1,
+    'documentation'    : '''Maximal age (in seconds) of cached job states.  The
+                          job service keeps the states of all its jobs in one
+                          table, which is refreshed for all non-final jobs at
+                          once (in a single round trip) when a job state older
+                          than this is requested.  Final states are never
+                          refreshed.''',
+    'env_variable'     : None
+    },
+    {
+    'category'         : 'saga.adaptor.shell_job',
+    'name'             : 'run_batch_window',
+    'type'             : int,
+    'default'          : 0,
+    'documentation'    : '''Coalesce job submissions: run() calls which arrive
+                          within that many milliseconds (for example from
+                          concurrent threads) are submitted in a single bulk
+                          operation.  Note that this delays each individual
+                          run() by up to that time.  0 disables coalescing.''',
+    'env_variable'     : 'SAGA_SHELL_RUN_BATCH_WINDOW'
+    },
+    {
+    'category'         : 'saga.adaptor.shell_job',
+    'name'             : 'run_batch_size',
+    'type'             : int,
+    'default'          : 100,
+    'documentation'    : '''Maximal number of jobs in a coalesced bulk
+                          submission (see 'run_batch_window').  A full batch
+                          is submitted right away.''',
+    'env_variable'     : None
+},
+{
+    'category'         : 'saga.adaptor.shell_job',
+    'name'             : 'polling',
+    'type'             : str,
+    'default'          : 'pending=0.5,pending_max=5,running=1,final=0.1',
+    'documentation'    : '''Polling intervals for wait(), in seconds, as comma
+                          separated key=value pairs: pending, pending_max,
+                          running, final, backoff, latency (see
+                          saga.utils.poll_policy).  Only used while job state
+                          notifications are not available.''',
+    'env_variable'     : None
 }
 ]
 
@@ -264,7 +524,9 @@ _ADAPTOR_DOC           = {
             instance).  Each remote job will create three additional processes:
             two for the job instance itself (double fork), and an additional
             process which monitors the job for state changes etc.  Additional
-            temporary processes may be needed as well.  
+            temporary processes may be needed as well.  With the
+            'use_supervisor' option, each job only creates one process, plus
+            one supervisor process per job service.
 
             While marked as 'obsolete' by POSIX, the `ulimit` command is
             available on many systems, and reports the number of processes
@@ -280,7 +542,9 @@ _ADAPTOR_DOC           = {
             
             keep job state on the remote disk, in ``~/.saga/adaptors/shell_job/``.
             Quota limitations may limit the number of files created there,
-            and/or the total size of that directory.  
+            and/or the total size of that directory.  Job directories are
+            spread over ``jobs/<nn>/`` subdirectories, and are purged one day
+            after the job finished (if ``purge_on_start`` is enabled).
 
             On quota or disk space limits, you may see error messages similar to
             the following ones::
@@ -356,6 +620,11 @@ class Adaptor (saga.adaptors.base.Base):
 
         self.notifications  = self.opts['enable_notifications'].get_value ()
         self.purge_on_start = self.opts['purge_on_start'      ].get_value ()
+        self.max_state_age  = self.opts['max_state_age'       ].get_value ()
+        self.use_supervisor = self.opts['use_supervisor'      ].get_value ()
+        self.batch_window   = self.opts['run_batch_window'    ].get_value ()
+        self.batch_size     = self.opts['run_batch_size'      ].get_value ()
+        self.polling        = self.opts['polling'             ].get_value ()
 
 
     # ----------------------------------------------------------------
@@ -415,6 +684,9 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
         self.opts = {}
         self.opts['shell'] = None  # default to login shell
 
+        self.monitor   = None
+        self.coalescer = None
+
 
     # ----------------------------------------------------------------
     #
@@ -454,6 +726,15 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
         self.jobs    = dict()
         self.njobs   = 0
 
+        # index of all jobs known on the remote host, as obtained by the
+        # last list(): job_id : job info
+        self.known_jobs   = dict()
+
+        # job state table: job_id : [state, time of last update]
+        self.states       = dict()
+        self.states_lock  = threading.RLock ()
+        self.refresh_lock = threading.RLock ()
+
         # if the rm URL specifies a path, we interprete that as shell to run.
         # Otherwise, we default to running /bin/sh (for fork) or the user's
         # login shell (for ssh etc).
@@ -465,6 +746,10 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
                                                       self._logger, opts=self.opts)
         self.channel = saga.utils.pty_shell.PTYShell (self.rm, self.session, 
                                                       self._logger, opts=self.opts)
+
+        # paces state pulls, if notifications are not available
+        self._policy = self.shell.get_poll_policy (_ADAPTOR_NAME,
+                                                   self._adaptor.polling)
         self.initialize ()
 
         # the monitoring thread - one per service instance.  We wait for
@@ -476,6 +761,21 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
                                            logger  = self._logger)
         self.monitor.start ()
 
+        # make sure that notifications are flowing before we start any job, so
+        # that no state change is missed.
+        self.monitor.ready.wait (MONITOR_READY_TIMEOUT)
+
+        if  not self.monitor.active :
+            self._logger.warn ("no job notifications for %s -- fall back to polling" \
+                            % self.rm)
+
+        # collect concurrent job submissions into bulks, if so configured
+        if  self._adaptor.batch_window > 0 :
+            self.coalescer = _job_run_coalescer (js     = self,
+                                                 window = self._adaptor.batch_window / 1000.0,
+                                                 size   = self._adaptor.batch_size,
+                                                 logger = self._logger)
+
         return self.get_api ()
 
 
@@ -510,7 +810,13 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
 
         # TODO: replace some constants in the script with values from config
         # files, such as 'timeout' or 'purge_on_quit' ...
-        tgt = ".saga/adaptors/shell_job/wrapper.sh"
+        src = shell_wrapper._WRAPPER_SCRIPT % ({ 'PURGE_ON_START' : str(self._adaptor.purge_on_start), 
+                                                 'SUPERVISOR'     : str(self._adaptor.use_supervisor) })
+
+        # the script name contains a checksum of the script, so that an
+        # outdated wrapper on the remote host never gets used.
+        wrapper = "wrapper.%s.sh" % hashlib.md5 (src).hexdigest ()[:8]
+        tgt     = ".saga/adaptors/shell_job/%s" % wrapper
 
         # lets check if we actually need to stage the wrapper script.  We need
         # an adaptor lock on this one.
@@ -519,7 +825,6 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
             ret, out, _ = self.shell.run_sync (" test -f %s" % tgt)
             if  ret != 0 :
                 # yep, need to stage...
-                src = shell_wrapper._WRAPPER_SCRIPT % ({ 'PURGE_ON_START' : str(self._adaptor.purge_on_start) })
                 self.shell.write_to_remote (src, tgt)
 
         # ----------------------------------------------------------------------
@@ -531,12 +836,23 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
         # Thus, when the script times out, the shell dies and the connection
         # drops -- that will free all associated resources, and allows for
         # a clean reconnect.
-        # ret, out, _ = self.shell.run_sync (" exec sh %s/wrapper.sh" % base)
+        # ret, out, _ = self.shell.run_sync (" exec sh %s/%s" % (base, wrapper))
       
         # Well, actually, we do not use exec, as that does not give us good
         # feedback on failures (the shell just quits) -- so we replace it with
         # this poor-man's version...
-        ret, out, _ = self.shell.run_sync (" /bin/sh %s/wrapper.sh" % base)
+        self._wrapper = "%s/%s" % (base, wrapper)
+
+        self._run_wrapper (self.shell,   'cmd')
+        self._run_wrapper (self.channel, 'mon')
+
+
+    # ----------------------------------------------------------------
+    #
+    def _run_wrapper (self, shell, name) :
+        """ run the staged wrapper script on the given shell """
+
+        ret, out, _ = shell.run_sync (" /bin/sh %s" % self._wrapper)
 
         # shell_wrapper.sh will report its own PID -- we use that to sync prompt
         # detection, too.
@@ -547,35 +863,50 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
         id_match   = id_pattern.search (out)
 
         if  not id_match :
-            self.shell.run_async (" exit")
+            shell.run_async (" exit")
             self._logger.error   ("host bootstrap failed - no pid (%s)" % out)
             raise saga.NoSuccess ("host bootstrap failed - no pid (%s)" % out)
 
         # we actually don't care much about the PID :-P
         
-        self._logger.debug ("got cmd prompt (%s)(%s)" % (ret, out.strip ()))
+        self._logger.debug ("got %s prompt (%s)(%s)" % (name, ret, out.strip ()))
 
 
-        # ----------------------------------------------------------------------
-        # now do the same for the monitoring shell
-        ret, out, _ = self.channel.run_sync (" /bin/sh %s/wrapper.sh" % base)
+    # ----------------------------------------------------------------
+    #
+    def _reconnect_channel (self) :
+        """ 
+        replace a lost monitoring channel by a new one (the wrapper script is
+        already staged)
+        """
 
-        # shell_wrapper.sh will report its own PID -- we use that to sync prompt
-        # detection, too.
-        if  ret != 0 :
-            raise saga.NoSuccess ("failed to run bootstrap: (%s)(%s)" % (ret, out))
+        try :
+            self.channel.finalize (True)
+        except Exception :
+            pass
 
-        id_pattern = re.compile ("\s*PID:\s+(\d+)\s*$")
-        id_match   = id_pattern.search (out)
+        self.channel = saga.utils.pty_shell.PTYShell (self.rm, self.session, 
+                                                      self._logger, opts=self.opts)
+        self._run_wrapper (self.channel, 'mon')
 
-        if  not id_match :
-            self.channel.run_async (" exit")
-            self._logger.error     ("host bootstrap failed - no pid (%s)" % out)
-            raise saga.NoSuccess   ("host bootstrap failed - no pid (%s)" % out)
+        return self.channel
 
-        # we actually don't care much about the PID :-P
-        
-        self._logger.debug ("got mon prompt (%s)(%s)" % (ret, out.strip ()))
+
+    # ----------------------------------------------------------------
+    #
+    def _resync_states (self) :
+        """ 
+        Pull the states of all non-final jobs known to this service -- this is
+        needed when notifications got lost.
+        """
+
+        with self.monitor.lock :
+            job_ids = [job_id for job_id in self.jobs \
+                              if not self.jobs[job_id]._adaptor._state in _FINAL_STATES]
+
+        if  job_ids :
+            with self.refresh_lock :
+                self._refresh_states (job_ids)
 
 
     # ----------------------------------------------------------------
@@ -587,6 +918,153 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
                 self.shell.finalize (kill_pty=True)
 
 
+    # ----------------------------------------------------------------
+    #
+    def _register_job (self, job_id, job) :
+        """ make the job known to the service (and thus to the monitor) """
+
+        if  self.monitor :
+            self.monitor.register (job_id, job)
+        else :
+            self.jobs[job_id] = job
+
+
+    # ----------------------------------------------------------------
+    #
+    def _notifications_active (self) :
+        """ can jobs rely on state notifications? """
+
+        return bool (self.monitor and self.monitor.active)
+
+
+    # ----------------------------------------------------------------
+    #
+    def _update_state (self, job_id, state) :
+        """ 
+        record a job state in the state table.  The table only tracks non-final
+        jobs: once a job is final, its state is pinned in the job instance, and
+        the job is dropped from the table (and thus from further refreshes).
+        """
+
+        with self.states_lock :
+
+            if  state in _FINAL_STATES :
+                self.states.pop (job_id, None)
+            else :
+                self.states[job_id] = [state, time.time ()]
+
+
+    # ----------------------------------------------------------------
+    #
+    def _get_states (self, job_ids) :
+        """ 
+        Return the states for the given job ids from the state table.  If any
+        of those states is outdated (or unknown), the table is refreshed for
+        *all* non-final jobs of this service, in a single bulk operation.
+        """
+
+        with self.refresh_lock :
+
+            now    = time.time ()
+            stale  = list()
+            states = dict()
+
+            with self.states_lock :
+
+                for job_id in job_ids :
+
+                    if  not job_id in self.states :
+                        stale.append (job_id)
+                        continue
+
+                    state, updated = self.states[job_id]
+
+                    if  now - updated > self._adaptor.max_state_age :
+                        stale.append (job_id)
+                    else :
+                        states[job_id] = state
+
+            if  stale :
+
+                # piggyback all other non-final jobs on that refresh
+                with self.states_lock :
+                    for job_id in self.states :
+                        if  not job_id in stale :
+                            stale.append (job_id)
+
+                fresh, errors = self._refresh_states (stale)
+                states.update (fresh)
+
+                for job_id in job_ids :
+                    if  job_id in errors :
+                        raise saga.NoSuccess ("failed to get job state for '%s': %s" \
+                                           % (job_id, errors[job_id]))
+
+        return [states[job_id] for job_id in job_ids]
+
+
+    # ----------------------------------------------------------------
+    #
+    def _refresh_states (self, job_ids) :
+        """ 
+        Fetch the states of the given jobs in one bulk of STATE commands, and
+        update the state table (and the states of the known job instances,
+        which triggers their callbacks).  Returns a dict of the obtained
+        states, and a dict of error messages for those jobs whose state could
+        not be obtained.  The latter are dropped from the state table: the
+        wrapper purges old jobs, and those would otherwise be polled forever.
+        """
+
+        bulk   = "BULK\n"
+        states = dict()
+        errors = dict()
+
+        for job_id in job_ids :
+            rm, pid = self._adaptor.parse_id (job_id)
+            bulk   += "STATE %s\n" % pid
+
+        bulk += "BULK_RUN\n"
+
+        # the bulk spans several prompts -- hold the shell lock for all
+        # of them, so that no other thread's command interleaves
+        with self.shell.pty_shell.rlock :
+
+            self.shell.run_async (bulk)
+
+            for job_id in job_ids :
+
+                ret, out = self.shell.find_prompt ()
+                lines    = filter (None, out.split ("\n"))
+
+                if  ret != 0 or len (lines) < 2 or lines[-2] != "OK" :
+                    errors[job_id] = "(%s)(%s)" % (ret, out)
+                    continue
+
+                states[job_id] = self._adaptor.string_to_state (lines[-1])
+
+            # we also need to find the output of the bulk op itself
+            ret, out = self.shell.find_prompt ()
+
+        if  errors :
+            self._logger.debug ("failed to get state for (parts of the) bulk jobs: (%s)" % errors)
+
+            with self.states_lock :
+                for job_id in errors :
+                    self.states.pop (job_id, None)
+
+        # push the new states to the job instances (outside of the table lock,
+        # as this triggers callbacks).  The instances pin final states, and
+        # update the table accordingly.
+        for job_id in states :
+            job = self.jobs.get (job_id)
+            if  job :
+                states[job_id] = job._adaptor._set_state (states[job_id])
+            else :
+                self._update_state (job_id, states[job_id])
+
+        return states, errors
+
+
     
     # ----------------------------------------------------------------
     #
@@ -636,6 +1114,9 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
     def _job_run (self, jd) :
         """ runs a job on the wrapper via pty, and returns the job id """
 
+        if  self.coalescer :
+            return self.coalescer.submit (jd)
+
         cmd = self._jd2cmd (jd)
         ret = 1
         out = ""
@@ -652,37 +1133,41 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
 
         run_cmd = run_cmd.replace ("\\", "\\\\\\\\") # hello MacOS
 
-        ret, out, _ = self.shell.run_sync (run_cmd)
-        if  ret != 0 :
-            raise saga.NoSuccess ("failed to run Job '%s': (%s)(%s)" % (cmd, ret, out))
+        # an LRUN bulk spans two prompts -- hold the shell lock for both, so
+        # that no other thread's command interleaves
+        with self.shell.pty_shell.rlock :
 
-        lines = filter (None, out.split ("\n"))
-        self._logger.debug (lines)
+            ret, out, _ = self.shell.run_sync (run_cmd)
+            if  ret != 0 :
+                raise saga.NoSuccess ("failed to run Job '%s': (%s)(%s)" % (cmd, ret, out))
 
-        if  len (lines) < 2 :
-            raise saga.NoSuccess ("Failed to run job (%s)" % lines)
+            lines = filter (None, out.split ("\n"))
+            self._logger.debug (lines)
+
+            if  len (lines) < 2 :
+                raise saga.NoSuccess ("Failed to run job (%s)" % lines)
         
-      # for i in range (0, len(lines)) :
-      #     print "%d: %s" % (i, lines[i])
+          # for i in range (0, len(lines)) :
+          #     print "%d: %s" % (i, lines[i])
 
-        if lines[-2] != "OK" :
-            raise saga.NoSuccess ("Failed to run Job (%s)" % lines)
+            if lines[-2] != "OK" :
+                raise saga.NoSuccess ("Failed to run Job (%s)" % lines)
 
-        # FIXME: verify format of returned pid (\d+)!
-        pid    = lines[-1].strip ()
-        job_id = "[%s]-[%s]" % (self.rm, pid)
+            # FIXME: verify format of returned pid (\d+)!
+            pid    = lines[-1].strip ()
+            job_id = "[%s]-[%s]" % (self.rm, pid)
 
-        self._logger.debug ("started job %s" % job_id)
+            self._logger.debug ("started job %s" % job_id)
 
-        self.njobs += 1
+            self.njobs += 1
 
-        # before we return, we need to clean the 'BULK COMPLETED message from lrun
-        if use_lrun :
-            ret, out = self.shell.find_prompt ()
-            if  ret != 0 :
-                raise saga.NoSuccess ("failed to run multiline job '%s': (%s)(%s)" % (run_cmd, ret, out))
+            # before we return, we need to clean the 'BULK COMPLETED message from lrun
+            if use_lrun :
+                ret, out = self.shell.find_prompt ()
+                if  ret != 0 :
+                    raise saga.NoSuccess ("failed to run multiline job '%s': (%s)(%s)" % (run_cmd, ret, out))
 
-        return job_id
+            return job_id
         
 
     # ----------------------------------------------------------------
@@ -692,7 +1177,9 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
         """ get the job stats from the wrapper shell """
 
         rm, pid     = self._adaptor.parse_id (id)
-        ret, out, _ = self.shell.run_sync ("STATS %s\n" % pid)
+
+        with self._policy.query () :
+            ret, out, _ = self.shell.run_sync ("STATS %s\n" % pid)
 
         if  ret != 0 :
             raise saga.NoSuccess ("failed to get job stats for '%s': (%s)(%s)" \
@@ -902,9 +1389,12 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
     @SYNC_CALL
     def list (self):
 
-        # FIXME: this should also fetch job state and metadata, and cache those
+        # LIST_STATES also reports state and metadata for all jobs -- we keep
+        # those, so that job instances can be reconnected without further
+        # round trips.  The state table is not touched: it only tracks the
+        # jobs of this service.
 
-        ret, out, _ = self.shell.run_sync ("LIST\n")
+        ret, out, _ = self.shell.run_sync ("LIST_STATES\n")
         if  ret != 0 :
             raise saga.NoSuccess ("failed to list jobs: (%s)(%s)" \
                                % (ret, out))
@@ -916,19 +1406,34 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
             raise saga.NoSuccess ("failed to list jobs (%s)" % (lines))
 
         del lines[0]
-        job_ids = list()
+        job_ids    = list()
+        known_jobs = dict()
 
         for line in lines :
 
             try :
-                pid    = line.strip ()
+                pid, state, code, start, stop, rpid = line.strip ().split (':')
+
                 job_id = "[%s]-[%s]" % (self.rm, pid)
+                info   = {'state'     : self._adaptor.string_to_state (state),
+                          'exit_code' : None,
+                          'started'   : None,
+                          'finished'  : None, 
+                          'rpid'      : rpid}
+
+                if  code.isdigit () : info['exit_code'] = int   (code)
+                if  start           : info['started'  ] = float (start)
+                if  stop            : info['finished' ] = float (stop)
+
                 job_ids.append (job_id)
+                known_jobs[job_id] = info
 
             except Exception as e:
-                self._logger.debug ("Ignore ill-formatted job id (%s) (%s)" % (line, e))
+                self._logger.debug ("Ignore ill-formatted job record (%s) (%s)" % (line, e))
                 continue
 
+        self.known_jobs = known_jobs
+
         return job_ids
    
    
@@ -946,9 +1451,11 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
         if  no_reconnect :
             return None
 
-        known_jobs = self.list ()
+        if  job_id not in self.known_jobs :
+            # our index may be outdated
+            self.list ()
 
-        if  job_id not in known_jobs :
+        if  job_id not in self.known_jobs :
             # can't reconnect
             raise saga.BadParameter._log (self._logger, "job id '%s' unknown"
                                        % job_id)
@@ -957,6 +1464,7 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
         # state information you need there.
         adaptor_state = { "job_service"     : self, 
                           "job_id"          : job_id,
+                          "job_info"        : self.known_jobs[job_id],
                           "job_schema"      : self.rm.schema }
 
         return saga.job.Job (_adaptor=self._adaptor, _adaptor_state=adaptor_state)
@@ -974,66 +1482,93 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
 
         self._logger.debug ("container run: %s"  %  str(jobs))
 
+        results = self._bulk_run ([self._jd2cmd (job.description) for job in jobs])
+
+        for job, result in zip (jobs, results) :
+
+            if  isinstance (result, Exception) :
+                job._adaptor._set_state (saga.job.FAILED)
+                job._adaptor._exception = result
+                continue
+
+            # FIXME: at this point we need to make sure that we actually created
+            # the job.  Well, we should make sure of this *before* we run it.
+            # But, actually, the container sorter should have done that already?
+            # Check!
+            job._adaptor._id = result
+            self._register_job (result, job)
+
+   
+    # ----------------------------------------------------------------
+    #
+    def _bulk_run (self, cmds) :
+        """
+        Submit the given job commands in a single BULK, and return a list which
+        holds, for each command, either the job id or a saga.NoSuccess
+        exception.
+        """
+
         bulk = "BULK\n"
 
-        for job in jobs :
-            cmd   = self._jd2cmd (job.description)
-            bulk += "RUN %s\n" % cmd
+        # simple one-liners use RUN, otherwise LRUN
+        for cmd in cmds :
+            if  not "\n" in cmd :
+                bulk += "RUN %s\n" % cmd
+            else :
+                bulk += "LRUN\n%s\nLRUN_EOT\n" % cmd
 
         bulk += "BULK_RUN\n"
-        self.shell.run_async (bulk)
+        bulk  = bulk.replace ("\\", "\\\\\\\\") # hello MacOS
 
-        for job in jobs :
+        # the bulk spans several prompts -- hold the shell lock for all of
+        # them, so that neither state refreshes nor commands from other threads
+        # interleave
+        with self.shell.pty_shell.rlock :
 
-            ret, out = self.shell.find_prompt ()
+            self.shell.run_async (bulk)
 
-            if  ret != 0 :
-                job._adaptor._set_state (saga.job.FAILED)
-                job._adaptor._exception = saga.NoSuccess ("failed to run job: (%s)(%s)" % (ret, out))
-                continue
+            results = list()
 
-            lines = filter (None, out.split ("\n"))
+            for cmd in cmds :
 
-            if  len (lines) < 2 :
-                job._adaptor._set_state (saga.job.FAILED)
-                job._adaptor._exception = saga.NoSuccess ("failed to run job : (%s)(%s)" % (ret, out))
-                continue
+                ret, out = self.shell.find_prompt ()
 
-            if lines[-2] != "OK" :
-                job._adaptor._set_state (saga.job.FAILED)
-                job._adaptor._exception = saga.NoSuccess ("failed to run job : (%s)(%s)" % (ret, out))
-                continue
+                if  ret != 0 :
+                    results.append (saga.NoSuccess ("failed to run job: (%s)(%s)" % (ret, out)))
+                    continue
 
-            # FIXME: verify format of returned pid (\d+)!
-            pid    = lines[-1].strip ()
-            job_id = "[%s]-[%s]" % (self.rm, pid)
+                lines = filter (None, out.split ("\n"))
 
-            self._logger.debug ("started job %s" % job_id)
+                if  len (lines) < 2 or lines[-2] != "OK" :
+                    results.append (saga.NoSuccess ("failed to run job : (%s)(%s)" % (ret, out)))
+                    continue
 
-            self.njobs += 1
+                # FIXME: verify format of returned pid (\d+)!
+                pid    = lines[-1].strip ()
+                job_id = "[%s]-[%s]" % (self.rm, pid)
 
-            # FIXME: at this point we need to make sure that we actually created
-            # the job.  Well, we should make sure of this *before* we run it.
-            # But, actually, the container sorter should have done that already?
-            # Check!
-            job._adaptor._id = job_id
+                self._logger.debug ("started job %s" % job_id)
 
-        # we also need to find the output of the bulk op itself
-        ret, out = self.shell.find_prompt ()
+                self.njobs += 1
+                results.append (job_id)
+
+            # we also need to find the output of the bulk op itself
+            ret, out = self.shell.find_prompt ()
 
         if  ret != 0 :
             self._logger.error ("failed to run (parts of the) bulk jobs: (%s)(%s)" % (ret, out))
-            return
+            return results
 
         lines = filter (None, out.split ("\n"))
 
         if  len (lines) < 2 :
             self._logger.error ("Cannot evaluate status of bulk job submission: (%s)(%s)" % (ret, out))
-            return
+            return results
 
         if lines[-2] != "OK" :
             self._logger.error ("failed to run (parts of the) bulk jobs: (%s)(%s)" % (ret, out))
-            return
+
+        return results
 
    
     # ----------------------------------------------------------------
@@ -1043,6 +1578,24 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
 
         self._logger.debug ("container wait: %s"  %  str(jobs))
 
+        if  self._notifications_active () :
+
+            # no need to block the shell with WAIT -- just wait for the
+            # notifications to arrive
+            time_start = time.time ()
+
+            for job in jobs :
+
+                if  timeout < 0 :
+                    job._adaptor.wait (timeout)
+
+                else :
+                    remaining = timeout - (time.time () - time_start)
+                    if  not job._adaptor.wait (max (remaining, 0)) :
+                        return
+
+            return
+
         bulk = "BULK\n"
 
         for job in jobs :
@@ -1050,32 +1603,39 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
             bulk   += "WAIT %s\n" % pid
 
         bulk += "BULK_RUN\n"
-        self.shell.run_async (bulk)
 
-        for job in jobs :
+        # the bulk spans several prompts -- hold the shell lock for all
+        # of them, so that no other thread's command interleaves
+        with self.shell.pty_shell.rlock :
+
+            self.shell.run_async (bulk)
 
+            results = [self.shell.find_prompt () for job in jobs]
+
+            # we also need to find the output of the bulk op itself
             ret, out = self.shell.find_prompt ()
 
-            if  ret != 0 :
+        # update the job states outside of the shell lock, as this triggers
+        # callbacks
+        for job, (job_ret, job_out) in zip (jobs, results) :
+
+            if  job_ret != 0 :
                 job._adaptor._set_state (saga.job.FAILED)
-                job._adaptor._exception = saga.NoSuccess ("failed to wait for job: (%s)(%s)" % (ret, out))
+                job._adaptor._exception = saga.NoSuccess ("failed to wait for job: (%s)(%s)" % (job_ret, job_out))
                 continue
 
-            lines = filter (None, out.split ("\n"))
+            lines = filter (None, job_out.split ("\n"))
 
             if  len (lines) < 2 :
                 job._adaptor._set_state (saga.job.FAILED)
-                job._adaptor._exception = saga.NoSuccess ("failed to wait for job : (%s)(%s)" % (ret, out))
+                job._adaptor._exception = saga.NoSuccess ("failed to wait for job : (%s)(%s)" % (job_ret, job_out))
                 continue
 
             if lines[-2] != "OK" :
                 job._adaptor._set_state (saga.job.FAILED)
-                job._adaptor._exception = saga.NoSuccess ("failed to wait for job : (%s)(%s)" % (ret, out))
+                job._adaptor._exception = saga.NoSuccess ("failed to wait for job : (%s)(%s)" % (job_ret, job_out))
                 continue
 
-        # we also need to find the output of the bulk op itself
-        ret, out = self.shell.find_prompt ()
-
         if  ret != 0 :
             self._logger.error ("failed to wait for (parts of the) bulk jobs: (%s)(%s)" % (ret, out))
             return
@@ -1105,32 +1665,39 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
             bulk   += "CANCEL %s\n" % pid
 
         bulk += "BULK_RUN\n"
-        self.shell.run_async (bulk)
 
-        for job in jobs :
+        # the bulk spans several prompts -- hold the shell lock for all
+        # of them, so that no other thread's command interleaves
+        with self.shell.pty_shell.rlock :
+
+            self.shell.run_async (bulk)
 
+            results = [self.shell.find_prompt () for job in jobs]
+
+            # we also need to find the output of the bulk op itself
             ret, out = self.shell.find_prompt ()
 
-            if  ret != 0 :
+        # update the job states outside of the shell lock, as this triggers
+        # callbacks
+        for job, (job_ret, job_out) in zip (jobs, results) :
+
+            if  job_ret != 0 :
                 job._adaptor._set_state (saga.job.FAILED)
-                job._adaptor._exception = saga.NoSuccess ("failed to cancel job: (%s)(%s)" % (ret, out))
+                job._adaptor._exception = saga.NoSuccess ("failed to cancel job: (%s)(%s)" % (job_ret, job_out))
                 continue
 
-            lines = filter (None, out.split ("\n"))
+            lines = filter (None, job_out.split ("\n"))
 
             if  len (lines) < 2 :
                 job._adaptor._set_state (saga.job.FAILED)
-                job._adaptor._exception = saga.NoSuccess ("failed to cancel job : (%s)(%s)" % (ret, out))
+                job._adaptor._exception = saga.NoSuccess ("failed to cancel job : (%s)(%s)" % (job_ret, job_out))
                 continue
 
             if lines[-2] != "OK" :
                 job._adaptor._set_state (saga.job.FAILED)
-                job._adaptor._exception = saga.NoSuccess ("failed to cancel job : (%s)(%s)" % (ret, out))
+                job._adaptor._exception = saga.NoSuccess ("failed to cancel job : (%s)(%s)" % (job_ret, job_out))
                 continue
 
-        # we also need to find the output of the bulk op itself
-        ret, out = self.shell.find_prompt ()
-
         if  ret != 0 :
             self._logger.error ("failed to cancel (parts of the) bulk jobs: (%s)(%s)" % (ret, out))
             return
@@ -1153,60 +1720,24 @@ class ShellJobService (saga.adaptors.cpi.job.Service) :
 
         self._logger.debug ("container get_state: %s"  %  str(jobs))
 
-        bulk   = "BULK\n"
         states = []
 
         for job in jobs :
-            rm, pid = self._adaptor.parse_id (job.id)
-            bulk   += "STATE %s\n" % pid
-
-        bulk += "BULK_RUN\n"
-        self.shell.run_async (bulk)
-
-        for job in jobs :
-
-            ret, out = self.shell.find_prompt ()
-
-            if  ret != 0 :
-                job._adaptor._set_state (saga.job.FAILED)
-                job._adaptor._exception = saga.NoSuccess ("failed to get job state: (%s)(%s)" % (ret, out))
-                continue
-
-            lines = filter (None, out.split ("\n"))
 
-            if  len (lines) < 2 :
-                job._adaptor._set_state (saga.job.FAILED)
-                job._adaptor._exception = saga.NoSuccess ("failed to get job state : (%s)(%s)" % (ret, out))
-                continue
+            # one state at a time, to be able to assign errors to jobs -- that
+            # does not cost extra round trips: the first call refreshes the
+            # states of all non-final jobs.  Final jobs are not queried at all,
+            # and jobs of other services are served by their own service.
+            try :
+                state = job._adaptor.get_state ()
 
-            if lines[-2] != "OK" :
+            except saga.NoSuccess as e :
                 job._adaptor._set_state (saga.job.FAILED)
-                job._adaptor._exception = saga.NoSuccess ("failed to get job state : (%s)(%s)" % (ret, out))
+                job._adaptor._exception = e
                 continue
 
-            state = self._adaptor.string_to_state (lines[-1])
-
-            job._adaptor._set_state (state)
             states.append (state)
 
-
-        # we also need to find the output of the bulk op itself
-        ret, out = self.shell.find_prompt ()
-
-        if  ret != 0 :
-            self._logger.error ("failed to get state for (parts of the) bulk jobs: (%s)(%s)" % (ret, out))
-            return
-
-        lines = filter (None, out.split ("\n"))
-
-        if  len (lines) < 2 :
-            self._logger.error ("Cannot evaluate status of bulk job get_state: (%s)(%s)" % (ret, out))
-            return
-
-        if lines[-2] != "OK" :
-            self._logger.error ("failed to get state for (parts of the) bulk jobs: (%s)(%s)" % (ret, out))
-            return
-
         return states
 
 
@@ -1222,6 +1753,9 @@ class ShellJob (saga.adaptors.cpi.job.Job) :
         _cpi_base = super  (ShellJob, self)
         _cpi_base.__init__ (api, adaptor)
 
+        # signalled on state changes (see wait())
+        self._state_cond = threading.Condition ()
+
 
     # ----------------------------------------------------------------
     #
@@ -1264,6 +1798,17 @@ class ShellJob (saga.adaptors.cpi.job.Job) :
             self._started         = None
             self._finished        = None
 
+            # the job service may already know some details from list()
+            if  'job_info' in job_info :
+                info = job_info['job_info']
+                self._exit_code   = info['exit_code']
+                self._started     = info['started']
+                self._finished    = info['finished']
+                self._set_state     (info['state'])
+
+            # we want to get notifications for reconnected jobs, too
+            self.js._register_job (self._id, self._api ())
+
         else :
             # don't know what to do...
             raise saga.BadParameter ("Cannot create job, insufficient information")
@@ -1291,43 +1836,66 @@ class ShellJob (saga.adaptors.cpi.job.Job) :
             return self._state
 
         # no need to re-fetch final states
-        if  self._state == saga.job.DONE      or \
-            self._state == saga.job.FAILED    or \
-            self._state == saga.job.CANCELED     :
-                return self._state
+        if  self._state in _FINAL_STATES :
+            return self._state
+
+        # the job service keeps the states of all jobs
+        state = self.js._get_states ([self._id])[0]
+
+        return self._set_state (state)
 
-        stats     = self.js._job_get_stats (self._id)
+
+    # ----------------------------------------------------------------
+    #
+    def _get_stats (self) :
+        """ fetch start and stop times from the wrapper """
+
+        if  self._id == None :
+            return
+
+        stats = self.js._job_get_stats (self._id)
 
         if 'start' in stats : self._started  = stats['start']
         if 'stop'  in stats : self._finished = stats['stop']
 
         if self._started  : self._started  = float(self._started)
         if self._finished : self._finished = float(self._finished)
-        
-        if  not 'state' in stats :
-            raise saga.NoSuccess ("failed to get job state for '%s': (%s)" \
-                               % (self._id, stats))
-
-        state = self._adaptor.string_to_state (stats['state'])
-        self._set_state (state)
-
-        return state
 
 
     # ----------------------------------------------------------------
     #
     def _set_state (self, state) :
 
-        old_state = self._state
+        with self._state_cond :
+
+            # final states are final -- late notifications (like a RUNNING
+            # which arrives after a local cancel) must not revive the job
+            if  self._state in _FINAL_STATES and self._state != state :
+                return self._state
+
+            old_state   = self._state
+            self._state = state
+            self._state_cond.notify_all ()
+
+        if  self._id :
+            self.js._update_state (self._id, state)
 
         # on state changes, trigger notifications
         if  old_state != state :
-            self._state  = state
             self._api ()._attributes_i_set ('state', state, self._api ()._UP)
         
         return self._state
 
 
+    # ----------------------------------------------------------------
+    #
+    def _notify (self) :
+        """ wake up all waiting threads, to let them re-check their condition """
+
+        with self._state_cond :
+            self._state_cond.notify_all ()
+
+
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
@@ -1342,7 +1910,9 @@ class ShellJob (saga.adaptors.cpi.job.Job) :
     @SYNC_CALL
     def get_started (self) : 
 
-        self.get_state () # refresh stats
+        if  self._started == None :
+            self._get_stats ()
+
         return self._started
 
 
@@ -1351,14 +1921,19 @@ class ShellJob (saga.adaptors.cpi.job.Job) :
     @SYNC_CALL
     def get_finished (self) : 
 
-        self.get_state () # refresh stats
+        if  self._finished == None :
+            self._get_stats ()
+
         return self._finished
 
 
     # ----------------------------------------------------------------
     #
-    @SYNC_CALL
-    def get_stdout (self) : 
+    def _get_output (self, stream, offset, size) :
+        """ 
+        fetch (a part of) the job's stdout, stderr or log (stream: out, err,
+        log) from the wrapper.  Only the requested byte range is transferred.
+        """
 
         state = self.get_state () # refresh stats
 
@@ -1369,78 +1944,59 @@ class ShellJob (saga.adaptors.cpi.job.Job) :
         if  not self._id :
             raise saga.IncorrectState ("Job output is only available after the job started")
 
-        rm, pid     = self._adaptor.parse_id (self._id)
-        ret, out, _ = self.js.shell.run_sync ("STDOUT %s\n" % pid)
-
-        if  ret != 0 :
-            raise saga.NoSuccess ("failed to get job stdout for '%s': (%s)(%s)" \
-                               % (self._id, ret, out))
-
-        lines = filter (None, out.split ("\n"))
-
-        if lines[0] != "OK" :
-            raise saga.NoSuccess ("failed to get valid job stdout for '%s' (%s)" % (self._id, lines))
+        if  offset < 0 :
+            raise saga.BadParameter ("invalid output offset %s" % offset)
 
-        return _decode('\n'.join (lines[1:]))
-
-
-    # ----------------------------------------------------------------
-    #
-    @SYNC_CALL
-    def get_stderr (self) : 
+        rm, pid = self._adaptor.parse_id (self._id)
+        cmd     = "OUTPUT %s %s %d" % (pid, stream, offset)
 
-        state = self.get_state () # refresh stats
+        if  size != None :
+            cmd += " %d" % size
 
-        if  state == saga.job.NEW      or \
-            state == saga.job.PENDING  :
-            raise saga.IncorrectState ("Job output is only available after the job started")
-
-        if  not self._id :
-            raise saga.IncorrectState ("Job output is only available after the job started")
-
-        rm, pid     = self._adaptor.parse_id (self._id)
-        ret, out, _ = self.js.shell.run_sync ("STDERR %s\n" % pid)
+        ret, out, _ = self.js.shell.run_sync ("%s\n" % cmd)
 
         if  ret != 0 :
-            raise saga.NoSuccess ("failed to get job stderr for '%s': (%s)(%s)" \
-                               % (self._id, ret, out))
+            raise saga.NoSuccess ("failed to get job %s for '%s': (%s)(%s)" \
+                               % (stream, self._id, ret, out))
 
+        # the encoded data come first, followed by 'OK' and the chunk info
         lines = filter (None, out.split ("\n"))
 
-        if lines[0] != "OK" :
-            raise saga.NoSuccess ("failed to get valid job stderr for '%s' (%s)" % (self._id, lines))
+        if  len (lines) < 2 or lines[-2] != "OK" :
+            raise saga.NoSuccess ("failed to get valid job %s for '%s' (%s)" \
+                               % (stream, self._id, lines[-3:]))
 
-        return _decode('\n'.join (lines[1:]))
+        encoding = lines[-1].split ()[0]
+
+        return _decode ('\n'.join (lines[:-2]), encoding)
 
 
     # ----------------------------------------------------------------
     #
     @SYNC_CALL
-    def get_log (self) : 
+    def get_stdout (self, offset=0, size=None) : 
 
-        state = self.get_state () # refresh stats
+        return self._get_output ('out', offset, size)
 
-        if  state == saga.job.NEW      or \
-            state == saga.job.PENDING  :
-            raise saga.IncorrectState ("Job output is only available after the job started")
 
-        if  not self._id :
-            raise saga.IncorrectState ("Job output is only available after the job started")
+    # ----------------------------------------------------------------
+    #
+    @SYNC_CALL
+    def get_stderr (self, offset=0, size=None) : 
 
-        rm, pid     = self._adaptor.parse_id (self._id)
-        ret, out, _ = self.js.shell.run_sync ("LOG %s\n" % pid)
+        return self._get_output ('err', offset, size)
 
-        if  ret != 0 :
-            raise saga.NoSuccess ("failed to get job log for '%s': (%s)(%s)" \
-                               % (self._id, ret, out))
 
-        lines = filter (None, out.split ("\n"))
+    # ----------------------------------------------------------------
+    #
+    @SYNC_CALL
+    def get_log (self, offset=0, size=None) : 
 
-        if lines[0] != "OK" :
-            raise saga.NoSuccess ("failed to get valid job stderr for '%s' (%s)" % (self._id, lines))
+        ret = self._get_output ('log', offset, size)
 
-        ret  = '\n'.join(self._log)  # pre-pend all local log messages
-        ret += _decode('\n'.join(lines[1:]))
+        if  offset == 0 and size == None :
+            # pre-pend all local log messages
+            ret = '\n'.join (self._log) + ret
 
         return ret
 
@@ -1458,9 +2014,6 @@ class ShellJob (saga.adaptors.cpi.job.Job) :
 
     # ----------------------------------------------------------------
     #
-    # TODO: this should also fetch the (final) state, to safe a hop
-    # TODO: implement via notifications
-    #
     @SYNC_CALL
     def wait (self, timeout):
         """ 
@@ -1468,32 +2021,62 @@ class ShellJob (saga.adaptors.cpi.job.Job) :
         other interactions.  In particular, it would practically kill it if the
         Wait waits forever...
 
-        So we implement the wait via a state pull.  The *real* solution is, of
-        course, to implement state notifications, and wait for such
-        a notification to arrive within timeout seconds...
+        So we wait for the state notifications which the job service's monitor
+        thread receives -- that does not cost any round trip to the remote
+        host.  Only if the notification channel is not available, we fall back
+        to pulling the state, paced by the service's polling policy.
         """
 
+        final = _FINAL_STATES
+
         time_start = time.time ()
-        time_now   = time_start
 
-        while True :
+        def _remaining () :
+            if  timeout < 0 :
+                return None
+            return timeout - (time.time () - time_start)
 
-            state = self.get_state ()
+        # notifications only report state *changes* -- for reconnected jobs, we
+        # need to learn about the initial state once.
+        if  self._id and self._state == None :
+            self.get_state ()
+
+        with self._state_cond :
 
-            if  state == saga.job.DONE      or \
-                state == saga.job.FAILED    or \
-                state == saga.job.CANCELED     :
+            while self.js._notifications_active () :
+
+                if  self._state in final :
                     return True
 
-            # avoid busy poll
-            # FIXME: self-tune by checking call latency
-            time.sleep (0.5)
+                remaining = _remaining ()
+
+                if  remaining == None :
+                    # wake up now and then to check if notifications still
+                    # flow -- this is purely local, and does not cost a hop.
+                    self._state_cond.wait (1.0)
 
-            # check if we hit timeout
-            if  timeout >= 0 :
-                time_now = time.time ()
-                if  time_now - time_start > timeout :
+                elif remaining > 0 :
+                    self._state_cond.wait (min (remaining, 1.0))
+
+                else :
                     return False
+
+        # no notifications (anymore) -- pull the state
+        poller = self.js._policy.poller ()
+
+        while True :
+
+            state = self.get_state ()
+
+            if  state in final :
+                return True
+
+            remaining = _remaining ()
+
+            if  remaining != None and remaining <= 0 :
+                return False
+
+            poller.sleep ([state], time_start, timeout)
    
     # ----------------------------------------------------------------
     #
@@ -1537,9 +2120,12 @@ class ShellJob (saga.adaptors.cpi.job.Job) :
     def run (self): 
 
         self._id = self.js._job_run (self.jd)
-        self.js.jobs[self._id] = self._api ()
 
+        # notifications which arrived for this job before this point are
+        # replayed on registration, so set RUNNING first: a replayed final
+        # state must not get overwritten.
         self._set_state (saga.job.RUNNING)
+        self.js._register_job (self._id, self._api ())
 
 
     # ----------------------------------------------------------------
@@ -1576,13 +2162,12 @@ class ShellJob (saga.adaptors.cpi.job.Job) :
                                       saga.job.FAILED] :
             raise saga.IncorrectState ("Cannot cancel, job is not running")
 
-        if  self._state in [saga.job.CANCELED, 
-                            saga.job.DONE, 
-                            saga.job.FAILED] :
-            self._set_state (saga.job.CANCELED)
+        # nothing to cancel -- and final states are kept
+        if  self._state in _FINAL_STATES :
             return
 
         self.js._job_cancel (self._id)
+        self._set_state (saga.job.CANCELED)
    
    
     # ----------------------------------------------------------------
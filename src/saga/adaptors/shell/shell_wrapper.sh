@@ -59,6 +59,15 @@ then
 fi
 NOTIFICATIONS="$BASE/notifications"
 
+# job directories are distributed over that many shard directories (see
+# job_dir())
+SHARDS=256
+
+# the notification log is rotated after that many records, and that many old
+# segments are kept (see cmd_monitor()).
+NOTIFICATIONS_MAX=10000
+NOTIFICATIONS_KEEP=10
+
 # this process will terminate when idle for longer than TIMEOUT seconds
 TIMEOUT=30
 
@@ -67,6 +76,15 @@ TIMESTAMP=0
 
 PURGE_ON_START="%(PURGE_ON_START)s"
 
+# in supervisor mode, jobs are started and reaped by a single supervisor
+# process, instead of one monitor.sh instance per job (see supervisor())
+SUPERVISOR="%(SUPERVISOR)s"
+SUPERVISOR_PID=""
+SUPERVISOR_QUEUE=""
+SUPERVISOR_COUNT=0
+SUPERVISOR_TICK=5
+JOB_COUNT=0
+
 # default exit value is 1, for error.  We need to set explicitly to 0 for
 # non-error conditions.
 EXIT_VAL=1
@@ -80,6 +98,10 @@ EXIT_VAL=1
 # \trap idle_handler ALRM
 \trap '' ALRM
 
+# USR1 is used to wake up the supervisor -- ignoring it here makes sure that
+# an early USR1 does not kill the supervisor before it set its own trap.
+\trap '' USR1
+
 cleanup_handler (){
   cmd_quit $IDLE
 }
@@ -164,11 +186,71 @@ timestamp () {
 }
 
 
+# --------------------------------------------------------------------
+#
+# Job directories are sharded by the job's pid, to keep directory operations
+# cheap on shared file systems: job '<pid>.<n>' lives in
+# "$BASE/jobs/<pid %% SHARDS>/<pid>.<n>".  Directories of jobs created before
+# the sharded layout are still found at "$BASE/<pid>.<n>".
+#
+# Jobs are indexed by empty marker files: "$BASE/active/<id>" for jobs which
+# did not yet reach a final state, "$BASE/final/<id>" for final jobs which
+# were not yet purged.  LIST and PURGE only consider those indexes, and never
+# scan the job directories.
+#
+job_dir () {
+  JOB_PID=${1%%%%.*}
+  case "$JOB_PID" in
+    '' | *[!0-9]* ) JOB_PID=0 ;;
+  esac
+  DIR="$BASE/jobs/$(($JOB_PID %% $SHARDS))/$1"
+  if ! test -d "$DIR" && test -d "$BASE/$1"
+  then
+    DIR="$BASE/$1"
+  fi
+}
+
+# move a job from the active to the final index
+job_final () {
+  \mv -f "$BASE/active/$1" "$BASE/final/$1" 2>/dev/null || : > "$BASE/final/$1"
+}
+
+# set up the sharded layout, and index all jobs found in the old, flat layout
+# (once).  This is the only operation which scans all job directories.
+layout_init () {
+
+  test -f "$BASE/layout" && return
+
+  \mkdir -p "$BASE/jobs" "$BASE/active" "$BASE/final"
+
+  \mkdir "$BASE/layout.lock" 2>/dev/null || return
+  if ! test -f "$BASE/layout"
+  then
+    (\cd "$BASE" ; \ls -C1 -d */ 2>/dev/null) | \cut -f 1 -d '/' | \awk -v base="$BASE" '
+      {
+        state = "" ; f = base "/" $1 "/state"
+        while ((getline line < f) > 0) { if (line ~ / $/) state = line }
+        close (f)
+
+        gsub (/ /, "", state)
+        if      (state == "")                                             next
+        else if (state == "DONE" || state == "FAILED" || state == "CANCELED") print "final/"  $1
+        else                                                              print "active/" $1
+      }' | while \read -r MARKER
+           do
+             : > "$BASE/$MARKER"
+           done
+    \printf "sharded\n" > "$BASE/layout"
+  fi
+  \rmdir "$BASE/layout.lock"
+}
+
+
 # --------------------------------------------------------------------
 # ensure that a given job id points to a viable working directory
 verify_dir () {
   if test -z $1 ;            then ERROR="no pid given";        return 1; fi
-  DIR="$BASE/$1"
+  job_dir "$1"
   if ! test -d "$DIR";       then ERROR="pid $1 not known";    return 1; fi
 }
 
@@ -251,16 +333,18 @@ create_monitor () {
   # i.e. that job id
   POST=0
   UPID="\$MPID.\$POST"
-  DIR="$BASE/\$UPID"
+  SHARD="$BASE/jobs/\$((\$MPID %% $SHARDS))"
+  DIR="\$SHARD/\$UPID"
   
-  while test -d "\$DIR"
+  while test -d "\$DIR" || test -d "$BASE/\$UPID"
   do
     POST=\$((\$POST+1))
     UPID="\$MPID.\$POST"
-    DIR="$BASE/\$UPID"
+    DIR="\$SHARD/\$UPID"
   done
 
   \\mkdir -p "\$DIR"
+  : > "$BASE/active/\$UPID"
 
 # exec 2>"\$DIR/monitor.trace"
 # set -x 
@@ -341,6 +425,8 @@ create_monitor () {
     test   "\$retv" -eq 0  && \\printf "\$UPID:DONE:\$retv   \\n" >> "\$NOTIFICATIONS"
     test   "\$retv" -eq 0  || \\printf "\$UPID:FAILED:\$retv \\n" >> "\$NOTIFICATIONS"
 
+    \\mv -f "$BASE/active/\$UPID" "$BASE/final/\$UPID"
+
 
     # done waiting
     break
@@ -355,19 +441,409 @@ EOT
 
 # --------------------------------------------------------------------
 #
-# list all job IDs
+# The supervisor is started (as background subshell) on the first RUN in
+# supervisor mode, and is the parent process of all jobs started by this
+# wrapper instance.  The wrapper prepares the job directories (with the same
+# layout monitor.sh uses), and queues the job ids in the supervisor's queue
+# file.  It then wakes the supervisor with USR1.  The supervisor starts queued
+# jobs, and collects the exit codes of all of its jobs in one loop.  That loop
+# runs whenever a signal arrives (USR1 for new jobs, CHLD for finished ones),
+# or every SUPERVISOR_TICK seconds otherwise.  The timestamp for the state
+# records is taken once per loop, for all jobs handled in that loop.
+#
+# mpid is set to the job's pid: with 'set -m', each job leads its own process
+# group, so that cmd_cancel works as for monitor.sh jobs.  The supervisor
+# survives the wrapper, and finishes once the wrapper is gone and all its jobs
+# are done.
+#
+supervisor () {
+
+  WPID=$1
+  QUEUE=$2
+  SEEN=0
+  JOBS=""
+
+  \trap ''       HUP
+  \trap -        QUIT TERM EXIT
+  \trap 'WAKE=1' USR1 CHLD
+  set -m 2>/dev/null
+
+  while true
+  do
+    timestamp
+    WAKE=""
+
+    # start all jobs which got queued since the last loop
+    N=0
+    while \read -r UPID
+    do
+      N=$(($N+1))
+      if test $N -gt $SEEN
+      then
+        SEEN=$N
+        supervisor_start "$UPID"
+      fi
+    done < "$QUEUE"
+
+    # reap all jobs which are gone
+    ALIVE=""
+    for JOB in $JOBS
+    do
+      if kill -0 ${JOB%%%%:*} 2>/dev/null
+      then
+        ALIVE="$ALIVE $JOB"
+      else
+        supervisor_reap "$JOB"
+      fi
+    done
+    JOBS=$ALIVE
+
+    if test -z "$JOBS" && ! kill -0 $WPID 2>/dev/null
+    then
+      # nothing left to do
+      \rm -f "$QUEUE"
+      exit 0
+    fi
+
+    # something happened while we were busy -- no need to sleep
+    test -z "$WAKE" || continue
+
+    # sleep until the next signal, or the next tick
+    \sleep $SUPERVISOR_TICK &
+    SLEEPER=$!
+    wait $SLEEPER
+    kill $SLEEPER 2>/dev/null
+  done
+}
+
+
+supervisor_start () {
+
+  job_dir "$1"
+
+  (
+    SAGA_PWD="$DIR"
+    SAGA_UPID="$1"
+    export SAGA_PWD SAGA_UPID
+    exec /bin/sh "$DIR/cmd" < "$DIR/in" > "$DIR/out" 2> "$DIR/err"
+  ) 3</dev/null &
+
+  RPID=$!
+  JOBS="$JOBS $RPID:$1"
+
+  \printf "$RPID\n"               > "$DIR/rpid"
+  \printf "$RPID\n"               > "$DIR/mpid"
+  \printf "START  : $TIMESTAMP\n" > "$DIR/stats"
+  \printf "$TIMESTAMP : RUNNING \n" >> "$DIR/log"
+  \printf "RUNNING \n"           >> "$DIR/state"
+  \printf "$1:RUNNING: \n"       >> "$NOTIFICATIONS"
+}
+
+
+supervisor_reap () {
+
+  RPID=${1%%%%:*}
+  UPID=${1#*:}
+  job_dir "$UPID"
+
+  # the job is gone, so this returns immediately
+  wait $RPID
+  RETV=$?
+
+  \printf "STOP   : $TIMESTAMP\n" >> "$DIR/stats"
+  \printf "$RETV\n"               > "$DIR/exit"
+
+  # on cancel, cmd_cancel records the final state
+  if test -e "$DIR/canceled"
+  then
+    return
+  fi
+
+  if test "$RETV" -eq 0
+  then
+    \printf "DONE   \n"              >> "$DIR/state"
+    \printf "$UPID:DONE:$RETV   \n"  >> "$NOTIFICATIONS"
+  else
+    \printf "FAILED \n"              >> "$DIR/state"
+    \printf "$UPID:FAILED:$RETV \n"  >> "$NOTIFICATIONS"
+  fi
+
+  job_final "$UPID"
+}
+
+
+# --------------------------------------------------------------------
+#
+# Job state notifications are kept in a segmented log.  All writers append
+# one record per line to "$NOTIFICATIONS", the current segment.  Once that
+# holds more than NOTIFICATIONS_MAX records, it is renamed to
+# "$NOTIFICATIONS.<seq>", where <seq> is the (zero padded) sequence number of
+# its first record, and a new segment is started.  "$NOTIFICATIONS.seq" holds
+# the sequence number of the first record in the current segment, and only
+# the last NOTIFICATIONS_KEEP old segments are kept.
+#
+# The sequence number of a record is thus implied by its position in the log.
+# Rotation is only performed by MONITOR, under a lock (mkdir is atomic): when
+# it starts, and whenever the segment it follows has grown beyond
+# NOTIFICATIONS_MAX records, so that the log stays bounded also for long-lived
+# monitors.  Once an old segment is sealed, NOTIFICATIONS_SEAL is appended to
+# it -- that line is not a record, but tells monitors which follow the
+# segment (via 'tail -f') to move on to the next one.
+#
+NOTIFICATIONS_SEAL="SEALED"
+
+notifications_lock () {
+
+  LOCK_WAIT=0
+  while ! \mkdir "$NOTIFICATIONS.lock" 2>/dev/null
+  do
+    # break stale locks, left behind by killed monitors
+    LOCK_WAIT=$(($LOCK_WAIT+1))
+    if test "$LOCK_WAIT" -gt 10
+    then
+      \rm -rf "$NOTIFICATIONS.lock"
+      LOCK_WAIT=0
+    fi
+    \sleep 1
+  done
+}
+
+notifications_unlock () {
+
+  \rmdir "$NOTIFICATIONS.lock" 2>/dev/null
+}
+
+# segment name for a given sequence number
+notifications_segment () {
+
+  \printf "%%s.%%012d" "$NOTIFICATIONS" "$1"
+}
+
+# sequence number from a segment name (strips the zero padding, which would
+# otherwise be interpreted as octal)
+notifications_seq () {
+
+  SEG_SEQ=${1##*.}
+  SEG_SEQ=${SEG_SEQ#"${SEG_SEQ%%%%[!0]*}"}
+  test -z "$SEG_SEQ" && SEG_SEQ=0
+}
+
+# seal a rotated segment: publish the sequence number of the next segment,
+# and mark the end of this one for its monitors
+notifications_seal () {
+
+  SEAL_COUNT=`\wc -l < "$2" | \tr -d ' '`
+  \printf "%%d\n" $(($1+$SEAL_COUNT)) > "$NOTIFICATIONS.seq.$$"
+  \mv "$NOTIFICATIONS.seq.$$" "$NOTIFICATIONS.seq"
+  \printf "%%s\n" "$NOTIFICATIONS_SEAL" >> "$2"
+}
+
+# start a new segment.  The current one gets its segment name (as hard link)
+# before it is replaced, so that "$NOTIFICATIONS" always exists.
+notifications_start () {
+
+  \ln -f  "$NOTIFICATIONS" "$1"
+  \touch  "$NOTIFICATIONS.new.$$"
+  \mv     "$NOTIFICATIONS.new.$$" "$NOTIFICATIONS"
+}
+
+notifications_rotate () {
+
+  \read ROT_SEQ < "$NOTIFICATIONS.seq"
+  ROT_SEG=`notifications_segment $ROT_SEQ`
+
+  # a rotation got interrupted (by a killed monitor) before the segment was
+  # sealed -- complete it now, so that its monitors can move on
+  if test -f "$ROT_SEG"
+  then
+    test "$ROT_SEG" -ef "$NOTIFICATIONS" && notifications_start "$ROT_SEG"
+    notifications_seal $ROT_SEQ "$ROT_SEG"
+    \read ROT_SEQ < "$NOTIFICATIONS.seq"
+    ROT_SEG=`notifications_segment $ROT_SEQ`
+  fi
+
+  ROT_COUNT=`\wc -l < "$NOTIFICATIONS" | \tr -d ' '`
+  test "$ROT_COUNT" -lt "$NOTIFICATIONS_MAX" && return
+
+  notifications_start "$ROT_SEG"
+
+  # writers which opened the segment before the rename may still append to
+  # it -- give them a second before the segment is sealed.  Monitors follow
+  # the old segment until then.
+  \sleep 1
+  notifications_seal $ROT_SEQ "$ROT_SEG"
+
+  # drop old segments (the names sort numerically, due to the padding)
+  \ls -r "$NOTIFICATIONS".[0-9]* 2>/dev/null \
+    | \tail -n +$(($NOTIFICATIONS_KEEP+1)) \
+    | while \read -r ROT_OLD
+      do
+        \rm -f "$ROT_OLD"
+      done
+}
+
+
+# open the segment with the given sequence number on fd 7 -- it may get
+# rotated while we open it, so check its segment name afterwards
+notifications_open () {
+
+  OPEN_SEG=`notifications_segment $1`
+
+  if ! test -f "$OPEN_SEG"
+  then
+    exec 7< "$NOTIFICATIONS"
+    test -f "$OPEN_SEG" || return
+  fi
+
+  exec 7< "$OPEN_SEG"
+}
+
+
+# --------------------------------------------------------------------
+#
+# report job state notifications, as '<seq>:<upid>:<state>:<data>'.  Without
+# argument, only new records are reported -- otherwise, all records starting
+# at the given sequence number are replayed first, so that a client can
+# resume after a reconnect without losing any state changes.  If those
+# records are not available anymore, 'GAP <seq>' is reported, with the
+# sequence number of the oldest record available.
 #
 cmd_monitor () {
 
-  # 'touch' to make sure the file exists, and use '-n 0' so that we don't 
-  # read old notifications'
-  # NOTE: tail complains on inotify handle shortage, and then continues 
-  #       by using pulling.  We redirect stderr to /dev/null -- lets pray 
-  #       that we don't miss any other notifications... :/
-  \touch        "$NOTIFICATIONS"
-  \tail -f -n 0 "$NOTIFICATIONS" 2>/dev/null
+  # fix the read position before we report READY, so that no notification can
+  # get lost in between.
+  notifications_lock
+
+  test -f "$NOTIFICATIONS"     || \touch "$NOTIFICATIONS"
+  test -s "$NOTIFICATIONS.seq" || \printf "0\n" > "$NOTIFICATIONS.seq"
+  notifications_rotate
+
+  \read MON_SEG < "$NOTIFICATIONS.seq"
+  MON_COUNT=`\wc -l < "$NOTIFICATIONS" | \tr -d ' '`
+  exec 7< "$NOTIFICATIONS"
+
+  notifications_unlock
+
+  # without cursor, or with a cursor beyond the end of the log (which was
+  # then reset), we report new records only
+  MON_END=$(($MON_SEG+$MON_COUNT))
+  MON_START=$1
+  test -z "$MON_START" && MON_START=$MON_END
+
+  \printf "READY %%d\n" $MON_START
+
+  if test "$MON_START" -gt "$MON_END"
+  then
+    \printf "GAP %%d\n" $MON_END
+    MON_START=$MON_END
+  fi
+
+  # replay old segments, each up to the start of the next one
+  MON_FIRST=$MON_SEG
+  MON_PREV=""
+  for MON_FILE in "$NOTIFICATIONS".[0-9]* "$NOTIFICATIONS"
+  do
+    test -f "$MON_FILE" || continue
+
+    if test "$MON_FILE" = "$NOTIFICATIONS"
+    then
+      SEG_SEQ=$MON_SEG
+    else
+      notifications_seq "$MON_FILE"
+    fi
+
+    if test -z "$MON_PREV"
+    then
+      MON_FIRST=$SEG_SEQ
+      if test "$MON_START" -lt "$MON_FIRST"
+      then
+        \printf "GAP %%d\n" $MON_FIRST
+        MON_START=$MON_FIRST
+      fi
+    elif test "$SEG_SEQ" -gt "$MON_START"
+    then
+      \awk -v n=$MON_PREV_SEQ -v start=$MON_START -v stop=$SEG_SEQ \
+          -v seal="$NOTIFICATIONS_SEAL" \
+          '$0 == seal { next } n >= start && n < stop { print n ":" $0 } { n++ }' \
+          "$MON_PREV"
+    fi
+
+    MON_PREV=$MON_FILE
+    MON_PREV_SEQ=$SEG_SEQ
+  done
+
+  # now follow the log, starting with the current segment on fd 7.  'tail -f'
+  # reads the segment via the fd, so that it stays on the old segment when
+  # that gets rotated, until the seal shows up.  tail feeds us via a fifo, so
+  # that we can stop it when moving on to the next segment.  The fifo is
+  # removed as soon as both ends are open.
+  MON_SEQ=$MON_SEG
+  MON_FIFO="$NOTIFICATIONS.fifo.$$"
+
+  while true
+  do
+    \rm -f   "$MON_FIFO"
+    \mkfifo "$MON_FIFO"
+    \tail -f -n +1 <&7 > "$MON_FIFO" 2>/dev/null &
+    MON_TAIL=$!
+    exec 8< "$MON_FIFO"
+    \rm -f   "$MON_FIFO"
+
+    MON_SEALED=""
+    MON_ROTATED=""
+    while IFS= \read -r MON_REC <&8
+    do
+      if test "$MON_REC" = "$NOTIFICATIONS_SEAL"
+      then
+        MON_SEALED=1
+        break
+      fi
+
+      if test "$MON_SEQ" -ge "$MON_START"
+      then
+        \printf "%%d:%%s\n" $MON_SEQ "$MON_REC" || break
+      fi
+      MON_SEQ=$(($MON_SEQ+1))
+
+      # rotate the log ourself when the segment is full -- but don't wait for
+      # the lock if some other monitor holds it.  The seal of the rotation
+      # shows up in the segment soon after.
+      if test -z "$MON_ROTATED" -a "$(($MON_SEQ-$MON_SEG))" -ge "$NOTIFICATIONS_MAX"
+      then
+        if \mkdir "$NOTIFICATIONS.lock" 2>/dev/null
+        then
+          notifications_rotate
+          notifications_unlock
+          MON_ROTATED=1
+        fi
+      fi
+    done
+
+    \kill $MON_TAIL 2>/dev/null
+    \wait $MON_TAIL 2>/dev/null
+    exec 8<&-
+
+    # tail or the channel died
+    test -z "$MON_SEALED" && break
+
+    # the segment is sealed and drained -- continue with the next one, which
+    # may itself be sealed already.
+    \read MON_NEXT < "$NOTIFICATIONS.seq"
 
-  # if tail dies for some reason, make sure the shell goes down
+    if test "$MON_SEQ" -ge "$MON_NEXT"
+    then
+      MON_SEQ=$MON_NEXT
+    elif ! test -f "`notifications_segment $MON_SEQ`"
+    then
+      \printf "GAP %%d\n" $MON_NEXT || break
+      MON_SEQ=$MON_NEXT
+    fi
+    notifications_open $MON_SEQ
+    MON_SEG=$MON_SEQ
+  done
+  exec 7<&-
+
+  # if the channel dies for some reason, make sure the shell goes down
   \printf "EXIT\n"
   ERROR="EXIT"
   true
@@ -413,6 +889,12 @@ cmd_monitor () {
 
 cmd_run () {
 
+  if test "$SUPERVISOR" = "True"
+  then
+    cmd_run_supervised "$@"
+    return
+  fi
+
   # do a double fork to avoid zombies.  Use 'set -m' to force a new process
   # group for the monitor
   (
@@ -425,7 +907,8 @@ cmd_run () {
   \read -r UPID < "$BASE/fifo"
 
   # report the current state
-  \tail -n 1 "$BASE/$UPID/state" || \printf "UNKNOWN\n"
+  job_dir "$UPID"
+  \tail -n 1 "$DIR/state" || \printf "UNKNOWN\n"
 
   # return job id
   RETVAL="$UPID"
@@ -433,6 +916,55 @@ cmd_run () {
 }
 
 
+# --------------------------------------------------------------------
+#
+# run a job via the supervisor: prepare the job directory (as monitor.sh
+# does), and hand the job over to the supervisor, which is started if needed.
+# The job will usually still be NEW when this returns.
+#
+cmd_run_supervised () {
+
+  if test -z "$SUPERVISOR_PID" || ! kill -0 $SUPERVISOR_PID 2>/dev/null
+  then
+    # a new supervisor needs a new queue, so that it does not restart old jobs
+    test -z "$SUPERVISOR_QUEUE" || \rm -f "$SUPERVISOR_QUEUE"
+    SUPERVISOR_COUNT=$(($SUPERVISOR_COUNT+1))
+    SUPERVISOR_QUEUE="$BASE/supervisor.$$.$SUPERVISOR_COUNT"
+    : > "$SUPERVISOR_QUEUE"
+
+    ( supervisor $$ "$SUPERVISOR_QUEUE" ) </dev/null 1>/dev/null 2>/dev/null 3</dev/null &
+    SUPERVISOR_PID=$!
+  fi
+
+  JOB_COUNT=$(($JOB_COUNT+1))
+  job_dir "$$.$JOB_COUNT"
+  while test -d "$DIR"
+  do
+    JOB_COUNT=$(($JOB_COUNT+1))
+    job_dir "$$.$JOB_COUNT"
+  done
+
+  UPID="$$.$JOB_COUNT"
+  \mkdir -p "$DIR"
+  : > "$BASE/active/$UPID"
+
+  : > "$DIR/in"
+  : > "$DIR/supervised"
+  \printf "#!/bin/sh\n\n" > "$DIR/cmd"
+  \printf "$@\n"        >> "$DIR/cmd"
+  \printf "$UPID\n"      > "$DIR/upid"
+  \printf "NEW \n"      >> "$DIR/state"
+
+  \printf "$UPID\n"     >> "$SUPERVISOR_QUEUE"
+  kill -USR1 $SUPERVISOR_PID
+
+  # report the current state
+  \printf "NEW \n"
+
+  RETVAL="$UPID"
+}
+
+
 cmd_lrun () {
   # LRUN allows to run shell commands which span more than one line.
   CMD=""
@@ -458,7 +990,7 @@ cmd_lrun () {
 cmd_state () {
   verify_state $1 || return
 
-  DIR="$BASE/$1"
+  job_dir "$1"
   RETVAL=`\grep -e ' $' "$DIR/state" | \tail -n 1 | \tr -d ' '`
   if test "$RETVAL" = ""
   then
@@ -475,7 +1007,7 @@ cmd_stats () {
   # stats are only defined for jobs in some state
   verify_state $1 || return
 
-  DIR="$BASE/$1"
+  job_dir "$1"
   STATE=`\grep -e ' $' "$DIR/state" | \tail -n 1 | \tr -d ' '`
   RETVAL="STATE : $STATE\n"
   RETVAL="$RETVAL\n`\cat $DIR/stats`\n"
@@ -533,7 +1065,7 @@ cmd_wait () {
 cmd_result () {
   verify_state $1 || return
 
-  DIR="$BASE/$1"
+  job_dir "$1"
   state=`\grep -e ' $' "$DIR/state" | \tail -n 1 | \tr -d ' '`
 
   if test "$state" != "DONE" -a "$state" != "FAILED" -a "$state" != "CANCELED"
@@ -559,7 +1091,7 @@ cmd_suspend () {
   verify_state $1 || return
   verify_pid   $1 || return
 
-  DIR="$BASE/$1"
+  job_dir "$1"
   state=`\grep -e ' $' "$DIR/state" | \tail -n 1 | \tr -d ' '`
   rpid=`\cat "$DIR/rpid"`
 
@@ -578,6 +1110,15 @@ cmd_suspend () {
     \printf "SUSPENDED \n" >>  "$DIR/state"
     \printf "$state \n"    >   "$DIR/state.susp"
     RETVAL="$1 suspended"
+
+    # without monitor.sh, we have to record the event ourself
+    if test -f "$DIR/supervised"
+    then
+      \rm -f "$DIR/suspended"
+      timestamp
+      \printf "SUSPEND: $TIMESTAMP\n" >> "$DIR/stats"
+      \printf "$1:SUSPENDED: \n"       >> "$NOTIFICATIONS"
+    fi
   else
     \rm -f   "$DIR/suspended"
     ERROR="suspend failed ($ECODE): $RETVAL"
@@ -594,7 +1135,7 @@ cmd_resume () {
   verify_state $1 || return
   verify_pid   $1 || return
 
-  DIR="$BASE/$1"
+  job_dir "$1"
   state=`\grep -e ' $' "$DIR/state" | \tail -n 1 | \tr -d ' '`
   rpid=`\cat "$DIR/rpid"`
 
@@ -614,6 +1155,15 @@ cmd_resume () {
     \cat    "$DIR/state.susp"                         >> "$DIR/state"
     \rm  -f "$DIR/state.susp"
     RETVAL="$1 resumed"
+
+    # without monitor.sh, we have to record the event ourself
+    if test -f "$DIR/supervised"
+    then
+      \rm -f "$DIR/resumed"
+      timestamp
+      \printf "RESUME : $TIMESTAMP\n" >> "$DIR/stats"
+      \printf "$1:RUNNING: \n"         >> "$NOTIFICATIONS"
+    fi
   else
     \rm  -f "$DIR/resumed"
     ERROR="resume failed ($ECODE): $RETVAL"
@@ -630,12 +1180,19 @@ cmd_cancel () {
   verify_state $1 || return
   verify_pid   $1 || return
 
-  DIR="$BASE/$1"
+  job_dir "$1"
 
 
   rpid=`\cat "$DIR/rpid"`
   mpid=`\cat "$DIR/mpid"`
 
+  # supervised jobs have no monitor, and mpid is the job itself: make sure
+  # that the supervisor does not record a final state when the job dies
+  if test -f "$DIR/supervised"
+  then
+    : > "$DIR/canceled"
+  fi
+
   # first kill monitor, so that it does not interfer with state management
   /bin/kill -TERM $mpid 2>/dev/null
   /bin/kill -KILL $mpid 2>/dev/null
@@ -655,7 +1212,9 @@ cmd_cancel () {
   /bin/kill -KILL               $rpid 2>/dev/null
 
   # FIXME: how can we check for success?  ps?
-  \printf "CANCELED \n" >> "$DIR/state"
+  \printf "CANCELED \n"     >> "$DIR/state"
+  \printf "$1:CANCELED: \n" >> "$NOTIFICATIONS"
+  job_final "$1"
   RETVAL="$1 canceled"
 }
 
@@ -667,7 +1226,7 @@ cmd_cancel () {
 cmd_stdin () {
   verify_in $1 || return
 
-  DIR="$BASE/$1"
+  job_dir "$1"
   shift
   \printf "$@" >> "$DIR/in"
   RETVAL="stdin refreshed"
@@ -681,7 +1240,7 @@ cmd_stdin () {
 cmd_stdout () {
   verify_out $1 || return
 
-  DIR="$BASE/$1"
+  job_dir "$1"
   RETVAL=`cat "$DIR/out" | od -t x1 -A n #| cut -c 2- | tr -d ' \n'`
 }
 
@@ -693,7 +1252,7 @@ cmd_stdout () {
 cmd_stderr () {
   verify_err $1 || return
 
-  DIR="$BASE/$1"
+  job_dir "$1"
   RETVAL=`cat "$DIR/err" | od -t x1 -A n #| cut -c 2- | tr -d ' \n'`
 }
 
@@ -705,41 +1264,159 @@ cmd_stderr () {
 cmd_log () {
   verify_log $1 || return
 
-  DIR="$BASE/$1"
+  job_dir "$1"
   RETVAL=`cat "$DIR/log" | od -t x1 -A n #| cut -c 2- | tr -d ' \n'`
 }
 
 
 # --------------------------------------------------------------------
 #
-# list all job IDs
+# print a part of the job's stdout, stderr or log.  Arguments are the job id,
+# the stream (out, err or log), the byte offset to start at, and the max number
+# of bytes to return (default: all remaining data).  The data are base64
+# encoded if 'base64' is available, and hex encoded otherwise.  They are
+# printed directly, not via RETVAL, to avoid keeping them in shell memory --
+# RETVAL reports the parameters of the returned chunk:
+#
+#   <encoding> <offset> <size> <total size of stream>
 #
+# Note that 'head -c' is not POSIX, but is available on all relevant systems
+# (and 'dd' cannot reliably count bytes on pipes).
+#
+cmd_output () {
+  verify_dir $1 || return
+
+  case "$2" in
+    out | err | log ) ;;
+    *               ) ERROR="invalid stream '$2'"; return 1 ;;
+  esac
+
+  FILE="$DIR/$2"
+  if ! test -r "$FILE"; then ERROR="pid $1 has no $2"; return 1; fi
+
+  OFFSET=${3:-0}
+  SIZE=${4:--1}
+  TOTAL=`\wc -c < "$FILE" | \tr -d ' '`
+
+  N=0
+  if test "$OFFSET" -lt "$TOTAL"
+  then
+    N=$(($TOTAL-$OFFSET))
+    if test "$SIZE" -ge 0 -a "$SIZE" -lt "$N"
+    then
+      N=$SIZE
+    fi
+  fi
+
+  ENCODING=hex
+  if command -v base64 >/dev/null 2>&1
+  then
+    ENCODING=base64
+  fi
+
+  if test "$N" -gt 0
+  then
+    if test "$ENCODING" = "base64"
+    then
+      \tail -c +$(($OFFSET+1)) "$FILE" | \head -c $N | base64
+    else
+      \tail -c +$(($OFFSET+1)) "$FILE" | \head -c $N | \od -t x1 -A n
+    fi
+  fi
+
+  RETVAL="$ENCODING $OFFSET $N $TOTAL"
+}
+
+
+# --------------------------------------------------------------------
+#
+# list the IDs of all indexed jobs.  A job which moves from the active to the
+# final index while we list can show up twice, so we filter duplicates.
+#
+list_ids () {
+  \ls -1 "$BASE/active" "$BASE/final" 2>/dev/null | \awk '/^$/ || /:$/ { next } !seen[$0]++'
+}
+
 cmd_list () {
-  RETVAL=`(\cd "$BASE" ; \ls -C1 -d */ 2>/dev/null) | \cut -f 1 -d '/'`
+  RETVAL=`list_ids`
+}
+
+
+# --------------------------------------------------------------------
+#
+# list all jobs, with their state, exit code, start and stop time, and the
+# pid of the job process.  This prints one record per job
+#
+#   id:state:exit:start:stop:rpid
+#
+# where fields which are not (yet) known are left empty.  A single awk
+# instance collects all records, so that no processes are spawned per job.
+#
+cmd_list_states () {
+  RETVAL=$(list_ids | \awk -v base="$BASE" -v shards=$SHARDS '
+    {
+      id = $1 ; state = "" ; code = "" ; start = "" ; stop = "" ; rpid = ""
+
+      # see job_dir()
+      d = base "/jobs/" (int (id) %% shards) "/" id
+      f = d "/state"
+      if ((getline line < f) < 0) { d = base "/" id ; f = d "/state" }
+      close (f)
+
+      while ((getline line < f) > 0) { if (line ~ / $/) state = line }
+      close (f)
+
+      gsub (/ /, "", state)
+      if (state == "") next
+
+      f = d "/stats"
+      while ((getline line < f) > 0) {
+        if (line ~ /^START/) { sub (/^[^:]*: */, "", line) ; start = line }
+        if (line ~ /^STOP/ ) { sub (/^[^:]*: */, "", line) ; stop  = line }
+      }
+      close (f)
+
+      f = d "/exit" ; if ((getline line < f) > 0) code = line ; close (f)
+      f = d "/rpid" ; if ((getline line < f) > 0) rpid = line ; close (f)
+
+      print id ":" state ":" code ":" start ":" stop ":" rpid
+    }' )
 }
 
 
 # --------------------------------------------------------------------
 #
 # purge working directories of given jobs 
-# default (no job id given): purge all final jobs older than 1 day
+# default (no job id given): purge all jobs which are final for more than
+# 1 day
 #
 cmd_purge () {
 
   if ! test -z "$1"
   then
-    DIR="$BASE/$1"
+    job_dir "$1"
     \rm -rf "$DIR"
+    \rm -f  "$BASE/active/$1" "$BASE/final/$1"
     RETVAL="purged $1"
   else
-    for d in `\grep -l -e 'DONE' -e 'FAILED' -e 'CANCELED' "$BASE"/*/state 2>/dev/null`
-    do
-      dir=`dirname "$d"`
-      id=`basename "$dir"`
-      \find  "$BASE/$id"      -type f -mtime +1 -print | xargs -n 100 rm -f
-      \rmdir "$BASE/$id"      >/dev/null 2>&1
-      \touch "$NOTIFICATIONS"
-    done
+    # jobs which got final without updating the index (such as jobs started
+    # by an older wrapper version) are moved to the final index first
+    cmd_list_states
+    \printf "%%s\n" "$RETVAL" | \awk -F: '$2 == "DONE" || $2 == "FAILED" || $2 == "CANCELED" { print $1 }' \
+      | while \read -r id
+        do
+          test -f "$BASE/active/$id" && job_final "$id"
+        done
+
+    (\cd "$BASE/final" && \find . -type f -mtime +1 -print 2>/dev/null) \
+      | while \read -r id
+        do
+          id=${id#./}
+          job_dir "$id"
+          \rm -rf "$DIR"
+          \rm -f  "$BASE/final/$id"
+        done
+    \touch "$NOTIFICATIONS"
     RETVAL="purged finished jobs"
   fi
 }
@@ -801,6 +1478,7 @@ listen() {
 
   # we need our home base cleaned
   test -d "$BASE" || \mkdir -p  "$BASE"  || exit 1
+  layout_init
   \rm  -f "$BASE/bulk.$$"
   \touch  "$BASE/bulk.$$"
 
@@ -809,6 +1487,10 @@ listen() {
   then
     \touch "$NOTIFICATIONS"
   fi
+  if ! test -s "$NOTIFICATIONS.seq"
+  then
+    \printf "0\n" > "$NOTIFICATIONS.seq"
+  fi
 
   # make sure we get killed when idle
   ( idle_checker $$ 1>/dev/null 2>/dev/null 3</dev/null & ) &
@@ -873,7 +1555,9 @@ listen() {
         STDOUT    ) cmd_stdout  "$ARGS"  ;;
         STDERR    ) cmd_stderr  "$ARGS"  ;;
         LOG       ) cmd_log     "$ARGS"  ;;
+        OUTPUT    ) cmd_output   $ARGS   ;;
         LIST      ) cmd_list    "$ARGS"  ;;
+        LIST_STATES ) cmd_list_states    ;;
         PURGE     ) cmd_purge   "$ARGS"  ;;
         QUIT      ) cmd_quit    "$IDLE"  ;;
         NOOP      ) ERROR="NOOP"         ;;
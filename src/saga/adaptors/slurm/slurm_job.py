@@ -21,6 +21,7 @@ import time
 import textwrap
 import string
 import tempfile
+import threading
 
 SYNC_CALL  = saga.adaptors.cpi.decorators.SYNC_CALL
 ASYNC_CALL = saga.adaptors.cpi.decorators.ASYNC_CALL
@@ -36,12 +37,287 @@ def log_error_and_raise(message, exception, logger):
 #
 _PTY_TIMEOUT = 2.0
 
+_FINAL_STATES = [saga.job.DONE, saga.job.FAILED, saga.job.CANCELED]
+
+# number of job ids passed to a single squeue / sacct invocation
+_QUERY_CHUNK  = 200
+
+# delimiter for job scripts which are passed as here documents
+_SCRIPT_EOF   = 'SAGA_SLURM_SCRIPT_EOF'
+
+# --------------------------------------------------------------------
+#
+class _job_state_tracker(object):
+    """ Keeps state, timestamps, execution hosts and exit codes of all jobs of
+        a job service in one table (the service's `jobs` dict).  If a table
+        entry older than the tracker interval is requested, the entries of
+        *all* non-final jobs are refreshed at once: with one squeue call, and
+        one sacct call for those jobs which have left the queue (or are in
+        a final state, but have no exit code yet).  Final entries are never
+        refreshed again.
+    """
+
+    def __init__(self, job_service, interval):
+
+        self.js       = job_service
+        self.logger   = job_service._logger
+        self.interval = interval
+        self.lock     = threading.RLock()
+
+    # ----------------------------------------------------------------
+    #
+    def track(self, job_id, state=saga.job.UNKNOWN):
+        """ add a job to the table
+        """
+        with self.lock:
+            self.js.jobs[job_id] = {
+                'job_id'     : job_id,
+                'state'      : state,
+                'create_time': None,
+                'start_time' : None,
+                'end_time'   : None,
+                'exec_hosts' : None,
+                'returncode' : None,
+                'updated'    : time.time()
+            }
+
+    # ----------------------------------------------------------------
+    #
+    def set_state(self, job_id, state):
+        """ overwrite the state of a job, e.g. after it got canceled
+        """
+        with self.lock:
+            if job_id not in self.js.jobs:
+                self.track(job_id, state)
+            else:
+                self.js.jobs[job_id]['state'  ] = state
+                self.js.jobs[job_id]['updated'] = time.time()
+
+    # ----------------------------------------------------------------
+    #
+    def get(self, job_id):
+        """ return (a copy of) the table entry for the given job, refreshing
+            the table if needed.  Jobs which are not in the table yet (for
+            example on reconnect) are added.
+        """
+        with self.lock:
+
+            jobs = self.js.jobs
+
+            if job_id not in jobs:
+                self.track(job_id)
+                self.refresh()
+
+            elif jobs[job_id]['state'] not in _FINAL_STATES and \
+                 time.time() - jobs[job_id]['updated'] > self.interval:
+                self.refresh()
+
+            return dict(jobs[job_id])
+
+    # ----------------------------------------------------------------
+    #
+    def refresh(self):
+        """ refresh the table entries of all non-final jobs
+        """
+        with self.lock:
+
+            jobs = self.js.jobs
+            pids = dict()
+
+            for job_id in jobs:
+                if jobs[job_id]['state'] not in _FINAL_STATES:
+                    rm, pid = self.js._adaptor.parse_id(job_id)
+                    pids[pid] = job_id
+
+            if not pids:
+                return
+
+            queued    = self._query(pids.keys(), self.js._squeue_cmd
+                                        % self.js._commands['squeue'])
+            accounted = dict()
+            missing   = list()
+
+            for pid in pids:
+
+                if pid in queued:
+                    self._update(pids[pid], queued[pid])
+                    if queued[pid]['state'] not in _FINAL_STATES:
+                        continue
+
+                missing.append(pid)
+
+            if missing and self.js._commands.get('sacct'):
+
+                accounted = self._query(missing, self.js._sacct_cmd
+                                        % self.js._commands['sacct'])
+
+                for pid in accounted:
+                    self._update(pids[pid], accounted[pid])
+
+            for pid in pids:
+
+                job_id = pids[pid]
+
+                if pid not in queued and pid not in accounted:
+                    # neither squeue nor sacct know about the job (anymore).
+                    # If it was pending or running, it most likely finished
+                    # -- otherwise we can only guess that it failed.  Either
+                    # way, we won't learn more about it, so we make it final.
+                    if jobs[job_id]['state'] in [saga.job.PENDING,
+                                                 saga.job.RUNNING]:
+                        state = saga.job.DONE
+                    else:
+                        state = saga.job.FAILED
+
+                    self.logger.warning("Couldn't find job %s in SLURM -- "
+                                        "setting state to %s" % (job_id, state))
+                    jobs[job_id]['state'] = state
+
+                jobs[job_id]['updated'] = time.time()
+
+    # ----------------------------------------------------------------
+    #
+    def _update(self, job_id, info):
+
+        entry = self.js.jobs[job_id]
+
+        for key in info:
+            if info[key] is not None:
+                entry[key] = info[key]
+
+        entry['updated'] = time.time()
+
+    # ----------------------------------------------------------------
+    #
+    def _query(self, pids, cmd):
+        """ run the given squeue or sacct command line for all pids, and parse
+            its '|' separated output of
+
+                jobid|state|exitcode|submit|start|end|nodelist
+
+            into a dict of info dicts, keyed by pid.  The ids are passed in
+            chunks via a here document, so that the command line stays short,
+            and all chunks are handled in a single round trip.
+        """
+        # array tasks ('<pid>_<task>') are queried via their array job
+        chunks = list()
+        pids   = list(pids)
+        bases  = sorted(set([pid.split('_')[0] for pid in pids]))
+
+        for i in range(0, len(bases), _QUERY_CHUNK):
+            chunks.append(','.join(bases[i:i+_QUERY_CHUNK]))
+
+        with self.js._policy.query():
+            ret, out, _ = self.js.shell.run_sync(
+                "{ while read ids; do %s 2>/dev/null; done <<EOT\n%s\nEOT\n}"
+                % (cmd, '\n'.join(chunks)))
+
+        infos  = dict()
+        wanted = set(pids)
+
+        for line in out.split('\n'):
+
+            elems = line.strip().split('|')
+
+            if len(elems) != 7:
+                continue
+
+            pid, state, exit_code, created, started, finished, hosts = elems
+
+            if pid not in wanted:
+                continue
+
+            info = dict()
+            info['state'      ] = self.js._slurm_to_saga_jobstate(state.split(' ')[0])
+            info['returncode' ] = _slurm_exit_code(exit_code)
+            info['create_time'] = _slurm_field(created)
+            info['start_time' ] = _slurm_field(started)
+            info['end_time'   ] = _slurm_field(finished)
+            info['exec_hosts' ] = _slurm_field(hosts)
+
+            infos[pid] = info
+
+        return infos
+
+
+# --------------------------------------------------------------------
+#
+def _slurm_field(val):
+    """ SLURM reports unset fields (times, node lists) as 'N/A', 'Unknown',
+        'None', 'None assigned' or '(null)'
+    """
+    val = val.strip()
+    if val in ['', 'N/A', 'Unknown', 'None', 'None assigned', '(null)']:
+        return None
+    return val
+
+
+# --------------------------------------------------------------------
+#
+def _slurm_exit_code(val):
+    """ sacct reports exit codes as '<code>:<signal>' -- squeue does not
+        report them at all
+    """
+    try:
+        return int(val.split(':')[0])
+    except ValueError:
+        return None
+
 # --------------------------------------------------------------------
 # the adaptor name
 #
 _ADAPTOR_NAME          = "saga.adaptor.slurm_job"
 _ADAPTOR_SCHEMAS       = ["slurm", "slurm+ssh", "slurm+gsissh"]
-_ADAPTOR_OPTIONS       = []
+_ADAPTOR_OPTIONS       = [
+    {
+    'category'         : 'saga.adaptor.slurm_job',
+    'name'             : 'state_interval',
+    'type'             : int,
+    'default'          : 1,
+    'documentation'    : '''Maximal age (in seconds) of cached job information
+                          (state, timestamps, exit code).  Once a job's
+                          information is older than this, the information of
+                          all non-final jobs of the job service is refreshed
+                          at once, via one squeue and at most one sacct call.''',
+    'env_variable'     : 'SAGA_SLURM_STATE_INTERVAL'
+    },
+    {
+    'category'         : 'saga.adaptor.slurm_job',
+    'name'             : 'polling',
+    'type'             : str,
+    'default'          : 'pending=2,pending_max=30,running=1,final=1',
+    'documentation'    : '''Polling intervals for wait(), in seconds, as comma
+                          separated key=value pairs: pending, pending_max,
+                          running, final, backoff, latency (see
+                          saga.utils.poll_policy).  Job information is not
+                          refreshed more often than <state_interval>.''',
+    'env_variable'     : None
+    },
+    {
+    'category'         : 'saga.adaptor.slurm_job',
+    'name'             : 'job_arrays',
+    'type'             : bool,
+    'default'          : True,
+    'valid_options'    : [True, False],
+    'documentation'    : '''Submit homogeneous jobs of a task container (jobs
+                          which only differ in arguments, environment and
+                          output files) as one job array, with a single
+                          sbatch call.  Each array task is still represented
+                          by its own job instance.''',
+    'env_variable'     : None
+    },
+    {
+    'category'         : 'saga.adaptor.slurm_job',
+    'name'             : 'job_array_max',
+    'type'             : int,
+    'default'          : 1000,
+    'documentation'    : '''Maximal number of tasks per job array.  Larger
+                          sets of homogeneous jobs are split into several
+                          arrays.  This needs to be lower than SLURM's
+                          'MaxArraySize' setting.''',
+    'env_variable'     : None
+    }
+]
 
 # --------------------------------------------------------------------
 # the adaptor capabilities & supported attributes
@@ -170,11 +446,14 @@ _ADAPTOR_DOC           = {
            (see _job_cancel)
          - If we can't suspend a job with scontrol suspend, we raise an exception
            (see _job_suspend).  scontrol suspend NOT supported on Stampede
-         - I started to implement a dictionary to keep track of jobs locally.
-           It works to the point where the unit tests are passed, but I have
-           not gone over theis extensively...
-         - Relating to the above, _job_get_info is written, but unused/untested
-           (mostly from PBS adaptor)
+         - Job states, timestamps, execution hosts and exit codes are kept in
+           a per-service table, which is refreshed for all non-final jobs at
+           once via squeue (and sacct for jobs which left the queue).  See
+           the 'state_interval' option.
+         - Homogeneous jobs run via a task container are submitted as job
+           arrays (see the 'job_arrays' option).  The array tasks get their
+           own job ids (`[url]-[<array job id>_<task id>]`), and can be
+           watched and canceled individually.
 
         """,
     "example": "examples/jobs/slurmjob.py",
@@ -221,6 +500,12 @@ class Adaptor (saga.adaptors.base.Base):
         saga.adaptors.base.Base.__init__ (self, _ADAPTOR_INFO, _ADAPTOR_OPTIONS)
 
         self.id_re = re.compile ('^\[(.*)\]-\[(.*?)\]$')
+        self.opts  = self.get_config (_ADAPTOR_NAME)
+
+        self.state_interval = self.opts['state_interval'].get_value ()
+        self.job_arrays     = self.opts['job_arrays'    ].get_value ()
+        self.job_array_max  = self.opts['job_array_max' ].get_value ()
+        self.polling        = self.opts['polling'       ].get_value ()
 
     # ----------------------------------------------------------------
     #
@@ -253,12 +538,14 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
 
         # TODO make sure this formats properly and works right!
         self.exit_code_re            = re.compile(r"\bExitCode  \b=(\d*)", re.VERBOSE)
-        self.scontrol_jobstate_re    = re.compile(r"\bJobState  \b=(\S*)", re.VERBOSE)
-        self.scontrol_create_time_re = re.compile(r"\bSubmitTime\b=(\S*)", re.VERBOSE)
-        self.scontrol_start_time_re  = re.compile(r"\bStartTime \b=(\S*)", re.VERBOSE)
-        self.scontrol_end_time_re    = re.compile(r"\bEndTime   \b=(\S*)", re.VERBOSE)
-        self.scontrol_comp_time_re   = re.compile(r"\bRunTime   \b=(\S*)", re.VERBOSE)
-        self.scontrol_exec_hosts_re  = re.compile(r"\bNodeList  \b=(\S*)", re.VERBOSE)
+
+        # bulk state queries -- both print the same fields, the ids are
+        # expected in $ids (see _job_state_tracker._query).  squeue does not
+        # know about exit codes, so we print a placeholder instead.  The
+        # discovered tool paths are filled in on use.
+        self._squeue_cmd = "%s -h -r -t all -j $ids -o '%%i|%%T|-|%%V|%%S|%%e|%%N'"
+        self._sacct_cmd  = "%s -n -P -X -j $ids " \
+                           "--format=JobID,State,ExitCode,Submit,Start,End,NodeList"
 
         # these are the commands that we need in order to interact with SLURM
         # the adaptor will try to find them when it first opens the shell
@@ -286,7 +573,8 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
         self.rm      = rm_url
         self.session = session
 
-        self.jobs = {}
+        self.jobs    = {}
+        self.tracker = _job_state_tracker (self, self._adaptor.state_interval)
         self._open ()
 
         return self.get_api ()
@@ -360,10 +648,51 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
                                                     self.session, 
                                                     self._logger)
 
+        # paces the state queries of all job services for this host
+        self._policy = self.shell.get_poll_policy (_ADAPTOR_NAME,
+                                                   self._adaptor.polling)
+
+        # use the discovery results of an earlier job service for the same
+        # host and user, if they are cached and cover what we need
+        self._discovery        = self.shell.get_discovery_cache (_ADAPTOR_NAME)
+        self._discovery_cached = False
+
+        info = None
+        if  self._discovery :
+            info = self._discovery.get ()
+
+        if  info is not None and (self.rm.username or 'username' in info) :
+            self._logger.info ("Using cached SLURM discovery results: %s" % info)
+            self._discovery_cached = True
+
+        else :
+            info = self._discover ()
+            if  self._discovery :
+                self._discovery.put (info)
+
+        self._commands = info['commands']
+
+        # figure out username if it wasn't made explicit
+        self.rm.detected_username = self.rm.username or info['username']
+
+        return
+
+
+    # ----------------------------------------------------------------
+    #
+    def _discover (self) :
+        """
+        Find the SLURM tools (and, if needed, the user name) on the remote
+        host, and return them as dict
+        """
+
+        info     = dict()
+        commands = dict()
+
         # verify our SLURM environment contains the commands we need for this
         # adaptor to work properly
         self._logger.debug("Verifying existence of remote SLURM tools.")
-        for cmd in self._commands.keys():
+        for cmd in ['sbatch', 'squeue', 'scontrol', 'scancel']:
             ret, out, _ = self.shell.run_sync("which %s " % cmd)
             if ret != 0:
                 message = "Error finding SLURM tool %s on remote server %s!\n" \
@@ -372,10 +701,22 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
                           "If so, is your remote SLURM environment "\
                           "configured properly? " % (cmd, self.rm, out)
                 raise saga.NoSuccess._log (self._logger, message)
+
+            commands[cmd] = out.strip()
+
+        # sacct is optional -- without accounting, we lose track of jobs once
+        # they leave the queue
+        ret, out, _ = self.shell.run_sync("which sacct")
+        if ret == 0:
+            commands['sacct'] = out.strip()
+        else:
+            self._logger.warning("sacct not found -- exit codes and states of "
+                                 "jobs which left the queue are not available")
                 
         self._logger.debug ("got cmd prompt (%s)(%s)" % (ret, out))
-        
-        self.rm.detected_username = self.rm.username
+
+        info['commands'] = commands
+
         # figure out username if it wasn't made explicit
         # important if .ssh/config info read+connected with 
         # a different username than what we expect
@@ -383,11 +724,37 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
             self._logger.debug ("No username provided in URL %s, so we are"
                                 " going to find it with whoami" % self.rm)
             ret, out, _ = self.shell.run_sync("whoami")
-            self.rm.detected_username = out.strip()
+            info['username'] = out.strip()
             self._logger.debug("Username detected as: %s",
-                               self.rm.detected_username)
+                               info['username'])
+
+        return info
+
+
+    # ----------------------------------------------------------------
+    #
+    def _rediscover (self) :
+        """
+        Drop cached discovery results after a failed submission, and
+        rediscover the remote environment.  Returns False if the results were
+        not cached (so that rediscovery would not change anything).
+        """
+
+        if  not self._discovery_cached :
+            return False
+
+        self._logger.info ("SLURM submission failed -- discovering again")
+        self._discovery.invalidate ()
+
+        info = self._discover ()
+        self._discovery.put (info)
+        self._discovery_cached = False
+
+        self._commands = info['commands']
+        self.rm.detected_username = self.rm.username or info['username']
+
+        return True
 
-        return
 
     # ----------------------------------------------------------------
     #
@@ -402,8 +769,14 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
     # ----------------------------------------------------------------
     #
     #
-    def _job_run (self, jd) :
-        """ runs a job on the wrapper via pty, and returns the job id """
+    def _job_script (self, jd, tasks=None) :
+        """ 
+        Creates the sbatch script for the given job description.  If `tasks`
+        (a list of job descriptions which differ from `jd` at most in
+        arguments, environment, output and error) is given, the script
+        describes a job array, where each array task picks up its own
+        arguments, environment and output files.
+        """
         
         #define a bunch of default args
         exe = jd.executable
@@ -515,10 +888,24 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
         if  cwd is not "":
             slurm_script += "#SBATCH -D %s\n" % cwd
 
-        if  output:
+        # array tasks with individual output files redirect their stdio
+        # themselves (see the task section below)
+        def _attr (t, name) :
+            if  t.attribute_exists (name) :
+                return t.get_attribute (name)
+            return None
+
+        task_output = tasks and len(set([_attr (t, 'output') for t in tasks])) > 1
+        task_error  = tasks and len(set([_attr (t, 'error' ) for t in tasks])) > 1
+
+        if  task_output:
+            slurm_script += "#SBATCH -o /dev/null\n"
+        elif  output:
             slurm_script += "#SBATCH -o %s\n" % output
         
-        if  error:
+        if  task_error:
+            slurm_script += "#SBATCH -e /dev/null\n"
+        elif  error:
             slurm_script += "#SBATCH -e %s\n" % error
 
         if  wall_time_limit:
@@ -538,6 +925,9 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
         if  job_contact:
             slurm_script += "#SBATCH --mail-user=%s\n" % job_contact
 
+        if  tasks:
+            slurm_script += "#SBATCH --array=0-%d\n" % (len(tasks) - 1)
+
         # make sure we are not missing anything important
         if  not queue:
             raise saga.BadParameter._log (self._logger, 
@@ -548,7 +938,34 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
                                           "a queue to submit the job to.")
 
         # add on our environment variables
-        if jd.attribute_exists ("environment") :
+        if tasks :
+            slurm_script += "\n## TASKS\n"
+            slurm_script += 'case "$SLURM_ARRAY_TASK_ID" in\n'
+            for i, task in enumerate (tasks) :
+                slurm_script += "%d)\n" % i
+                if task.attribute_exists ("environment") :
+                    for key,val in task.environment.iteritems() :
+                        slurm_script += "    export %s=%s\n"  %  (key, val)
+                if task.attribute_exists ("arguments") :
+                    slurm_script += "    set -- %s\n" % ' '.join (task.arguments)
+                else :
+                    slurm_script += "    set --\n"
+                if task_output :
+                    if task.attribute_exists ("output") :
+                        slurm_script += "    exec 1>%s\n" % task.output
+                    else :
+                        slurm_script += "    exec 1>%s\n" % output
+                    if not task_error and not error :
+                        slurm_script += "    exec 2>&1\n"
+                if task_error :
+                    if task.attribute_exists ("error") :
+                        slurm_script += "    exec 2>%s\n" % task.error
+                    else :
+                        slurm_script += "    exec 2>&1\n"
+                slurm_script += "    ;;\n"
+            slurm_script += "esac\n"
+
+        elif jd.attribute_exists ("environment") :
             slurm_script += "\n## ENVIRONMENT\n"
             for key,val in jd.environment.iteritems() :
                 slurm_script += "export %s=%s\n"  %  (key, val)
@@ -561,7 +978,9 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
         # create our commandline
         slurm_script += "\n## EXEC\n"
         slurm_script += exe
-        if jd.attribute_exists ("arguments") :
+        if tasks :
+            slurm_script += ' "$@"'
+        elif jd.attribute_exists ("arguments") :
             slurm_script += ' ' + ' '.join (jd.arguments)
         slurm_script += '\n'
 
@@ -570,60 +989,131 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
             for cmd in post :
                 slurm_script += "%s\n" % cmd
 
-        # try to create the working directory (if defined)
-        # WRANING: this assumes a shared filesystem between login node and
-        #           comnpute nodes.
-        if  jd.working_directory is not None:
-            self._logger.info("Creating working directory %s" % jd.working_directory)
-            ret, out, _ = self.shell.run_sync("mkdir -p %s" % (jd.working_directory))
-            if ret != 0:
-                # something went wrong
-                message = "Couldn't create working directory - %s" % (out)
-                log_error_and_raise(message, saga.NoSuccess, self._logger)
+        return slurm_script
+
+
+    # ----------------------------------------------------------------
+    #
+    def _job_submit (self, jd, slurm_script) :
+        """ submits the given script, and returns the SLURM job id """
+
+        ret, out, _ = self.shell.run_sync (self._job_submit_cmd (jd, slurm_script))
+
+        self._logger.debug ("staged/submit SLURM script (%s)" % ret)
+
+        return self._job_submit_parse (out)
+
 
+    # ----------------------------------------------------------------
+    #
+    def _job_submit_cmd (self, jd, slurm_script) :
+        """ 
+        returns the command line which creates the working directory (if
+        defined), writes the given script into a tmp file, and submits it
+        """
 
-        # write script into a tmp file for staging
         self._logger.info ("SLURM script generated:\n%s" % slurm_script)
 
+        # the script is passed as (literal) here document, so that it can be
+        # submitted along with other commands, in a single shell exchange
         tgt = os.path.basename (tempfile.mktemp (suffix='.slurm', prefix='tmp_'))
-        self.shell.write_to_remote (src=slurm_script, tgt=tgt)
+        cmd = "cat > '%s' <<'%s' && sbatch '%s'; rm -f '%s'\n%s\n%s" \
+            % (tgt, _SCRIPT_EOF, tgt, tgt, slurm_script.rstrip ('\n'), _SCRIPT_EOF)
 
-        # submit the job
-        ret, out, _ = self.shell.run_sync ("sbatch '%s'; rm -vf '%s'" % (tgt, tgt))
+        # WRANING: this assumes a shared filesystem between login node and
+        #           comnpute nodes.
+        if  jd.working_directory is not None:
+            cmd = "mkdir -p %s && %s" % (jd.working_directory, cmd)
 
-        self._logger.debug ("staged/submit SLURM script (%s) (%s)" % (tgt, ret))
+        return cmd
+
+
+    # ----------------------------------------------------------------
+    #
+    def _job_submit_parse (self, out) :
+        """ returns the SLURM job id from the output of a submit command """
 
         # find out what our job ID will be
-        # TODO: Could make this more efficient
-        found_id = False
         for line in out.split("\n"):
             if "Submitted batch job" in line:
-                self.job_id = "[%s]-[%s]" % \
-                    (self.rm, int(line.split()[-1:][0]))
-                found_id = True
+                self._logger.debug("Batch system output:\n%s" % out)
+                return str(int(line.split()[-1:][0]))
 
         # if we have no job ID, there's a failure...
-        if not found_id:
-            raise saga.NoSuccess._log(self._logger, 
-                             "Couldn't get job id from submitted job!"
-                              " sbatch output:\n%s" % out)
+        raise saga.NoSuccess._log(self._logger, 
+                         "Couldn't get job id from submitted job!"
+                          " sbatch output:\n%s" % out)
+
+
+    # ----------------------------------------------------------------
+    #
+    def _job_run (self, jd) :
+        """ runs a job via sbatch, and returns the job id """
+
+        try :
+            pid = self._job_submit (jd, self._job_script (jd))
+
+        except saga.NoSuccess :
+            # the submission may have failed because of stale cached discovery
+            # results -- if so, rediscover and try once more
+            if  not self._rediscover () :
+                raise
+            pid = self._job_submit (jd, self._job_script (jd))
+
+        return self._job_register (pid)
+
+
+    # ----------------------------------------------------------------
+    #
+    def _job_register (self, pid) :
+        """ adds a submitted job to the state table, and returns its job id """
+
+        self.job_id = "[%s]-[%s]" % (self.rm, pid)
 
         self._logger.debug("started job %s" % self.job_id)
-        self._logger.debug("Batch system output:\n%s" % out)
 
         # create local jobs dictionary entry
-        self.jobs[self.job_id] = {
-                'state': saga.job.PENDING,
-                'create_time': None,
-                'start_time': None,
-                'end_time': None,
-                'comp_time': None,
-                'exec_hosts': None,
-                'gone': False
-            }
+        self.tracker.track (self.job_id, saga.job.PENDING)
 
         return self.job_id
 
+
+    # ----------------------------------------------------------------
+    #
+    def _job_array_register (self, pid, n) :
+        """ 
+        adds the tasks of a submitted job array to the state table, and
+        returns their job ids
+        """
+
+        job_ids = list()
+
+        for i in range (n) :
+            job_id = "[%s]-[%s_%d]" % (self.rm, pid, i)
+            self.tracker.track (job_id, saga.job.PENDING)
+            job_ids.append (job_id)
+
+        self._logger.debug("started job array %s (%d tasks)" % (pid, n))
+
+        return job_ids
+
+
+    # ----------------------------------------------------------------
+    #
+    def _job_array_key (self, jd) :
+        """ 
+        jobs with the same key can be submitted as one job array: they may
+        only differ in arguments, environment, and output files
+        """
+
+        attribs = jd.as_dict ()
+
+        for key in [saga.job.ARGUMENTS, saga.job.ENVIRONMENT,
+                    saga.job.OUTPUT,    saga.job.ERROR] :
+            attribs.pop (key, None)
+
+        return repr (sorted (attribs.items ()))
+
     # ----------------  
     # FROM STAMPEDE'S SQUEUE MAN PAGE
     # 
@@ -672,7 +1162,13 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
             return saga.job.UNKNOWN
 
     def _job_get_exit_code (self, id) :
-        """ get the job exit code from the wrapper shell """
+        """ get the job exit code from the state table, or from scontrol """
+
+        self.exit_code = self.tracker.get (id)['returncode']
+
+        if  self.exit_code is not None :
+            return self.exit_code
+
         rm, pid     = self._adaptor.parse_id (id)
         ret, out, _ = self.shell.run_sync("scontrol show job %s" % pid)
         match       = self.exit_code_re.search (out)
@@ -705,6 +1201,7 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
         rm, pid     = self._adaptor.parse_id (id)
         ret, out, _ = self.shell.run_sync("scancel %s" % pid)
         if ret == 0:
+            self.tracker.set_state (id, saga.job.CANCELED)
             return True
         else:
             raise saga.NoSuccess._log(self._logger,
@@ -830,31 +1327,190 @@ class SLURMJobService (saga.adaptors.cpi.job.Service) :
   #         for (job_obj, job_id) in self._jobs.iteritems():
   #             if job_id == jobid:
   #                 return job_obj.get_api ()
-  #
-  #
-  # # ----------------------------------------------------------------
-  # #
-  # def container_run (self, jobs) :
-  #     self._logger.debug("container run: %s"  %  str(jobs))
-  #     # TODO: this is not optimized yet
-  #     for job in jobs:
-  #         job.run()
-  #
-  #
-  # # ----------------------------------------------------------------
-  # #
-  # def container_wait (self, jobs, mode, timeout) :
-  #     self._logger.debug("container wait: %s"  %  str(jobs))
-  #     # TODO: this is not optimized yet
-  #     for job in jobs:
-  #         job.wait()
-  #
-  #
-  # # ----------------------------------------------------------------
-  # #
-  # def container_cancel (self, jobs) :
-  #     self._logger.debug("container cancel: %s"  %  str(jobs))
-  #     raise saga.NoSuccess("Not Implemented");
+
+
+    # ----------------------------------------------------------------
+    #
+    def container_run (self, jobs) :
+        """
+        Sort the jobs into sets of homogeneous jobs, and submit each set as
+        one job array (of at most 'job_array_max' tasks).  Jobs which have no
+        sibling are submitted individually.  Jobs which cannot be submitted are
+        marked as FAILED, and the last error is raised once all other jobs are
+        submitted.
+        """
+
+        self._logger.debug("container run: %s"  %  str(jobs))
+
+        groups = list()
+        keys   = dict()
+
+        for job in jobs :
+
+            if  not self._adaptor.job_arrays :
+                groups.append ([job])
+                continue
+
+            key = self._job_array_key (job.description)
+
+            if  key not in keys or \
+                len (groups[keys[key]]) >= self._adaptor.job_array_max :
+                keys[key] = len (groups)
+                groups.append (list())
+
+            groups[keys[key]].append (job)
+
+        # create all job scripts, and submit them in a single shell exchange
+        error   = None
+        submits = list()
+        cmds    = list()
+
+        for group in groups :
+
+            jds = [job.description for job in group]
+
+            try :
+                if  len (group) > 1 :
+                    script = self._job_script (jds[0], jds)
+                else :
+                    script = self._job_script (jds[0])
+
+            except saga.SagaException as e :
+                # submit the other groups anyway
+                error = e
+                self._container_fail (group, e)
+                continue
+
+            submits.append (group)
+            cmds.append (self._job_submit_cmd (jds[0], script))
+
+        results  = self.shell.run_bulk (cmds)
+        rejected = False
+
+        for group, (ret, out) in zip (submits, results) :
+
+            try :
+                pid = self._job_submit_parse (out)
+
+            except saga.SagaException as e :
+                error    = e
+                rejected = True
+                self._container_fail (group, e)
+                continue
+
+            if  len (group) > 1 :
+                job_ids = self._job_array_register (pid, len (group))
+            else :
+                job_ids = [self._job_register (pid)]
+
+            for job, job_id in zip (group, job_ids) :
+                job._adaptor._id      = job_id
+                job._adaptor._started = True
+
+        if  rejected :
+            # make sure that later submissions don't use stale cached
+            # discovery results
+            self._rediscover ()
+
+        if  error :
+            raise error
+
+
+    # ----------------------------------------------------------------
+    #
+    def _container_fail (self, jobs, e) :
+        """ marks jobs which could not be submitted as failed """
+
+        for job in jobs :
+            job._adaptor._state     = saga.job.FAILED
+            job._adaptor._exception = e
+
+
+    # ----------------------------------------------------------------
+    #
+    def container_wait (self, jobs, mode, timeout) :
+        """
+        waits for any or all jobs to reach a final state -- the state table is
+        refreshed for all jobs at once, at most once per tracker interval
+        """
+
+        self._logger.debug("container wait: %s"  %  str(jobs))
+
+        time_start = time.time()
+        poller     = self._policy.poller ()
+
+        while True :
+
+            states = self.container_get_states (jobs)
+
+            if  saga.job.UNKNOWN in states :
+                log_error_and_raise("cannot get job state", saga.IncorrectState, self._logger)
+
+            final = [state for state in states if state in _FINAL_STATES]
+
+            if  len (final) == len (jobs) :
+                return
+
+            if  final and mode == saga.ANY :
+                return
+
+            # check if we hit timeout
+            if  timeout >= 0 :
+                if  time.time() - time_start > timeout :
+                    return
+
+            # avoid busy poll
+            poller.sleep (states, time_start, timeout)
+
+
+    # ----------------------------------------------------------------
+    #
+    def container_cancel (self, jobs, timeout) :
+        """ cancels all jobs which are not yet final with a single scancel """
+
+        self._logger.debug("container cancel: %s"  %  str(jobs))
+
+        job_ids = [job._adaptor._id for job in jobs
+                   if  job._adaptor._id and \
+                       job._adaptor._state not in _FINAL_STATES]
+
+        if  not job_ids :
+            return
+
+        # the job ids are passed on stdin, to avoid overly long command lines
+        pids = [self._adaptor.parse_id (job_id)[1] for job_id in job_ids]
+
+        ret, out, _ = self.shell.run_sync ("{ xargs %s <<EOT\n%s\nEOT\n}" \
+                                        % (self._commands['scancel'], '\n'.join (pids)))
+        if  ret != 0 :
+            raise saga.NoSuccess._log (self._logger,
+                                       "Could not cancel jobs because: %s" % out)
+
+        for job_id in job_ids :
+            self.tracker.set_state (job_id, saga.job.CANCELED)
+
+
+    # ----------------------------------------------------------------
+    #
+    def container_get_states (self, jobs) :
+        """ returns the job states, after one bulk refresh of the state table """
+
+        self._logger.debug("container get_states: %s"  %  str(jobs))
+
+        self.tracker.refresh ()
+
+        states = list()
+
+        for job in jobs :
+
+            job_id = job._adaptor._id
+
+            if  job_id and job._adaptor._state not in _FINAL_STATES :
+                job._adaptor._state = self.tracker.get (job_id)['state']
+
+            states.append (job._adaptor._state)
+
+        return states
 
 
 ###############################################################################
@@ -879,10 +1535,8 @@ class SLURMJob (saga.adaptors.cpi.job.Job):
         self.jd = job_info["job_description"]
         self.js = job_info["job_service"] 
 
-        # the js is responsible for job bulk operations -- which
-        # for jobs only work for run()
+        # the js is responsible for job bulk operations (container_*)
         self._container       = self.js
-        self._method_type     = "run"
 
         # initialize job attribute values
         self._id              = None
@@ -902,86 +1556,8 @@ class SLURMJob (saga.adaptors.cpi.job.Job):
 
         return self.get_api ()
 
-    def _job_get_info (self, job_id):
-        """ 
-        use scontrol to grab job info 
-        NOT CURRENTLY USED/TESTED, here for later
-        """
-        # if we don't have the job in our dictionary, we don't want it
-        # TODO: verify correctness, we should probably probe anyhow
-        #       in case it was added by an external app
-        if job_id not in self.js.jobs:
-            message = "Unknown job ID: %s. Can't update state." % job_id
-            raise saga.NoSuccess._log(self._logger, message)
-
-        # prev. info contains the info collect when _job_get_info
-        # was called the last time
-        prev_info = self.js.jobs[job_id]
-
-        # if the 'gone' flag is set, there's no need to query the job
-        # state again. it's gone forever
-        if prev_info['gone'] is True:
-            self._logger.warning("Job information is not available anymore.")
-            return prev_info
-
-        # curr. info will contain the new job info collect. it starts off
-        # as a copy of prev_info (don't use deepcopy because there is an API 
-        # object in the dict -> recursion)
-        curr_info = dict()
-        curr_info['job_id'     ] = prev_info.get ('job_id'     )
-        curr_info['state'      ] = prev_info.get ('state'      )
-        curr_info['create_time'] = prev_info.get ('create_time')
-        curr_info['start_time' ] = prev_info.get ('start_time' )
-        curr_info['end_time'   ] = prev_info.get ('end_time'   )
-        curr_info['comp_time'  ] = prev_info.get ('comp_time'  )
-        curr_info['exec_hosts' ] = prev_info.get ('exec_hosts' )
-        curr_info['gone'       ] = prev_info.get ('gone'       )
-
-        rm, pid = self._adaptor.parse_id(job_id)
-
-        # update current info with scontrol
-        ret, out, _ = self.js.shell.run_sync('scontrol show job %s' % pid)
-      # self._logger.debug("Updating job status using the following information:\n%s" % out) 
-
-        # update the state
-        curr_info['state'] = self._job_get_state(job_id)
-
-
-        match = self.js.scontrol_create_time_re.search(out)
-        if match:
-            curr_info['create_time'] = match.group(1)
-            self._logger.debug("create_time for job %s detected as %s" % \
-                               (pid, curr_info['create_time']))
-
-        match = self.js.scontrol_start_time_re.search(out)
-        if match:
-            curr_info['start_time'] = match.group(1)
-            self._logger.debug("start_time for job %s detected as %s" % \
-                               (pid, curr_info['start_time']))
-
-        match = self.js.scontrol_end_time_re.search(out)
-        if match:
-            curr_info['end_time'] = match.group(1)
-            self._logger.debug("end_time for job %s detected as %s" % \
-                               (pid, curr_info['end_time']))
-
-        match = self.js.scontrol_comp_time_re.search(out)
-        if match:
-            curr_info['comp_time'] = match.group(1)
-            self._logger.debug("comp_time for job %s detected as %s" % \
-                               (pid, curr_info['comp_time']))
-
-        match = self.js.scontrol_exec_hosts_re.search(out)
-        if match:
-            curr_info['exec_hosts'] = match.group(1)
-            self._logger.debug("exec_hosts for job %s detected as %s" % \
-                               (pid, curr_info['exec_hosts']))
-
-        return curr_info
-
-
     def _job_get_state (self, job_id) :
-        """ get the job state from the wrapper shell """
+        """ get the job state from the job service's state table """
 
         # if the state is NEW and we haven't sent out a run command, keep
         # it listed as NEW
@@ -1003,47 +1579,14 @@ class SLURMJob (saga.adaptors.cpi.job.Job):
         rm, pid = self._adaptor.parse_id (job_id)
 
         try:
-            ret, out, _ = self.js.shell.run_sync('scontrol show job %s' % pid)
-            match       = self.js.scontrol_jobstate_re.search(out)
+            return self.js.tracker.get (job_id)['state']
 
-            if match:
-                slurm_state = match.group(1)
-            else:
-                # no jobstate found from scontrol
-                # the job may have finished a while back, use sacct to
-                # look at the full slurm history
-                slurm_state = self._sacct_jobstate_match(pid)
-                if not slurm_state:
-                    # no jobstate found in slurm
-                    return saga.job.UNKNOWN
-
-            return self.js._slurm_to_saga_jobstate(slurm_state)
+        except saga.SagaException:
+            raise
 
         except Exception, ex:
             raise saga.NoSuccess("Error getting the job state for "
                                  "job %s:\n%s"%(pid,ex))
-        
-        raise saga.NoSuccess._log (self._logger,
-                                   "Internal SLURM adaptor error"
-                                   " in _job_get_state")
-
-    def _sacct_jobstate_match (self, pid):
-        """ get the job state from the slurm accounting data """
-        ret, sacct_out, _ = self.js.shell.run_sync(
-            "sacct --format=JobID,State --parsable2 --noheader --jobs=%s" % pid)
-        # output will look like:
-        # 500723|COMPLETED
-        # 500723.batch|COMPLETED
-        # or:
-        # 500682|CANCELLED by 900369
-        # 500682.batch|CANCELLED
-
-        for line in sacct_out.strip().split('\n'):
-            (slurm_id, slurm_state) = line.split('|', 1)
-            if slurm_id == pid and slurm_state:
-                return slurm_state.split()[0].strip()
-
-        return None
 
     # ----------------------------------------------------------------
     #
@@ -1076,6 +1619,7 @@ class SLURMJob (saga.adaptors.cpi.job.Job):
         time_start = time.time()
         time_now   = time_start
         rm, pid    = self._adaptor.parse_id(self._id)
+        poller     = self.js._policy.poller()
 
         while True:
             state = self._job_get_state(self._id)
@@ -1089,7 +1633,7 @@ class SLURMJob (saga.adaptors.cpi.job.Job):
                state == saga.job.CANCELED:
                     return True
             # avoid busy poll
-            time.sleep(0.5)
+            poller.sleep([state], time_start, timeout)
 
             # check if we hit timeout
             if timeout >= 0:
@@ -1140,7 +1684,7 @@ class SLURMJob (saga.adaptors.cpi.job.Job):
     def get_created(self) :
         """ Implements saga.adaptors.cpi.job.Job.get_created()
         """     
-        return self._job_get_info(self._id)['create_time']
+        return self.js.tracker.get(self._id)['create_time']
         #raise saga.NotImplemented._log (self._logger, "get_created not"
         #                                " implemented for SLURM jobs.")
         #return
@@ -1151,7 +1695,7 @@ class SLURMJob (saga.adaptors.cpi.job.Job):
     def get_started(self) :
         """ Implements saga.adaptors.cpi.job.Job.get_started()
         """        
-        return self._job_get_info(self._id)['start_time']
+        return self.js.tracker.get(self._id)['start_time']
         #raise saga.NotImplemented._log (self._logger, "get_started not"
         #                                " implemented for SLURM jobs.")
         #return self._started
@@ -1162,7 +1706,7 @@ class SLURMJob (saga.adaptors.cpi.job.Job):
     def get_finished(self) :
         """ Implements saga.adaptors.cpi.job.Job.get_finished()
         """
-        return self._job_get_info(self._id)['end_time']
+        return self.js.tracker.get(self._id)['end_time']
         #raise saga.NotImplemented._log (self._logger, "get_finished not"
         #                                " implemented for SLURM jobs.")
         #return self._finished
@@ -1174,7 +1718,7 @@ class SLURMJob (saga.adaptors.cpi.job.Job):
         """ Implements saga.adaptors.cpi.job.Job.get_execution_hosts()
         """        
 
-        return self._job_get_info(self._id)['exec_hosts']
+        return self.js.tracker.get(self._id)['exec_hosts']
         #raise saga.NotImplemented._log (self._logger, "get_execution_hosts not"
         #                                " implemented for SLURM jobs.")
         #return
@@ -105,6 +105,41 @@ _config_options = [
     'default'       : 10*60,
     'documentation' : 'maximum number of seconds to wait for any connection in the connection pool to become available before raising a timeout error',
     'env_variable'  : 'SAGA_PTY_CONN_POOL_WAIT'
+    },
+    {
+    'category'      : 'saga.utils.pty',
+    'name'          : 'transfer_dedup',
+    'type'          : bool,
+    'default'       : False,
+    'valid_options' : [True, False],
+    'documentation' : 'keep a per-host manifest of staged files (locally, and '
+                      'mirrored in $HOME/.saga/transfer_manifest on the remote '
+                      'host), and avoid transfers of content which is already '
+                      'present on the target host',
+    'env_variable'  : 'SAGA_PTY_TRANSFER_DEDUP'
+    },
+    {
+    'category'      : 'saga.utils.pty',
+    'name'          : 'discovery_cache_ttl',
+    'type'          : int,
+    'default'       : 24*60*60,
+    'documentation' : 'number of seconds for which job adaptors reuse the '
+                      'results of their remote environment discovery (command '
+                      'paths and versions, node properties) for the same host '
+                      'and user.  The results are cached locally, in '
+                      '$HOME/.saga/adaptors/shell/.  0 disables the cache',
+    'env_variable'  : 'SAGA_PTY_DISCOVERY_CACHE_TTL'
+    },
+    {
+    'category'      : 'saga.utils.pty',
+    'name'          : 'query_budget',
+    'type'          : int,
+    'default'       : 0,
+    'documentation' : 'maximum number of job state queries per minute which '
+                      'job adaptors send to the same host (over all job '
+                      'services).  Further queries are delayed.  0 disables '
+                      'the limit',
+    'env_variable'  : 'SAGA_PTY_QUERY_BUDGET'
     }
 ]
 
@@ -187,21 +187,63 @@ class Directory (nsdir.Directory) :
         return self._adaptor.open_dir (url, flags, ttype=ttype)
 
 
+    # --------------------------------------------------------------------------
+    #
+    @rus.takes   ('Directory', 
+                  rus.optional (basestring),
+                  rus.optional (int, rus.nothing),
+                  rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
+    @rus.returns ((dict, st.Task))
+    def list_stats (self, pattern=None, flags=0, ttype=None) :
+        """
+        list_stats(pattern=None, flags=0)
+
+        List the directory's content, together with the attributes of each
+        entry.  This is equivalent to calling :func:`list`, and then
+        inspecting each entry individually, but will usually be much faster,
+        as all information is obtained at once.
+
+        :param pattern:  Entry name pattern (like POSIX 'ls', e.g. '\*.txt')
+        :param flags:    :ref:`filesystemflags`
+
+        Returns a dictionary which maps entry names to dictionaries with the
+        following keys:
+
+          * `type`  : 'dir', 'file', 'link' or 'other'
+          * `size`  : size in bytes (for directories, the size of the directory
+                      entry itself, not of its content)
+          * `mtime` : modification time (seconds since epoch)
+          * `perms` : permissions (like 'rwxr-xr-x')
+
+        Example::
+
+            dir = saga.filesystem.Directory("sftp://localhost/tmp/")
+            for name, info in dir.list_stats ().iteritems () :
+                if info['type'] == 'file' :
+                    print "%-20s : %d" % (name, info['size'])
+        """
+        if  not flags : flags = 0
+        return self._adaptor.list_stats (pattern, flags, ttype=ttype)
+
+
     # --------------------------------------------------------------------------
     #
     @rus.takes   ('Directory', 
                   rus.optional ((surl.Url, basestring)),
+                  rus.optional (int, rus.nothing),
                   rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
     @rus.returns ((int, st.Task))
-    def get_size (self, path=None, ttype=None) :
+    def get_size (self, path=None, flags=None, ttype=None) :
         """
-        get_size(path=None)
+        get_size(path=None, flags=None)
 
         Return the size of the directory itself or the entry pointed to by `path`. 
         
         :param path:     (Optional) name/path of an entry
         :type path:      str()
 
+        :param flags:    (Optional) NO_CACHE to bypass adaptor side caching
+
         Returns the size of a file or directory (in bytes)
 
         Example::
@@ -211,6 +253,10 @@ class Directory (nsdir.Directory) :
             size = dir.get_size ('data/data.bin')
             print size
         """
+        if flags  :
+            if path   :  return self._adaptor.get_size      (path, flags, ttype=ttype)
+            else      :  return self._adaptor.get_size_self (      flags, ttype=ttype)
+
         if path   :  return self._adaptor.get_size      (path, ttype=ttype)
         else      :  return self._adaptor.get_size_self (      ttype=ttype)
 
@@ -232,11 +278,12 @@ class Directory (nsdir.Directory) :
     #
     @rus.takes   ('Directory', 
                   rus.optional ((surl.Url, basestring)),
+                  rus.optional (int, rus.nothing),
                   rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
     @rus.returns ((bool, st.Task))
-    def is_file (self, path=None, ttype=None) :
+    def is_file (self, path=None, flags=None, ttype=None) :
         """
-        is_file(path=None)
+        is_file(path=None, flags=None)
 
         Returns `True` if entry points to a file, `False` otherwise. If `path`
         is not none, the entry pointed to by `path` is inspected instead of the
@@ -244,9 +291,15 @@ class Directory (nsdir.Directory) :
 
         :param path:     (Optional) name/path of an entry
         :type path:      str()
+
+        :param flags:    (Optional) NO_CACHE to bypass adaptor side caching
         """
+        if flags  :
+            if path   :  return self._adaptor.is_file      (path, flags, ttype=ttype)
+            else      :  return self._adaptor.is_file_self (      flags, ttype=ttype)
+
         if path   :  return self._adaptor.is_file      (path, ttype=ttype)
-        else      :  return self._adaptor.is_file_self (     ttype=ttype)
+        else      :  return self._adaptor.is_file_self (      ttype=ttype)
 
 
     size  = property (get_size)  # int
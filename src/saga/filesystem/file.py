@@ -116,28 +116,35 @@ class File (nsentry.Entry) :
     # --------------------------------------------------------------------------
     #
     @rus.takes   ('File', 
+                  rus.optional (int, rus.nothing),
                   rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
     @rus.returns ((bool, st.Task))
-    def is_file (self, ttype=None) :
+    def is_file (self, flags=None, ttype=None) :
         """
-        is_file()
+        is_file(flags=None)
 
         Returns `True` if instance points to a file, `False` otherwise. 
+
+        :param flags:    (Optional) NO_CACHE to bypass adaptor side caching
         """
-        return self._adaptor.is_file_self (ttype=ttype)
+        if flags  :  return self._adaptor.is_file_self (flags, ttype=ttype)
+        else      :  return self._adaptor.is_file_self (       ttype=ttype)
 
   
     # --------------------------------------------------------------------------
     #
     @rus.takes   ('File', 
+                  rus.optional (int, rus.nothing),
                   rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
     @rus.returns ((int, st.Task))
-    def get_size (self, ttype=None) :
+    def get_size (self, flags=None, ttype=None) :
         '''
-        get_size()
+        get_size(flags=None)
         
         Returns the size (in bytes) of a file.
 
+        :param flags:    (Optional) NO_CACHE to bypass adaptor side caching
+
            Example::
 
                # get a file handle
@@ -147,7 +154,8 @@ class File (nsentry.Entry) :
                print file.get_size ()
 
         '''
-        return self._adaptor.get_size_self (ttype=ttype)
+        if flags  :  return self._adaptor.get_size_self (flags, ttype=ttype)
+        else      :  return self._adaptor.get_size_self (       ttype=ttype)
 
   
     # --------------------------------------------------------------------------
@@ -21,6 +21,25 @@ import saga.url              as surl
 
 import description           as descr
 
+
+# ------------------------------------------------------------------------------
+#
+def _iter_output (getter, chunk_size, offset) :
+    """ 
+    generator which fetches job output via getter (offset=offset, size=size),
+    chunk by chunk, until no further data are returned
+    """
+
+    while True :
+
+        chunk = getter (offset=offset, size=chunk_size)
+
+        if  not chunk :
+            return
+
+        offset += len (chunk)
+        yield chunk
+
 # ------------------------------------------------------------------------------
 #
 class Job (sb.Base, st.Task, sasync.Async) :
@@ -217,18 +236,46 @@ class Job (sb.Base, st.Task, sasync.Async) :
     # --------------------------------------------------------------------------
     #
     @rus.takes     ('Job',
-                    rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
+                    rus.optional (rus.one_of (SYNC, ASYNC, TASK)),
+                    rus.optional (int),
+                    rus.optional (int))
     @rus.returns   ((file, st.Task))
-    def get_stdout (self, ttype=None) :
+    def get_stdout (self, ttype=None, offset=0, size=None) :
         """
-        get_stdout()
+        get_stdout(offset=0, size=None)
 
         ttype:     saga.task.type enum
+        offset:    int
+        size:      int
         ret:       string / saga.Task
 
-        Return the job's STDOUT as string. 
+        Return the job's STDOUT as string.  If an offset and/or size are
+        given, only that part of STDOUT is returned (`size=None` means up to
+        the end of the output). 
         """
-        return self._adaptor.get_stdout (ttype=ttype)
+        return self._adaptor.get_stdout (offset=offset, size=size, ttype=ttype)
+
+
+    # --------------------------------------------------------------------------
+    #
+    @rus.takes     ('Job',
+                    rus.optional (int),
+                    rus.optional (int))
+    @rus.returns   (rus.anything)
+    def iter_stdout (self, chunk_size=1024*1024, offset=0) :
+        """
+        iter_stdout(chunk_size=1048576, offset=0)
+
+        chunk_size: int
+        offset:     int
+        ret:        iterator over strings
+
+        Iterate over the job's STDOUT, in chunks of at most `chunk_size` bytes,
+        starting at the given offset.  The iteration ends at the current end of
+        the output -- for a running job, a new iterator (with the offset
+        advanced by the data already seen) picks up any further output.
+        """
+        return _iter_output (self.get_stdout, chunk_size, offset)
 
 
     # --------------------------------------------------------------------------
@@ -254,18 +301,44 @@ class Job (sb.Base, st.Task, sasync.Async) :
     # --------------------------------------------------------------------------
     #
     @rus.takes     ('Job',
-                    rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
+                    rus.optional (rus.one_of (SYNC, ASYNC, TASK)),
+                    rus.optional (int),
+                    rus.optional (int))
     @rus.returns   ((file, st.Task))
-    def get_stderr (self, ttype=None) :
+    def get_stderr (self, ttype=None, offset=0, size=None) :
         """
-        get_stderr()
+        get_stderr(offset=0, size=None)
 
-        Return the job's STDERR as string.
+        Return the job's STDERR as string.  If an offset and/or size are
+        given, only that part of STDERR is returned (`size=None` means up to
+        the end of the output).
 
         ttype:     saga.task.type enum
+        offset:    int
+        size:      int
         ret:       string / saga.Task
         """
-        return self._adaptor.get_stderr (ttype=ttype)
+        return self._adaptor.get_stderr (offset=offset, size=size, ttype=ttype)
+
+
+    # --------------------------------------------------------------------------
+    #
+    @rus.takes     ('Job',
+                    rus.optional (int),
+                    rus.optional (int))
+    @rus.returns   (rus.anything)
+    def iter_stderr (self, chunk_size=1024*1024, offset=0) :
+        """
+        iter_stderr(chunk_size=1048576, offset=0)
+
+        Iterate over the job's STDERR, in chunks of at most `chunk_size` bytes,
+        starting at the given offset (see :func:`iter_stdout`).
+
+        chunk_size: int
+        offset:     int
+        ret:        iterator over strings
+        """
+        return _iter_output (self.get_stderr, chunk_size, offset)
 
 
     # --------------------------------------------------------------------------
@@ -291,22 +364,27 @@ class Job (sb.Base, st.Task, sasync.Async) :
     # --------------------------------------------------------------------------
     #
     @rus.takes     ('Job',
-                    rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
+                    rus.optional (rus.one_of (SYNC, ASYNC, TASK)),
+                    rus.optional (int),
+                    rus.optional (int))
     @rus.returns   ((str, st.Task))
-    def get_log (self, ttype=None) :
+    def get_log (self, ttype=None, offset=0, size=None) :
         """
-        get_log_string()
+        get_log_string(offset=0, size=None)
 
         Return the job's log information, ie. backend specific log messages
         which have been collected during the job execution.  Those messages also
         include stdout/stderr from the job's pre- and post-exec.  The returned
         string generally contains one log message per line, but the format of
-        the string is ultimately undefined.
+        the string is ultimately undefined.  If an offset and/or size are
+        given, only that part of the log is returned.
 
         ttype:     saga.task.type enum
+        offset:    int
+        size:      int
         ret:       string / saga.Task
         """
-        return self._adaptor.get_log (ttype=ttype)
+        return self._adaptor.get_log (offset=offset, size=size, ttype=ttype)
 
 
     # --------------------------------------------------------------------------
@@ -18,6 +18,7 @@ CREATE_PARENTS =   64
 # WRITE        = 1024 # reserved
 # READ_WRITE   = 1536 # reserved
 # BINARY       = 2048 # reserved
+NO_CACHE       = 4096
 
 
 
@@ -430,11 +430,13 @@ class Directory (entry.Entry) :
     #
     @rus.takes   ('Directory', 
                   rus.optional ((surl.Url, basestring)),
+                  rus.optional (int, rus.nothing),
                   rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
     @rus.returns ((bool, st.Task))
-    def is_dir (self, tgt=None, ttype=None) :
+    def is_dir (self, tgt=None, flags=None, ttype=None) :
         '''
         tgt:           saga.Url / None
+        flags:         flags enum (NO_CACHE)
         ttype:         saga.task.type enum
         ret:           bool / saga.Task
         
@@ -447,40 +449,47 @@ class Directory (entry.Entry) :
             if dir.is_dir ('data'):
                 # do something
         '''
-        if tgt    :  return self._adaptor.is_dir (tgt, ttype=ttype)
-        else      :  return self._nsentry.is_dir (     ttype=ttype)
+        if not tgt:  return self._nsentry.is_dir (     flags, ttype=ttype)
+        if flags  :  return self._adaptor.is_dir (tgt, flags, ttype=ttype)
+        else      :  return self._adaptor.is_dir (tgt,        ttype=ttype)
   
     
     # --------------------------------------------------------------------------
     #
     @rus.takes   ('Directory', 
                   rus.optional ((surl.Url, basestring)),
+                  rus.optional (int, rus.nothing),
                   rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
     @rus.returns ((bool, st.Task))
-    def is_entry (self, tgt=None, ttype=None) :
+    def is_entry (self, tgt=None, flags=None, ttype=None) :
         '''
         tgt:           saga.Url / None
+        flags:         flags enum (NO_CACHE)
         ttype:         saga.task.type enum
         ret:           bool / saga.Task
         '''
-        if tgt    :  return self._adaptor.is_entry (tgt, ttype=ttype)
-        else      :  return self._nsentry.is_entry (     ttype=ttype)
+        if not tgt:  return self._nsentry.is_entry (     flags, ttype=ttype)
+        if flags  :  return self._adaptor.is_entry (tgt, flags, ttype=ttype)
+        else      :  return self._adaptor.is_entry (tgt,        ttype=ttype)
   
     
     # --------------------------------------------------------------------------
     #
     @rus.takes   ('Directory', 
                   rus.optional ((surl.Url, basestring)),
+                  rus.optional (int, rus.nothing),
                   rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
     @rus.returns ((bool, st.Task))
-    def is_link (self, tgt=None, ttype=None) :
+    def is_link (self, tgt=None, flags=None, ttype=None) :
         '''
         tgt:           saga.Url / None
+        flags:         flags enum (NO_CACHE)
         ttype:         saga.task.type enum
         ret:           bool / saga.Task
         '''
-        if tgt    :  return self._adaptor.is_link (tgt, ttype=ttype)
-        else      :  return self._nsentry.is_link (     ttype=ttype)
+        if not tgt:  return self._nsentry.is_link (     flags, ttype=ttype)
+        if flags  :  return self._adaptor.is_link (tgt, flags, ttype=ttype)
+        else      :  return self._adaptor.is_link (tgt,        ttype=ttype)
 
 
     # --------------------------------------------------------------------------
@@ -171,10 +171,12 @@ class Entry (sb.Base, sasync.Async) :
     # namespace entry / directory methods
     #
     @rus.takes   ('Entry',
+                  rus.optional (int, rus.nothing),
                   rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
     @rus.returns ((bool, st.Task))
-    def is_dir   (self, ttype=None) :
+    def is_dir   (self, flags=None, ttype=None) :
         '''
+        flags:         flags enum (NO_CACHE)
         ttype:         saga.task.type enum
         ret:           bool / saga.Task
 
@@ -187,34 +189,40 @@ class Entry (sb.Base, sasync.Async) :
             if dir.is_dir ('data'):
                 # do something
         '''
-        return self._adaptor.is_dir_self (ttype=ttype)
+        if flags  :  return self._adaptor.is_dir_self (flags, ttype=ttype)
+        else      :  return self._adaptor.is_dir_self (       ttype=ttype)
 
 
     # --------------------------------------------------------------------------
     #
     @rus.takes   ('Entry',
+                  rus.optional (int, rus.nothing),
                   rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
     @rus.returns ((bool, st.Task))
-    def is_entry (self, ttype=None) :
+    def is_entry (self, flags=None, ttype=None) :
         '''
+        flags:         flags enum (NO_CACHE)
         ttype:         saga.task.type enum
         ret:           bool / saga.Task
         '''
-        return self._adaptor.is_entry_self (ttype=ttype)
+        if flags  :  return self._adaptor.is_entry_self (flags, ttype=ttype)
+        else      :  return self._adaptor.is_entry_self (       ttype=ttype)
   
     
     # --------------------------------------------------------------------------
     #
     @rus.takes   ('Entry',
+                  rus.optional (int, rus.nothing),
                   rus.optional (rus.one_of (SYNC, ASYNC, TASK)))
     @rus.returns ((bool, st.Task))
-    def is_link  (self, ttype=None) :
+    def is_link  (self, flags=None, ttype=None) :
         '''
-        tgt:           saga.Url / None
+        flags:         flags enum (NO_CACHE)
         ttype:         saga.task.type enum
         ret:           bool / saga.Task
         '''
-        return self._adaptor.is_link_self (ttype=ttype)
+        if flags  :  return self._adaptor.is_link_self (flags, ttype=ttype)
+        else      :  return self._adaptor.is_link_self (       ttype=ttype)
   
     
     # --------------------------------------------------------------------------
@@ -0,0 +1,170 @@
+
+__author__    = "Andre Merzky"
+__copyright__ = "Copyright 2012-2013, The SAGA Project"
+__license__   = "MIT"
+
+
+''' Provides a persistent cache for the information job adaptors discover
+    about a remote host (command paths and versions, machine properties), so
+    that new job services for the same host can skip the discovery round trips.
+'''
+
+import os
+import re
+import json
+import time
+import errno
+import threading
+
+import radical.utils.logger as rul
+
+
+# ------------------------------------------------------------------------------
+#
+# One cache file is kept per (adaptor, user, host) key.  The file records the
+# time of discovery and the discovered information:
+#
+#   {"time" : <epoch>, "info" : {...}}
+#
+# Entries older than the TTL are ignored.  Adaptors drop (and rediscover)
+# their entry when a job submission fails, as the cached information may have
+# become stale.
+#
+# The cache is an optimization only: if the cache file cannot be read or
+# written (read-only or full home directory, ...), a warning is logged, and the
+# adaptors simply discover again.
+#
+_caches = dict()
+_lock   = threading.RLock ()
+
+
+# ------------------------------------------------------------------------------
+#
+def get_cache (key, base, ttl) :
+    """
+    Returns the discovery cache for the given key, stored under the given local
+    base dir.  Entries older than `ttl` seconds are considered expired.
+    """
+
+    with _lock :
+
+        if  not key in _caches :
+            _caches[key] = DiscoveryCache (key, base)
+
+        _caches[key].ttl = ttl
+
+        return _caches[key]
+
+
+# ------------------------------------------------------------------------------
+#
+def _to_str (data) :
+
+    # json returns unicode strings, which we don't want to pass on to the shell
+    if  isinstance (data, dict) :
+        return dict ([(_to_str (k), _to_str (v)) for k, v in data.iteritems ()])
+
+    if  isinstance (data, list) :
+        return [_to_str (e) for e in data]
+
+    if  isinstance (data, unicode) :
+        return data.encode ('utf-8')
+
+    return data
+
+
+# ------------------------------------------------------------------------------
+#
+class DiscoveryCache (object) :
+    """
+    Holds the discovery results of one adaptor for one remote host and user.
+    The results are stored on local disk, and are thus shared with other
+    processes.
+    """
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__ (self, key, base) :
+
+        name = re.sub ('[^a-zA-Z0-9_.@-]', '_', key)
+
+        self.key     = key
+        self.ttl     = 0
+        self._fname  = os.path.join (base, 'discovery.%s.json' % name)
+        self._lock   = threading.RLock ()
+        self._logger = rul.getLogger ('saga', 'DiscoveryCache')
+
+
+    # --------------------------------------------------------------------------
+    #
+    def get (self) :
+        """
+        Returns the cached information, or None if there is none, or if it is
+        expired.
+        """
+
+        with self._lock :
+
+            try :
+                with open (self._fname, 'r') as f :
+                    data = json.load (f)
+
+            except IOError as e :
+                if  e.errno != errno.ENOENT :
+                    self._logger.warning ("could not read discovery cache %s: %s" \
+                                       % (self._fname, e))
+                return None
+
+            except ValueError :
+                # corrupt cache -- rediscover
+                return None
+
+        if  not isinstance (data, dict) or \
+            not 'time' in data          or \
+            not 'info' in data          :
+            return None
+
+        if  time.time () - data['time'] > self.ttl :
+            return None
+
+        return _to_str (data['info'])
+
+
+    # --------------------------------------------------------------------------
+    #
+    def put (self, info) :
+
+        tmp = "%s.%s" % (self._fname, os.getpid ())
+
+        with self._lock :
+
+            try :
+                with open (tmp, 'w') as f :
+                    json.dump ({'time' : time.time (),
+                                'info' : info}, f)
+                os.rename (tmp, self._fname)
+
+            except (IOError, OSError) as e :
+                # continue without caching
+                self._logger.warning ("could not write discovery cache %s: %s" \
+                                   % (self._fname, e))
+                try :
+                    os.unlink (tmp)
+                except OSError :
+                    pass
+
+
+    # --------------------------------------------------------------------------
+    #
+    def invalidate (self) :
+
+        with self._lock :
+
+            try :
+                os.unlink (self._fname)
+
+            except OSError as e :
+                if  e.errno != errno.ENOENT :
+                    self._logger.warning ("could not remove discovery cache %s: %s" \
+                                       % (self._fname, e))
+
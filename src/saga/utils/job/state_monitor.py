@@ -0,0 +1,249 @@
+
+__author__    = "Andre Merzky, Ole Weidner"
+__copyright__ = "Copyright 2012-2013, The SAGA Project"
+__license__   = "MIT"
+
+
+''' Provides job state monitoring threads which are shared by all job services
+    for the same resource manager and user.
+'''
+
+import threading
+
+
+# ------------------------------------------------------------------------------
+#
+# Job services register with the monitor for their resource manager and user.
+# On each cycle, the monitor collects the jobs all registered services track,
+# queries their states with a single (bulk) call on one of the services, and
+# hands the results to the services owning the jobs.  The services need to
+# provide:
+#
+#   js._logger                       : logger
+#   js.jobs                          : dict of job infos, keyed by job
+#   js._monitor_jobs  ()             : dict of job infos to monitor, by job
+#   js._job_get_infos (jobs, table)  : new job infos for the given jobs, from
+#                                      the given table of current job infos
+#   js._job_update_infos (infos)     : apply new job infos, fire callbacks
+#
+# The monitor waits between cycles as its polling policy (see
+# saga.utils.poll_policy) suggests for the job states it saw last.  If the
+# query fails on one service, the next registered service is tried.  The monitor
+# thread ends once the last service unregisters, or after 'max_errors'
+# identical errors in a row (if set) -- the next service registering for that
+# key then starts a new monitor, which takes over the services of the old one.
+#
+_monitors = dict()
+_lock     = threading.RLock ()
+
+
+# ------------------------------------------------------------------------------
+#
+def register (key, js, policy, max_errors=3) :
+    """
+    Registers the job service with the state monitor for the given key (which
+    should identify the resource manager and user), and returns that monitor.
+    The monitor is created and started if needed, and is paced by the given
+    polling policy.  It stops after 'max_errors' identical errors in a row --
+    'None' lets it retry forever.
+    """
+
+    with _lock :
+
+        old = _monitors.get (key)
+
+        if  old and (old.stopped () or not old.is_alive ()) :
+            # the old monitor gave up -- start over, for all its services
+            del (_monitors[key])
+
+        if  not key in _monitors :
+            _monitors[key] = StateMonitor (key, js._logger, policy, max_errors)
+
+            if  old :
+                for other in old.services () :
+                    _monitors[key].add (other)
+
+            _monitors[key].start ()
+
+        _monitors[key].add (js)
+
+        return _monitors[key]
+
+
+# ------------------------------------------------------------------------------
+#
+def unregister (key, js) :
+    """
+    Unregisters the job service from the state monitor for the given key.  The
+    monitor is stopped when no other service is registered.
+    """
+
+    with _lock :
+
+        if  not key in _monitors :
+            return
+
+        monitor = _monitors[key]
+
+        if  not monitor.remove (js) :
+            monitor.stop ()
+            del (_monitors[key])
+
+
+# ------------------------------------------------------------------------------
+#
+class StateMonitor (threading.Thread) :
+    """
+    Thread that periodically monitors the states of the jobs of all registered
+    job services.
+    """
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__ (self, key, logger, policy, max_errors=3) :
+
+        self.key        = key
+        self.logger     = logger
+        self.policy     = policy
+        self.max_errors = max_errors
+        self._poller    = policy.poller ()
+        self._services  = list()
+        self._lock      = threading.RLock ()
+        self._terminate = threading.Event ()
+
+        super (StateMonitor, self).__init__ (name="StateMonitor-%s" % key)
+        self.setDaemon (True)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def add (self, js) :
+
+        with self._lock :
+            if  not js in self._services :
+                self._services.append (js)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def remove (self, js) :
+        """ returns the number of services still registered """
+
+        with self._lock :
+            if  js in self._services :
+                self._services.remove (js)
+
+            return len (self._services)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def services (self) :
+
+        with self._lock :
+            return list(self._services)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def stop (self) :
+
+        self._terminate.set ()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def stopped (self) :
+
+        return self._terminate.is_set ()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def run (self) :
+
+        try :
+            self._run ()
+
+        finally :
+            # mark the monitor as dead, so that the next register() replaces
+            # it (and takes over its services)
+            self.stop ()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _run (self) :
+
+        # we stop the monitoring thread when we see the same error
+        # 'max_errors' times in a row...
+        error_type_count = dict()
+
+        while not self.stopped () :
+
+            # without any jobs to monitor, we don't query -- but check for new
+            # jobs as often as for running ones
+            delay = self.policy.intervals['running']
+
+            try :
+                states = self._update ()
+                if  states :
+                    delay = self._poller.next (states)
+
+            except Exception as e :
+                self.logger.warning ("Exception caught in job monitoring thread: %s" % e)
+
+                # check if we see the same error again and again
+                error_type = str(e)
+                if  error_type not in error_type_count :
+                    error_type_count = dict()
+                    error_type_count[error_type]  = 1
+                else :
+                    error_type_count[error_type] += 1
+                    if  self.max_errors and \
+                        error_type_count[error_type] >= self.max_errors :
+                        self.logger.error ("too many monitoring errors -- stopping job monitoring thread")
+                        return
+
+            self._terminate.wait (delay)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _update (self) :
+        """ returns the states of all monitored jobs """
+
+        services = self.services ()
+
+        # collect the jobs of all services, so that they are queried in one go
+        table = dict()
+        for js in services :
+            table.update (js._monitor_jobs ())
+
+        if  not table :
+            return list()
+
+        # any service can query the states of all jobs -- they all talk to the
+        # same resource manager, so if one shell fails we try the next one
+        error = None
+        for js in services :
+            try :
+                job_infos = js._job_get_infos (table.keys (), table)
+                break
+
+            except Exception as e :
+                self.logger.warning ("job state query failed, trying next service: %s" % e)
+                error = e
+        else :
+            raise error
+
+        for js in services :
+            mine = dict ([(job, info) for job, info in job_infos.iteritems () \
+                                      if  job in js.jobs])
+            if  mine :
+                js._job_update_infos (mine)
+
+        return sorted ([job_infos.get (job, info)['state'] \
+                        for job, info in table.iteritems ()])
+
+
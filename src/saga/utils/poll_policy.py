@@ -0,0 +1,352 @@
+
+__author__    = "Andre Merzky"
+__copyright__ = "Copyright 2012-2013, The SAGA Project"
+__license__   = "MIT"
+
+
+''' Provides the polling policy which job adaptors use to pace their state
+    queries to a resource manager.
+'''
+
+import time
+import threading
+
+import saga.exceptions as se
+
+
+# ------------------------------------------------------------------------------
+#
+# A polling policy derives the time to wait before the next state query from
+# the states of the jobs a caller waits for:
+#
+#   - while any job is in an undetermined state (not yet known, or about to
+#     become final), the 'final' interval is used, for a quick confirmation;
+#   - while any job is RUNNING, the 'running' interval is used;
+#   - while jobs are PENDING (or SUSPENDED), the interval starts at 'pending',
+#     and grows by the factor 'backoff' with every query which does not show
+#     a state change, up to 'pending_max'.
+#
+# Intervals are never shorter than 'latency' times the average duration of
+# recent queries, so that slow resource managers are queried less often.
+# Additionally, all policies for the same host share a query budget (queries
+# per minute, 0 for unlimited): queries beyond the budget are delayed.
+#
+# Policies are shared by all job services of an adaptor for the same host, and
+# count the queries they pace (see `get_counters()`).
+#
+# Adaptors configure the intervals with a spec string like
+#
+#   "pending=5,pending_max=60,running=2,final=0.5,backoff=2,latency=4"
+#
+# where any omitted key assumes its default.
+#
+DEFAULTS = {'pending'     :  5.0,
+            'pending_max' : 60.0,
+            'running'     :  2.0,
+            'final'       :  0.5,
+            'backoff'     :  2.0,
+            'latency'     :  4.0}
+
+# states which the policy does not need to confirm
+_PENDING = ['Pending', 'Suspended']
+_RUNNING = ['Running']
+_FINAL   = ['Done', 'Failed', 'Canceled']
+
+_policies = dict()   # (name, host) : PollPolicy
+_budgets  = dict()   # host         : _QueryBudget
+_lock     = threading.RLock ()
+
+
+# ------------------------------------------------------------------------------
+#
+def parse_spec (spec) :
+    """
+    Parses a polling spec string (see above) into a dict of intervals.
+    """
+
+    intervals = dict (DEFAULTS)
+
+    for elem in (spec or '').split (',') :
+
+        elem = elem.strip ()
+        if  not elem :
+            continue
+
+        if  not '=' in elem :
+            raise se.BadParameter ("invalid polling spec '%s' (expected key=value)" % elem)
+
+        key, val = [e.strip () for e in elem.split ('=', 1)]
+
+        if  not key in DEFAULTS :
+            raise se.BadParameter ("invalid polling spec key '%s' (expected one of %s)" \
+                                % (key, DEFAULTS.keys ()))
+        try :
+            intervals[key] = float (val)
+        except ValueError :
+            raise se.BadParameter ("invalid polling spec value '%s' for '%s'" % (val, key))
+
+        if  intervals[key] < 0 :
+            raise se.BadParameter ("invalid polling spec value '%s' for '%s'" % (val, key))
+
+    return intervals
+
+
+# ------------------------------------------------------------------------------
+#
+def get_policy (name, host, spec, budget=0) :
+    """
+    Returns the polling policy of the named adaptor for the given host.  The
+    policy is created with the intervals from the given spec on first use.
+    `budget` is the maximum number of queries per minute for the host (over all
+    adaptors), 0 for unlimited -- it is also set on first use of the host.
+    """
+
+    with _lock :
+
+        if  not host in _budgets :
+            _budgets[host] = _QueryBudget (budget)
+
+        if  not (name, host) in _policies :
+            _policies[(name, host)] = PollPolicy (name, host, parse_spec (spec),
+                                                  _budgets[host])
+
+        return _policies[(name, host)]
+
+
+# ------------------------------------------------------------------------------
+#
+def get_counters () :
+    """
+    Returns the counters of all policies, as dict keyed by '<name>@<host>'.
+    """
+
+    with _lock :
+        return dict ([("%s@%s" % key, policy.get_counters ()) \
+                      for key, policy in _policies.iteritems ()])
+
+
+# ------------------------------------------------------------------------------
+#
+class _QueryBudget (object) :
+    """
+    Token bucket which limits the query rate to one host.
+    """
+
+    def __init__ (self, budget) :
+
+        self.budget  = budget            # queries per minute
+        self._tokens = float (budget)
+        self._last   = time.time ()
+        self._lock   = threading.Lock ()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def acquire (self) :
+        """ blocks until a query is allowed, and returns the time waited """
+
+        if  not self.budget :
+            return 0.0
+
+        waited = 0.0
+
+        while True :
+
+            with self._lock :
+
+                now          = time.time ()
+                self._tokens = min (float (self.budget),
+                                    self._tokens + (now - self._last) * self.budget / 60.0)
+                self._last   = now
+
+                if  self._tokens >= 1.0 :
+                    self._tokens -= 1.0
+                    return waited
+
+                delay = (1.0 - self._tokens) * 60.0 / self.budget
+
+            time.sleep (delay)
+            waited += delay
+
+
+# ------------------------------------------------------------------------------
+#
+class PollPolicy (object) :
+    """
+    Paces the state queries of one adaptor to one host.
+    """
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__ (self, name, host, intervals, budget) :
+
+        self.name      = name
+        self.host      = host
+        self.intervals = intervals
+
+        self._budget   = budget
+        self._latency  = 0.0      # moving average of query durations
+        self._lock     = threading.Lock ()
+        self._counters = {'queries'       : 0,    # number of state queries
+                          'query_time'    : 0.0,  # total time spent in queries
+                          'throttled'     : 0,    # queries delayed by budget
+                          'throttle_time' : 0.0,  # total delay by budget
+                          'polls'         : 0,    # number of poll intervals
+                          'poll_time'     : 0.0}  # total poll interval time
+
+
+    # --------------------------------------------------------------------------
+    #
+    def get_counters (self) :
+
+        with self._lock :
+            ret = dict (self._counters)
+            ret['latency'] = self._latency
+            return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def query (self) :
+        """
+        Returns a context manager which wraps one state query: it waits for
+        the host's query budget, and measures and counts the query.  Use as::
+
+            with policy.query () :
+                ret, out, _ = shell.run_sync (...)
+        """
+
+        return _Query (self)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _record (self, waited, duration) :
+
+        with self._lock :
+
+            self._counters['queries']    += 1
+            self._counters['query_time'] += duration
+
+            if  waited :
+                self._counters['throttled']     += 1
+                self._counters['throttle_time'] += waited
+
+            if  not self._latency : self._latency = duration
+            else                  : self._latency = 0.8 * self._latency + 0.2 * duration
+
+
+    # --------------------------------------------------------------------------
+    #
+    def interval (self, states, unchanged=0) :
+        """
+        Returns the time to wait before querying the given job states again,
+        after `unchanged` queries which did not show any state change.
+        """
+
+        iv = self.intervals
+
+        if  [s for s in states if s in _RUNNING] :
+            ret = iv['running']
+
+        elif states and not [s for s in states if not s in _PENDING + _FINAL] :
+            if  [s for s in states if s in _PENDING] :
+                ret = min (iv['pending'] * (iv['backoff'] ** unchanged),
+                           iv['pending_max'])
+            else :
+                ret = iv['final']
+
+        else :
+            ret = iv['final']
+
+        return max (ret, iv['latency'] * self._latency)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def poller (self) :
+        """
+        Returns a poller, which tracks state changes over the iterations of one
+        polling loop.
+        """
+
+        return Poller (self)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _count_poll (self, delay) :
+
+        with self._lock :
+            self._counters['polls']     += 1
+            self._counters['poll_time'] += delay
+
+
+# ------------------------------------------------------------------------------
+#
+class _Query (object) :
+
+    def __init__ (self, policy) :
+        self._policy = policy
+
+    def __enter__ (self) :
+        self._waited = self._policy._budget.acquire ()
+        self._start  = time.time ()
+
+    def __exit__ (self, exc_type, exc_value, tb) :
+        self._policy._record (self._waited, time.time () - self._start)
+        return False
+
+
+# ------------------------------------------------------------------------------
+#
+class Poller (object) :
+    """
+    Computes the intervals of one polling loop from the states observed in
+    each iteration.
+    """
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__ (self, policy) :
+
+        self.policy     = policy
+        self._states    = None
+        self._unchanged = 0
+
+
+    # --------------------------------------------------------------------------
+    #
+    def next (self, states) :
+        """ returns the interval to wait after observing the given states """
+
+        states = list (states)
+
+        if  states == self._states :
+            self._unchanged += 1
+        else :
+            self._unchanged  = 0
+            self._states     = states
+
+        delay = self.policy.interval (states, self._unchanged)
+        self.policy._count_poll (delay)
+
+        return delay
+
+
+    # --------------------------------------------------------------------------
+    #
+    def sleep (self, states, start=None, timeout=-1) :
+        """
+        Sleeps for the interval after observing the given states -- but, if
+        a timeout is given (timeout >= 0), not beyond `start + timeout`.
+        """
+
+        delay = self.next (states)
+
+        if  timeout >= 0 and start is not None :
+            delay = max (0.0, min (delay, start + timeout - time.time ()))
+
+        time.sleep (delay)
+
+
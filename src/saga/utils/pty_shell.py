@@ -7,13 +7,18 @@ __license__   = "MIT"
 import re
 import os
 import sys
+import time
 import errno
+import pipes
 
 import saga.utils.misc              as sumisc
 import radical.utils.logger         as rul
 
 import saga.utils.pty_shell_factory as supsf
 import saga.utils.pty_process       as supp
+import saga.utils.transfer_manifest as sutm
+import saga.utils.discovery_cache   as sudc
+import saga.utils.poll_policy       as supol
 import saga.url                     as surl
 import saga.exceptions              as se
 import saga.session                 as ss
@@ -41,6 +46,66 @@ STDERR   = 4    # fetch stderr only, discard stdout
 DEFAULT_PROMPT = "[\$#%>\]]\s*$"
 
 
+# ------------------------------------------------------------------------------
+#
+# seconds between progress reports of running relay copies
+#
+_RELAY_PROGRESS = 10.0
+
+
+# ------------------------------------------------------------------------------
+#
+# transfer deduplication: remote stat of "$P" into $S ("size mtime"), for GNU
+# and BSD stat
+#
+_DEDUP_CANDIDATES = 10
+_DEDUP_STAT       = "S=`(stat -c '%s %Y' \"$P\" || stat -f '%z %m' \"$P\") 2>/dev/null`"
+
+
+def _dedup_record_cmd (checksum, path) :
+    """
+    remote command to stat the given path, and to add it to the remote index
+    of the transfer manifest.  The path is expected to be quoted, or to be
+    a variable reference.
+    """
+
+    if  path.startswith ('$') :
+        path = '"%s"' % path
+    else :
+        path = pipes.quote (path)
+
+    return "P=%s ; %s ; echo \"STAT $S $P\" ; test -z \"$S\" || " \
+           "{ mkdir -p \"$HOME/.saga\" && echo \"%s $S $P\" >> \"%s\" ; }" \
+         % (path, _DEDUP_STAT, checksum, sutm.REMOTE_INDEX)
+
+
+def _parse_dedup_stats (out) :
+    """
+    parse 'STAT <size> <mtime> <path>' lines into a list of
+    (path, (size, mtime)) tuples.  Paths which do not exist are reported
+    with (None, None).
+    """
+
+    ret = list ()
+
+    for line in out.split ('\n') :
+
+        if  not line.startswith ('STAT ') :
+            continue
+
+        rest  = line.rstrip ('\r')[len ('STAT '):]
+        elems = rest.split (' ', 2)
+
+        if  len (elems) == 3 and elems[0].isdigit () and elems[1].isdigit () :
+            ret.append ((elems[2], (int (elems[0]), int (elems[1]))))
+
+        else :
+            # $S was empty -- the path does not exist
+            ret.append ((rest[1:], (None, None)))
+
+    return ret
+
+
 # --------------------------------------------------------------------
 #
 class PTYShell (object) :
@@ -211,6 +276,21 @@ class PTYShell (object) :
 
         self.cfg = self.session.get_config('saga.utils.pty')
 
+        # transfer deduplication for stage_to_remote (off by default)
+        self.dedup = False
+        if 'transfer_dedup' in self.cfg:
+            self.dedup = self.cfg['transfer_dedup'].get_value ()
+
+        # lifetime of cached adaptor discovery results (see get_discovery_cache)
+        self.discovery_ttl = 0
+        if 'discovery_cache_ttl' in self.cfg:
+            self.discovery_ttl = self.cfg['discovery_cache_ttl'].get_value ()
+
+        # per-host limit for job state queries (see get_poll_policy)
+        self.query_budget = 0
+        if 'query_budget' in self.cfg:
+            self.query_budget = self.cfg['query_budget'].get_value ()
+
         # get prompt pattern from options, config, or use default
         if 'prompt_pattern' in self.options:
             self.prompt = self.options['prompt_pattern']
@@ -748,6 +828,52 @@ class PTYShell (object) :
                 raise ptye.translate_exception (e)
 
 
+    # ----------------------------------------------------------------
+    #
+    def run_bulk (self, commands) :
+        """
+        Run a list of shell commands in a single round trip, and report exit
+        code and output for each of them (as a list of tuples, in the order of
+        the given commands).  The commands are run one after the other, within
+        a single compound command -- so they must not read from stdin, and
+        must not change the state of the shell (like `cd` or `exit` would).
+        Output is captured as in the default iomode of :func:`run_sync`.
+        An empty command list results in an empty result list, and in no
+        shell interaction at all.
+
+        :type  commands: list of strings
+        :param commands: shell commands to run.
+        """
+
+        if  not commands :
+            return list()
+
+        marker  = "SAGA-BULK-%s" % id(self)
+        command = "{\n"
+
+        for cmd in commands :
+            command += "%s\n" % cmd.strip ()
+            command += "printf '\\n%s %%d\\n' $?\n" % marker
+
+        command += "}"
+
+        ret, out, _ = self.run_sync (command)
+
+        # split the output at the markers -- that results in a list
+        # [out_0, ret_0, out_1, ret_1, ..., out_n, ret_n, rest]
+        elems = re.split ("\r?\n%s (\d+)(?:\r?\n|$)" % marker, out)
+
+        if  len(elems) != 2 * len(commands) + 1 :
+            raise se.NoSuccess ("run_bulk failed, %d of %d results (%s)" \
+                             % ((len(elems) - 1) / 2, len(commands), out))
+
+        results = list()
+        for i in range (len(commands)) :
+            results.append ((int(elems[2*i+1]), elems[2*i]))
+
+        return results
+
+
     # ----------------------------------------------------------------
     #
     def run_async (self, command) :
@@ -834,7 +960,8 @@ class PTYShell (object) :
             fhandle.flush  ()
             fhandle.close  ()
 
-            ret = self.stage_to_remote (fname, tgt)
+            # the staging file is reused, so we bypass transfer deduplication
+            ret = self.run_copy_to (fname, tgt)
 
             os.remove (fname)
 
@@ -900,7 +1027,193 @@ class PTYShell (object) :
         # prompt, and updating pwd state on every find_prompt.
 
         try :
-            return self.run_copy_to (src, tgt, cp_flags)
+            # with transfer deduplication enabled, single files to absolute
+            # target paths may be served from content already on the host
+            manifest = None
+            if  os.path.isfile (src) and tgt.startswith ('/') :
+                manifest = self._get_manifest ()
+
+            if  not manifest :
+                return self.run_copy_to (src, tgt, cp_flags)
+
+            # the manifest is written once for the whole transfer
+            with manifest.batch () :
+
+                checksum = manifest.checksum (src)
+                files    = self._stage_dedup (manifest, checksum, src, tgt)
+                if  files :
+                    return files
+
+                files = self.run_copy_to (src, tgt, cp_flags)
+                self._stage_record (manifest, checksum, src, tgt)
+
+                return files
+
+        except Exception as e :
+            raise ptye.translate_exception (e)
+
+
+    # ----------------------------------------------------------------
+    #
+    def get_discovery_cache (self, name) :
+        """
+        Return the discovery cache of the named adaptor for the host and user
+        of this shell, or None if discovery caching is disabled (or pointless,
+        for local shells).
+        """
+
+        if  not self.discovery_ttl or self.pty_info['shell_type'] != 'ssh' :
+            return None
+
+        url = self.pty_info['url']
+        key = "%s:%s@%s:%s" % (name, self.pty_info['user'], url.host, url.port)
+
+        return sudc.get_cache (key, self.base, self.discovery_ttl)
+
+
+    # ----------------------------------------------------------------
+    #
+    def get_poll_policy (self, name, spec) :
+        """
+        Return the polling policy of the named adaptor for the host of this
+        shell.  The policy is created from the given spec (see
+        saga.utils.poll_policy) on first use, and shares the host's query
+        budget with the policies of other adaptors.
+        """
+
+        url = self.pty_info['url']
+        key = "%s:%s" % (url.host, url.port)
+
+        return supol.get_policy (name, key, spec, self.query_budget)
+
+
+    # ----------------------------------------------------------------
+    #
+    def _get_manifest (self) :
+        """
+        Return the transfer manifest for the host of this shell, or None if
+        transfer deduplication is disabled (or pointless, for local shells).
+        On first use, the manifest is merged with the host's remote index,
+        and that index is compacted if needed.
+        """
+
+        if  not self.dedup or self.pty_info['shell_type'] != 'ssh' :
+            return None
+
+        url      = self.pty_info['url']
+        key      = "%s@%s:%s" % (self.pty_info['user'], url.host, url.port)
+        manifest = sutm.get_manifest (key, self.base)
+
+        if  not manifest.synced :
+            ret, out, _ = self.run_sync (" cat \"%s\" 2>/dev/null" % sutm.REMOTE_INDEX)
+            if  ret != 0 :
+                out = ""
+            if  manifest.merge (out) :
+                self.run_sync (" %s" % sutm.REMOTE_COMPACT)
+
+        return manifest
+
+
+    # ----------------------------------------------------------------
+    #
+    def _stage_dedup (self, manifest, checksum, src, tgt) :
+        """
+        Try to satisfy a transfer of src to tgt from content which is already
+        on the remote host: if the target holds the content already, nothing
+        is done -- if some other file holds it, it is copied remotely.  All
+        records are verified against the remote size and mtime first.  Returns
+        the list of staged files on success, None otherwise.
+        """
+
+        cands = manifest.candidates (checksum)[:_DEDUP_CANDIDATES]
+
+        if  not cands :
+            return None
+
+        # find the final target path (cp semantics), and stat target and
+        # candidates in one go
+        ret, out, _ = self.run_sync (" T=%s ; test -d \"$T\" && T=\"$T\"/%s ; "
+                                     "for P in \"$T\" %s ; do %s ; echo \"STAT $S $P\" ; done" \
+                                  % (pipes.quote (tgt), pipes.quote (os.path.basename (src)),
+                                     ' '.join ([pipes.quote (c) for c in cands]), _DEDUP_STAT))
+        stats = _parse_dedup_stats (out)
+
+        if  ret != 0 or not stats :
+            return None
+
+        tgt_path = stats[0][0]
+        stats    = dict (stats)
+
+        rec = manifest.lookup (tgt_path)
+        if  rec and rec[0] == checksum and stats[tgt_path] == rec[1:] :
+            self.logger.debug ("skip transfer %s -> %s: content is in place" % (src, tgt_path))
+            return [src]
+
+        for cand in cands :
+
+            if  cand == tgt_path :
+                continue
+
+            rec = manifest.lookup (cand)
+            if  not rec or stats.get (cand) != rec[1:] :
+                # stale record
+                manifest.forget (cand)
+                continue
+
+            self.logger.debug ("skip transfer %s -> %s: copy from %s" % (src, tgt_path, cand))
+            ret, out, _ = self.run_sync (" cp %s %s && %s" \
+                                      % (pipes.quote (cand), pipes.quote (tgt_path),
+                                         _dedup_record_cmd (checksum, tgt_path)))
+            if  ret != 0 :
+                return None
+
+            for path, stat in _parse_dedup_stats (out) :
+                if  stat[0] != None :
+                    manifest.record (path, checksum, stat[0], stat[1])
+
+            return [src]
+
+        return None
+
+
+    # ----------------------------------------------------------------
+    #
+    def _stage_record (self, manifest, checksum, src, tgt) :
+        """
+        Record a completed transfer of src to tgt in the manifest, and in the
+        remote index.
+        """
+
+        ret, out, _ = self.run_sync (" T=%s ; test -d \"$T\" && T=\"$T\"/%s ; %s" \
+                                  % (pipes.quote (tgt), pipes.quote (os.path.basename (src)),
+                                     _dedup_record_cmd (checksum, '$T')))
+
+        for path, stat in _parse_dedup_stats (out) :
+            if  stat[0] != None :
+                manifest.record (path, checksum, stat[0], stat[1])
+
+    # ----------------------------------------------------------------
+    #
+    def stage_to_shell (self, src, other, tgt, cp_flags="") :
+        """
+        :type  src: string
+        :param src: path to source file to stage from.
+                    The src path is not an URL, but expected to be a path
+                    relative to the shell's URL.
+
+        :type  other: PTYShell
+        :param other: shell on the host to stage to.
+
+        :type  tgt: string
+        :param tgt: path to target file to stage to.
+                    The tgt path is not an URL, but expected to be a path
+                    relative to the URL of the other shell.
+        """
+
+        self._trace ("stage to shell: %s -> %s" % (src, tgt))
+
+        try :
+            return self.run_copy_relay (src, other, tgt, cp_flags)
 
         except Exception as e :
             raise ptye.translate_exception (e)
@@ -1155,5 +1468,128 @@ class PTYShell (object) :
             return files
 
 
+    # --------------------------------------------------------------------------
+    #
+    def run_copy_relay (self, src, other, tgt, cp_flags="") :
+        """
+        This copies src (a path on this shell's host) to tgt (a path on the
+        host of the other shell), without staging the data on the local disk.
+        The data are streamed through a local pipe which connects two ssh
+        slave connections -- those reuse the existing master connections of
+        both shells, so no further authentication is needed.  Directories
+        (which require '-r' in cp_flags) are streamed as tar archive.
+
+        Like 'cp', the copy ends up *in* tgt if tgt is an existing directory.
+
+        The copy progress is logged every _RELAY_PROGRESS seconds: bytes
+        received for files, and files sent for directories.
+        """
+
+        for info in [self.pty_info, other.pty_info] :
+            if  info['shell_type'] != 'ssh' :
+                raise se.BadParameter ("relay copy needs ssh based shells, not '%s'" \
+                                    % info['schema'])
+
+        def _ssh_cmd (info, cmd) :
+            # the stream needs to be binary clean, so we must not request a pty
+            # on the remote end
+            args = info['ssh_args'].replace ('-t ', '-T ', 1)
+            return '%s "%s" %s %s %s %s' % (info['ssh_env'], info['ssh_exe'], args,
+                                            info['s_flags'], info['host_str'],
+                                            pipes.quote (cmd))
+
+        with self.pty_shell.rlock :
+
+            self._trace ("copy relay: %s -> %s" % (src, tgt))
+
+            ret, out, _ = self.run_sync (" test -d '%s' && echo DIR || { test -e '%s' && echo FILE && wc -c < '%s' ; }" \
+                                       % (src, src, src))
+            if  ret != 0 :
+                raise se.DoesNotExist ("file copy failed: no such source '%s'" % src)
+
+            is_dir = ('DIR' in out)
+            size   = out.split ()[-1]
+            if  is_dir and not '-r' in cp_flags :
+                raise se.BadParameter ("file copy failed: '%s' is a directory" % src)
+
+            # resolve the target path up front, so that a partial target can
+            # be removed if the copy fails
+            tgt_base = os.path.basename (src.rstrip ('/'))
+            _, out, _ = other.run_sync (" test -d '%s' && echo DIR ; true" % tgt)
+
+            if  'DIR' in out : tgt_path = "%s/%s" % (tgt.rstrip ('/'), tgt_base)
+            else             : tgt_path = tgt
+
+            _, out, _  = other.run_sync (" test -e '%s' && echo EXISTS ; true" % tgt_path)
+            tgt_exists = ('EXISTS' in out)
+
+            if  is_dir :
+                src_cmd = "cd '%s' && tar cvf - ." % src
+                tgt_cmd = "mkdir -p '%s' && cd '%s' && tar xf -" % (tgt_path, tgt_path)
+            else :
+                src_cmd = "cat '%s'" % src
+                tgt_cmd = "cat > '%s'" % tgt_path
+
+            # the exit code of the pipe is the one of the receiving end --
+            # failures on the sending end are flagged explicitly (on stderr,
+            # so that the flag does not end up in the target)
+            relay = "( %s || echo 'RELAY SOURCE FAILED' >&2 ) | %s" \
+                  % (_ssh_cmd (self.pty_info, src_cmd), _ssh_cmd (other.pty_info, tgt_cmd))
+
+            cp_proc = supp.PTYProcess (['/bin/sh', '-c', relay])
+            out     = ""
+            start   = time.time ()
+            report  = start + _RELAY_PROGRESS
+
+            # collect the relay output until it finishes, and report progress
+            # on the way
+            while True :
+
+                try :
+                    out += cp_proc.read (timeout=_RELAY_PROGRESS)
+                except Exception :
+                    break
+
+                if  time.time () < report :
+                    continue
+
+                report = time.time () + _RELAY_PROGRESS
+
+                if  is_dir :
+                    done = "%d files" % len ([line for line in out.split ('\n') \
+                                              if line.strip ().startswith ('./')])
+                else :
+                    _, recv, _ = other.run_sync (" wc -c < '%s' 2>/dev/null ; true" % tgt_path)
+                    done = "%s of %s bytes" % (recv.strip () or 0, size)
+
+                self.pty_info['logger'].info ("copy relay: %s -> %s: %s after %ds" \
+                                            % (src, tgt_path, done, time.time () - start))
+
+            out += cp_proc.wait ()
+
+            if  cp_proc.exit_code or 'RELAY SOURCE FAILED' in out :
+
+                # don't leave a partial target behind (but don't remove
+                # directories which existed before)
+                if  not is_dir or not tgt_exists :
+                    other.run_sync (" rm -rf '%s'" % tgt_path)
+
+                raise ptye.translate_exception (se.NoSuccess ("file copy failed: %s" % out))
+
+            if  not is_dir :
+                return [src]
+
+            # tar reports the files it sends (relative to src)
+            files = []
+            for line in out.split ('\n') :
+                line = line.strip ()
+                if  line.startswith ('./') and not line.endswith ('/') :
+                    files.append (os.path.join (src, line[2:]))
+
+            self.pty_info['logger'].debug ("copy done: %s" % files)
+
+            return files
+
+
 # ------------------------------------------------------------------------------
 
@@ -0,0 +1,270 @@
+
+__author__    = "Andre Merzky"
+__copyright__ = "Copyright 2012-2013, The SAGA Project"
+__license__   = "MIT"
+
+
+''' Provides a per-host manifest of staged files, which is used to avoid
+    repeated transfers of identical content to the same remote host.
+'''
+
+import os
+import re
+import json
+import errno
+import hashlib
+import contextlib
+import threading
+
+import saga.exceptions as se
+
+
+# ------------------------------------------------------------------------------
+#
+# The manifest of each host is kept in a local json file, and is mirrored into
+# an index file on the remote host (so that other clients, or a client with
+# a lost local manifest, can pick up the records).  The remote index contains
+# one record per line:
+#
+#   <checksum> <size> <mtime> <path>
+#
+# Later records for the same path override earlier ones.  Records are hints
+# only: any record is verified against the remote file's size and mtime before
+# it is used.
+#
+# The index is only ever appended to -- when it has grown to more than twice
+# the number of live records, it is compacted on load (REMOTE_COMPACT keeps the
+# last record per path, and drops garbage lines).  Records appended by other
+# clients while compacting may get lost, which is fine for hints.
+#
+REMOTE_INDEX   = '$HOME/.saga/transfer_manifest'
+REMOTE_COMPACT = "awk 'NF >= 4 { k = $0 ; sub (/^[^ ]* [^ ]* [^ ]* /, \"\", k) ; "  \
+                 "if (!(k in r)) o[++n] = k ; r[k] = $0 } "                      \
+                 "END { for (i = 1 ; i <= n ; i++) print r[o[i]] }' "            \
+                 "\"%(idx)s\" > \"%(idx)s.$$\" && mv \"%(idx)s.$$\" \"%(idx)s\""     \
+               % {'idx' : REMOTE_INDEX}
+
+_manifests = dict()
+_lock      = threading.RLock ()
+
+
+# ------------------------------------------------------------------------------
+#
+def get_manifest (host_key, base) :
+    """
+    Returns the manifest for the given host key, stored under the given local
+    base dir.  Manifests are shared by all shells to the same host.
+    """
+
+    with _lock :
+
+        if  not host_key in _manifests :
+            _manifests[host_key] = TransferManifest (host_key, base)
+
+        return _manifests[host_key]
+
+
+# ------------------------------------------------------------------------------
+#
+class TransferManifest (object) :
+    """
+    Records which content (identified by its md5 checksum) has been staged to
+    which path on one remote host, together with the size and mtime the remote
+    file had after staging.  It also caches checksums of local files (keyed by
+    their size and mtime), so that unchanged files are not hashed repeatedly.
+
+    Changes are written to the local manifest file right away, unless they
+    happen within a `batch()`, in which case they are written once at its end.
+    """
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__ (self, host_key, base) :
+
+        name = re.sub ('[^a-zA-Z0-9_.@-]', '_', host_key)
+
+        self.host_key = host_key
+        self.synced   = False     # remote index merged?
+        self._fname   = os.path.join (base, 'manifest.%s.json' % name)
+        self._lock    = threading.RLock ()
+        self._entries = dict ()   # remote path : [checksum, size, mtime]
+        self._hashes  = dict ()   # local  path : [size, mtime, checksum]
+        self._batch   = 0         # nesting level of batch()
+        self._dirty   = False     # changes not yet saved
+
+        self._load ()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _load (self) :
+
+        try :
+            with open (self._fname, 'r') as f :
+                data = json.load (f)
+
+            self._entries = data.get ('entries', dict())
+            self._hashes  = data.get ('hashes',  dict())
+
+        except IOError as e :
+            if  e.errno != errno.ENOENT :
+                raise se.NoSuccess ("could not read manifest %s: %s" % (self._fname, e))
+
+        except ValueError :
+            # corrupt manifest -- start over
+            self._entries = dict ()
+            self._hashes  = dict ()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _save (self) :
+
+        if  self._batch :
+            self._dirty = True
+            return
+
+        self._dirty = False
+
+        tmp = "%s.%s" % (self._fname, os.getpid ())
+
+        try :
+            with open (tmp, 'w') as f :
+                json.dump ({'entries' : self._entries,
+                            'hashes'  : self._hashes}, f)
+            os.rename (tmp, self._fname)
+
+        except (IOError, OSError) as e :
+            raise se.NoSuccess ("could not write manifest %s: %s" % (self._fname, e))
+
+
+    # --------------------------------------------------------------------------
+    #
+    @contextlib.contextmanager
+    def batch (self) :
+        """
+        Context manager which defers writing the local manifest file until the
+        (outermost) batch ends, so that a transfer which checks, forgets and
+        records several entries writes the manifest only once.
+        """
+
+        with self._lock :
+            self._batch += 1
+
+        try :
+            yield self
+
+        finally :
+            with self._lock :
+                self._batch -= 1
+                if  not self._batch and self._dirty :
+                    self._save ()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def checksum (self, path) :
+        """
+        Returns the md5 checksum of the given local file.
+        """
+
+        st = os.stat (path)
+
+        with self._lock :
+
+            if  path in self._hashes :
+                size, mtime, checksum = self._hashes[path]
+                if  size == st.st_size and mtime == st.st_mtime :
+                    return checksum
+
+        md5 = hashlib.md5 ()
+        with open (path, 'rb') as f :
+            for chunk in iter (lambda : f.read (1024*1024), '') :
+                md5.update (chunk)
+        checksum = md5.hexdigest ()
+
+        with self._lock :
+            self._hashes[path] = [st.st_size, st.st_mtime, checksum]
+            self._save ()
+
+        return checksum
+
+
+    # --------------------------------------------------------------------------
+    #
+    def lookup (self, path) :
+        """
+        Returns the record for the given remote path as (checksum, size, mtime)
+        tuple, or None if there is none.
+        """
+
+        with self._lock :
+
+            if  path in self._entries :
+                return tuple (self._entries[path])
+
+            return None
+
+
+    # --------------------------------------------------------------------------
+    #
+    def candidates (self, checksum) :
+        """
+        Returns the list of remote paths which are recorded to hold content
+        with the given checksum.
+        """
+
+        with self._lock :
+            return sorted ([p for p, e in self._entries.iteritems () if e[0] == checksum])
+
+
+    # --------------------------------------------------------------------------
+    #
+    def record (self, path, checksum, size, mtime) :
+
+        with self._lock :
+            self._entries[path] = [checksum, int (size), int (mtime)]
+            self._save ()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def forget (self, path) :
+
+        with self._lock :
+            if  path in self._entries :
+                del (self._entries[path])
+                self._save ()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def merge (self, index) :
+        """
+        Merges the content of a remote index file into the manifest.  Local
+        records take precedence.  Returns True if the remote index should be
+        compacted (see REMOTE_COMPACT).
+        """
+
+        remote = dict ()
+        lines  = filter (None, [line.strip () for line in index.split ('\n')])
+
+        for line in lines :
+
+            elems = line.split (' ', 3)
+
+            if  len (elems) == 4 and elems[1].isdigit () and elems[2].isdigit () :
+                remote[elems[3]] = [elems[0], int (elems[1]), int (elems[2])]
+
+        with self._lock :
+
+            for path in remote :
+                if  not path in self._entries :
+                    self._entries[path] = remote[path]
+
+            self.synced = True
+            self._save ()
+
+        return len (lines) > 2 * len (remote)
+
+
@@ -0,0 +1,2130 @@
+#!/usr/bin/env python
+
+__author__    = "Andre Merzky"
+__copyright__ = "Copyright 2012-2013, The SAGA Project"
+__license__   = "MIT"
+
+
+''' Offline simulator for the command line tools of the batch systems which
+    the saga-python job adaptors talk to -- so that the batch adaptors can be
+    exercised and benchmarked on any machine, over fork:// or ssh://.
+
+    The simulator is one script, which is called via symlinks named after the
+    simulated commands.  The batch system flavour is taken from the name of
+    the directory which holds the symlinks, so that, e.g.::
+
+        PATH=`pwd`/fake_rm/pbs:$PATH qsub job.sh
+
+    submits a job to a fake TORQUE server.  The supported flavours and
+    commands are:
+
+        pbs    : qsub qstat qdel pbsnodes
+        slurm  : sbatch squeue scontrol scancel sacct
+        sge    : qsub qstat qdel qconf qacct
+        lsf    : bsub bjobs bkill bqueues
+        condor : condor_version condor_submit condor_q condor_history condor_rm
+        loadl  : llsubmit llq llcancel
+
+    Only the options and output formats which the saga-python adaptors use are
+    simulated.  The queue state is kept in a sqlite database in a local
+    directory, and job scripts are really executed (with the directives and
+    environment the flavour defines) -- but there is no scheduler daemon: the
+    queue advances whenever any of the simulated commands runs.  The
+    simulation is configured by the following environment variables:
+
+        SAGA_FAKE_RM_DIR        : state directory (~/.saga/fake_rm/<flavour>)
+        SAGA_FAKE_RM_SLOTS      : number of jobs which run concurrently (16)
+        SAGA_FAKE_RM_QUEUE_TIME : minimal time jobs spend in the queue (0s)
+        SAGA_FAKE_RM_RUN_TIME   : time jobs keep running after their script
+                                  finished (0s)
+        SAGA_FAKE_RM_CMD_DELAY  : latency added to each command call (0s)
+        SAGA_FAKE_RM_KEEP       : time PBS, SLURM and LSF keep reporting
+                                  finished jobs in their queue listings (300s)
+        SAGA_FAKE_RM_HOST       : host name to report (local host name)
+
+    Remove the state directory to reset the simulated batch system.  Stdout
+    and stderr of jobs default to /dev/null.  Canceling a job which has
+    already finished is not considered an error.
+'''
+
+import os
+import re
+import sys
+import json
+import time
+import shlex
+import errno
+import signal
+import socket
+import getpass
+import sqlite3
+import subprocess
+
+try :
+    from shlex import quote as _quote
+except ImportError :
+    from pipes import quote as _quote
+
+
+# ------------------------------------------------------------------------------
+#
+# the job states the simulator knows about -- the flavours map them to their
+# own state names
+#
+QUEUED    = 'Q'
+RUNNING   = 'R'
+SUSPENDED = 'S'
+DONE      = 'C'
+CANCELED  = 'X'
+
+_FINAL    = [DONE, CANCELED]
+
+# exit code of jobs which got killed while running (128 + SIGTERM)
+_KILLED   = 143
+
+# time formats
+_CTIME    = '%a %b %d %H:%M:%S %Y'
+_ISO      = '%Y-%m-%dT%H:%M:%S'
+
+_SCHEMA   = '''CREATE TABLE IF NOT EXISTS jobs (
+                   id      INTEGER,
+                   task    INTEGER,
+                   name    TEXT,
+                   queue   TEXT,
+                   state   TEXT,
+                   exit    INTEGER,
+                   submit  REAL,
+                   start   REAL,
+                   end     REAL,
+                   pid     INTEGER,
+                   shell   TEXT,
+                   cwd     TEXT,
+                   out     TEXT,
+                   err     TEXT,
+                   env     TEXT,
+                   PRIMARY KEY (id, task))'''
+
+# the job runner: it runs the job script, and leaves the exit code in a file
+# which the next command collects.  The runner is started in its own process
+# group, so that the whole job can be signalled.
+_RUNNER   = '''
+if test "$_FAKE_RM_OUT" = "$_FAKE_RM_ERR"; then
+    "$_FAKE_RM_SHELL" "$_FAKE_RM_SCRIPT" > "$_FAKE_RM_OUT" 2>&1 < /dev/null
+else
+    "$_FAKE_RM_SHELL" "$_FAKE_RM_SCRIPT" > "$_FAKE_RM_OUT" 2> "$_FAKE_RM_ERR" < /dev/null
+fi
+rc=$?
+test "$_FAKE_RM_RUN_TIME" = "0" || sleep "$_FAKE_RM_RUN_TIME"
+echo $rc > "$_FAKE_RM_EXIT.tmp" && mv -f "$_FAKE_RM_EXIT.tmp" "$_FAKE_RM_EXIT"
+'''
+
+
+# ------------------------------------------------------------------------------
+#
+def _cfg (key, default) :
+
+    return os.environ.get ('SAGA_FAKE_RM_%s' % key) or default
+
+
+# ------------------------------------------------------------------------------
+#
+def out (msg='') :
+
+    sys.stdout.write ('%s\n' % msg)
+
+
+# ------------------------------------------------------------------------------
+#
+def err (msg) :
+
+    sys.stderr.write ('%s\n' % msg)
+
+
+# ------------------------------------------------------------------------------
+#
+def _fmt (t, fmt, default='') :
+
+    if  not t :
+        return default
+
+    return time.strftime (fmt, time.localtime (t))
+
+
+# ------------------------------------------------------------------------------
+#
+def _getopt (args, flags=None, values=None) :
+    """
+    Splits a command line into a list of (option, value) tuples and a list of
+    positional arguments.  Either the options which take no value (`flags`),
+    or the options which do take a value (`values`) are given.  Long options
+    take a value only in the '--key=value' form.
+    """
+
+    opts = list()
+    pos  = list()
+    i    = 0
+
+    while i < len (args) :
+
+        arg = args[i]
+
+        if  arg.startswith ('--') and '=' in arg :
+            opts.append (tuple (arg.split ('=', 1)))
+
+        elif arg.startswith ('-') and len (arg) > 1 :
+
+            if  values is not None : has_value = arg in values
+            else                   : has_value = arg not in (flags or [])
+
+            if  arg.startswith ('--') or not has_value or i + 1 >= len (args) :
+                opts.append ((arg, None))
+            else :
+                opts.append ((arg, args[i+1]))
+                i += 1
+
+        else :
+            pos.append (arg)
+
+        i += 1
+
+    return opts, pos
+
+
+# ------------------------------------------------------------------------------
+#
+def _range (spec) :
+    """ parses an array spec like '0-9', '1-10:2' or '1,3,5-7%2' """
+
+    ret = list()
+
+    for part in spec.split ('%')[0].split (',') :
+
+        step = 1
+        if  ':' in part :
+            part, step = part.split (':', 1)
+            step = int (step)
+
+        if  '-' in part :
+            first, last = part.split ('-', 1)
+            ret += range (int (first), int (last) + 1, step)
+        elif part.strip () :
+            ret.append (int (part))
+
+    return ret
+
+
+# ------------------------------------------------------------------------------
+#
+def _alive (pid) :
+
+    try :
+        os.kill (pid, 0)
+        return True
+
+    except OSError as e :
+        return e.errno == errno.EPERM
+
+
+# ------------------------------------------------------------------------------
+#
+class FakeRM (object) :
+    """
+    The queue and job management which is shared by all flavours.  The
+    flavours implement their commands as methods of the same name, which get
+    the command line arguments, and return the exit code.
+    """
+
+    commands   = ()          # simulated commands
+    prefix     = None        # prefix of directive lines in job scripts
+    flags      = ()          # submission options which take no value
+    keep_final = False       # keep finished jobs in queue listings
+    version    = ''
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__ (self, base) :
+
+        self.base       = base
+        self.host       = _cfg ('HOST', socket.gethostname ().split ('.')[0])
+        self.user       = getpass.getuser ()
+        self.home       = os.path.expanduser ('~')
+        self.slots      = int   (_cfg ('SLOTS',      16))
+        self.queue_time = float (_cfg ('QUEUE_TIME',  0))
+        self.run_time   =        _cfg ('RUN_TIME',  '0')
+        self.keep       = float (_cfg ('KEEP',      300))
+        self.now        = time.time ()
+        self._jobs      = None
+
+        self._scripts   = os.path.join (base, 'scripts')
+        self._exits     = os.path.join (base, 'exits')
+
+        for path in [self._scripts, self._exits] :
+            if  not os.path.isdir (path) :
+                try :
+                    os.makedirs (path)
+                except OSError as e :
+                    if  e.errno != errno.EEXIST :
+                        raise
+
+        self.db = sqlite3.connect (os.path.join (base, 'jobs.db'),
+                                   timeout=600, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute (_SCHEMA)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def run (self, cmd, args) :
+        """ runs a command -- all commands are serialized """
+
+        self.db.execute ('BEGIN IMMEDIATE')
+
+        try :
+            self.advance ()
+            ret = getattr (self, cmd) (args)
+            self.db.execute ('COMMIT')
+
+        except :
+            self.db.execute ('ROLLBACK')
+            raise
+
+        return ret or 0
+
+
+    # --------------------------------------------------------------------------
+    #
+    def jobs (self) :
+        """ returns all jobs, ordered by id and task """
+
+        if  self._jobs is None :
+            self._jobs = [dict (row) for row in self.db.execute (
+                          'SELECT * FROM jobs ORDER BY id, task')]
+        return self._jobs
+
+
+    # --------------------------------------------------------------------------
+    #
+    def lookup (self, jid, task=None) :
+        """ returns the job with the given id (and task), or all its tasks """
+
+        if  not hasattr (self, '_index') or self._index[0] is not self._jobs :
+            index = dict()
+            for job in self.jobs () :
+                index.setdefault (job['id'], list()).append (job)
+            self._index = (self._jobs, index)
+
+        jobs = self._index[1].get (jid, [])
+
+        if  task is None :
+            return jobs
+
+        return [job for job in jobs if job['task'] == task]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def update (self, job, **kwargs) :
+
+        keys = sorted (kwargs.keys ())
+        self.db.execute ('UPDATE jobs SET %s WHERE id=? AND task=?' \
+                         % ', '.join (['%s=?' % key for key in keys]),
+                         [kwargs[key] for key in keys] + [job['id'], job['task']])
+        job.update (kwargs)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def final (self, job) :
+
+        return job['state'] in _FINAL
+
+
+    # --------------------------------------------------------------------------
+    #
+    def visible (self, job) :
+        """ is the job listed in the queue? """
+
+        if  not self.final (job) :
+            return True
+
+        return self.keep_final and job['end'] > self.now - self.keep
+
+
+    # --------------------------------------------------------------------------
+    #
+    def summary (self, jobs) :
+        """ the combined state of all tasks of a job array """
+
+        ret    = dict (jobs[0])
+        states = [job['state'] for job in jobs]
+
+        for state in [RUNNING, SUSPENDED, QUEUED, DONE, CANCELED] :
+            if  state in states :
+                ret['state'] = state
+                break
+
+        starts = [job['start'] for job in jobs if job['start']]
+        ret['start'] = min (starts) if starts else None
+        ret['end'  ] = max ([job['end'] or 0 for job in jobs]) \
+                       if not [s for s in states if s not in _FINAL] else None
+        ret['exit' ] = max ([job['exit'] or 0 for job in jobs])
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def directives (self, script) :
+        """ returns the options given by the directives in a job script """
+
+        args = list()
+
+        for line in script.split ('\n') :
+
+            line = line.strip ()
+
+            if  not line.startswith (self.prefix + ' ') :
+                continue
+
+            try :
+                args += shlex.split (line[len (self.prefix):])
+            except ValueError :
+                args += line[len (self.prefix):].split ()
+
+        return args
+
+
+    # --------------------------------------------------------------------------
+    #
+    def script (self, pos) :
+        """ reads the job script from the file given, or from stdin """
+
+        if  pos :
+            with open (pos[0], 'r') as f :
+                return f.read ()
+
+        return sys.stdin.read ()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def submit (self, script, name, queue, cwd, out=None, err=None, env=None,
+                tasks=None, shell=None) :
+        """ queues a job (or the tasks of a job array), returns its id """
+
+        row = self.db.execute ('SELECT MAX(id) FROM jobs').fetchone ()
+        jid = (row[0] or 0) + 1
+
+        with open (os.path.join (self._scripts, str (jid)), 'w') as f :
+            f.write (script)
+
+        for task in (tasks if tasks is not None else [-1]) :
+            self.db.execute ('INSERT INTO jobs (id, task, name, queue, state, '
+                             'submit, shell, cwd, out, err, env) '
+                             'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             [jid, task, name, queue, QUEUED, self.now,
+                              shell or '/bin/bash', cwd, out or '/dev/null',
+                              err or '/dev/null', json.dumps (env or {})])
+        self._jobs = None
+
+        return jid
+
+
+    # --------------------------------------------------------------------------
+    #
+    def cancel (self, job) :
+
+        if  self.final (job) :
+            return
+
+        if  job['state'] in [RUNNING, SUSPENDED] :
+            self._signal (job, signal.SIGTERM)
+            self._signal (job, signal.SIGCONT)
+            self.update (job, state=CANCELED, exit=_KILLED, end=self.now)
+        else :
+            self.update (job, state=CANCELED, end=self.now)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def suspend (self, job) :
+
+        if  job['state'] != RUNNING :
+            return False
+
+        self._signal (job, signal.SIGSTOP)
+        self.update (job, state=SUSPENDED)
+        return True
+
+
+    # --------------------------------------------------------------------------
+    #
+    def resume (self, job) :
+
+        if  job['state'] != SUSPENDED :
+            return False
+
+        self._signal (job, signal.SIGCONT)
+        self.update (job, state=RUNNING)
+        return True
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _signal (self, job, sig) :
+
+        try :
+            os.killpg (job['pid'], sig)
+        except OSError :
+            pass
+
+
+    # --------------------------------------------------------------------------
+    #
+    def advance (self) :
+        """
+        collects the exit codes of finished jobs, and starts queued jobs on the
+        free slots
+        """
+
+        exits   = set (os.listdir (self._exits))
+        running = 0
+
+        for job in self.jobs () :
+
+            if  job['state'] not in [RUNNING, SUSPENDED] :
+                continue
+
+            key  = '%d.%d' % (job['id'], job['task'])
+            path = os.path.join (self._exits, key)
+
+            if  key in exits or (not _alive (job['pid']) and os.path.exists (path)) :
+                with open (path, 'r') as f :
+                    code = f.read ().strip ()
+                self.update (job, state=DONE, end=os.path.getmtime (path),
+                             exit=int (code) if code.isdigit () else 1)
+                os.unlink (path)
+
+            elif not _alive (job['pid']) :
+                # the job got lost (killed behind our back)
+                self.update (job, state=DONE, end=self.now, exit=_KILLED)
+
+            else :
+                running += 1
+
+        for job in self.jobs () :
+
+            if  running >= self.slots :
+                break
+
+            if  job['state'] == QUEUED and \
+                job['submit'] + self.queue_time <= self.now :
+                self._start (job)
+                running += 1
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _start (self, job) :
+
+        env = dict (os.environ)
+        env.update (json.loads (job['env']))
+        env.update (self.job_env (job))
+
+        cwd = job['cwd']
+        if  not os.path.isdir (cwd) :
+            cwd = self.home
+
+        env['_FAKE_RM_SHELL'   ] = job['shell']
+        env['_FAKE_RM_SCRIPT'  ] = os.path.join (self._scripts, str (job['id']))
+        env['_FAKE_RM_OUT'     ] = self.path (job['out'], job, cwd)
+        env['_FAKE_RM_ERR'     ] = self.path (job['err'], job, cwd)
+        env['_FAKE_RM_RUN_TIME'] = self.run_time
+        env['_FAKE_RM_EXIT'    ] = os.path.join (self._exits, '%d.%d' % (job['id'], job['task']))
+
+        try :
+            with open (os.devnull, 'r+') as null :
+                proc = subprocess.Popen (['/bin/sh', '-c', _RUNNER], env=env,
+                                         cwd=cwd, stdin=null, stdout=null,
+                                         stderr=null, close_fds=True,
+                                         preexec_fn=os.setsid)
+            self.update (job, state=RUNNING, start=self.now, pid=proc.pid)
+
+        except OSError :
+            self.update (job, state=DONE, start=self.now, end=self.now, exit=127)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def path (self, path, job, cwd) :
+        """ expands the flavour's patterns in an output file name """
+
+        for key, val in self.patterns (job).items () :
+            path = path.replace (key, val)
+
+        return os.path.join (cwd, os.path.expanduser (path))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def job_env (self, job) :
+        """ the environment the flavour defines for running jobs """
+
+        return dict()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def patterns (self, job) :
+        """ the placeholders the flavour supports in output file names """
+
+        return dict()
+
+
+# ------------------------------------------------------------------------------
+#
+class PBS (FakeRM) :
+    """ TORQUE """
+
+    commands   = ('qsub', 'qstat', 'qdel', 'pbsnodes')
+    prefix     = '#PBS'
+    flags      = ('-V', '-h', '-I', '-X', '-z', '-f')
+    keep_final = True
+    version    = 'Version: 4.2.6'
+
+    _STATES    = {QUEUED : 'Q', RUNNING : 'R', SUSPENDED : 'S',
+                  DONE   : 'C', CANCELED : 'C'}
+
+    # <pid>, <pid>.<server>, <pid>[], <pid>[<index>].<server>
+    _ID_RE     = re.compile (r'^(\d+)(\[(\d*)\])?(\..*)?$')
+
+    # --------------------------------------------------------------------------
+    #
+    def job_id (self, job, array=False) :
+
+        if  job['task'] < 0 : return '%d.%s'     % (job['id'], self.host)
+        elif array          : return '%d[].%s'   % (job['id'], self.host)
+        else                : return '%d[%d].%s' % (job['id'], job['task'], self.host)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def job_env (self, job) :
+
+        env = {'PBS_JOBID'       : self.job_id (job),
+               'PBS_JOBNAME'     : job['name'],
+               'PBS_QUEUE'       : job['queue'],
+               'PBS_ENVIRONMENT' : 'PBS_BATCH'}
+
+        if  job['task'] >= 0 :
+            env['PBS_ARRAYID'    ] = str (job['task'])
+            env['PBS_ARRAY_INDEX'] = str (job['task'])
+
+        return env
+
+
+    # --------------------------------------------------------------------------
+    #
+    def find (self, spec, visible=True) :
+        """ returns the jobs an id refers to, and whether it names an array """
+
+        match = self._ID_RE.match (spec)
+        if  not match :
+            return [], False
+
+        jobs = self.lookup (int (match.group (1)))
+
+        if  visible :
+            jobs = [job for job in jobs if self.visible (job)]
+
+        if  match.group (3) :
+            return [job for job in jobs if job['task'] == int (match.group (3))], False
+
+        return jobs, jobs and jobs[0]['task'] >= 0
+
+
+    # --------------------------------------------------------------------------
+    #
+    def qsub (self, args) :
+
+        if  '--version' in args :
+            out (self.version)
+            return 0
+
+        opts, pos = _getopt (args, self.flags)
+        script    = self.script (pos)
+        dopts, _  = _getopt (self.directives (script), self.flags)
+        opts      = dict (dopts + opts)
+
+        # '-V' exports the submission environment
+        env = dict (os.environ) if '-V' in opts else dict()
+        env.update ({'PBS_O_WORKDIR' : os.getcwd (),
+                     'PBS_O_HOST'    : self.host})
+
+        for var in (opts.get ('-v') or '').split (',') :
+            if  '=' in var :
+                key, val = var.split ('=', 1)
+                env[key] = val
+
+        tasks = None
+        if  opts.get ('-t') or opts.get ('-J') :
+            tasks = _range (opts.get ('-t') or opts.get ('-J'))
+
+        # output paths may be given as <host>:<path>
+        jid = self.submit (script,
+                           name  = opts.get ('-N') or (os.path.basename (pos[0]) if pos else 'STDIN'),
+                           queue = opts.get ('-q') or 'batch',
+                           cwd   = opts.get ('-d') or opts.get ('-w') or self.home,
+                           out   = (opts.get ('-o') or '').split (':')[-1],
+                           err   = (opts.get ('-e') or '').split (':')[-1],
+                           env   = env,
+                           tasks = tasks)
+
+        if  tasks : out ('%d[].%s' % (jid, self.host))
+        else      : out ('%d.%s'   % (jid, self.host))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def qstat (self, args) :
+
+        if  '--version' in args :
+            out (self.version)
+            return 0
+
+        opts, ids = _getopt (args, values=['-u', '-q', '-W'])
+        opts      = [opt for opt, _ in opts]
+        full      = [opt for opt in opts if opt.startswith ('-f')]
+        expand    = '-t' in opts
+        ret       = 0
+        records   = list()     # (id, job)
+
+        if  ids :
+            for spec in ids :
+                jobs, array = self.find (spec)
+                if  not jobs :
+                    err ('qstat: Unknown Job Id Error %s.%s' % (spec.split ('.')[0], self.host))
+                    ret = 153
+                elif array and not expand :
+                    records.append ((self.job_id (jobs[0], True), self.summary (jobs)))
+                else :
+                    records += [(self.job_id (job), job) for job in jobs]
+        else :
+            arrays = dict()
+            for job in self.jobs () :
+                if  not self.visible (job) :
+                    continue
+                if  job['task'] >= 0 and not expand :
+                    if  job['id'] not in arrays :
+                        arrays[job['id']] = len (records)
+                        records.append ((self.job_id (job, True), None))
+                else :
+                    records.append ((self.job_id (job), job))
+            for jid, idx in arrays.items () :
+                records[idx] = (records[idx][0],
+                                self.summary ([job for job in self.lookup (jid) if self.visible (job)]))
+
+        if  full :
+            for jid, job in records :
+                self._record (jid, job)
+
+        elif records :
+            out ('%-24s %-16s %-15s %-8s %s %s' % ('Job ID', 'Name', 'User', 'Time Use', 'S', 'Queue'))
+            out ('%s %s %s %s %s %s' % ('-' * 24, '-' * 16, '-' * 15, '-' * 8, '-', '-' * 5))
+            for jid, job in records :
+                out ('%-24s %-16s %-15s %-8s %s %s' % (jid, job['name'][:16], self.user,
+                     '0', self._STATES[job['state']], job['queue']))
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _record (self, jid, job) :
+
+        out ('Job Id: %s' % jid)
+        out ('    Job_Name = %s'     % job['name'])
+        out ('    Job_Owner = %s@%s' % (self.user, self.host))
+        out ('    job_state = %s'    % self._STATES[job['state']])
+        out ('    queue = %s'        % job['queue'])
+        out ('    server = %s'       % self.host)
+        out ('    ctime = %s'        % _fmt (job['submit'], _CTIME))
+
+        if  job['start'] :
+            out ('    exec_host = %s/0'  % self.host)
+            out ('    start_time = %s'   % _fmt (job['start'], _CTIME))
+
+        if  job['state'] == CANCELED :
+            out ('    exit_status = 271')
+        elif job['state'] == DONE :
+            out ('    exit_status = %d'  % job['exit'])
+
+        out ('    mtime = %s' % _fmt (job['end'] or job['start'] or job['submit'], _CTIME))
+        out ()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def qdel (self, args) :
+
+        _, ids = _getopt (args, values=['-m', '-W'])
+        ret    = 0
+
+        for spec in ids :
+            jobs, _ = self.find (spec, visible=False)
+            if  not jobs :
+                err ('qdel: Unknown Job Id %s.%s' % (spec.split ('.')[0], self.host))
+                ret = 153
+            for job in jobs :
+                self.cancel (job)
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def pbsnodes (self, args) :
+
+        if  '--version' in args :
+            out (self.version)
+            return 0
+
+        out (self.host)
+        out ('     state = free')
+        out ('     np = %d' % self.slots)
+        out ('     ntype = cluster')
+        out ()
+
+
+# ------------------------------------------------------------------------------
+#
+class SLURM (FakeRM) :
+    """ SLURM """
+
+    commands   = ('sbatch', 'squeue', 'scontrol', 'scancel', 'sacct')
+    prefix     = '#SBATCH'
+    flags      = ('-h', '-H', '-O', '-Q', '-v', '-W', '-s')
+    keep_final = True
+    version    = 'slurm 14.03.0'
+
+    _LONG      = {'--job-name'  : '-J', '--output'    : '-o',
+                  '--error'     : '-e', '--chdir'     : '-D',
+                  '--workdir'   : '-D', '--array'     : '-a',
+                  '--partition' : '-p', '--jobs'      : '-j',
+                  '--states'    : '-t', '--format'    : '-o',
+                  '--user'      : '-u', '--noheader'  : '-h',
+                  '--parsable2' : '-P', '--parsable'  : '-p',
+                  '--allocations' : '-X'}
+
+    _HEADERS   = {'i' : 'JOBID',     'A' : 'JOBID',        'a' : 'ACCOUNT',
+                  'K' : 'ARRAY_TASK_ID',
+                  'j' : 'NAME',      'u' : 'USER',         'T' : 'STATE',
+                  't' : 'ST',        'V' : 'SUBMIT_TIME',  'S' : 'START_TIME',
+                  'e' : 'END_TIME',  'N' : 'NODELIST',     'M' : 'TIME',
+                  'D' : 'NODES',     'P' : 'PARTITION',    'R' : 'NODELIST(REASON)',
+                  'C' : 'CPUS',      '%' : '%'}
+
+    _STATES    = {QUEUED : ('PENDING',   'PD'), RUNNING  : ('RUNNING',   'R' ),
+                  SUSPENDED : ('SUSPENDED', 'S' ), CANCELED : ('CANCELLED', 'CA')}
+
+    # --------------------------------------------------------------------------
+    #
+    def _opts (self, opts) :
+
+        return dict ([(self._LONG.get (key, key), val) for key, val in opts])
+
+
+    # --------------------------------------------------------------------------
+    #
+    def job_id (self, job) :
+
+        if  job['task'] < 0 : return '%d'    %  job['id']
+        else                : return '%d_%d' % (job['id'], job['task'])
+
+
+    # --------------------------------------------------------------------------
+    #
+    def find (self, spec, visible=True) :
+        """ returns the jobs an id (<pid> or <pid>_<task>) refers to """
+
+        elems = spec.strip ().split ('_')
+
+        if  not elems[0].isdigit () :
+            return []
+
+        if  len (elems) > 1 and elems[1].isdigit () :
+            jobs = self.lookup (int (elems[0]), int (elems[1]))
+        else :
+            jobs = self.lookup (int (elems[0]))
+
+        if  visible :
+            jobs = [job for job in jobs if self.visible (job)]
+
+        return jobs
+
+
+    # --------------------------------------------------------------------------
+    #
+    def state (self, job, short=False) :
+
+        if  job['state'] == DONE :
+            names = ('COMPLETED', 'CD') if job['exit'] == 0 else ('FAILED', 'F')
+        else :
+            names = self._STATES[job['state']]
+
+        return names[1] if short else names[0]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def job_env (self, job) :
+
+        env = {'SLURM_JOB_ID'        : str (job['id']),
+               'SLURM_JOBID'         : str (job['id']),
+               'SLURM_JOB_NAME'      : job['name'],
+               'SLURM_JOB_PARTITION' : job['queue'],
+               'SLURM_JOB_NODELIST'  : self.host,
+               'SLURM_NODELIST'      : self.host}
+
+        if  job['task'] >= 0 :
+            env['SLURM_ARRAY_JOB_ID' ] = str (job['id'])
+            env['SLURM_ARRAY_TASK_ID'] = str (job['task'])
+
+        return env
+
+
+    # --------------------------------------------------------------------------
+    #
+    def patterns (self, job) :
+
+        return {'%j' : str (job['id']),
+                '%A' : str (job['id']),
+                '%a' : str (max (job['task'], 0)),
+                '%x' : job['name'],
+                '%u' : self.user,
+                '%N' : self.host}
+
+
+    # --------------------------------------------------------------------------
+    #
+    def field (self, key, job) :
+        """ renders one squeue / sacct field of a job """
+
+        # '%T' is the full state name, '%t' the abbreviated one
+        if  key == 'T' :
+            return self.state (job)
+
+        if  key == 'A' :
+            return str (job['id'])
+
+        key = key.lower ()
+
+        if  key in ['i', 'jobid']      : return self.job_id (job)
+        if  key in ['k', 'arraytaskid']: return str (job['task']) if job['task'] >= 0 else 'N/A'
+        if  key in ['a', 'account']    : return self.user
+        if  key in ['j', 'jobname']    : return job['name']
+        if  key in ['u', 'user']       : return self.user
+        if  key in ['p', 'partition']  : return job['queue']
+        if  key in ['t']               : return self.state (job, short=True)
+        if  key in ['d', 'c', 'alloccpus', 'nnodes'] : return '1'
+        if  key in ['v', 'submit']     : return _fmt (job['submit'], _ISO, 'Unknown')
+        if  key in ['s', 'start']      : return _fmt (job['start'],  _ISO, 'Unknown')
+        if  key in ['e', 'end']        : return _fmt (job['end'],    _ISO, 'Unknown')
+        if  key in ['m', 'elapsed']    :
+            secs = int ((job['end'] or self.now) - job['start']) if job['start'] else 0
+            return '%02d:%02d:%02d' % (secs // 3600, (secs // 60) % 60, secs % 60)
+
+        if  key in ['state'] :
+            if  job['state'] == CANCELED :
+                return 'CANCELLED by %d' % os.getuid ()
+            return self.state (job)
+
+        if  key == 'exitcode' :
+            if  job['state'] == CANCELED : return '0:15'
+            return '%d:0' % (job['exit'] or 0)
+
+        if  key in ['n', 'nodelist'] :
+            return self.host if job['start'] else ''
+
+        if  key in ['r'] :
+            return self.host if job['start'] else '(None)'
+
+        if  key == '%' :
+            return '%'
+
+        return ''
+
+
+    # --------------------------------------------------------------------------
+    #
+    def sbatch (self, args) :
+
+        if  '--version' in args or '-V' in args :
+            out (self.version)
+            return 0
+
+        opts, pos = _getopt (args, self.flags)
+        script    = self.script (pos)
+        dopts, _  = _getopt (self.directives (script), self.flags)
+        opts      = self._opts (dopts + opts)
+
+        tasks = None
+        if  opts.get ('-a') :
+            tasks = _range (opts['-a'])
+
+        # stderr goes to the stdout file by default
+        jid = self.submit (script,
+                           name  = opts.get ('-J') or (os.path.basename (pos[0]) if pos else 'sbatch'),
+                           queue = opts.get ('-p') or 'normal',
+                           cwd   = opts.get ('-D') or os.getcwd (),
+                           out   = opts.get ('-o'),
+                           err   = opts.get ('-e') or opts.get ('-o'),
+                           env   = dict (os.environ,
+                                         SLURM_SUBMIT_DIR  = os.getcwd (),
+                                         SLURM_SUBMIT_HOST = self.host),
+                           tasks = tasks)
+
+        out ('Submitted batch job %d' % jid)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def squeue (self, args) :
+
+        if  '--version' in args or '-V' in args :
+            out (self.version)
+            return 0
+
+        opts, _ = _getopt (args, values=['-j', '-t', '-o', '-u', '-p', '-n', '-w', '-O'])
+        opts    = self._opts (opts)
+        fmt     = opts.get ('-o') or '%.18i %.9P %.8j %.8u %.2t %.10M %.6D %R'
+        states  = [s.strip ().upper () for s in (opts.get ('-t') or '').split (',') if s.strip ()]
+
+        if  opts.get ('-j') :
+            jobs = list()
+            for spec in opts['-j'].split (',') :
+                jobs += self.find (spec)
+            if  not jobs :
+                err ('slurm_load_jobs error: Invalid job id specified')
+                return 1
+        else :
+            jobs = [job for job in self.jobs () if self.visible (job)]
+
+        if  'ALL' not in states :
+            if  states :
+                jobs = [job for job in jobs if self.state (job)  in states \
+                                            or self.state (job, True) in states]
+            else :
+                jobs = [job for job in jobs if not self.final (job)]
+
+        if  '-h' not in opts :
+            out (self._render (fmt, None))
+
+        for job in jobs :
+            out (self._render (fmt, job))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _render (self, fmt, job) :
+        """ renders a squeue format string for a job (or the header) """
+
+        def render (match) :
+
+            if  job is None : val = self._HEADERS.get (match.group (3), '')
+            else            : val = self.field  (match.group (3), job)
+
+            width = int (match.group (2) or 0)
+
+            if  match.group (1) : return val.rjust (width)
+            else                : return val.ljust (width)
+
+        return re.sub (r'%(\.?)(\d*)([a-zA-Z%])', render, fmt)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def sacct (self, args) :
+
+        if  '--version' in args or '-V' in args :
+            out (self.version)
+            return 0
+
+        opts, _ = _getopt (args, values=['-j', '-o', '-u', '-S', '-E', '-s', '--format'])
+        opts    = self._opts (opts)
+        fields  = [f.split ('%')[0] for f in \
+                   (opts.get ('-o') or opts.get ('--format') or
+                    'JobID,JobName,Partition,Account,AllocCPUS,State,ExitCode').split (',')]
+
+        if  opts.get ('-j') :
+            jobs = list()
+            for spec in opts['-j'].split (',') :
+                jobs += self.find (spec, visible=False)
+        else :
+            jobs = self.jobs ()
+
+        rows = [[self.field (f, job) for f in fields] for job in jobs]
+
+        if  '-P' in opts or '-p' in opts :
+            end = '|' if '-p' in opts else ''
+            if  '-n' not in opts :
+                out ('|'.join (fields) + end)
+            for row in rows :
+                out ('|'.join (row) + end)
+
+        else :
+            if  '-n' not in opts :
+                out (' '.join (['%-10s' % f[:10] for f in fields]))
+                out (' '.join (['-' * 10    for f in fields]))
+            for row in rows :
+                out (' '.join (['%-10s' % r[:10] for r in row]))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def scontrol (self, args) :
+
+        if  '--version' in args or '-V' in args :
+            out (self.version)
+            return 0
+
+        if  len (args) < 2 :
+            err ('scontrol: error: invalid command')
+            return 1
+
+        if  args[0] == 'show' and args[1] == 'job' :
+
+            if  len (args) > 2 : jobs = self.find (args[2])
+            else               : jobs = [job for job in self.jobs () if self.visible (job)]
+
+            if  len (args) > 2 and not jobs :
+                err ('slurm_load_jobs error: Invalid job id specified')
+                return 1
+
+            for job in jobs :
+                out ('JobId=%s JobName=%s' % (self.job_id (job), job['name']))
+                out ('   UserId=%s(%d) GroupId=%s(%d)' % (self.user, os.getuid (),
+                                                         self.user, os.getgid ()))
+                out ('   JobState=%s Reason=None Dependency=(null)' % self.state (job))
+                out ('   ExitCode=%s' % self.field ('exitcode', job))
+                out ('   SubmitTime=%s EligibleTime=%s' % (self.field ('submit', job),
+                                                          self.field ('submit', job)))
+                out ('   StartTime=%s EndTime=%s' % (self.field ('start', job),
+                                                    self.field ('end',   job)))
+                out ('   Partition=%s NodeList=%s' % (job['queue'],
+                                                     self.field ('nodelist', job) or '(null)'))
+                out ('   WorkDir=%s' % job['cwd'])
+                out ()
+
+            return 0
+
+        if  args[0] in ['suspend', 'resume'] :
+
+            jobs = list()
+            for spec in args[1].split (',') :
+                jobs += self.find (spec)
+
+            if  not jobs :
+                err ('Invalid job id specified')
+                return 1
+
+            ret = 0
+            for job in jobs :
+                if  not getattr (self, args[0]) (job) :
+                    err ('Job is not %s' % ('running' if args[0] == 'suspend' else 'suspended'))
+                    ret = 1
+
+            return ret
+
+        err ('scontrol: error: invalid command: %s' % ' '.join (args))
+        return 1
+
+
+    # --------------------------------------------------------------------------
+    #
+    def scancel (self, args) :
+
+        _, ids = _getopt (args, values=['-n', '-p', '-u', '-s', '-t'])
+        ret    = 0
+
+        for spec in ','.join (ids).split (',') :
+
+            if  not spec :
+                continue
+
+            jobs = self.find (spec, visible=False)
+            if  not jobs :
+                err ('scancel: error: Kill job error on job id %s: '
+                     'Invalid job id specified' % spec)
+                ret = 1
+
+            for job in jobs :
+                self.cancel (job)
+
+        return ret
+
+
+# ------------------------------------------------------------------------------
+#
+class SGE (FakeRM) :
+    """ Sun / Oracle / Open Grid Engine """
+
+    commands   = ('qsub', 'qstat', 'qdel', 'qconf', 'qacct')
+    prefix     = '#$'
+    flags      = ('-V', '-cwd', '-notify', '-h', '-terse')
+    version    = 'GE 6.2u5'
+
+    _STATES    = {QUEUED : 'qw', RUNNING : 'r', SUSPENDED : 's'}
+
+    # --------------------------------------------------------------------------
+    #
+    def find (self, spec, visible=True) :
+
+        if  not spec.split ('.')[0].isdigit () :
+            return []
+
+        jobs = self.lookup (int (spec.split ('.')[0]))
+
+        if  visible :
+            jobs = [job for job in jobs if self.visible (job)]
+
+        return jobs
+
+
+    # --------------------------------------------------------------------------
+    #
+    def job_env (self, job) :
+
+        return {'JOB_ID'      : str (job['id']),
+                'JOB_NAME'    : job['name'],
+                'QUEUE'       : job['queue'],
+                'HOSTNAME'    : self.host,
+                'SGE_TASK_ID' : 'undefined'}
+
+
+    # --------------------------------------------------------------------------
+    #
+    def patterns (self, job) :
+
+        return {'$JOB_ID'   : str (job['id']),
+                '$JOB_NAME' : job['name'],
+                '$HOSTNAME' : self.host,
+                '$USER'     : self.user,
+                '$TASK_ID'  : 'undefined'}
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _help (self, cmd) :
+
+        out (self.version)
+        out ('usage: %s [options]' % cmd)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def qsub (self, args) :
+
+        if  '-help' in args :
+            return self._help ('qsub')
+
+        opts, pos = _getopt (args, self.flags)
+        script    = self.script (pos)
+        dopts, _  = _getopt (self.directives (script), self.flags)
+        opts      = dict (dopts + opts)
+        name      = opts.get ('-N') or (os.path.basename (pos[0]) if pos else 'STDIN')
+
+        if  '-wd' in opts     : cwd = opts['-wd']
+        elif '-cwd' in opts   : cwd = os.getcwd ()
+        else                  : cwd = self.home
+
+        # '-V' exports the submission environment
+        env = dict (os.environ) if '-V' in opts else dict()
+        env.update ({'SGE_O_HOST'    : self.host,
+                     'SGE_O_WORKDIR' : os.getcwd ()})
+
+        for var in (opts.get ('-v') or '').split (',') :
+            if  '=' in var :
+                key, val = var.split ('=', 1)
+                env[key] = val
+
+        # output paths may name directories
+        paths = dict()
+        for key, suffix in [('-o', 'o'), ('-e', 'e')] :
+            paths[key] = opts.get (key)
+            if  paths[key] and os.path.isdir (os.path.join (cwd, paths[key])) :
+                paths[key] = os.path.join (paths[key], '$JOB_NAME.%s$JOB_ID' % suffix)
+
+        jid = self.submit (script, name=name,
+                           queue = opts.get ('-q') or 'all.q',
+                           cwd   = cwd,
+                           out   = paths['-o'],
+                           err   = paths['-e'],
+                           env   = env,
+                           shell = opts.get ('-S'))
+
+        if  '-terse' in opts : out ('%d' % jid)
+        else                 : out ('Your job %d ("%s") has been submitted' % (jid, name))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def qstat (self, args) :
+
+        if  '-help' in args :
+            return self._help ('qstat')
+
+        opts, _ = _getopt (args, values=['-j', '-u', '-q', '-s'])
+        opts    = dict (opts)
+
+        if  '-j' in opts :
+
+            jobs = list()
+            for spec in opts['-j'].split (',') :
+                jobs += self.find (spec)
+
+            if  not jobs :
+                err ('Following jobs do not exist: ')
+                err (opts['-j'])
+                return 1
+
+            for job in jobs :
+                out ('=' * 62)
+                out ('%-28s%d' % ('job_number:',      job['id']))
+                out ('%-28s%s' % ('submission_time:', _fmt (job['submit'], _CTIME)))
+                out ('%-28s%s' % ('owner:',           self.user))
+                out ('%-28s%s' % ('sge_o_home:',      self.home))
+                out ('%-28s%s' % ('sge_o_host:',      self.host))
+                out ('%-28s%s' % ('job_name:',        job['name']))
+                out ('%-28s%s' % ('cwd:',             job['cwd']))
+
+            return 0
+
+        jobs = [job for job in self.jobs () if self.visible (job)]
+
+        if  not jobs :
+            return 0
+
+        out ('job-ID  prior   name       user         state submit/start at     queue                          slots ja-task-ID ')
+        out ('-' * 113)
+
+        for job in jobs :
+
+            if  job['start'] :
+                date  = _fmt (job['start'], '%m/%d/%Y %H:%M:%S')
+                queue = '%s@%s' % (job['queue'], self.host)
+            else :
+                date  = _fmt (job['submit'], '%m/%d/%Y %H:%M:%S')
+                queue = ''
+
+            out ('%7d %7s %-10s %-12s %-5s %-19s %-30s %5d' \
+                 % (job['id'], '0.55500', job['name'].replace (' ', '_')[:10],
+                    self.user[:12], self._STATES[job['state']], date, queue, 1))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def qdel (self, args) :
+
+        _, ids = _getopt (args, values=['-u'])
+        ret    = 0
+
+        for spec in ','.join (ids).split (',') :
+
+            if  not spec :
+                continue
+
+            jobs = self.find (spec, visible=False)
+
+            if  not jobs :
+                err ('denied: job "%s" does not exist' % spec)
+                ret = 1
+
+            for job in jobs :
+                if  job['state'] == QUEUED :
+                    out ('%s has deleted job %d' % (self.user, job['id']))
+                elif not self.final (job) :
+                    out ('%s has registered the job %d for deletion' % (self.user, job['id']))
+                self.cancel (job)
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def qconf (self, args) :
+
+        if  '-help' in args :
+            return self._help ('qconf')
+
+        if  '-spl' in args :
+            out ('make')
+            out ('mpi')
+            out ('smp')
+
+        elif '-sc' in args :
+            out ('#name               shortcut   type        relop requestable consumable default  urgency ')
+            out ('#' + '-' * 87)
+            out ('arch                a          RESTRING    ==    YES         NO         NONE     0')
+            out ('h_vmem              h_vmem     MEMORY      <=    YES         NO         0        0')
+            out ('mem_free            mf         MEMORY      <=    YES         NO         0        0')
+            out ('slots               s          INT         <=    YES         YES        1        1000')
+            out ('# >#< starts a comment but comments are not saved across edits --------')
+
+        elif '-sconf' in args :
+            out ('#global:')
+            out ('execd_spool_dir              /var/spool/sge')
+            out ('reporting_params             accounting=true reporting=false \\')
+            out ('                             flush_time=00:00:15 joblog=false sharelog=00:00:00')
+            out ('max_aj_tasks                 75000')
+
+        else :
+            err ('error: invalid option argument "%s"' % ' '.join (args))
+            return 1
+
+
+    # --------------------------------------------------------------------------
+    #
+    def qacct (self, args) :
+
+        if  '-help' in args :
+            return self._help ('qacct')
+
+        opts, _ = _getopt (args, values=['-j', '-o', '-d', '-b', '-e'])
+        opts    = dict (opts)
+
+        jobs = [job for job in self.find (opts.get ('-j') or '', visible=False) \
+                    if  self.final (job)]
+
+        if  not jobs :
+            err ('error: job id %s not found' % opts.get ('-j'))
+            return 1
+
+        for job in jobs :
+
+            if  job['state'] == CANCELED :
+                failed, code = '100 : assumedly after job', 137
+            else :
+                failed, code = '0', job['exit']
+
+            out ('=' * 62)
+            out ('%-13s%s' % ('qname',       job['queue']))
+            out ('%-13s%s' % ('hostname',    self.host))
+            out ('%-13s%s' % ('owner',       self.user))
+            out ('%-13s%s' % ('jobname',     job['name']))
+            out ('%-13s%d' % ('jobnumber',   job['id']))
+            out ('%-13s%s' % ('qsub_time',   _fmt (job['submit'], _CTIME)))
+            out ('%-13s%s' % ('start_time',  _fmt (job['start'],  _CTIME, '-/-')))
+            out ('%-13s%s' % ('end_time',    _fmt (job['end'],    _CTIME, '-/-')))
+            out ('%-13s%s' % ('failed',      failed))
+            out ('%-13s%d' % ('exit_status', code))
+
+
+# ------------------------------------------------------------------------------
+#
+class LSF (FakeRM) :
+    """ IBM Platform LSF """
+
+    commands   = ('bsub', 'bjobs', 'bkill', 'bqueues')
+    prefix     = '#BSUB'
+    flags      = ('-K', '-I', '-N', '-B', '-x', '-r', '-H')
+    keep_final = True
+    version    = 'IBM Platform LSF 9.1.1.1, Feb 27 2013\n' \
+                 'Copyright International Business Machines Corp, 1992-2013.'
+
+    _STATES    = {QUEUED : 'PEND', RUNNING : 'RUN', SUSPENDED : 'USUSP',
+                  CANCELED : 'EXIT'}
+
+    # --------------------------------------------------------------------------
+    #
+    def find (self, spec, visible=True) :
+
+        if  not spec.isdigit () :
+            return []
+
+        jobs = self.lookup (int (spec))
+
+        if  visible :
+            jobs = [job for job in jobs if self.visible (job)]
+
+        return jobs
+
+
+    # --------------------------------------------------------------------------
+    #
+    def state (self, job) :
+
+        if  job['state'] == DONE :
+            return 'DONE' if job['exit'] == 0 else 'EXIT'
+
+        return self._STATES[job['state']]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def job_env (self, job) :
+
+        return {'LSB_JOBID'   : str (job['id']),
+                'LSB_JOBNAME' : job['name'],
+                'LSB_QUEUE'   : job['queue'],
+                'LSB_HOSTS'   : self.host}
+
+
+    # --------------------------------------------------------------------------
+    #
+    def patterns (self, job) :
+
+        return {'%J' : str (job['id']),
+                '%I' : '0'}
+
+
+    # --------------------------------------------------------------------------
+    #
+    def field (self, key, job) :
+        """ renders one 'bjobs -o' field of a job """
+
+        if  key == 'jobid'       : return str (job['id'])
+        if  key == 'user'        : return self.user
+        if  key == 'stat'        : return self.state (job)
+        if  key == 'queue'       : return job['queue']
+        if  key == 'from_host'   : return self.host
+        if  key == 'exec_host'   : return self.host if job['start'] else '-'
+        if  key == 'job_name'    : return job['name']
+        if  key == 'submit_time' : return _fmt (job['submit'], '%b %d %H:%M', '-')
+        if  key == 'start_time'  : return _fmt (job['start'],  '%b %d %H:%M', '-')
+        if  key == 'finish_time' : return _fmt (job['end'],    '%b %d %H:%M', '-')
+
+        if  key == 'exit_code' :
+            if  job['state'] == CANCELED : return '%d' % _KILLED
+            if  job['exit'] : return '%d' % job['exit']
+            return '-'
+
+        return '-'
+
+
+    # --------------------------------------------------------------------------
+    #
+    def bsub (self, args) :
+
+        if  '-V' in args :
+            err (self.version)
+            return 0
+
+        opts, pos = _getopt (args, self.flags)
+
+        # without a command, the job script is read from stdin
+        if  pos : script = ' '.join (pos)
+        else    : script = sys.stdin.read ()
+
+        dopts, _ = _getopt (self.directives (script), self.flags)
+        opts     = dict (dopts + opts)
+        queue    = opts.get ('-q') or 'normal'
+
+        jid = self.submit (script,
+                           name  = opts.get ('-J') or (pos[0] if pos else 'NONAME'),
+                           queue = queue,
+                           cwd   = opts.get ('-cwd') or os.getcwd (),
+                           out   = opts.get ('-o'),
+                           err   = opts.get ('-e') or opts.get ('-o'),
+                           env   = dict (os.environ, LS_SUBCWD=os.getcwd ()))
+
+        out ('Job <%d> is submitted to queue <%s>.' % (jid, queue))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def bjobs (self, args) :
+
+        if  '-V' in args :
+            err (self.version)
+            return 0
+
+        opts, ids = _getopt (args, values=['-o', '-u', '-q', '-m', '-J', '-P'])
+        opts      = dict (opts)
+        ret       = 0
+
+        if  ids :
+            jobs = list()
+            for spec in ids :
+                found = self.find (spec)
+                if  not found :
+                    err ('Job <%s> is not found' % spec)
+                    ret = 255
+                jobs += found
+
+        elif '-a' in opts :
+            jobs = [job for job in self.jobs () if self.visible (job)]
+
+        else :
+            jobs = [job for job in self.jobs () if not self.final (job)]
+            if  not jobs :
+                err ('No unfinished job found')
+                return 0
+
+        if  opts.get ('-o') :
+
+            spec   = opts['-o']
+            delim  = ' '
+            match  = re.search (r'delimiter\s*=\s*[\'"](.*?)[\'"]', spec)
+
+            if  match :
+                delim = match.group (1)
+                spec  = spec[:match.start ()]
+
+            fields = [f.split (':')[0].lower () for f in spec.split ()]
+
+            if  '-noheader' not in opts :
+                out (delim.join ([f.upper () for f in fields]))
+
+            for job in jobs :
+                out (delim.join ([self.field (f, job) for f in fields]))
+
+            return ret
+
+        if  '-noheader' not in opts and jobs :
+            out ('JOBID   USER    STAT  QUEUE      FROM_HOST   EXEC_HOST   JOB_NAME   SUBMIT_TIME')
+
+        for job in jobs :
+            out ('%-7d %-7s %-5s %-10s %-11s %-11s %-10s %s' \
+                 % (job['id'], self.user, self.state (job), job['queue'],
+                    self.host, self.host if job['start'] else '',
+                    job['name'][:10], _fmt (job['submit'], '%b %d %H:%M')))
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def bkill (self, args) :
+
+        if  '-V' in args :
+            err (self.version)
+            return 0
+
+        _, ids = _getopt (args, values=['-s', '-u', '-q', '-m', '-J'])
+        ret    = 0
+
+        for spec in ids :
+
+            jobs = self.find (spec, visible=False)
+
+            if  not jobs :
+                err ('Job <%s>: No matching job found' % spec)
+                ret = 255
+
+            for job in jobs :
+                if  not self.final (job) :
+                    out ('Job <%d> is being terminated' % job['id'])
+                self.cancel (job)
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def bqueues (self, args) :
+
+        if  '-V' in args :
+            err (self.version)
+            return 0
+
+        out ('QUEUE_NAME      PRIO STATUS          MAX JL/U JL/P JL/H NJOBS  PEND   RUN  SUSP ')
+        out ('normal           30  Open:Active       -    -    -    -     0     0     0     0')
+
+
+# ------------------------------------------------------------------------------
+#
+class Condor (FakeRM) :
+    """ HTCondor -- jobs are identified as <cluster>.<proc> """
+
+    commands   = ('condor_version', 'condor_submit', 'condor_q',
+                  'condor_history', 'condor_rm')
+    version    = '$CondorVersion: 8.0.6 Feb 01 2014 BuildID: 225363 $\n' \
+                 '$CondorPlatform: x86_64_RedHat6 $'
+
+    _STATES    = {QUEUED : 1, RUNNING : 2, SUSPENDED : 7, CANCELED : 3, DONE : 4}
+
+    # --------------------------------------------------------------------------
+    #
+    def find (self, spec, visible=True) :
+
+        elems = spec.split ('.')
+
+        if  not elems[0].isdigit () :
+            return []
+
+        if  len (elems) > 1 and elems[1].isdigit () :
+            jobs = self.lookup (int (elems[0]), int (elems[1]))
+        else :
+            jobs = self.lookup (int (elems[0]))
+
+        if  visible :
+            jobs = [job for job in jobs if self.visible (job)]
+
+        return jobs
+
+
+    # --------------------------------------------------------------------------
+    #
+    def patterns (self, job) :
+
+        return {'$(cluster)' : str (job['id']), '$(Cluster)' : str (job['id']),
+                '$(process)' : str (job['task']), '$(Process)' : str (job['task'])}
+
+
+    # --------------------------------------------------------------------------
+    #
+    def condor_version (self, args) :
+
+        out (self.version)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def condor_submit (self, args) :
+
+        _, pos = _getopt (args, values=['-name', '-pool', '-append', '-a'])
+        desc   = self.script (pos)
+        attrs  = dict()
+        procs  = 0
+
+        for line in desc.split ('\n') :
+
+            line = line.strip ()
+
+            if  not line or line.startswith ('#') :
+                continue
+
+            if  line.lower ().split ()[0] == 'queue' :
+                elems  = line.split ()
+                procs += int (elems[1]) if len (elems) > 1 else 1
+                continue
+
+            if  '=' in line :
+                key, val = line.split ('=', 1)
+                attrs[key.strip ().lower ()] = val.strip ()
+
+        if  not procs or not attrs.get ('executable') :
+            err ('ERROR: No queue statement or executable in submit description')
+            return 1
+
+        # new style argument and environment lists are double quoted, and
+        # double quotes within are repeated
+        argv = [attrs['executable']]
+        arguments = attrs.get ('arguments', '')
+
+        if  arguments.startswith ('"') and arguments.endswith ('"') :
+            argv += shlex.split (arguments[1:-1].replace ('""', '"'))
+        else :
+            argv += arguments.split ()
+
+        env  = dict()
+        envs = attrs.get ('environment', '')
+
+        if  envs.startswith ('"') and envs.endswith ('"') :
+            envs = shlex.split (envs[1:-1].replace ('""', '"'))
+        else :
+            envs = envs.split (';')
+
+        for var in envs :
+            if  '=' in var :
+                key, val = var.split ('=', 1)
+                env[key.strip ()] = val
+
+        script = 'exec %s\n' % ' '.join ([_quote (arg) for arg in argv])
+        cwd    = attrs.get ('initialdir') or os.getcwd ()
+
+        jid = self.submit (script,
+                           name  = os.path.basename (attrs['executable']),
+                           queue = attrs.get ('universe', 'vanilla'),
+                           cwd   = cwd,
+                           out   = attrs.get ('output'),
+                           err   = attrs.get ('error'),
+                           env   = env,
+                           tasks = range (procs))
+
+        out ('Submitting job(s).')
+
+        if  '-verbose' in args :
+            for proc in range (procs) :
+                out ('** Proc %d.%d:' % (jid, proc))
+                out ('Args = "%s"' % ' '.join (argv[1:]).replace ('"', '\\"'))
+                out ('ClusterId = %d' % jid)
+                out ('ProcId = %d' % proc)
+                out ('Iwd = "%s"' % cwd)
+                out ()
+
+        out ('%d job(s) submitted to cluster %d.' % (procs, jid))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _ad (self, job) :
+
+        out ('ClusterId = %d' % job['id'])
+        out ('ProcId = %d' % job['task'])
+        out ('Owner = "%s"' % self.user)
+        out ('Cmd = "%s"' % job['name'])
+        out ('Iwd = "%s"' % job['cwd'])
+        out ('JobStatus = %d' % self._STATES[job['state']])
+        out ('QDate = %d' % job['submit'])
+
+        if  job['start'] :
+            out ('JobCurrentStartDate = %d' % job['start'])
+            out ('RemoteHost = "slot1@%s"' % self.host)
+
+        if  job['state'] == DONE :
+            out ('ExitCode = %d' % job['exit'])
+
+        out ('ExitStatus = %d' % (job['exit'] or 0))
+        out ('CompletionDate = %d' % (job['end'] or 0))
+        out ('Out = "%s"' % job['out'])
+        out ('Err = "%s"' % job['err'])
+        out ()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def condor_q (self, args) :
+
+        opts, ids = _getopt (args, values=['-name', '-pool', '-constraint',
+                                           '-format', '-attributes'])
+        opts      = dict (opts)
+
+        if  ids :
+            jobs = list()
+            for spec in ids :
+                jobs += self.find (spec)
+        else :
+            jobs = [job for job in self.jobs () if self.visible (job)]
+
+        if  '-long' in opts or '-l' in opts :
+            for job in jobs :
+                self._ad (job)
+            return 0
+
+        out ()
+        out ('-- Schedd: %s : <127.0.0.1:9618>' % self.host)
+        out (' ID      OWNER            SUBMITTED     RUN_TIME ST PRI SIZE CMD')
+
+        for job in jobs :
+            secs = int (self.now - job['start']) if job['start'] else 0
+            out ('%-8s %-16s %11s %3d+%02d:%02d:%02d %-2s %-3d %-4s %s' \
+                 % ('%d.%d' % (job['id'], job['task']), self.user,
+                    _fmt (job['submit'], '%m/%d %H:%M'), secs // 86400,
+                    (secs // 3600) % 24, (secs // 60) % 60, secs % 60,
+                    {QUEUED : 'I', RUNNING : 'R', SUSPENDED : 'S'}[job['state']],
+                    0, '0.0', job['name']))
+
+        out ()
+        out ('%d jobs; 0 completed, 0 removed, %d idle, %d running, 0 held, %d suspended' \
+             % (len (jobs), len ([job for job in jobs if job['state'] == QUEUED   ]),
+                            len ([job for job in jobs if job['state'] == RUNNING  ]),
+                            len ([job for job in jobs if job['state'] == SUSPENDED])))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def condor_history (self, args) :
+
+        opts, ids = _getopt (args, values=['-match', '-constraint', '-file', '-format'])
+        opts      = dict (opts)
+
+        if  ids :
+            jobs = list()
+            for spec in ids :
+                jobs += self.find (spec, visible=False)
+        else :
+            jobs = self.jobs ()
+
+        # the most recent jobs first
+        jobs = [job for job in reversed (jobs) if self.final (job)]
+
+        if  opts.get ('-match') :
+            jobs = jobs[:int (opts['-match'])]
+
+        if  '-long' in opts or '-l' in opts :
+            for job in jobs :
+                self._ad (job)
+            return 0
+
+        out (' ID      OWNER            SUBMITTED     RUN_TIME ST   COMPLETED CMD')
+
+        for job in jobs :
+            out ('%-8s %-16s %11s %12s %-2s %11s %s' \
+                 % ('%d.%d' % (job['id'], job['task']), self.user,
+                    _fmt (job['submit'], '%m/%d %H:%M'), '0+00:00:00',
+                    'C' if job['state'] == DONE else 'X',
+                    _fmt (job['end'], '%m/%d %H:%M'), job['name']))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def condor_rm (self, args) :
+
+        _, ids = _getopt (args, values=['-name', '-pool', '-constraint'])
+        ret    = 0
+
+        for spec in ids :
+
+            jobs = self.find (spec, visible=False)
+
+            if  not jobs :
+                err ("Couldn't find/remove all jobs matching constraint (ClusterId==%s)" % spec)
+                ret = 1
+                continue
+
+            for job in jobs :
+                self.cancel (job)
+
+            if  '.' in spec : out ('Job %s marked for removal' % spec)
+            else            : out ('All jobs in cluster %s have been marked for removal' % spec)
+
+        return ret
+
+
+# ------------------------------------------------------------------------------
+#
+class LoadL (FakeRM) :
+    """ IBM LoadLeveler -- jobs are identified as <host>.<pid>, their single
+        steps as <host>.<pid>.0 """
+
+    commands   = ('llsubmit', 'llq', 'llcancel')
+    prefix     = '#@'
+    version    = '5.1.0.14'
+
+    _STATES    = {QUEUED : 'I', RUNNING : 'R', SUSPENDED : 'S'}
+
+    # --------------------------------------------------------------------------
+    #
+    def find (self, spec, visible=True) :
+
+        elems = [e for e in spec.split ('.') if e.isdigit ()]
+
+        if  not elems :
+            return []
+
+        # the job number follows the host name, the step number follows that
+        if  len (elems) > 1 : jobs = self.lookup (int (elems[-2]))
+        else                : jobs = self.lookup (int (elems[-1]))
+
+        if  visible :
+            jobs = [job for job in jobs if self.visible (job)]
+
+        return jobs
+
+
+    # --------------------------------------------------------------------------
+    #
+    def job_env (self, job) :
+
+        return {'LOADL_JOB_NAME'    : '%s.%d'   % (self.host, job['id']),
+                'LOADL_STEP_ID'     : '%s.%d.0' % (self.host, job['id']),
+                'LOADL_STEP_CLASS'  : job['queue'],
+                'LOADL_STEP_INITDIR': job['cwd']}
+
+
+    # --------------------------------------------------------------------------
+    #
+    def directives (self, script) :
+        """ LoadLeveler directives are '# @ key = value' lines """
+
+        opts = dict()
+
+        for line in script.split ('\n') :
+
+            match = re.match (r'^\s*#\s*@\s*(\w+)\s*=\s*(.*?)\s*$', line)
+            if  match :
+                opts[match.group (1).lower ()] = match.group (2)
+
+        return opts
+
+
+    # --------------------------------------------------------------------------
+    #
+    def llsubmit (self, args) :
+
+        if  '-v' in args :
+            out ('llsubmit %s' % self.version)
+            return 0
+
+        _, pos = _getopt (args, values=['-X', '-q'])
+        script = self.script (pos)
+        opts   = self.directives (script)
+        env    = dict()
+
+        for var in (opts.get ('environment') or '').split (';') :
+            if  var.strip () == 'COPY_ALL' :
+                env.update (os.environ)
+            elif '=' in var :
+                key, val = var.split ('=', 1)
+                env[key.strip ()] = val.strip ()
+
+        jid = self.submit (script,
+                           name  = opts.get ('job_name') or '%s.%s' % (self.host, 'job'),
+                           queue = opts.get ('class') or 'No_Class',
+                           cwd   = opts.get ('initialdir') or os.getcwd (),
+                           out   = opts.get ('output'),
+                           err   = opts.get ('error'),
+                           env   = env)
+
+        out ('llsubmit: The job "%s.%d" has been submitted.' % (self.host, jid))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def field (self, key, job) :
+        """ renders one 'llq -r' field of a job """
+
+        if  key == '%id' : return '%s.%d.0' % (self.host, job['id'])
+        if  key == '%st' : return self._STATES[job['state']]
+        if  key == '%dd' : return _fmt (job['start'], '%m/%d/%Y %H:%M')
+        if  key == '%jn' : return job['name']
+        if  key == '%jt' : return 'Serial'
+        if  key == '%c'  : return job['queue']
+        if  key == '%o'  : return self.user
+        if  key == '%h'  : return self.host if job['start'] else ''
+        if  key == '%nh' : return '1' if job['start'] else '0'
+
+        return ''
+
+
+    # --------------------------------------------------------------------------
+    #
+    def llq (self, args) :
+
+        if  '-v' in args :
+            out ('llq %s' % self.version)
+            return 0
+
+        # '-r' takes a list of fields, '-j' a list of job ids
+        fields = list()
+        ids    = list()
+        target = ids
+        skip   = False
+
+        for arg in args :
+            if  skip              : skip = False
+            elif arg == '-r'      : target = fields
+            elif arg == '-j'      : target = ids
+            elif arg in ['-X', '-u', '-c'] : skip = True
+            elif arg.startswith ('-') : target = ids
+            else                  : target.append (arg)
+
+        if  ids :
+            jobs = list()
+            for spec in ','.join (ids).split (',') :
+                if  spec :
+                    jobs += self.find (spec)
+        else :
+            jobs = [job for job in self.jobs () if self.visible (job)]
+
+        if  not jobs :
+            out ('llq: There is currently no job status to report.')
+            return 0
+
+        if  fields :
+            for job in jobs :
+                out ('!'.join ([self.field (f, job) for f in fields]))
+            return 0
+
+        out ('Id                       Owner      Submitted   ST PRI Class        Running On ')
+        out ('------------------------ ---------- ----------- -- --- ------------ -----------')
+
+        for job in jobs :
+            out ('%-24s %-10s %11s %-2s %-3d %-12s %s' \
+                 % (self.field ('%id', job), self.user[:10],
+                    _fmt (job['submit'], '%m/%d %H:%M'), self._STATES[job['state']],
+                    50, job['queue'][:12], self.field ('%h', job)))
+
+        out ()
+        out ('%d job step(s) in queue, %d waiting, 0 pending, %d running, 0 held, 0 preempted' \
+             % (len (jobs), len ([job for job in jobs if job['state'] == QUEUED]),
+                            len ([job for job in jobs if job['state'] != QUEUED])))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def llcancel (self, args) :
+
+        if  '-v' in args :
+            out ('llcancel %s' % self.version)
+            return 0
+
+        _, ids = _getopt (args, values=['-X', '-u', '-h'])
+        ret    = 0
+
+        for spec in ids :
+
+            jobs = self.find (spec, visible=False)
+
+            if  not jobs :
+                err ('llcancel: 2512-054 The job step %s was not found.' % spec)
+                ret = 1
+
+            for job in jobs :
+                self.cancel (job)
+
+        if  ids and not ret :
+            out ('llcancel: Cancel command has been sent to the central manager.')
+
+        return ret
+
+
+# ------------------------------------------------------------------------------
+#
+_FLAVOURS = {'pbs'    : PBS,
+             'slurm'  : SLURM,
+             'sge'    : SGE,
+             'lsf'    : LSF,
+             'condor' : Condor,
+             'loadl'  : LoadL}
+
+
+# ------------------------------------------------------------------------------
+#
+def main (argv) :
+
+    cmd     = os.path.basename (argv[0])
+    args    = argv[1:]
+    flavour = os.environ.get ('SAGA_FAKE_RM_FLAVOUR') or \
+              os.path.basename (os.path.dirname (os.path.abspath (argv[0])))
+
+    # the script can also be called directly, as
+    #   fake_rm.py <flavour> <command> [args]
+    if  cmd.startswith ('fake_rm') :
+        if  len (argv) < 3 :
+            err ('usage: %s <flavour> <command> [args]' % cmd)
+            return 2
+        flavour, cmd, args = argv[1], argv[2], argv[3:]
+
+    if  flavour not in _FLAVOURS :
+        err ('%s: unknown batch system flavour %s (expected one of %s)' \
+             % (cmd, flavour, ', '.join (sorted (_FLAVOURS.keys ()))))
+        return 2
+
+    rm = _FLAVOURS[flavour]
+
+    if  cmd not in rm.commands :
+        err ('%s: command not simulated for %s (expected one of %s)' \
+             % (cmd, flavour, ', '.join (rm.commands)))
+        return 2
+
+    delay = float (_cfg ('CMD_DELAY', 0))
+    if  delay :
+        time.sleep (delay)
+
+    base = os.path.expanduser (_cfg ('DIR', os.path.join ('~', '.saga', 'fake_rm', flavour)))
+
+    return rm (base).run (cmd, args)
+
+
+# ------------------------------------------------------------------------------
+#
+if  __name__ == '__main__' :
+
+    sys.exit (main (sys.argv))
+
+
+# ------------------------------------------------------------------------------
+
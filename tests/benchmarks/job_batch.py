@@ -0,0 +1,137 @@
+
+import radical.utils.benchmark as rb
+
+import os
+import time
+import tempfile
+import threading
+import saga
+
+
+# ------------------------------------------------------------------------------
+#
+# Measures the throughput of the bulk operations of the batch system adaptors:
+# each iteration submits 'load' jobs in one job container, queries their states
+# once, and cancels them again.  The time spent in each phase is reported as
+# jobs/sec.
+#
+# If the benchmark config names a 'fake_rm' flavour (pbs, sge, slurm, lsf,
+# condor, loadl), the simulated batch system from ./fake_rm/ is put into the
+# PATH, so that the adaptors can be benchmarked on any machine, e.g.:
+#
+#   SAGA_BENCHMARK_LOAD=1000  python job_batch.py -c ../configs/fake_pbs_localhost.cfg
+#   SAGA_BENCHMARK_LOAD=10000 python job_batch.py -c ../configs/fake_pbs_localhost.cfg
+#
+# The simulator keeps its state in $SAGA_FAKE_RM_DIR -- if that is not set, a
+# new temporary directory is used for each benchmark run.  See
+# fake_rm/fake_rm.py for the other SAGA_FAKE_RM_* settings.
+#
+_PHASES  = ['run', 'states', 'cancel']
+
+_js      = None
+_js_lock = threading.Lock ()
+
+
+# ------------------------------------------------------------------------------
+#
+def _use_fake_rm (flavour) :
+
+    path = os.path.join (os.path.dirname (os.path.abspath (__file__)),
+                         'fake_rm', flavour)
+
+    if  not os.path.isdir (path) :
+        raise saga.BadParameter ('no fake resource manager for %s' % flavour)
+
+    os.environ['PATH'] = "%s:%s" % (path, os.environ.get ('PATH', ''))
+
+    if  not os.environ.get ('SAGA_FAKE_RM_DIR') :
+        os.environ['SAGA_FAKE_RM_DIR'] = tempfile.mkdtemp (prefix='saga_fake_rm_')
+
+
+# ------------------------------------------------------------------------------
+#
+def benchmark_pre (tid, test_cfg, bench_cfg, session) :
+
+    global _js
+
+    if  not 'job_service_url' in test_cfg :
+        raise saga.NoSuccess ('no job service URL configured')
+
+    if  not 'load' in bench_cfg :
+        raise saga.NoSuccess ('no benchmark load configured')
+
+    host = test_cfg['job_service_url']
+    load = int(bench_cfg['load'])
+
+    with _js_lock :
+        if  not _js :
+            if  bench_cfg.get ('fake_rm') :
+                _use_fake_rm (bench_cfg['fake_rm'])
+            _js = saga.job.Service (host, session=session)
+
+    jd = saga.job.Description()
+
+    jd.executable = '/bin/sleep'
+    jd.arguments  = [str(bench_cfg.get ('runtime', 10))]
+
+    if  bench_cfg.get ('queue') :
+        jd.queue  = bench_cfg['queue']
+
+    return {'js'    : _js,
+            'jd'    : jd,
+            'load'  : load,
+            'times' : dict ([(phase, 0.0) for phase in _PHASES]),
+            'n_j'   : 0}
+
+
+# ------------------------------------------------------------------------------
+#
+def benchmark_core (tid, i, args={}) :
+
+    js    = args['js']
+    jd    = args['jd']
+    times = args['times']
+
+    jc = saga.job.Container ()
+
+    for n in range (0, args['load']) :
+        jc.add (js.create_job (jd))
+
+    start = time.time ()
+    jc.run ()
+    times['run'] += time.time () - start
+
+    start = time.time ()
+    jc.get_states ()
+    times['states'] += time.time () - start
+
+    start = time.time ()
+    jc.cancel ()
+    times['cancel'] += time.time () - start
+
+    args['n_j'] += args['load']
+
+
+# ------------------------------------------------------------------------------
+#
+def benchmark_post (tid, args={}) :
+
+    for phase in _PHASES :
+
+        elapsed = args['times'][phase]
+
+        if  elapsed :
+            print "thread %3d: %-6s %6d jobs in %8.2fs : %8.2f jobs/sec" \
+                % (tid, phase, args['n_j'], elapsed, args['n_j'] / elapsed)
+
+
+# ------------------------------------------------------------------------------
+#
+try:
+
+    rb.benchmark_init ('job_batch', benchmark_pre, benchmark_core, benchmark_post)
+
+except saga.SagaException, ex:
+    print "An exception occured: (%s) %s " % (ex.type, (str(ex)))
+    print " \n*** Backtrace:\n %s" % ex.traceback
+
@@ -0,0 +1,69 @@
+
+import radical.utils.benchmark as rb
+
+import saga
+
+
+# ------------------------------------------------------------------------------
+#
+# The benchmark runs one job which writes 'load' MB (default: 100) of random
+# data to stdout, and then measures the retrieval of that output, chunk by
+# chunk, via job.iter_stdout().
+#
+def benchmark_pre (tid, test_cfg, bench_cfg, session) :
+
+    if  not 'job_service_url' in test_cfg :
+        raise saga.NoSuccess ('no job service URL configured')
+
+    host = test_cfg['job_service_url']
+    load = int(bench_cfg.get ('load', 100))
+
+    js = saga.job.Service (host, session=session) 
+    jd = saga.job.Description()
+
+    jd.executable = '/bin/sh'
+    jd.arguments  = ['-c', "'dd if=/dev/urandom bs=1048576 count=%d 2>/dev/null'" % load]
+
+    j  = js.create_job (jd)
+    j.run  ()
+    j.wait ()
+
+    if  j.state != saga.job.DONE :
+        raise saga.NoSuccess ('output job failed (%s)' % j.state)
+
+    return {'js'   : js, 
+            'job'  : j, 
+            'size' : load * 1024 * 1024}
+
+
+# ------------------------------------------------------------------------------
+#
+def benchmark_core (tid, i, args={}) :
+
+    j    = args['job']
+    size = 0
+
+    for chunk in j.iter_stdout (chunk_size=4*1024*1024) :
+        size += len (chunk)
+
+    if  size != args['size'] :
+        raise saga.NoSuccess ('incomplete output (%s != %s)' % (size, args['size']))
+
+
+# ------------------------------------------------------------------------------
+#
+def benchmark_post (tid, args={}) :
+
+    args['js'].close ()
+
+
+# ------------------------------------------------------------------------------
+#
+try:
+
+    rb.benchmark_init ('job_output', benchmark_pre, benchmark_core, benchmark_post)
+
+except saga.SagaException, ex:
+    print "An exception occured: (%s) %s " % (ex.type, (str(ex)))
+    print " \n*** Backtrace:\n %s" % ex.traceback
+
@@ -3,30 +3,53 @@ import radical.utils.benchmark as rb
 
 import os
 import sys
+import time
+import threading
 import saga
 
 
+# ------------------------------------------------------------------------------
+#
+# All benchmark threads share one job service, so that concurrent run() calls
+# can be coalesced into bulk submissions by the shell adaptor.  Compare the
+# jobs/sec reported with and without coalescing, e.g.:
+#
+#   SAGA_SHELL_RUN_BATCH_WINDOW=0 python job_run.py -c ../configs/fork_localhost.cfg
+#   SAGA_SHELL_RUN_BATCH_WINDOW=5 python job_run.py -c ../configs/fork_localhost.cfg
+#
+_js      = None
+_js_lock = threading.Lock ()
+
+
 # ------------------------------------------------------------------------------
 #
 def benchmark_pre (tid, test_cfg, bench_cfg, session) :
 
+    global _js
+
     if  not 'job_service_url' in test_cfg :
         raise saga.NoSuccess ('no job service URL configured')
 
-    if  not 'load' in bench_cfg : 
+    if  not 'load' in bench_cfg :
         raise saga.NoSuccess ('no benchmark load configured')
 
     host = test_cfg['job_service_url']
-    n_j  = int(bench_cfg['iterations'])  
-    load = int(bench_cfg['load'])       
+    n_j  = int(bench_cfg['iterations'])
+    load = int(bench_cfg['load'])
+
+    with _js_lock :
+        if  not _js :
+            _js = saga.job.Service (host, session=session)
 
-    js = saga.job.Service (host, session=session) 
     jd = saga.job.Description()
 
     jd.executable = '/bin/sleep'
     jd.arguments  = [load]
 
-    return {'js' : js, 'jd' : jd}
+    return {'js'    : _js,
+            'jd'    : jd,
+            'n_j'   : n_j,
+            'start' : time.time ()}
 
 
 # ------------------------------------------------------------------------------
@@ -44,7 +67,11 @@ def benchmark_core (tid, i, args={}) :
 #
 def benchmark_post (tid, args={}) :
 
-    pass
+    elapsed = time.time () - args['start']
+
+    print "thread %3d: %6d jobs in %8.2fs : %8.2f jobs/sec (batch window: %s ms)" \
+        % (tid, args['n_j'], elapsed, args['n_j'] / elapsed,
+           os.environ.get ('SAGA_SHELL_RUN_BATCH_WINDOW', 0))
 
 
 # ------------------------------------------------------------------------------
@@ -59,4 +86,3 @@ except saga.SagaException, ex:
 
 
 
-
@@ -191,3 +191,20 @@ export SAGA_BENCHMARK_LOAD=1
 # SAGA_BENCHMARK_CONCURRENCY=20 python tests/benchmark/job_run.py -c tests/configs/pbs_ssh_india.cfg
 
 
+export SAGA_BENCHMARK_CONCURRENCY=1
+export SAGA_BENCHMARK_ITERATIONS=1
+
+# SAGA_BENCHMARK_LOAD=1000   python tests/benchmarks/job_batch.py -c tests/configs/fake_pbs_localhost.cfg
+# SAGA_BENCHMARK_LOAD=1000   python tests/benchmarks/job_batch.py -c tests/configs/fake_sge_localhost.cfg
+# SAGA_BENCHMARK_LOAD=1000   python tests/benchmarks/job_batch.py -c tests/configs/fake_slurm_localhost.cfg
+# SAGA_BENCHMARK_LOAD=1000   python tests/benchmarks/job_batch.py -c tests/configs/fake_lsf_localhost.cfg
+# SAGA_BENCHMARK_LOAD=1000   python tests/benchmarks/job_batch.py -c tests/configs/fake_condor_localhost.cfg
+# SAGA_BENCHMARK_LOAD=1000   python tests/benchmarks/job_batch.py -c tests/configs/fake_loadl_localhost.cfg
+  
+# SAGA_BENCHMARK_LOAD=10000  python tests/benchmarks/job_batch.py -c tests/configs/fake_pbs_localhost.cfg
+# SAGA_BENCHMARK_LOAD=10000  python tests/benchmarks/job_batch.py -c tests/configs/fake_sge_localhost.cfg
+# SAGA_BENCHMARK_LOAD=10000  python tests/benchmarks/job_batch.py -c tests/configs/fake_slurm_localhost.cfg
+# SAGA_BENCHMARK_LOAD=10000  python tests/benchmarks/job_batch.py -c tests/configs/fake_lsf_localhost.cfg
+# SAGA_BENCHMARK_LOAD=10000  python tests/benchmarks/job_batch.py -c tests/configs/fake_condor_localhost.cfg
+# SAGA_BENCHMARK_LOAD=10000  python tests/benchmarks/job_batch.py -c tests/configs/fake_loadl_localhost.cfg
+
@@ -171,3 +171,142 @@ class TestFile(unittest.TestCase):
             assert False, "Unexpected exception: %s" % ex
 
 
+
+    # -------------------------------------------------------------------------
+    #
+    def test_file_size_cache(self):
+        """ Testing if cached file sizes are invalidated on write, and if
+            NO_CACHE bypasses the cache.
+        """
+        try:
+            tc = testing.get_test_config ()
+            filename1 = deepcopy(saga.Url(tc.filesystem_url))
+            filename1.path += "/%s" % self.uniquefilename1
+            f1 = saga.filesystem.File(filename1, saga.filesystem.CREATE)
+            assert f1.get_size() == 0
+
+            f1.write("hello")
+            assert f1.get_size() == 5
+
+            d = saga.filesystem.Directory(tc.filesystem_url)
+            assert d.is_file(self.uniquefilename1)
+            assert d.get_size(self.uniquefilename1, saga.filesystem.NO_CACHE) == 5
+
+        except saga.SagaException as ex:
+            assert False, "Unexpected exception: %s" % ex
+
+    # -------------------------------------------------------------------------
+    #
+    def test_directory_list_stats(self):
+        """ Testing if we can list a directory together with entry attributes.
+        """
+        try:
+            tc = testing.get_test_config ()
+            filename1 = deepcopy(saga.Url(tc.filesystem_url))
+            filename1.path += "/%s" % self.uniquefilename1
+            f1 = saga.filesystem.File(filename1, saga.filesystem.CREATE)
+            f1.write("hello")
+
+            d = saga.filesystem.Directory(tc.filesystem_url)
+            stats = d.list_stats("saga-unittests-*")
+
+            assert self.uniquefilename1 in stats
+            assert stats[self.uniquefilename1]['type'] == 'file'
+            assert stats[self.uniquefilename1]['size'] == 5
+            assert d.is_file(self.uniquefilename1)
+
+        except saga.SagaException as ex:
+            assert False, "Unexpected exception: %s" % ex
+
+    # -------------------------------------------------------------------------
+    #
+    def test_directory_find(self):
+        """ Testing if find() returns matching entries of a directory.
+        """
+        try:
+            tc = testing.get_test_config ()
+            filename1 = deepcopy(saga.Url(tc.filesystem_url))
+            filename1.path += "/%s" % self.uniquefilename1
+            f1 = saga.filesystem.File(filename1, saga.filesystem.CREATE)
+            assert f1.is_file()
+
+            d = saga.filesystem.Directory(tc.filesystem_url)
+            found = [str(u) for u in d.find(self.uniquefilename1, 0)]
+
+            assert self.uniquefilename1 in found
+            assert not d.find("saga-unittests-no-such-entry-*", 0)
+
+        except saga.SagaException as ex:
+            assert False, "Unexpected exception: %s" % ex
+
+    # -------------------------------------------------------------------------
+    #
+    def test_file_seek_read_write(self):
+        """ Testing if read and write honor the file cursor.
+        """
+        try:
+            tc = testing.get_test_config ()
+            filename1 = deepcopy(saga.Url(tc.filesystem_url))
+            filename1.path += "/%s" % self.uniquefilename1
+            f1 = saga.filesystem.File(filename1, saga.filesystem.CREATE)
+            f1.write("hello world")
+
+            assert f1.seek(6) == 6
+            assert f1.read(5) == "world"
+            assert f1.seek(0) == 0
+            assert f1.read(5) == "hello"
+
+            f1.write("-")
+            assert f1.seek(-3, saga.filesystem.END) == 8
+            assert f1.read() == "rld"
+
+            f1.seek(0)
+            assert f1.read() == "hello-world"
+
+            # writing at offset 0 overwrites, but does not truncate
+            f1.seek(0)
+            f1.write("HE")
+            f1.seek(0)
+            assert f1.read() == "HEllo-world"
+
+            # writing beyond the end extends the file
+            assert f1.seek(0, saga.filesystem.END) == 11
+            f1.write("!")
+            f1.seek(0)
+            assert f1.read() == "HEllo-world!"
+
+            # truncation only happens when asked for
+            f2 = saga.filesystem.File(filename1, saga.filesystem.TRUNCATE)
+            assert f2.read() == ""
+            f2.write("bye")
+            f2.seek(0)
+            assert f2.read() == "bye"
+
+        except saga.SagaException as ex:
+            assert False, "Unexpected exception: %s" % ex
+
+    # -------------------------------------------------------------------------
+    #
+    def test_directory_local_copy_move(self):
+        """ Testing copy and move where source and target are both local.
+        """
+        try:
+            d = saga.filesystem.Directory("file://localhost/tmp/")
+
+            f1 = saga.filesystem.File("file://localhost/tmp/%s" % self.uniquefilename1,
+                                      saga.filesystem.CREATE)
+            f1.write("hello")
+
+            d.copy(self.uniquefilename1, self.uniquefilename2)
+            assert d.get_size(self.uniquefilename2) == 5
+
+            d.remove(self.uniquefilename2)
+            d.move(self.uniquefilename1, self.uniquefilename2)
+            assert not d.is_entry(self.uniquefilename1)
+            assert d.is_file(self.uniquefilename2)
+
+            d.remove(self.uniquefilename2)
+            assert not d.is_entry(self.uniquefilename2)
+
+        except saga.SagaException as ex:
+            assert False, "Unexpected exception: %s" % ex
@@ -336,6 +336,60 @@ def test_job_run_many():
         _silent_close_js(js)
 
 
+# ------------------------------------------------------------------------------
+#
+def test_job_container_run():
+    """ Run, query and cancel a bunch of jobs as one job container, so that
+        batch system adaptors submit them in bulk (e.g. as job array).
+    """
+    NUM_JOBS = 4
+
+    js   = None
+    jobs = []
+    try:
+
+        tc = testing.get_test_config ()
+        js = saga.job.Service(tc.job_service_url, tc.session)
+        jc = saga.job.Container()
+
+        for i in range(0, NUM_JOBS):
+            jd = saga.job.Description()
+            jd.executable = '/bin/sleep'
+            jd.arguments  = ['60']
+            jd.output     = 'container_%d.out' % i
+
+            # add options from the test .cfg file if set
+            jd = sutc.add_tc_params_to_jd(tc=tc, jd=jd)
+
+            j = js.create_job(jd)
+            jc.add(j)
+            jobs.append(j)
+
+        jc.run()
+
+        for state in jc.get_states():
+            assert state in [saga.job.PENDING, saga.job.RUNNING, saga.job.DONE], state
+
+        ids = [job.id for job in jobs]
+        assert len(set(ids)) == NUM_JOBS, ids
+
+        jc.cancel()
+
+        for job in jobs:
+            assert job.state in [saga.job.CANCELED, saga.job.DONE], job.state
+
+    except saga.NotImplemented as ni:
+            assert tc.notimpl_warn_only, "%s " % ni
+            if tc.notimpl_warn_only:
+                print "%s " % ni
+    except saga.SagaException as se:
+        assert False, "Unexpected exception: %s" % se
+    finally:
+        for j in jobs:
+            _silent_cancel(j)
+        _silent_close_js(js)
+
+
 # ------------------------------------------------------------------------------
 #
 def test_get_exit_code():
@@ -416,6 +470,47 @@ def test_get_stdio():
         _silent_close_js(js)
 
 
+# ------------------------------------------------------------------------------
+#
+def test_get_stdio_offset():
+    """ Test job.get_stdout/get_stderr with offset and size, and iter_stdout
+    """
+    js = None
+    j  = None
+    try:
+        tc = testing.get_test_config ()
+        js = saga.job.Service(tc.job_service_url, tc.session)
+        jd = saga.job.Description()
+        jd.executable = 'sh'
+        jd.arguments  = ['-c', '"echo 0123456789; echo abcdef 1>&2"']
+
+        # add options from the test .cfg file if set
+        jd = sutc.add_tc_params_to_jd(tc=tc, jd=jd)
+
+        j = js.create_job(jd)
+        j.run()
+        j.wait()
+
+        assert '0123456789\n' == j.get_stdout()
+        assert '3456789\n'    == j.get_stdout(offset=3)
+        assert '345'          == j.get_stdout(offset=3, size=3)
+        assert ''             == j.get_stdout(offset=100)
+        assert 'cde'          == j.get_stderr(offset=2, size=3)
+
+        assert '0123456789\n' == ''.join (j.iter_stdout (chunk_size=4))
+        assert '789\n'        == ''.join (j.iter_stdout (chunk_size=4, offset=7))
+
+    except saga.NotImplemented as ni:
+        assert tc.notimpl_warn_only, "%s " % ni
+        if tc.notimpl_warn_only:
+            print "%s " % ni
+    except saga.SagaException as se:
+        assert False, "Unexpected exception: %s" % se
+    finally:
+        _silent_cancel(j)
+        _silent_close_js(js)
+
+
 # ------------------------------------------------------------------------------
 #
 def test_get_service_url():
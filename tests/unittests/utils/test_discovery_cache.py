@@ -0,0 +1,132 @@
+
+__author__    = "Andre Merzky"
+__copyright__ = "Copyright 2013, The SAGA Project"
+__license__   = "MIT"
+
+
+import os
+import json
+import time
+import shutil
+import tempfile
+
+import saga.utils.discovery_cache as sudc
+
+
+# ------------------------------------------------------------------------------
+#
+def test_discovery_cache_records () :
+    """ Test storing and loading of discovery results """
+
+    base = tempfile.mkdtemp ()
+
+    try :
+        cache = sudc.get_cache ('pbs:user@host.net:test_records', base, 60)
+
+        assert (cache.get () == None)
+
+        cache.put ({'qsub' : {'path' : '/usr/bin/qsub', 'version' : '4.2'},
+                    'ppn'  : 8})
+
+        info = cache.get ()
+        assert (info == {'qsub' : {'path' : '/usr/bin/qsub', 'version' : '4.2'},
+                         'ppn'  : 8})
+
+        # no unicode leaks to the shell
+        assert (isinstance (info['qsub']['path'], str))
+
+        # the same cache is returned for the same key, with the new ttl
+        assert (sudc.get_cache ('pbs:user@host.net:test_records', base, 10) is cache)
+        assert (cache.ttl == 10)
+
+        # results survive a new cache instance
+        assert (sudc.DiscoveryCache ('pbs:user@host.net:test_records', base).get () == None)
+
+        other     = sudc.DiscoveryCache ('pbs:user@host.net:test_records', base)
+        other.ttl = 60
+        assert (other.get () == info)
+
+        cache.invalidate ()
+        assert (cache.get () == None)
+
+        # invalidating twice is fine
+        cache.invalidate ()
+
+    finally :
+        shutil.rmtree (base)
+
+
+# ------------------------------------------------------------------------------
+#
+def test_discovery_cache_ttl () :
+    """ Test expiry of discovery results """
+
+    base = tempfile.mkdtemp ()
+
+    try :
+        cache     = sudc.DiscoveryCache ('pbs:user@host.net', base)
+        cache.ttl = 60
+
+        cache.put ({'ppn' : 8})
+        assert (cache.get () == {'ppn' : 8})
+
+        # age the entry
+        fname = os.path.join (base, os.listdir (base)[0])
+        with open (fname, 'w') as f :
+            json.dump ({'time' : time.time () - 100, 'info' : {'ppn' : 8}}, f)
+
+        assert (cache.get () == None)
+
+        cache.ttl = 1000
+        assert (cache.get () == {'ppn' : 8})
+
+    finally :
+        shutil.rmtree (base)
+
+
+# ------------------------------------------------------------------------------
+#
+def test_discovery_cache_corrupt () :
+    """ Test that corrupt cache files are ignored """
+
+    base = tempfile.mkdtemp ()
+
+    try :
+        cache     = sudc.DiscoveryCache ('pbs:user@host.net', base)
+        cache.ttl = 60
+
+        cache.put ({'ppn' : 8})
+        fname = os.path.join (base, os.listdir (base)[0])
+
+        for data in ['{"time" : 1', '', '[1, 2]', '{"info" : {}}'] :
+            with open (fname, 'w') as f :
+                f.write (data)
+            assert (cache.get () == None), data
+
+        # the cache recovers on the next put
+        cache.put ({'ppn' : 16})
+        assert (cache.get () == {'ppn' : 16})
+
+    finally :
+        shutil.rmtree (base)
+
+
+# ------------------------------------------------------------------------------
+#
+def test_discovery_cache_unwritable () :
+    """ Test that an unusable cache dir does not break discovery """
+
+    base = tempfile.mkdtemp ()
+
+    try :
+        cache     = sudc.DiscoveryCache ('pbs:user@host.net', os.path.join (base, 'missing'))
+        cache.ttl = 60
+
+        cache.put ({'ppn' : 8})
+        assert (cache.get () == None)
+
+        cache.invalidate ()
+
+    finally :
+        shutil.rmtree (base)
+
@@ -0,0 +1,150 @@
+
+__author__    = "Andre Merzky"
+__copyright__ = "Copyright 2013, The SAGA Project"
+__license__   = "MIT"
+
+
+import time
+
+import saga
+import saga.utils.poll_policy as supp
+
+
+# ------------------------------------------------------------------------------
+#
+def _policy (spec) :
+
+    return supp.PollPolicy ('test', 'localhost', supp.parse_spec (spec),
+                            supp._QueryBudget (0))
+
+
+# ------------------------------------------------------------------------------
+#
+def test_poll_policy_spec () :
+    """ Test parsing of polling specs """
+
+    assert (supp.parse_spec (None) == supp.DEFAULTS)
+    assert (supp.parse_spec ('')   == supp.DEFAULTS)
+
+    intervals = supp.parse_spec (' pending = 1, running=0.5,,')
+
+    assert (intervals['pending']     == 1.0)
+    assert (intervals['running']     == 0.5)
+    assert (intervals['pending_max'] == supp.DEFAULTS['pending_max'])
+
+    for spec in ['pending', 'unknown=1', 'pending=soon', 'pending=-1'] :
+        try :
+            supp.parse_spec (spec)
+            assert False, "spec '%s' should be rejected" % spec
+        except saga.BadParameter :
+            pass
+
+
+# ------------------------------------------------------------------------------
+#
+def test_poll_policy_backoff () :
+    """ Test the intervals for different job states, and their backoff """
+
+    policy = _policy ('pending=1,pending_max=5,running=2,final=0.5,backoff=2,latency=0')
+
+    assert (policy.interval (['Pending'])    == 1.0)
+    assert (policy.interval (['Pending'], 1) == 2.0)
+    assert (policy.interval (['Pending'], 2) == 4.0)
+    assert (policy.interval (['Pending'], 3) == 5.0)
+
+    # running jobs are polled at a fixed rate, no matter what else we wait for
+    assert (policy.interval (['Pending', 'Running'], 3) == 2.0)
+
+    # undetermined states get confirmed quickly
+    assert (policy.interval ([])                  == 0.5)
+    assert (policy.interval (['Done'])            == 0.5)
+    assert (policy.interval (['Pending', 'New'])  == 0.5)
+
+    # the poller counts unchanged iterations, and resets on change
+    poller = policy.poller ()
+
+    assert (poller.next (['Pending'])         == 1.0)
+    assert (poller.next (['Pending'])         == 2.0)
+    assert (poller.next (['Pending'])         == 4.0)
+    assert (poller.next (['Pending', 'Done']) == 1.0)
+    assert (poller.next (['Pending', 'Done']) == 2.0)
+
+    counters = policy.get_counters ()
+    assert (counters['polls']     == 5)
+    assert (counters['poll_time'] == 10.0)
+
+
+# ------------------------------------------------------------------------------
+#
+def test_poll_policy_latency () :
+    """ Test that intervals are never shorter than the scaled query latency """
+
+    policy = _policy ('pending=1,running=1,final=0.5,latency=4')
+
+    assert (policy.interval (['Running']) == 1.0)
+
+    policy._record (0.0, 1.0)
+    assert (policy.interval (['Running']) == 4.0)
+    assert (policy.interval (['Done'])    == 4.0)
+
+    # the latency is a moving average
+    policy._record (0.0, 2.0)
+    assert (abs (policy.get_counters ()['latency'] - 1.2) < 1e-9)
+
+    # queries are counted
+    with policy.query () :
+        pass
+
+    counters = policy.get_counters ()
+    assert (counters['queries']   == 3)
+    assert (counters['throttled'] == 0)
+
+
+# ------------------------------------------------------------------------------
+#
+def test_poll_policy_budget () :
+    """ Test the per-host query budget """
+
+    # no budget, no limit
+    budget = supp._QueryBudget (0)
+    for i in range (100) :
+        assert (budget.acquire () == 0.0)
+
+    # 600 queries per minute: a full bucket, refilled at 10 per second
+    budget = supp._QueryBudget (600)
+    for i in range (600) :
+        assert (budget.acquire () == 0.0)
+
+    start  = time.time ()
+    waited = budget.acquire ()
+
+    assert (waited > 0.0)
+    assert (waited < 1.0)
+    assert (time.time () - start >= waited * 0.9)
+
+
+# ------------------------------------------------------------------------------
+#
+def test_poll_policy_sleep_timeout () :
+    """ Test that pollers don't sleep beyond a given timeout """
+
+    policy = _policy ('pending=10,latency=0')
+    poller = policy.poller ()
+
+    start = time.time ()
+    poller.sleep (['Pending'], start, 0.1)
+    assert (time.time () - start < 1.0)
+
+    # timeout has passed already
+    start = time.time ()
+    poller.sleep (['Pending'], start - 100, 10)
+    assert (time.time () - start < 1.0)
+
+    # no timeout
+    policy = _policy ('final=0.1,latency=0')
+    poller = policy.poller ()
+
+    start = time.time ()
+    poller.sleep (['Done'])
+    assert (time.time () - start >= 0.1)
+
@@ -0,0 +1,174 @@
+
+__author__    = "Andre Merzky"
+__copyright__ = "Copyright 2013, The SAGA Project"
+__license__   = "MIT"
+
+
+import time
+import logging
+import threading
+
+import saga.utils.poll_policy       as supp
+import saga.utils.job.state_monitor as sujsm
+
+
+# ------------------------------------------------------------------------------
+#
+class _Service (object) :
+    """ minimal job service, as expected by the state monitor """
+
+    _logger = logging.getLogger ('test_state_monitor')
+
+    def __init__ (self, fail=False) :
+
+        self.jobs    = dict()
+        self.fail    = fail
+        self.queries = list()
+        self.updates = list()
+        self.lock    = threading.Lock ()
+
+    def add_jobs (self, jobs) :
+        with self.lock :
+            for job in jobs :
+                self.jobs[job] = {'state' : 'Running'}
+
+    def _monitor_jobs (self) :
+        with self.lock :
+            return dict ([(job, info) for job, info in self.jobs.iteritems () \
+                                      if  info['state'] == 'Running'])
+
+    def _job_get_infos (self, jobs, table) :
+        with self.lock :
+            self.queries.append (sorted (jobs))
+            if  self.fail :
+                raise RuntimeError ('query failed')
+        return dict ([(job, {'state' : 'Done'}) for job in jobs])
+
+    def _job_update_infos (self, infos) :
+        with self.lock :
+            self.updates.append (infos)
+            self.jobs.update (infos)
+
+
+# ------------------------------------------------------------------------------
+#
+def _policy () :
+
+    return supp.PollPolicy ('test', 'localhost',
+                            supp.parse_spec ('pending=0.01,running=0.01,'
+                                             'final=0.01,latency=0'),
+                            supp._QueryBudget (0))
+
+
+# ------------------------------------------------------------------------------
+#
+def _wait_for (check, timeout=5.0) :
+
+    start = time.time ()
+    while not check () :
+        if  time.time () - start > timeout :
+            return False
+        time.sleep (0.01)
+    return True
+
+
+# ------------------------------------------------------------------------------
+#
+def test_state_monitor_fanout () :
+    """ Test that one bulk query serves all services, each getting its jobs """
+
+    js_1 = _Service ()
+    js_2 = _Service ()
+
+    monitor = sujsm.register ('test://fanout', js_1, _policy ())
+    assert (sujsm.register ('test://fanout', js_2, _policy ()) is monitor)
+
+    try :
+        # the monitor only queries once there are jobs
+        time.sleep (0.1)
+        assert (not js_1.queries and not js_2.queries)
+
+        with js_1.lock, js_2.lock :
+            js_1.jobs = {'job.1' : {'state' : 'Running'},
+                         'job.2' : {'state' : 'Running'}}
+            js_2.jobs = {'job.3' : {'state' : 'Running'}}
+
+        assert (_wait_for (lambda : js_1.updates and js_2.updates))
+
+        # a single query for all jobs, on either service
+        queries = js_1.queries + js_2.queries
+        assert (['job.1', 'job.2', 'job.3'] in queries)
+
+        assert (js_1.updates[0] == {'job.1' : {'state' : 'Done'},
+                                    'job.2' : {'state' : 'Done'}})
+        assert (js_2.updates[0] == {'job.3' : {'state' : 'Done'}})
+
+    finally :
+        sujsm.unregister ('test://fanout', js_1)
+        sujsm.unregister ('test://fanout', js_2)
+
+
+# ------------------------------------------------------------------------------
+#
+def test_state_monitor_unregister () :
+    """ Test that the monitor stops when the last service unregisters """
+
+    js_1 = _Service ()
+    js_2 = _Service ()
+
+    monitor = sujsm.register ('test://unregister', js_1, _policy ())
+    sujsm.register ('test://unregister', js_2, _policy ())
+
+    sujsm.unregister ('test://unregister', js_1)
+    assert (not monitor.stopped ())
+    assert ('test://unregister' in sujsm._monitors)
+
+    sujsm.unregister ('test://unregister', js_2)
+    assert (monitor.stopped ())
+    assert ('test://unregister' not in sujsm._monitors)
+
+    monitor.join (5.0)
+    assert (not monitor.is_alive ())
+
+    # unregistering again is fine
+    sujsm.unregister ('test://unregister', js_2)
+
+
+# ------------------------------------------------------------------------------
+#
+def test_state_monitor_errors () :
+    """ Test query fallback to other services, and restart after errors """
+
+    js_1 = _Service (fail=True)
+    js_2 = _Service (fail=True)
+    js_3 = _Service (fail=True)
+
+    monitor = sujsm.register ('test://errors', js_1, _policy (), max_errors=3)
+    sujsm.register ('test://errors', js_2, _policy ())
+
+    try :
+        js_1.add_jobs (['job.1'])
+        js_2.add_jobs (['job.2'])
+
+        # both services fail, so the monitor gives up
+        monitor.join (5.0)
+        assert (not monitor.is_alive ())
+        assert (monitor.stopped ())
+        assert (js_1.queries and js_2.queries)
+
+        # the next registration starts a new monitor for all services, and
+        # a failing service is backed up by the others
+        js_2.fail = False
+        js_3.add_jobs (['job.3'])
+
+        restarted = sujsm.register ('test://errors', js_3, _policy ())
+        assert (restarted is not monitor)
+
+        assert (_wait_for (lambda : js_1.updates and js_2.updates and js_3.updates))
+        assert (restarted.is_alive ())
+
+    finally :
+        sujsm.unregister ('test://errors', js_1)
+        sujsm.unregister ('test://errors', js_2)
+        sujsm.unregister ('test://errors', js_3)
+
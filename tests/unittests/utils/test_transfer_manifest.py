@@ -0,0 +1,119 @@
+
+__author__    = "Andre Merzky"
+__copyright__ = "Copyright 2013, The SAGA Project"
+__license__   = "MIT"
+
+
+import os
+import shutil
+import tempfile
+
+import saga.utils.transfer_manifest as sutm
+
+
+# ------------------------------------------------------------------------------
+#
+def test_transfer_manifest_records () :
+    """ Test recording and lookup of transfer manifest entries """
+
+    base = tempfile.mkdtemp ()
+
+    try :
+        src = os.path.join (base, 'data')
+        with open (src, 'w') as f :
+            f.write ("some data")
+
+        manifest = sutm.TransferManifest ('user@host.net:None', base)
+        checksum = manifest.checksum (src)
+
+        assert (manifest.candidates (checksum) == [])
+
+        manifest.record ('/remote/data.1', checksum, 9, 1000)
+        manifest.record ('/remote/data.2', checksum, 9, 2000)
+
+        assert (manifest.candidates (checksum) == ['/remote/data.1', '/remote/data.2'])
+        assert (manifest.lookup ('/remote/data.1') == (checksum, 9, 1000))
+
+        manifest.forget ('/remote/data.1')
+        assert (manifest.lookup ('/remote/data.1') == None)
+
+        # records survive a new manifest instance
+        manifest = sutm.TransferManifest ('user@host.net:None', base)
+        assert (manifest.candidates (checksum) == ['/remote/data.2'])
+
+    finally :
+        shutil.rmtree (base)
+
+
+# ------------------------------------------------------------------------------
+#
+def test_transfer_manifest_merge () :
+    """ Test merging of a remote transfer index """
+
+    base = tempfile.mkdtemp ()
+
+    try :
+        manifest = sutm.TransferManifest ('host.net', base)
+        manifest.record ('/remote/a', 'aaa', 1, 1)
+
+        manifest.merge ("bbb 2 2 /remote/a\n"
+                        "ccc 3 3 /remote/with space\n"
+                        "garbage\n")
+
+        assert (manifest.synced)
+        assert (manifest.lookup ('/remote/a')          == ('aaa', 1, 1))
+        assert (manifest.lookup ('/remote/with space') == ('ccc', 3, 3))
+
+    finally :
+        shutil.rmtree (base)
+
+
+
+# ------------------------------------------------------------------------------
+#
+def test_transfer_manifest_batch () :
+    """ Test that batched changes are written once, at the end of the batch """
+
+    base = tempfile.mkdtemp ()
+
+    try :
+        manifest = sutm.TransferManifest ('host.net', base)
+
+        with manifest.batch () :
+
+            manifest.record ('/remote/a', 'aaa', 1, 1)
+
+            with manifest.batch () :
+                manifest.record ('/remote/b', 'bbb', 2, 2)
+                manifest.forget ('/remote/a')
+
+            # nothing written yet
+            assert (not os.listdir (base))
+
+        assert (sutm.TransferManifest ('host.net', base).lookup ('/remote/b') == ('bbb', 2, 2))
+        assert (sutm.TransferManifest ('host.net', base).lookup ('/remote/a') == None)
+
+    finally :
+        shutil.rmtree (base)
+
+
+# ------------------------------------------------------------------------------
+#
+def test_transfer_manifest_compact () :
+    """ Test that redundant remote indexes are flagged for compaction """
+
+    base = tempfile.mkdtemp ()
+
+    try :
+        manifest = sutm.TransferManifest ('host.net', base)
+
+        assert (not manifest.merge (""))
+        assert (not manifest.merge ("aaa 1 1 /remote/a\n"
+                                    "bbb 2 2 /remote/a\n"))
+        assert (manifest.merge ("aaa 1 1 /remote/a\n"
+                                "bbb 2 2 /remote/a\n"
+                                "ccc 3 3 /remote/a\n"))
+        assert (manifest.merge ("garbage\n" * 3 + "aaa 1 1 /remote/a\n"))
+
+    finally :
+        shutil.rmtree (base)